@@ -0,0 +1,149 @@
+"""
+This module defines the functions used to read the notebook archive, i.e., the folder where notebooks are downloaded.
+
+Notebooks are stored as ``UserName_CurrentUrlSlug.ipynb`` files.
+They are parsed with the optional ``orjson`` package when it is installed, which is several times faster
+than the ``json`` module of the standard library on large notebooks; otherwise ``json`` is used.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Extension of the notebook files
+NOTEBOOK_SUFFIX = '.ipynb'
+
+# Below this number of files, notebooks are processed in the calling process, sparing the start of the process pool
+MIN_PARALLEL_FILES = 256
+
+
+def loads(content):
+    """
+    This function parses the content of a JSON document.
+
+    Args:
+        content: The content of the document, as ``bytes`` or ``str``.
+
+    Returns:
+        document: The parsed document.
+
+    Raises:
+        ValueError: If the content is not valid JSON (``json.JSONDecodeError`` and ``orjson.JSONDecodeError``
+            are both subclasses of ``ValueError``).
+    """
+
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def load_notebook(path):
+    """
+    This function reads and parses a notebook file.
+
+    Args:
+        path: The path to the notebook file.
+
+    Returns:
+        notebook: The parsed notebook, as a dictionary.
+    """
+
+    with open(path, 'rb') as notebook_file:
+        return loads(notebook_file.read())
+
+
+def get_cells(notebook):
+    """
+    This function returns the cells of a parsed notebook, whatever its nbformat version.
+
+    Args:
+        notebook: The parsed notebook.
+
+    Returns:
+        cells: The list of cells.
+    """
+
+    # Notebooks before nbformat 4 store their cells in worksheets
+    if notebook.get('nbformat', 4) < 4:
+        return [cell for worksheet in notebook.get('worksheets', []) for cell in worksheet.get('cells', [])]
+    return notebook.get('cells', [])
+
+
+def get_source(cell):
+    """
+    This function returns the source of a cell as a single string.
+
+    Args:
+        cell: The cell of a parsed notebook.
+
+    Returns:
+        source: The source of the cell.
+    """
+
+    # Code cells of nbformat 3 store their source in the input field
+    source = cell.get('source', cell.get('input', ''))
+    if isinstance(source, list):
+        return ''.join(source)
+    return source
+
+
+def parse_notebook_name(path):
+    """
+    This function extracts the user name and the slug of a notebook from the name of its file.
+
+    Args:
+        path: The path to the notebook file.
+
+    Returns:
+        identifiers: A ``(UserName, CurrentUrlSlug)`` tuple, or ``None`` if the file name is not valid.
+    """
+
+    split = Path(path).stem.split('_')
+    if len(split) != 2:
+        return None
+    return split[0], split[1]
+
+
+def list_notebooks(nb_archive_path):
+    """
+    This function lists the notebook files in the notebook archive folder, sorted by name.
+    Files in subfolders (e.g., shards or quarantined notebooks) are not listed.
+
+    Args:
+        nb_archive_path: The path to the notebook archive folder.
+
+    Returns:
+        notebook_paths: The list of paths to the notebook files.
+    """
+    return sorted(Path(nb_archive_path).glob(f'*{NOTEBOOK_SUFFIX}'))
+
+
+def map_notebooks(function, paths, n_workers=None):
+    """
+    This function applies a function to a list of notebook files, in parallel on a pool of processes
+    when the list is large enough.
+
+    Args:
+        function: A module-level function taking the path to a notebook file (it must be picklable).
+        paths: The list of paths to the notebook files.
+        n_workers: The number of worker processes. By default it is the number of CPUs.
+
+    Returns:
+        results: The list of the results, in the same order as ``paths``.
+    """
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(paths) < MIN_PARALLEL_FILES:
+        return [function(path) for path in paths]
+
+    # Large chunks amortize the inter-process communication, while leaving a few chunks per worker
+    # to balance the load
+    chunksize = max(1, len(paths) // (n_workers * 8))
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(function, paths, chunksize=chunksize))
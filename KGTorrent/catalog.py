@@ -0,0 +1,104 @@
+"""
+This module defines the class that builds the notebook catalog, a denormalized table with one row for each notebook
+of KGTorrent and the information that is most often used to select notebooks.
+
+The catalog is built from the preprocessed Meta Kaggle tables: it contains the same notebooks as the join of the
+``Kernels``, ``Users``, ``KernelVersions`` and ``KernelLanguages`` tables used to select the notebooks to download,
+so that selecting notebooks only requires to read one indexed table.
+"""
+
+# Name of the catalog table in the database
+CATALOG_TABLE_NAME = 'notebookcatalog'
+
+# Tables the catalog is built from, with the columns it uses
+CATALOG_SOURCE_TABLES = {
+    'Kernels.csv': ['Id', 'AuthorUserId', 'CurrentKernelVersionId', 'ForkParentKernelVersionId', 'CreationDate',
+                    'MadePublicDate', 'CurrentUrlSlug', 'Medal', 'MedalAwardDate', 'TotalViews', 'TotalComments',
+                    'TotalVotes'],
+    'Users.csv': ['Id', 'UserName', 'DisplayName'],
+    'KernelVersions.csv': ['Id', 'ScriptLanguageId', 'CreationDate'],
+    'KernelLanguages.csv': ['Id', 'Name'],
+    'KernelVersionDatasetSources.csv': ['KernelVersionId'],
+    'KernelVersionCompetitionSources.csv': ['KernelVersionId'],
+    'KernelVersionKernelSources.csv': ['KernelVersionId'],
+}
+
+# Columns of the catalog, in order
+CATALOG_COLUMNS = ['KernelId', 'CurrentKernelVersionId', 'FileName', 'UserName', 'CurrentUrlSlug', 'AuthorUserId',
+                   'AuthorDisplayName', 'LanguageId', 'LanguageName', 'Medal', 'MedalAwardDate', 'TotalVotes',
+                   'TotalViews', 'TotalComments', 'KernelCreationDate', 'MadePublicDate', 'VersionCreationDate',
+                   'ForkParentKernelVersionId', 'NDatasetSources', 'NCompetitionSources', 'NKernelSources']
+
+
+class CatalogBuilder:
+    """
+    The ``CatalogBuilder`` class builds the notebook catalog from the preprocessed Meta Kaggle tables.
+    """
+
+    def __init__(self, tables_dict, to_pandas=None):
+        """
+        The constructor of this class sets the preprocessed tables the catalog is built from.
+
+        Args:
+            tables_dict: The dictionary whose keys are the table names and whose values are the preprocessed tables;
+                it must contain the tables in ``CATALOG_SOURCE_TABLES``.
+            to_pandas: An optional function converting each table into a ``pandas.DataFrame``
+                (e.g., the ``to_pandas`` method of a dataframe engine).
+        """
+
+        self._tables_dict = {}
+        for table_name, columns in CATALOG_SOURCE_TABLES.items():
+            table = tables_dict[table_name]
+            table = to_pandas(table) if to_pandas is not None else table
+            self._tables_dict[table_name] = table[columns]
+
+    def _count_sources(self, table_name):
+        """
+        This method counts the sources of each kernel version in a source table.
+
+        Args:
+            table_name: The name of the source table.
+
+        Returns:
+            counts: The ``pandas.Series`` of the number of sources, indexed by ``KernelVersionId``.
+        """
+        return self._tables_dict[table_name]['KernelVersionId'].value_counts()
+
+    def build(self):
+        """
+        This method builds the notebook catalog.
+
+        Returns:
+            catalog: The ``pandas.DataFrame`` containing the catalog.
+        """
+
+        kernels = self._tables_dict['Kernels.csv']
+        users = self._tables_dict['Users.csv']
+        kernel_versions = self._tables_dict['KernelVersions.csv']
+        kernel_languages = self._tables_dict['KernelLanguages.csv']
+
+        users = users.rename(columns={'Id': 'AuthorUserId', 'DisplayName': 'AuthorDisplayName'})
+        kernel_versions = kernel_versions.rename(columns={'Id': 'CurrentKernelVersionId',
+                                                          'ScriptLanguageId': 'LanguageId',
+                                                          'CreationDate': 'VersionCreationDate'})
+        kernel_languages = kernel_languages.rename(columns={'Id': 'LanguageId', 'Name': 'LanguageName'})
+
+        # Same inner joins as the query selecting the notebooks to download
+        catalog = kernels.rename(columns={'Id': 'KernelId', 'CreationDate': 'KernelCreationDate'}) \
+            .merge(users, on='AuthorUserId') \
+            .merge(kernel_versions, on='CurrentKernelVersionId') \
+            .merge(kernel_languages, on='LanguageId')
+
+        # User names and slugs can be missing in Meta Kaggle, and so is then the file name
+        catalog['FileName'] = catalog['UserName'] + '_' + catalog['CurrentUrlSlug'] + '.ipynb'
+
+        # Number of sources of the current version of each kernel
+        for column, table_name in (('NDatasetSources', 'KernelVersionDatasetSources.csv'),
+                                   ('NCompetitionSources', 'KernelVersionCompetitionSources.csv'),
+                                   ('NKernelSources', 'KernelVersionKernelSources.csv')):
+            counts = self._count_sources(table_name)
+            catalog[column] = catalog['CurrentKernelVersionId'].map(counts).fillna(0).astype('int64')
+
+        catalog = catalog.astype({'CurrentKernelVersionId': 'int64'})
+        return catalog[CATALOG_COLUMNS].reset_index(drop=True)
+
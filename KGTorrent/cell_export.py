@@ -0,0 +1,412 @@
+"""
+This module defines the function and the class that export the cells of the notebooks in the notebook archive
+to a partitioned Parquet dataset, so that analyses read compressed columns instead of parsing JSON files.
+
+The dataset has one row per cell, with the ``CurrentKernelVersionId`` of its notebook (so that it can be joined
+with the tables of the KGTorrent database), its ``CellIndex``, its ``Source``, its ``ExecutionCount`` and the number
+(``NOutputs``) and size (``OutputBytes``) of its outputs, and whether one of them is an error (``HasError``).
+It is partitioned on the type of the cells, Hive-style (``CellType=code``, ``CellType=markdown``, ...), and each
+partition is split into *parts* covering a batch of notebooks; it can be read with ``pandas.read_parquet`` or
+``pyarrow.dataset``, which ignore the files starting with an underscore.
+
+The ``_notebooks.parquet`` file lists the exported notebooks, with the size and modification time of their files and
+the part holding their cells. Updates are incremental: new or changed notebooks are exported to new parts, and
+the parts holding outdated rows are rewritten to new parts without them; parts are only deleted once the list of
+notebooks no longer refers to them, so that an interrupted update leaves a consistent dataset.
+
+Parquet files require the optional ``pyarrow`` package.
+"""
+
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from KGTorrent.archive import load_notebook, get_cells, get_source, parse_notebook_name, list_notebooks, map_notebooks
+
+# Name of the dataset folder, inside the notebook archive, used when no other folder is given
+CELLS_FOLDER_NAME = 'cells'
+
+# Name of the file listing the exported notebooks
+NOTEBOOKS_FILE_NAME = '_notebooks.parquet'
+
+# Name of the partitioning column and template of the names of the part files
+PARTITION_COLUMN = 'CellType'
+PART_FILE_NAME = 'part-{:06d}.parquet'
+
+# Default maximum number of notebooks in each part
+DEFAULT_NOTEBOOKS_PER_PART = 5000
+
+# Columns of the cells, besides the partitioning column
+CELL_COLUMNS = ['CurrentKernelVersionId', 'CellIndex', 'Source', 'ExecutionCount', 'NOutputs', 'OutputBytes',
+                'HasError']
+
+# Columns of the list of exported notebooks
+NOTEBOOK_COLUMNS = ['FileName', 'CurrentKernelVersionId', 'Part', 'ByteSize', 'MTimeNs', 'NCells']
+
+_PART_PATTERN = re.compile(r'^part-(\d+)\.parquet$')
+_CELL_TYPE_PATTERN = re.compile(r'^\w+$')
+
+
+def _get_text_size(value):
+    """
+    This function measures a text field of an output, stored either as a string or as a list of lines.
+
+    Args:
+        value: The value of the field.
+
+    Returns:
+        size: The number of characters of the field.
+    """
+
+    if isinstance(value, list):
+        return sum(len(line) for line in value if isinstance(line, str))
+    if isinstance(value, str):
+        return len(value)
+    return 0
+
+
+def _get_output_size(output):
+    """
+    This function measures the payload of a cell output: its text, traceback and data in all the MIME types.
+
+    Args:
+        output: The output of a code cell.
+
+    Returns:
+        size: The number of characters of the payload.
+    """
+
+    size = _get_text_size(output.get('text')) + _get_text_size(output.get('traceback'))
+    data = output.get('data')
+    if isinstance(data, dict):
+        size += sum(_get_text_size(value) for value in data.values())
+    return size
+
+
+def _extract_cell(cell_index, cell):
+    """
+    This function extracts a cell of a parsed notebook.
+
+    Args:
+        cell_index: The position of the cell in the notebook.
+        cell: The cell.
+
+    Returns:
+        cell: The ``(CellType, CellIndex, Source, ExecutionCount, NOutputs, OutputBytes, HasError)`` tuple of the cell.
+    """
+
+    cell_type = cell.get('cell_type')
+    if not isinstance(cell_type, str) or _CELL_TYPE_PATTERN.match(cell_type) is None:
+        cell_type = 'unknown'
+
+    source = get_source(cell)
+    if not isinstance(source, str):
+        raise ValueError(f'Invalid source of cell {cell_index}')
+
+    outputs = cell.get('outputs') or []
+    execution_count = cell.get('execution_count', cell.get('prompt_number'))
+    return (cell_type,
+            cell_index,
+            source,
+            execution_count if isinstance(execution_count, int) else None,
+            len(outputs),
+            sum(_get_output_size(output) for output in outputs),
+            any(output.get('output_type') in ('error', 'pyerr') for output in outputs))
+
+
+def extract_cells(path):
+    """
+    This function parses a notebook file and extracts its cells.
+
+    Args:
+        path: The path to the notebook file.
+
+    Returns:
+        cells: The list of ``(CellType, CellIndex, Source, ExecutionCount, NOutputs, OutputBytes, HasError)`` tuples
+        of the cells, or ``None`` if the notebook or any of its cells cannot be parsed.
+    """
+
+    # Malformed cells (e.g., a source list holding a non-string, or outputs that are not objects)
+    # make the whole notebook unparsable
+    # noinspection PyBroadException
+    try:
+        return [_extract_cell(cell_index, cell) for cell_index, cell in enumerate(get_cells(load_notebook(path)))]
+    except Exception:
+        return None
+
+
+def _get_cell_schema():
+    """
+    This function returns the schema of the part files.
+
+    Returns:
+        schema: The ``pyarrow.Schema`` of the cells.
+    """
+
+    import pyarrow
+
+    return pyarrow.schema([('CurrentKernelVersionId', pyarrow.int64()),
+                           ('CellIndex', pyarrow.int32()),
+                           ('Source', pyarrow.string()),
+                           ('ExecutionCount', pyarrow.int64()),
+                           ('NOutputs', pyarrow.int32()),
+                           ('OutputBytes', pyarrow.int64()),
+                           ('HasError', pyarrow.bool_())])
+
+
+class CellExporter:
+    """
+    The ``CellExporter`` class exports the cells of the notebooks in the notebook archive to a partitioned Parquet
+    dataset and keeps it up to date. Notebooks are parsed in parallel by a pool of processes.
+    """
+
+    def __init__(self, dataset_path):
+        """
+        The constructor of this class opens the dataset stored in the given folder, creating it if needed.
+
+        Args:
+            dataset_path: The path to the dataset folder.
+        """
+
+        self._dataset_path = Path(dataset_path)
+        self._dataset_path.mkdir(parents=True, exist_ok=True)
+
+    def _read_notebooks(self):
+        """
+        This method reads the list of the exported notebooks.
+
+        Returns:
+            notebooks: The ``pandas.DataFrame`` of the exported notebooks.
+        """
+
+        path = self._dataset_path / NOTEBOOKS_FILE_NAME
+        if not path.exists():
+            return pd.DataFrame(columns=NOTEBOOK_COLUMNS)
+        return pd.read_parquet(path)
+
+    def _save_notebooks(self, notebooks):
+        """
+        This method atomically writes the list of the exported notebooks.
+
+        Args:
+            notebooks: The ``pandas.DataFrame`` of the exported notebooks.
+        """
+
+        notebooks = notebooks.astype({'CurrentKernelVersionId': 'int64', 'Part': 'int64', 'ByteSize': 'int64',
+                                      'MTimeNs': 'int64', 'NCells': 'int64'})
+        temporary_path = self._dataset_path / ('.' + NOTEBOOKS_FILE_NAME + '.tmp')
+        notebooks.sort_values('FileName').to_parquet(temporary_path, index=False)
+        os.replace(temporary_path, self._dataset_path / NOTEBOOKS_FILE_NAME)
+
+    def _list_parts(self):
+        """
+        This method lists the part files of the dataset.
+
+        Returns:
+            parts: A dictionary whose keys are the part numbers and whose values are the lists of their files
+            (one for each cell type).
+        """
+
+        parts = defaultdict(list)
+        for path in self._dataset_path.glob(f'{PARTITION_COLUMN}=*/part-*.parquet'):
+            match = _PART_PATTERN.match(path.name)
+            if match is not None:
+                parts[int(match.group(1))].append(path)
+        return parts
+
+    def _write_part(self, part, cells_by_type):
+        """
+        This method writes a part of the dataset, with one file for each cell type.
+
+        Args:
+            part: The number of the part.
+            cells_by_type: A dictionary whose keys are the cell types and whose values are the ``pyarrow.Table``
+                of the cells.
+        """
+
+        import pyarrow.parquet
+
+        for cell_type, cells in cells_by_type.items():
+            if cells.num_rows == 0:
+                continue
+            folder = self._dataset_path / f'{PARTITION_COLUMN}={cell_type}'
+            folder.mkdir(exist_ok=True)
+            temporary_path = folder / ('.' + PART_FILE_NAME.format(part) + '.tmp')
+            pyarrow.parquet.write_table(cells, str(temporary_path), compression='zstd')
+            os.replace(temporary_path, folder / PART_FILE_NAME.format(part))
+
+    def _build_cells(self, rows_by_type):
+        """
+        This method converts the rows of the cells into tables.
+
+        Args:
+            rows_by_type: A dictionary whose keys are the cell types and whose values are the lists of the rows,
+                with the values of ``CELL_COLUMNS``.
+
+        Returns:
+            cells_by_type: A dictionary whose keys are the cell types and whose values are the ``pyarrow.Table``
+            of the cells.
+        """
+
+        import pyarrow
+
+        schema = _get_cell_schema()
+        cells_by_type = {}
+        for cell_type, rows in rows_by_type.items():
+            columns = list(zip(*rows))
+            cells_by_type[cell_type] = pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+        return cells_by_type
+
+    def _rewrite_part(self, files, kept_ids, part):
+        """
+        This method copies the rows of the notebooks that are still up to date from the files of a part
+        to a new part.
+
+        Args:
+            files: The list of the files of the outdated part.
+            kept_ids: The ``numpy.ndarray`` of the ``CurrentKernelVersionId`` of the notebooks to be kept.
+            part: The number of the new part.
+        """
+
+        import pyarrow
+        import pyarrow.parquet
+
+        cells_by_type = {}
+        for path in files:
+            cells = pyarrow.parquet.read_table(str(path))
+            is_kept = np.isin(cells.column('CurrentKernelVersionId').to_numpy(), kept_ids)
+            cells_by_type[path.parent.name.split('=', 1)[1]] = cells.filter(pyarrow.array(is_kept))
+        self._write_part(part, cells_by_type)
+
+    def _find_changed_notebooks(self, nb_identifiers, nb_archive_path, notebooks):
+        """
+        This method compares the notebooks in the archive with the exported ones.
+
+        Args:
+            nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
+            nb_archive_path: The path to the notebook archive folder.
+            notebooks: The ``pandas.DataFrame`` of the exported notebooks.
+
+        Returns:
+            - changed    - the list of ``(CurrentKernelVersionId, path, stat)`` tuples of new or changed notebooks
+            - is_changed - the boolean ``numpy.ndarray`` telling which exported notebooks are changed
+            - is_removed - the boolean ``numpy.ndarray`` telling which exported notebooks are no longer in the archive
+            - n_unknown - the number of notebooks in the archive that are not referenced in the database
+              (or whose identifier is already taken by another notebook file)
+        """
+
+        ids = {(row.UserName, row.CurrentUrlSlug): int(row.CurrentKernelVersionId)
+               for row in nb_identifiers.itertuples()}
+        exported = {row.FileName: (int(row.CurrentKernelVersionId), int(row.ByteSize), int(row.MTimeNs))
+                    for row in notebooks.itertuples()}
+
+        changed = []
+        present = set()
+        n_unknown = 0
+        for path in list_notebooks(nb_archive_path):
+            kernel_version_id = ids.get(parse_notebook_name(path))
+            if kernel_version_id is None or kernel_version_id in present:
+                n_unknown += 1
+                continue
+
+            present.add(kernel_version_id)
+            stat = path.stat()
+            if exported.get(path.name) != (kernel_version_id, stat.st_size, stat.st_mtime_ns):
+                changed.append((kernel_version_id, path, stat))
+
+        is_changed = notebooks['FileName'].isin({path.name for _, path, _ in changed}).to_numpy()
+        is_removed = ~notebooks['CurrentKernelVersionId'].isin(list(present)).to_numpy() & ~is_changed
+        return changed, is_changed, is_removed, n_unknown
+
+    def update(self, nb_identifiers, nb_archive_path, n_workers=None, notebooks_per_part=DEFAULT_NOTEBOOKS_PER_PART):
+        """
+        This method exports the cells of the notebooks that were added to or changed in the notebook archive since
+        the last update, and removes from the dataset the cells of the notebooks that are no longer in the archive.
+
+        Args:
+            nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers
+                (see :func:`.DbCommunicationHandler.get_nb_identifiers`).
+            nb_archive_path: The path to the notebook archive folder.
+            n_workers: The number of worker processes. By default it is the number of CPUs.
+            notebooks_per_part: The maximum number of notebooks exported to each new part. By default it is 5000.
+
+        Returns:
+            report: A dictionary with the number of exported, removed, unparsable and unknown notebooks,
+            the number of exported cells and the number of parts.
+        """
+
+        start = time.perf_counter()
+
+        notebooks = self._read_notebooks()
+        parts = self._list_parts()
+
+        # Parts left by an interrupted update are not listed and are deleted
+        listed_parts = set(notebooks['Part'].astype('int64'))
+        for part in [part for part in parts if part not in listed_parts]:
+            for path in parts.pop(part):
+                path.unlink()
+        next_part = max(listed_parts, default=-1) + 1
+
+        changed, is_changed, is_removed, n_unknown = self._find_changed_notebooks(nb_identifiers, nb_archive_path,
+                                                                                  notebooks)
+        is_stale = is_changed | is_removed
+        print(f'## Exporting the cells of {len(changed)} new or changed notebooks...')
+
+        # New and changed notebooks are exported to new parts
+        new_notebooks = []
+        n_cells = 0
+        n_unparsable = 0
+        for chunk_start in range(0, len(changed), notebooks_per_part):
+            chunk = changed[chunk_start:chunk_start + notebooks_per_part]
+            results = map_notebooks(extract_cells, [path for _, path, _ in chunk], n_workers=n_workers)
+
+            rows_by_type = defaultdict(list)
+            for (kernel_version_id, path, stat), cells in zip(chunk, results):
+                if cells is None:
+                    n_unparsable += 1
+                    logging.warning(f'Notebook {path} could not be parsed')
+                    continue
+                for cell_type, *values in cells:
+                    rows_by_type[cell_type].append((kernel_version_id, *values))
+                new_notebooks.append((path.name, kernel_version_id, next_part, stat.st_size, stat.st_mtime_ns,
+                                      len(cells)))
+                n_cells += len(cells)
+
+            self._write_part(next_part, self._build_cells(rows_by_type))
+            next_part += 1
+            print(f'- {min(chunk_start + notebooks_per_part, len(changed))}/{len(changed)} notebooks exported')
+
+        # Up-to-date notebooks of the parts holding outdated rows are moved to new parts
+        kept = notebooks.loc[~is_stale].copy()
+        outdated_parts = sorted(set(notebooks.loc[is_stale, 'Part'].astype('int64')))
+        for part in outdated_parts:
+            is_in_part = kept['Part'] == part
+            if is_in_part.any():
+                self._rewrite_part(parts.get(part, []), kept.loc[is_in_part, 'CurrentKernelVersionId'].to_numpy(), next_part)
+                kept.loc[is_in_part, 'Part'] = next_part
+                next_part += 1
+
+        self._save_notebooks(pd.concat([kept, pd.DataFrame(new_notebooks, columns=NOTEBOOK_COLUMNS)],
+                                       ignore_index=True))
+
+        # Outdated parts are deleted once they are no longer listed
+        for part in outdated_parts:
+            for path in parts.get(part, []):
+                path.unlink()
+
+        return {
+            'exported': len(new_notebooks),
+            'cells': n_cells,
+            'removed': int(is_removed.sum()),
+            'unparsable': n_unparsable,
+            'unknown': n_unknown,
+            'parts': len(self._list_parts()),
+            'seconds': time.perf_counter() - start,
+        }
@@ -0,0 +1,307 @@
+"""
+This module defines the client library used to retrieve KGTorrent notebooks from Python, without writing SQL queries or
+building the paths to the notebook files.
+
+A :class:`.KGTorrentClient` takes a :class:`.Selection` and returns a lazy iterator of :class:`.Notebook` objects,
+each with the metadata of the notebook (its row of the notebook catalog) and its parsed content. Notebooks are read in
+batches on a pool of threads, which query the database through the pooled SQLAlchemy engine of the
+:class:`.DbCommunicationHandler` and read the files ahead of the consumer; parsed notebooks are kept in a bounded
+least recently used cache, so that notebooks read again (e.g., in several epochs of a training pipeline) are not
+parsed twice.
+
+Example::
+
+    from KGTorrent.client import KGTorrentClient
+    from KGTorrent.selection import Selection
+
+    with KGTorrentClient.from_config() as client:
+        for notebook in client.iter_notebooks(Selection(languages=['IPython Notebook HTML'], medals=['gold'])):
+            print(notebook.file_name, notebook.metadata['TotalVotes'], len(notebook.content['cells']))
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import column, select, table
+
+from KGTorrent.archive import NOTEBOOK_SUFFIX, load_notebook
+from KGTorrent.catalog import CATALOG_COLUMNS, CATALOG_TABLE_NAME
+
+# Default number of notebooks read by each task of the thread pool
+DEFAULT_BATCH_SIZE = 64
+
+# Default number of parsed notebooks kept in the cache
+DEFAULT_CACHE_SIZE = 1024
+
+# Table of the notebook metadata
+_CATALOG = table(CATALOG_TABLE_NAME, *[column(name) for name in CATALOG_COLUMNS])
+
+
+class Notebook:
+    """
+    The ``Notebook`` class holds the metadata and the parsed content of a notebook.
+    """
+
+    def __init__(self, kernel_version_id, path, metadata, content):
+        """
+        The constructor of this class sets the notebook attributes.
+
+        Args:
+            kernel_version_id: The ``CurrentKernelVersionId`` of the notebook.
+            path: The path to the notebook file.
+            metadata: The dictionary of the metadata of the notebook (its row of the notebook catalog, or its
+                ``UserName``, ``CurrentUrlSlug`` and ``CurrentKernelVersionId`` when the catalog does not exist).
+            content: The parsed notebook, as a dictionary (shared with the cache: it should not be modified),
+                or ``None`` if it was not read or the file is missing or unreadable.
+        """
+
+        self.kernel_version_id = kernel_version_id
+        self.path = path
+        self.file_name = path.name
+        self.metadata = metadata
+        self.content = content
+
+    def __repr__(self):
+        return f'Notebook({self.kernel_version_id}, {self.file_name!r})'
+
+
+class KGTorrentClient:
+    """
+    The ``KGTorrentClient`` class retrieves the notebooks selected in the KGTorrent database
+    from the notebook archive.
+    """
+
+    def __init__(self, db_engine, nb_archive_path, n_workers=None, batch_size=DEFAULT_BATCH_SIZE, prefetch=None,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        """
+        The constructor of this class creates the thread pool and the cache of parsed notebooks.
+
+        Args:
+            db_engine: The :class:`.DbCommunicationHandler` of the KGTorrent database.
+            nb_archive_path: The path to the notebook archive folder.
+            n_workers: The number of threads reading the notebooks. By default it is the number of CPUs.
+            batch_size: The number of notebooks read by each task. By default it is 64.
+            prefetch: The maximum number of batches read ahead of the consumer.
+                By default it is twice the number of threads.
+            cache_size: The maximum number of parsed notebooks kept in the cache (0 disables the cache).
+                By default it is 1024.
+        """
+
+        self._db_engine = db_engine
+        self._nb_archive_path = Path(nb_archive_path)
+        self._n_workers = n_workers or os.cpu_count() or 1
+        self._batch_size = batch_size
+        self._prefetch = prefetch or 2 * self._n_workers
+        self._executor = ThreadPoolExecutor(max_workers=self._n_workers, thread_name_prefix='KGTorrentClient')
+
+        # Parsed notebooks, from the least to the most recently used, with the size and modification time
+        # of their files
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._n_hits = 0
+        self._n_misses = 0
+
+    @classmethod
+    def from_config(cls, **kwargs):
+        """
+        This method creates a client for the database and the notebook archive set in the configuration
+        (see :mod:`.config`). The connection pool of the database holds a connection for each thread.
+
+        Args:
+            **kwargs: The other arguments of the constructor (e.g., ``n_workers``).
+
+        Returns:
+            client: The :class:`.KGTorrentClient`.
+        """
+
+        import KGTorrent.config as config
+        from KGTorrent.db_communication_handler import DbCommunicationHandler
+
+        n_workers = kwargs.get('n_workers') or os.cpu_count() or 1
+        if config.db_backend == 'sqlite':
+            db_engine = DbCommunicationHandler(None, None, None, None, config.db_name, backend='sqlite')
+        else:
+            db_engine = DbCommunicationHandler(config.db_username, config.db_password, config.db_host,
+                                               config.db_port, config.db_name, pool_size=n_workers)
+        return cls(db_engine, config.nb_archive_path, **kwargs)
+
+    def select(self, selection):
+        """
+        This method selects the notebooks described by a selection
+        (see :func:`.DbCommunicationHandler.select_notebooks`).
+
+        Args:
+            selection: The :class:`.Selection`.
+
+        Returns:
+            nb_identifiers: The ``pandas.DataFrame`` containing the ``UserName``, ``CurrentUrlSlug`` and
+            ``CurrentKernelVersionId`` of the selected notebooks.
+        """
+        return self._db_engine.select_notebooks(selection)
+
+    def _get_metadata(self, nb_identifiers, use_catalog):
+        """
+        This method retrieves the metadata of a batch of notebooks.
+
+        Args:
+            nb_identifiers: The ``pandas.DataFrame`` of the slugs and identifiers of the notebooks.
+            use_catalog: If True, the metadata are read from the notebook catalog.
+
+        Returns:
+            metadata: The list of the dictionaries of the metadata, in the order of ``nb_identifiers``.
+        """
+
+        rows = nb_identifiers.to_dict('records')
+        if not use_catalog or len(rows) == 0:
+            return rows
+
+        kernel_version_ids = [int(row['CurrentKernelVersionId']) for row in rows]
+        catalog = self._db_engine.execute_query(
+            select([_CATALOG]).where(_CATALOG.c.CurrentKernelVersionId.in_(kernel_version_ids)))
+        catalog = catalog.astype(object).where(catalog.notnull(), None)
+        by_key = {(int(row['CurrentKernelVersionId']), row['UserName'], row['CurrentUrlSlug']): row
+                  for row in catalog.to_dict('records')}
+        return [by_key.get((kernel_version_id, row['UserName'], row['CurrentUrlSlug']), row)
+                for kernel_version_id, row in zip(kernel_version_ids, rows)]
+
+    def _read_content(self, path):
+        """
+        This method reads and parses a notebook, unless the cache holds the same version of its file.
+
+        Args:
+            path: The path to the notebook file.
+
+        Returns:
+            content: The parsed notebook, or ``None`` if the file is missing or cannot be read or parsed.
+        """
+
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        version = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(path)
+                self._n_hits += 1
+                return cached[1]
+            self._n_misses += 1
+
+        # Unreadable files (e.g., truncated JSON) are treated as missing, instead of ending the iteration
+        try:
+            content = load_notebook(path)
+        except (ValueError, OSError) as e:
+            logging.warning(f'Notebook {path} cannot be read: {e}')
+            return None
+
+        if self._cache_size > 0:
+            with self._lock:
+                self._cache[path] = (version, content)
+                self._cache.move_to_end(path)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return content
+
+    def _read_batch(self, nb_identifiers, use_catalog, with_content):
+        """
+        This method reads the metadata and the content of a batch of notebooks.
+
+        Args:
+            nb_identifiers: The ``pandas.DataFrame`` of the slugs and identifiers of the notebooks.
+            use_catalog: If True, the metadata are read from the notebook catalog.
+            with_content: If True, the notebook files are read and parsed.
+
+        Returns:
+            notebooks: The list of the :class:`.Notebook`, in the order of ``nb_identifiers``.
+        """
+
+        notebooks = []
+        for metadata in self._get_metadata(nb_identifiers, use_catalog):
+            kernel_version_id = int(metadata['CurrentKernelVersionId'])
+            path = self._nb_archive_path / f'{metadata["UserName"]}_{metadata["CurrentUrlSlug"]}{NOTEBOOK_SUFFIX}'
+            content = self._read_content(path) if with_content else None
+            notebooks.append(Notebook(kernel_version_id, path, metadata, content))
+        return notebooks
+
+    def iter_notebooks(self, selection, with_content=True, skip_missing=True):
+        """
+        This method iterates over the selected notebooks, in the order of the selection.
+        Batches of notebooks are read on the thread pool ahead of the consumer.
+
+        Args:
+            selection: The :class:`.Selection`, or a ``pandas.DataFrame`` with the ``UserName``, ``CurrentUrlSlug``
+                and ``CurrentKernelVersionId`` of the notebooks.
+            with_content: If True, the notebook files are read and parsed; otherwise, only the metadata are
+                retrieved. By default it is True.
+            skip_missing: If True, the notebooks that are not in the notebook archive, or cannot be read, are
+                skipped; otherwise, they are returned with a ``None`` content. By default it is True.
+
+        Returns:
+            notebooks: The iterator of the :class:`.Notebook`.
+        """
+
+        if isinstance(selection, pd.DataFrame):
+            nb_identifiers = selection
+        else:
+            nb_identifiers = self.select(selection)
+        use_catalog = self._db_engine.has_table(CATALOG_TABLE_NAME)
+
+        pending = deque()
+        for start in range(0, nb_identifiers.shape[0], self._batch_size):
+            batch = nb_identifiers.iloc[start:start + self._batch_size]
+            pending.append(self._executor.submit(self._read_batch, batch, use_catalog, with_content))
+
+            if len(pending) >= self._prefetch:
+                yield from self._filter(pending.popleft().result(), with_content, skip_missing)
+
+        while len(pending) != 0:
+            yield from self._filter(pending.popleft().result(), with_content, skip_missing)
+
+    @staticmethod
+    def _filter(notebooks, with_content, skip_missing):
+        """
+        This method drops the notebooks whose files are missing or unreadable, if requested.
+
+        Args:
+            notebooks: The list of the :class:`.Notebook`.
+            with_content: True if the notebook files were read.
+            skip_missing: If True, the notebooks whose files are missing or unreadable are dropped.
+
+        Returns:
+            notebooks: The list of the remaining :class:`.Notebook`.
+        """
+
+        if not with_content or not skip_missing:
+            return notebooks
+        return [notebook for notebook in notebooks if notebook.content is not None]
+
+    def get_cache_info(self):
+        """
+        This method returns the statistics of the cache of parsed notebooks.
+
+        Returns:
+            info: A dictionary with the number of ``hits`` and ``misses`` and the current ``size`` of the cache.
+        """
+
+        with self._lock:
+            return {'hits': self._n_hits, 'misses': self._n_misses, 'size': len(self._cache)}
+
+    def close(self):
+        """
+        This method stops the thread pool.
+        """
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,497 @@
+"""
+This module defines the functions and the class that build and query an inverted index of the code cells
+of the notebooks in the notebook archive.
+
+Code cells are tokenized into the names they use (e.g., ``xgb.train``), together with every prefix of dotted names
+(``xgb``) and, when the name starts with an imported alias, its fully qualified form (``xgboost.train``, ``xgboost``).
+For each token, the index stores the sorted list (the *postings*) of the notebooks using it.
+
+The index is stored in a folder as a list of immutable *segments*, each one covering a batch of notebooks.
+Every segment stores its sorted terms, its postings and its notebook names in flat binary arrays that are
+memory-mapped when the index is queried, so that a query only reads the few pages it needs.
+Updates add a new segment with the new or changed notebooks and mark the outdated entries of older segments
+as deleted; segments are merged when they become too many.
+"""
+
+import json
+import keyword
+import os
+import re
+import shutil
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from KGTorrent.archive import load_notebook, get_cells, get_source, list_notebooks, map_notebooks
+
+# Name of the index folder, inside the notebook archive, used when no other folder is given
+INDEX_FOLDER_NAME = 'code_index'
+
+# Name of the file listing the segments of the index
+MANIFEST_FILE_NAME = 'index.json'
+
+# Number of segments above which all the segments are merged into one
+MAX_SEGMENTS = 8
+
+# Maximum length of the indexed tokens
+MAX_TOKEN_LENGTH = 255
+
+# Names used by code cells, including attribute chains (e.g., "np.random.seed")
+_NAME_PATTERN = re.compile(r'[A-Za-z_]\w*(?:[ \t]*\.[ \t]*[A-Za-z_]\w*)*')
+
+# Import statements defining aliases: "import a.b as c" and "from a.b import c as d, e"
+_IMPORT_AS_PATTERN = re.compile(r'^[ \t]*import[ \t]+([\w.]+)[ \t]+as[ \t]+(\w+)', re.MULTILINE)
+_FROM_IMPORT_PATTERN = re.compile(r'^[ \t]*from[ \t]+([\w.]+)[ \t]+import[ \t]+\(?([\w \t,]+)', re.MULTILINE)
+
+_KEYWORDS = frozenset(keyword.kwlist)
+
+
+def tokenize_code(code):
+    """
+    This function extracts the tokens of a piece of Python code.
+
+    Args:
+        code: The source of a code cell.
+
+    Returns:
+        tokens: The set of tokens.
+    """
+
+    # Aliases defined by import statements
+    aliases = {}
+    for match in _IMPORT_AS_PATTERN.finditer(code):
+        aliases[match.group(2)] = match.group(1)
+    for match in _FROM_IMPORT_PATTERN.finditer(code):
+        for imported in match.group(2).split(','):
+            parts = imported.split()
+            if len(parts) == 1:
+                aliases[parts[0]] = f'{match.group(1)}.{parts[0]}'
+            elif len(parts) == 3 and parts[1] == 'as':
+                aliases[parts[2]] = f'{match.group(1)}.{parts[0]}'
+
+    tokens = set()
+    for name in set(_NAME_PATTERN.findall(code)):
+        parts = [part.strip() for part in name.split('.')]
+        if parts[0] in _KEYWORDS:
+            continue
+
+        names = [parts]
+        if parts[0] in aliases:
+            names.append(aliases[parts[0]].split('.') + parts[1:])
+
+        # Every prefix of the dotted names
+        for name_parts in names:
+            for i in range(1, len(name_parts) + 1):
+                tokens.add('.'.join(name_parts[:i]))
+
+    return {token for token in tokens if len(token) <= MAX_TOKEN_LENGTH}
+
+
+def tokenize_notebook_file(path):
+    """
+    This function extracts the tokens of the code cells of a notebook file.
+
+    Args:
+        path: The path to the notebook file.
+
+    Returns:
+        tokens: The sorted list of tokens, or ``None`` if the notebook or any of its cells cannot be parsed.
+    """
+
+    # Malformed cells (e.g., a source list holding a non-string) make the whole notebook unparsable
+    # noinspection PyBroadException
+    try:
+        cells = get_cells(load_notebook(path))
+        code = '\n'.join(get_source(cell) for cell in cells if cell.get('cell_type') == 'code')
+    except Exception:
+        return None
+
+    return sorted(tokenize_code(code))
+
+
+def _load_array(path, mmap=True):
+    """
+    This function loads a ``.npy`` array, memory-mapping it unless it is empty.
+
+    Args:
+        path: The path to the ``.npy`` file.
+        mmap: Whether the array has to be memory-mapped. By default it is True.
+
+    Returns:
+        array: The array.
+    """
+
+    array = np.load(path, mmap_mode='r' if mmap else None)
+    if array.size == 0:
+        return np.load(path)
+    return array
+
+
+def _pack_strings(strings):
+    """
+    This function packs a list of strings into a UTF-8 blob and the offsets of its elements.
+
+    Args:
+        strings: The list of strings.
+
+    Returns:
+        - blob    - the ``numpy.ndarray`` of bytes with the concatenated strings
+        - offsets - the ``numpy.ndarray`` of the ``len(strings) + 1`` offsets of the strings in the blob
+    """
+
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(string) for string in encoded])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class _Segment:
+    """
+    The ``_Segment`` class reads and writes a segment of the code index.
+    """
+
+    def __init__(self, path):
+        """
+        The constructor of this class memory-maps the arrays of the segment stored in the given folder.
+
+        Args:
+            path: The path to the segment folder.
+        """
+
+        self.path = Path(path)
+        self._terms = _load_array(self.path / 'terms.npy')
+        self._term_offsets = _load_array(self.path / 'term_offsets.npy')
+        self._postings = _load_array(self.path / 'postings.npy')
+        self._posting_offsets = _load_array(self.path / 'posting_offsets.npy')
+        self._docs = _load_array(self.path / 'docs.npy')
+        self._doc_offsets = _load_array(self.path / 'doc_offsets.npy')
+        self.doc_stats = _load_array(self.path / 'doc_stats.npy')
+        self.deleted = _load_array(self.path / 'deleted.npy', mmap=False).copy()
+
+        self.n_terms = self._term_offsets.shape[0] - 1
+        self.n_docs = self._doc_offsets.shape[0] - 1
+
+    @staticmethod
+    def write(path, names, doc_stats, term_postings):
+        """
+        This method writes a new segment.
+
+        Args:
+            path: The path to the segment folder.
+            names: The list of notebook names; the position of each name is its document identifier.
+            doc_stats: The list of ``(size, mtime_ns)`` tuples of the notebook files.
+            term_postings: A dictionary whose keys are the terms and whose values are the sorted arrays
+                of the identifiers of the documents using them.
+        """
+
+        path = Path(path)
+        path.mkdir(parents=True)
+
+        terms = sorted(term_postings)
+        terms_blob, term_offsets = _pack_strings(terms)
+        posting_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        posting_offsets[1:] = np.cumsum([len(term_postings[term]) for term in terms])
+        postings = np.concatenate([term_postings[term] for term in terms]).astype(np.int32) \
+            if len(terms) != 0 else np.zeros(0, dtype=np.int32)
+        docs_blob, doc_offsets = _pack_strings(names)
+
+        np.save(path / 'terms.npy', terms_blob)
+        np.save(path / 'term_offsets.npy', term_offsets)
+        np.save(path / 'postings.npy', postings)
+        np.save(path / 'posting_offsets.npy', posting_offsets)
+        np.save(path / 'docs.npy', docs_blob)
+        np.save(path / 'doc_offsets.npy', doc_offsets)
+        np.save(path / 'doc_stats.npy', np.array(doc_stats, dtype=np.int64).reshape(-1, 2))
+        np.save(path / 'deleted.npy', np.zeros(len(names), dtype=bool))
+
+    def save_deleted(self):
+        """
+        This method writes the deletion mask of the segment.
+        """
+
+        temporary_path = self.path / 'deleted.tmp.npy'
+        np.save(temporary_path, self.deleted)
+        os.replace(temporary_path, self.path / 'deleted.npy')
+
+    def term(self, i):
+        """
+        This method returns a term of the segment.
+
+        Args:
+            i: The position of the term in the sorted terms.
+
+        Returns:
+            term: The term, as ``bytes``.
+        """
+        return self._terms[self._term_offsets[i]:self._term_offsets[i + 1]].tobytes()
+
+    def find_term(self, term):
+        """
+        This method finds a term by binary search over the sorted terms.
+
+        Args:
+            term: The term, as ``bytes``.
+
+        Returns:
+            i: The position of the term, or ``None`` if the segment does not contain it.
+        """
+
+        low, high = 0, self.n_terms
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_terms and self.term(low) == term:
+            return low
+        return None
+
+    def postings(self, i):
+        """
+        This method returns the postings of a term.
+
+        Args:
+            i: The position of the term in the sorted terms.
+
+        Returns:
+            postings: The sorted array of the identifiers of the documents using the term.
+        """
+        return self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]]
+
+    def doc_name(self, doc_id):
+        """
+        This method returns the name of a document.
+
+        Args:
+            doc_id: The identifier of the document.
+
+        Returns:
+            name: The notebook name (``UserName_CurrentUrlSlug``).
+        """
+        return self._docs[self._doc_offsets[doc_id]:self._doc_offsets[doc_id + 1]].tobytes().decode('utf-8')
+
+    def live_docs(self):
+        """
+        This method lists the documents of the segment that are not deleted.
+
+        Returns:
+            docs: A list of ``(doc_id, name, size, mtime_ns)`` tuples.
+        """
+        return [(doc_id, self.doc_name(doc_id), int(self.doc_stats[doc_id, 0]), int(self.doc_stats[doc_id, 1]))
+                for doc_id in np.flatnonzero(~self.deleted)]
+
+
+class CodeIndex:
+    """
+    The ``CodeIndex`` class builds, updates and queries the inverted index of the code cells of the notebooks.
+    Notebooks are tokenized in parallel by a pool of processes.
+    """
+
+    def __init__(self, index_path):
+        """
+        The constructor of this class opens the index stored in the given folder, creating it if needed.
+
+        Args:
+            index_path: The path to the index folder.
+        """
+
+        self._index_path = Path(index_path)
+        self._index_path.mkdir(parents=True, exist_ok=True)
+
+        manifest_path = self._index_path / MANIFEST_FILE_NAME
+        if manifest_path.exists():
+            with open(manifest_path) as manifest_file:
+                self._manifest = json.load(manifest_file)
+        else:
+            self._manifest = {'segments': [], 'next_segment': 0}
+
+        self._segments = [_Segment(self._index_path / name) for name in self._manifest['segments']]
+
+    def _save_manifest(self):
+        """
+        This method atomically writes the list of segments of the index.
+        """
+
+        self._manifest['segments'] = [segment.path.name for segment in self._segments]
+        temporary_path = self._index_path / (MANIFEST_FILE_NAME + '.tmp')
+        with open(temporary_path, 'w') as manifest_file:
+            json.dump(self._manifest, manifest_file)
+        os.replace(temporary_path, self._index_path / MANIFEST_FILE_NAME)
+
+    def _new_segment_path(self):
+        """
+        This method reserves the name of a new segment.
+
+        Returns:
+            segment_path: The path to the new segment folder.
+        """
+
+        segment_path = self._index_path / f'segment_{self._manifest["next_segment"]:06d}'
+        self._manifest['next_segment'] += 1
+        return segment_path
+
+    def _merge_segments(self):
+        """
+        This method merges all the segments of the index into a single segment, dropping deleted documents.
+        """
+
+        print(f'## Merging {len(self._segments)} index segments...')
+
+        names = []
+        doc_stats = []
+        term_postings = defaultdict(list)
+        for segment in self._segments:
+
+            # Identifiers of the live documents in the merged segment
+            live = ~segment.deleted
+            remap = np.full(segment.n_docs, -1, dtype=np.int64)
+            remap[live] = np.arange(len(names), len(names) + int(live.sum()))
+
+            for doc_id, name, size, mtime_ns in segment.live_docs():
+                names.append(name)
+                doc_stats.append((size, mtime_ns))
+
+            for i in range(segment.n_terms):
+                postings = remap[segment.postings(i)]
+                postings = postings[postings >= 0]
+                if postings.size != 0:
+                    term_postings[segment.term(i).decode('utf-8')].append(postings)
+
+        # Segments are processed in order, so the concatenated postings are still sorted
+        term_postings = {term: np.concatenate(postings) for term, postings in term_postings.items()}
+
+        segment_path = self._new_segment_path()
+        _Segment.write(segment_path, names, doc_stats, term_postings)
+
+        old_segments = self._segments
+        self._segments = [_Segment(segment_path)]
+        self._save_manifest()
+        for segment in old_segments:
+            shutil.rmtree(segment.path)
+
+    def update(self, nb_archive_path, n_workers=None, merge=False):
+        """
+        This method indexes the notebooks that were added to or changed in the notebook archive since the last update,
+        and removes from the index the notebooks that are no longer in the archive.
+
+        Args:
+            nb_archive_path: The path to the notebook archive folder.
+            n_workers: The number of worker processes. By default it is the number of CPUs.
+            merge: If True, all the segments are merged into one at the end of the update.
+                By default segments are merged only when they are more than :data:`MAX_SEGMENTS`.
+
+        Returns:
+            report: A dictionary with the number of indexed, removed and unparsable notebooks
+            and the number of segments.
+        """
+
+        start = time.perf_counter()
+
+        # Live documents of the index
+        indexed = {}
+        for segment in self._segments:
+            for doc_id, name, size, mtime_ns in segment.live_docs():
+                indexed[name] = (segment, doc_id, size, mtime_ns)
+
+        # New or changed notebooks
+        changed = []
+        present = set()
+        for path in list_notebooks(nb_archive_path):
+            stat = path.stat()
+            present.add(path.stem)
+            entry = indexed.get(path.stem)
+            if entry is None or entry[2:] != (stat.st_size, stat.st_mtime_ns):
+                changed.append((path, stat))
+
+        # Outdated entries are marked as deleted
+        changed_names = {path.stem for path, _ in changed}
+        outdated = [entry for name, entry in indexed.items() if name not in present or name in changed_names]
+        for segment, doc_id, _, _ in outdated:
+            segment.deleted[doc_id] = True
+        n_removed = sum(1 for name in indexed if name not in present)
+
+        print(f'## Indexing {len(changed)} new or changed notebooks...')
+        results = map_notebooks(tokenize_notebook_file, [path for path, _ in changed], n_workers=n_workers)
+
+        names = []
+        doc_stats = []
+        term_postings = defaultdict(list)
+        n_unparsable = 0
+        for (path, stat), tokens in zip(changed, results):
+            if tokens is None:
+                n_unparsable += 1
+                continue
+            doc_id = len(names)
+            names.append(path.stem)
+            doc_stats.append((stat.st_size, stat.st_mtime_ns))
+            for token in tokens:
+                term_postings[token].append(doc_id)
+
+        if len(names) != 0:
+            segment_path = self._new_segment_path()
+            _Segment.write(segment_path, names, doc_stats,
+                           {term: np.array(postings, dtype=np.int32) for term, postings in term_postings.items()})
+            self._segments.append(_Segment(segment_path))
+
+        for segment in {id(segment): segment for segment, _, _, _ in outdated}.values():
+            segment.save_deleted()
+        self._save_manifest()
+
+        if len(self._segments) > 1 and (merge or len(self._segments) > MAX_SEGMENTS):
+            self._merge_segments()
+
+        return {
+            'indexed': len(names),
+            'removed': n_removed,
+            'unparsable': n_unparsable,
+            'segments': len(self._segments),
+            'seconds': time.perf_counter() - start,
+        }
+
+    def search(self, query, names=None):
+        """
+        This method finds the notebooks whose code cells use all the tokens of a query.
+
+        Args:
+            query: The query, i.e., one or more names separated by spaces (e.g., ``xgboost.train``).
+            names: An optional collection of notebook names (``UserName_CurrentUrlSlug``) the results are restricted to,
+                e.g., the notebooks selected by a query on the KGTorrent database.
+
+        Returns:
+            names: The sorted list of the names of the matching notebooks.
+        """
+
+        terms = [term.encode('utf-8') for term in query.split()]
+        if len(terms) == 0:
+            return []
+
+        results = []
+        for segment in self._segments:
+            matches = None
+            for term in terms:
+                i = segment.find_term(term)
+                if i is None:
+                    matches = np.zeros(0, dtype=np.int32)
+                    break
+                postings = segment.postings(i)
+                matches = postings if matches is None else np.intersect1d(matches, postings, assume_unique=True)
+
+            matches = matches[~segment.deleted[matches]]
+            results += [segment.doc_name(doc_id) for doc_id in matches]
+
+        if names is not None:
+            names = set(names)
+            results = [name for name in results if name in names]
+        return sorted(results)
+
+    def get_n_notebooks(self):
+        """
+        This method returns the number of notebooks in the index.
+
+        Returns:
+            n_notebooks: The number of indexed notebooks.
+        """
+        return sum(int((~segment.deleted).sum()) for segment in self._segments)
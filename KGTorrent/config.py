@@ -2,6 +2,8 @@
 This is the configuration file of KGTorrent.
 
 Here the main variables of the program are set, mostly by reading their values from environment variables.
+Environment variables are read lazily, the first time the corresponding configuration variable is accessed,
+so that importing this module has no side effects; logging is configured by calling :func:`setup_logging`.
 
 See :ref:`configuration` for details on the environment variables that must be set to run KGTorrent.
 """
@@ -10,28 +12,71 @@ import logging
 import os
 import time
 
-# MySQL DB configuration
-db_host = os.environ['DB_HOST']
-db_port = os.environ['DB_PORT']
-db_name = os.environ['DB_NAME']
-db_username = os.environ['MYSQL_USER']
-db_password = os.environ['MYSQL_PWD']
+# Configuration variables read from the environment, with the name of the related environment variable
+_env_variables = {
+    # MySQL DB configuration
+    'db_host': 'DB_HOST',
+    'db_port': 'DB_PORT',
+    'db_name': 'DB_NAME',
+    'db_username': 'MYSQL_USER',
+    'db_password': 'MYSQL_PWD',
+
+    # Data paths
+    'meta_kaggle_path': 'METAKAGGLE_PATH',
+
+    # Notebook dataset configuration
+    'nb_archive_path': 'NB_DEST_PATH',
+
+    # Logging Configuration
+    'log_path': 'LOG_DEST_PATH',
+}
+
+# Optional configuration variables read from the environment, with the related environment variable and default value
+_optional_env_variables = {
+    # Storage backend of the database (mysql or sqlite)
+    'db_backend': ('DB_BACKEND', 'mysql'),
+}
 
 # Data paths
-meta_kaggle_path = os.environ['METAKAGGLE_PATH']
 constraints_file_path = '../data/fk_constraints_data.csv'
 
 # Notebook dataset configuration
-nb_archive_path = os.environ['NB_DEST_PATH']
 nb_conf = {
     'languages': ['IPython Notebook HTML']
 }
 
-# Logging Configuration
-log_path = os.environ['LOG_DEST_PATH']
-logging.basicConfig(
-    filename=os.path.join(log_path, f'{time.time()}.log'),
-    filemode='w',
-    level=logging.INFO,
-    format='[%(levelname)s]\t%(asctime)s - %(message)s'
-)
+
+def __getattr__(name):
+    """
+    This function reads the environment variable related to a configuration variable the first time
+    the configuration variable is accessed, and caches its value in the module namespace.
+
+    Args:
+        name: The name of the configuration variable.
+
+    Returns:
+        value: The value of the related environment variable.
+    """
+
+    if name in _env_variables:
+        value = os.environ[_env_variables[name]]
+        globals()[name] = value
+        return value
+    if name in _optional_env_variables:
+        env_variable, default = _optional_env_variables[name]
+        value = os.environ.get(env_variable, default)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def setup_logging():
+    """
+    This function configures the logging of KGTorrent, creating a new log file in the ``LOG_DEST_PATH`` folder.
+    """
+    logging.basicConfig(
+        filename=os.path.join(__getattr__('log_path'), f'{time.time()}.log'),
+        filemode='w',
+        level=logging.INFO,
+        format='[%(levelname)s]\t%(asctime)s - %(message)s'
+    )
@@ -0,0 +1,270 @@
+"""
+This module defines the functions and the class that discover the foreign key constraints of Meta Kaggle,
+i.e., the inclusion dependencies between the ``*Id`` columns of its tables and the ``Id`` column of the referenced
+tables, so that ``fk_constraints_data.csv`` can be kept up to date when new tables or columns are published.
+
+Only the key columns are read. The distinct values of each column are hashed into sorted arrays of 64-bit integers,
+so that set containment is tested with vectorized binary searches:
+
+1. every ``*Id`` column is screened against the ``Id`` column of every table, on a random sample of its distinct
+   values;
+2. the coverage (the fraction of the distinct values of the column found in the referenced column) of the
+   promising candidates and of the constraints already known is computed exactly, on all the distinct values.
+
+Since Meta Kaggle misses many rows, constraints are accepted when their coverage exceeds a threshold rather than
+only when it is complete. Integer identifiers are dense, so a column is often covered by several tables:
+candidates whose name ends with the singular name of the referenced table (e.g., ``AuthorUserId`` and ``Users``)
+are preferred.
+"""
+
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from KGTorrent.dataframe_engine import PandasEngine
+from KGTorrent.schema import read_header
+
+# Referenced column of the constraints and suffix of the referencing columns
+ID_COLUMN = 'Id'
+
+# Number of distinct values of each column used to screen the candidate constraints
+DEFAULT_SAMPLE_SIZE = 10000
+
+# Minimum coverage of a constraint
+DEFAULT_MIN_COVERAGE = 0.8
+
+# Columns of the constraints file
+CONSTRAINT_COLUMNS = ['Table', 'Foreign Key', 'Referenced Table', 'Referenced Column']
+
+
+def hash_keys(values):
+    """
+    This function hashes the values of a key column into a sorted array of distinct 64-bit integers.
+    Integer values (including integral floats, as in columns with missing values) are kept as they are,
+    so that the same key is hashed to the same integer whatever the type of its column.
+
+    Args:
+        values: The ``pandas.Series`` of the values.
+
+    Returns:
+        keys: The sorted ``numpy.ndarray`` of the distinct hashed values, or ``None`` if the column cannot hold keys
+        (e.g., non-integral numbers).
+    """
+
+    values = values.dropna()
+    if pd.api.types.is_bool_dtype(values):
+        return None
+    if pd.api.types.is_numeric_dtype(values):
+        if not np.all(np.mod(values.to_numpy(), 1) == 0):
+            return None
+        keys = values.to_numpy().astype(np.int64).view(np.uint64)
+    else:
+        keys = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+    return np.unique(keys)
+
+
+def coverage(keys, referenced_keys):
+    """
+    This function computes the fraction of the keys that are found among the referenced keys.
+
+    Args:
+        keys: The sorted ``numpy.ndarray`` of the distinct keys.
+        referenced_keys: The sorted ``numpy.ndarray`` of the distinct referenced keys.
+
+    Returns:
+        coverage: The fraction of the keys found among the referenced keys (``NaN`` if there are no keys).
+    """
+
+    if len(keys) == 0:
+        return np.nan
+    if len(referenced_keys) == 0:
+        return 0.0
+    positions = np.searchsorted(referenced_keys, keys).clip(max=len(referenced_keys) - 1)
+    return float(np.mean(referenced_keys[positions] == keys))
+
+
+def name_matches(foreign_key, referenced_table):
+    """
+    This function checks whether the name of a foreign key refers to a table, i.e., whether it ends with the
+    singular name of the table followed by ``Id`` (e.g., ``AuthorUserId`` and ``Users.csv``).
+
+    Args:
+        foreign_key: The name of the foreign key column.
+        referenced_table: The file name of the referenced table.
+
+    Returns:
+        bool: True if the name of the foreign key refers to the table, False otherwise.
+    """
+
+    entity = Path(referenced_table).stem
+    entity = entity[:-1] if entity.endswith('s') else entity
+    return foreign_key.endswith(entity + ID_COLUMN)
+
+
+class ConstraintDiscoverer:
+    """
+    The ``ConstraintDiscoverer`` class discovers the foreign key constraints of the Meta Kaggle tables
+    and compares them with a constraints file.
+    """
+
+    def __init__(self, meta_kaggle_path, engine=None, sample_size=DEFAULT_SAMPLE_SIZE,
+                 min_coverage=DEFAULT_MIN_COVERAGE, random_state=0):
+        """
+        The constructor of this class reads the key columns of all the ``.csv`` tables in the Meta Kaggle folder
+        and hashes their distinct values.
+
+        Args:
+            meta_kaggle_path: The path to the folder containing the ``.csv`` files of the Meta Kaggle tables.
+            engine: The dataframe engine used to read the tables (see :mod:`.dataframe_engine`).
+                By default it is the ``pandas`` engine.
+            sample_size: The number of distinct values of each column used to screen the candidates.
+            min_coverage: The minimum coverage of a constraint, between 0 and 1.
+            random_state: The seed of the random generator used to sample the values.
+        """
+
+        self._engine = engine if engine is not None else PandasEngine()
+        self._sample_size = sample_size
+        self._min_coverage = min_coverage
+        self._random = np.random.RandomState(random_state)
+
+        # Hashed distinct values of the Id columns and of the *Id columns of each table
+        self._referenced_keys = {}
+        self._foreign_keys = {}
+
+        print(f'## Reading the key columns of the tables in {meta_kaggle_path}...')
+        for path in sorted(Path(meta_kaggle_path).glob('*.csv')):
+            columns = [column for column in read_header(path) if column.endswith(ID_COLUMN)]
+            if len(columns) == 0:
+                continue
+
+            table = self._engine.to_pandas(self._engine.read_csv(path, columns=columns))
+            for column in columns:
+                keys = hash_keys(table[column])
+                if keys is None:
+                    continue
+                if column == ID_COLUMN:
+                    self._referenced_keys[path.name] = keys
+                else:
+                    self._foreign_keys[(path.name, column)] = keys
+            print(f'- {path.name}: {len(columns)} key columns')
+
+    def _sample(self, keys):
+        """
+        This method draws a random sample of distinct keys.
+
+        Args:
+            keys: The sorted ``numpy.ndarray`` of the distinct keys.
+
+        Returns:
+            sample: The sorted ``numpy.ndarray`` of at most ``sample_size`` keys.
+        """
+
+        if len(keys) <= self._sample_size:
+            return keys
+        return np.sort(self._random.choice(keys, self._sample_size, replace=False))
+
+    def discover(self):
+        """
+        This method finds the candidate constraints: for each ``*Id`` column, the tables whose ``Id`` column covers
+        at least ``min_coverage`` of its distinct values.
+
+        Returns:
+            candidates: The ``pandas.DataFrame`` of the candidates, with the columns of the constraints file and the
+            ``Coverage``, ``NameMatch`` and ``Selected`` columns; for each column, the selected candidate is the one
+            whose name matches the referenced table, or else the one with the highest coverage.
+        """
+
+        start = time.perf_counter()
+        rows = []
+        for (table_name, foreign_key), keys in self._foreign_keys.items():
+            sample = self._sample(keys)
+            for referenced_table, referenced_keys in self._referenced_keys.items():
+                if coverage(sample, referenced_keys) < self._min_coverage:
+                    continue
+
+                # Promising candidates are checked on all the distinct values
+                exact_coverage = coverage(keys, referenced_keys)
+                if exact_coverage >= self._min_coverage:
+                    rows.append({'Table': table_name,
+                                 'Foreign Key': foreign_key,
+                                 'Referenced Table': referenced_table,
+                                 'Referenced Column': ID_COLUMN,
+                                 'Coverage': exact_coverage,
+                                 'NameMatch': name_matches(foreign_key, referenced_table)})
+
+        candidates = pd.DataFrame(rows, columns=CONSTRAINT_COLUMNS + ['Coverage', 'NameMatch'])
+        candidates = candidates.sort_values(['Table', 'Foreign Key', 'NameMatch', 'Coverage'],
+                                            ascending=[True, True, False, False]).reset_index(drop=True)
+        candidates['Selected'] = ~candidates.duplicated(subset=['Table', 'Foreign Key'])
+
+        print(f'## {candidates.shape[0]} candidate constraints found for {len(self._foreign_keys)} columns '
+              f'in {time.perf_counter() - start:.2f}s')
+        return candidates
+
+    def diff(self, constraints_df):
+        """
+        This method compares the constraints of a constraints file with the discovered ones.
+        Columns already constrained in the file are not proposed other constraints.
+
+        Args:
+            constraints_df: The ``pandas.DataFrame`` of the constraints file.
+
+        Returns:
+            diff: A dictionary of ``pandas.DataFrame`` with the following keys:
+
+            - ``confirmed`` - the constraints of the file whose coverage is at least ``min_coverage``
+            - ``weak``      - the constraints of the file whose coverage is lower (e.g., columns that now refer to
+              another table)
+            - ``stale``     - the constraints of the file whose table or columns are no longer in Meta Kaggle
+            - ``new``       - the selected candidates for the columns that are not constrained in the file
+            - ``unresolved`` - the ``*Id`` columns that are not constrained in the file and have no candidate
+        """
+
+        candidates = self.discover()
+
+        known = constraints_df[CONSTRAINT_COLUMNS].copy()
+        coverages = []
+        for row in known.itertuples(index=False):
+            keys = self._foreign_keys.get((row[0], row[1]))
+            referenced_keys = self._referenced_keys.get(row[2]) if row[3] == ID_COLUMN else None
+            coverages.append(coverage(keys, referenced_keys)
+                             if keys is not None and referenced_keys is not None else np.nan)
+        known['Coverage'] = coverages
+
+        is_stale = known['Coverage'].isnull()
+        is_confirmed = known['Coverage'] >= self._min_coverage
+
+        known_columns = set(zip(known['Table'], known['Foreign Key']))
+        is_unknown = [column not in known_columns for column in zip(candidates['Table'], candidates['Foreign Key'])]
+        new = candidates.loc[candidates['Selected'] & is_unknown].drop(columns='Selected')
+
+        candidate_columns = set(zip(candidates['Table'], candidates['Foreign Key']))
+        unresolved = pd.DataFrame(sorted(column for column in self._foreign_keys
+                                         if column not in known_columns and column not in candidate_columns),
+                                  columns=['Table', 'Foreign Key'])
+
+        return {
+            'confirmed': known.loc[is_confirmed].reset_index(drop=True),
+            'weak': known.loc[~is_confirmed & ~is_stale].reset_index(drop=True),
+            'stale': known.loc[is_stale, CONSTRAINT_COLUMNS].reset_index(drop=True),
+            'new': new.reset_index(drop=True),
+            'unresolved': unresolved,
+        }
+
+
+def write_constraints(diff, path):
+    """
+    This function writes a constraints file with the confirmed and the new constraints of a diff.
+
+    Args:
+        diff: The diff returned by :func:`.ConstraintDiscoverer.diff`.
+        path: The path to the constraints file.
+    """
+
+    constraints = pd.concat([diff['confirmed'][CONSTRAINT_COLUMNS], diff['new'][CONSTRAINT_COLUMNS]],
+                            ignore_index=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    constraints.to_csv(path, index=False)
@@ -2,25 +2,40 @@
 This module defines the class that handles the data loading.
 """
 
+import os
+
 import pandas as pd
 
-# Imports for testing
-from KGTorrent import config
+from KGTorrent.dataframe_engine import PandasEngine
+from KGTorrent.exceptions import SchemaValidationError
+from KGTorrent.schema import (get_table_schema, read_header, get_read_columns, get_read_dtypes,
+                              get_integer_columns, drop_missing_values, validate_table)
+
 
 class DataLoader:
     """
     This class stores the MetaKaggle version tables and the foreign key constraints table.
     """
 
-    def __init__(self, constraints_file_path, meta_kaggle_path):
+    def __init__(self, constraints_file_path, meta_kaggle_path, engine=None):
         """
         The constructor of this class loads Meta Kaggle and constraints ``.csv`` files from the given paths.
+        Tables are read and validated according to the schema of the KGTorrent database (see :mod:`.schema`):
+        columns that are not in the schema are not read, and rows with missing values in non-nullable columns
+        are dropped.
 
         Args:
             constraints_file_path: the path to the ``.csv`` file containing information on the foreign key constraints to be set. By default, it is located at ``/data/fk_constraints_data.csv``.
             meta_kaggle_path: The path to the folder containing the 29 ``.csv`` of the MetaKaggle tables.
+            engine: The dataframe engine used to load the MetaKaggle tables (see :mod:`.dataframe_engine`). By default it is the ``pandas`` engine.
+
+        Raises:
+            SchemaValidationError: if a table does not match the schema of the KGTorrent database.
         """
 
+        # Dataframe engine used to load the tables
+        self._engine = engine if engine is not None else PandasEngine()
+
         # Dataframe containing constraints info:
         # (Referencing Table, Foreign Key, Referenced Table, Referenced Column, IsSolved)
         print('## Loading MetaKaggle constraints data...')
@@ -38,9 +53,47 @@ class DataLoader:
         # Reading tables
         print('## Loading MeataKaggle csv tables from provided path...')
         for file_name in table_file_names:
-            self._tables_dict[file_name] = pd.read_csv(meta_kaggle_path + '\\' + file_name)
+            self._tables_dict[file_name] = self._read_table(os.path.join(meta_kaggle_path, file_name), file_name)
             print(f'- {file_name} loaded.')
 
+    def _read_table(self, path, file_name):
+        """
+        This method reads the columns of a Meta Kaggle table that are in the schema of the KGTorrent database,
+        with the types of the schema, and validates their values.
+        Tables that are not in the schema are read as they are.
+
+        Args:
+            path: The path to the ``.csv`` file of the table.
+            file_name: The name of the ``.csv`` file of the table.
+
+        Returns:
+            table: The dataframe table.
+        """
+
+        table = get_table_schema(file_name)
+        if table is None:
+            print(f'\t{file_name} is not in the schema: reading all its columns')
+            return self._engine.read_csv(path)
+
+        header = read_header(path)
+        columns = get_read_columns(table, header)
+        skipped_columns = [column for column in header if column not in columns]
+        if len(skipped_columns) != 0:
+            print(f'\t{file_name}: skipping columns not in the schema {skipped_columns}')
+
+        try:
+            df = self._engine.read_csv(path, columns=columns, dtypes=get_read_dtypes(table, columns))
+        except Exception as e:
+            raise SchemaValidationError(f'Table {table.name}: cannot parse {path} with the types of the schema '
+                                        f'({e}).') from e
+
+        df, null_counts = drop_missing_values(df, table, self._engine)
+        if len(null_counts) != 0:
+            print(f'\t{file_name}: dropping the rows with missing values in non-nullable columns {null_counts}')
+
+        validate_table(df, table, self._engine)
+        return self._engine.cast_integers(df, get_integer_columns(table, columns))
+
     def get_constraints_df(self):
         """
         This method returns the foreign key constraints ``pandas.DataFrame`` which contains constraints information:
@@ -53,16 +106,19 @@ class DataLoader:
 
     def get_tables_dict(self):
         """
-        This method returns the dictionary of all 29 MetaKaggle ``pandas.DataFrame`` tables.
+        This method returns the dictionary of all 29 MetaKaggle tables, loaded by the dataframe engine.
 
         Returns:
-            tables_dict: The dictionary whose keys are the table names and whose values are the ``pandas.DataFrame`` tables.
+            tables_dict: The dictionary whose keys are the table names and whose values are the dataframe tables.
         """
         return self._tables_dict
 
 
 if __name__ == '__main__':
 
+    # Imports for testing
+    from KGTorrent import config
+
     print("********************")
     print("*** LOADING DATA ***")
     print("********************")
@@ -0,0 +1,618 @@
+"""
+This module defines the dataframe engines that can be used to load and preprocess the Meta Kaggle tables.
+
+``pandas``
+    the reference engine; it is single-threaded.
+
+``polars``
+    a multithreaded columnar engine; tables are ``polars.LazyFrame`` objects, and the operations of the
+    preprocessing are chained into a query plan for each table, which Polars optimizes and executes
+    on all the available cores. It requires the optional ``polars`` package, version 1.0 or later
+    (hence Python 3.8 or later).
+
+Both engines expose the same set of operations, so that :class:`.DataLoader` and :class:`.MkPreprocessor` do not
+depend on the actual dataframe library.
+"""
+
+import numpy as np
+import pandas as pd
+
+from KGTorrent.schema import FLOAT_DTYPE, BOOLEAN_DTYPE, STRING_DTYPE
+
+# Format of the dates in Meta Kaggle; Polars cannot tell days and months apart when inferring it
+META_KAGGLE_DATE_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+
+class PandasEngine:
+    """
+    The ``PandasEngine`` class implements the dataframe operations required by KGTorrent with ``pandas``.
+    """
+
+    name = 'pandas'
+
+    # Types used to parse the columns of the ``.csv`` files; boolean columns are inferred,
+    # since ``pandas`` boolean columns cannot hold missing values
+    dtypes = {FLOAT_DTYPE: 'float64', BOOLEAN_DTYPE: None, STRING_DTYPE: str}
+
+    def read_csv(self, path, columns=None, dtypes=None):
+        """
+        This method reads a ``.csv`` file into a dataframe.
+
+        Args:
+            path: The path to the ``.csv`` file.
+            columns: The optional list of the columns to be read. By default all the columns are read.
+            dtypes: The optional dictionary of the types of the columns (see :func:`.schema.get_read_dtypes`).
+                By default the types are inferred.
+
+        Returns:
+            df: The ``pandas.DataFrame`` with the content of the file.
+        """
+        dtypes = {column: self.dtypes[dtype] for column, dtype in (dtypes or {}).items()
+                  if self.dtypes[dtype] is not None}
+        return pd.read_csv(path, usecols=columns, dtype=dtypes or None)
+
+    def null_counts(self, df, columns):
+        """
+        This method counts the missing values of the given columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the columns.
+
+        Returns:
+            counts: A dictionary whose keys are the columns and whose values are the numbers of missing values.
+        """
+        return {column: int(df[column].isnull().sum()) for column in columns}
+
+    def non_integral_counts(self, df, columns):
+        """
+        This method counts the non-integral values of the given numeric columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the numeric columns.
+
+        Returns:
+            counts: A dictionary whose keys are the columns and whose values are the numbers of non-integral values.
+        """
+        counts = {}
+        for column in columns:
+            values = df[column].to_numpy(dtype='float64')
+            # Missing values differ from their truncation too
+            counts[column] = np.count_nonzero(np.trunc(values) != values) - np.count_nonzero(np.isnan(values))
+        return counts
+
+    def max_lengths(self, df, columns):
+        """
+        This method computes the length of the longest string of the given string columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the string columns.
+
+        Returns:
+            lengths: A dictionary whose keys are the columns and whose values are the maximum numbers of characters.
+        """
+        return {column: max(map(len, df[column].dropna().tolist()), default=0) for column in columns}
+
+    def cast_integers(self, df, columns):
+        """
+        This method converts the given integral numeric columns into integer columns.
+        As ``pandas`` integer columns cannot hold missing values, columns with missing values are left as they are.
+
+        Args:
+            df: The dataframe; it is updated in place.
+            columns: The list of the integral numeric columns.
+
+        Returns:
+            df: The dataframe with integer columns.
+        """
+        for column in columns:
+            if not df[column].isnull().any():
+                df[column] = df[column].astype('int64')
+        return df
+
+    def n_rows(self, df):
+        """
+        This method returns the number of rows of a dataframe.
+
+        Args:
+            df: The dataframe.
+
+        Returns:
+            n_rows: The number of rows.
+        """
+        return df.shape[0]
+
+    def columns(self, df):
+        """
+        This method returns the column names of a dataframe.
+
+        Args:
+            df: The dataframe.
+
+        Returns:
+            columns: The list of column names.
+        """
+        return list(df.columns)
+
+    def drop_duplicates(self, df, subset):
+        """
+        This method removes duplicate rows, keeping the first occurrence.
+
+        Args:
+            df: The dataframe.
+            subset: The list of columns used to identify duplicates.
+
+        Returns:
+            df: The dataframe without duplicates.
+        """
+        return df.drop_duplicates(subset=subset)
+
+    def drop_missing(self, df, columns):
+        """
+        This method removes the rows with missing values in any of the given columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the columns.
+
+        Returns:
+            df: The dataframe without such rows.
+        """
+        return df.dropna(subset=columns)
+
+    def round_scores(self, df, columns, decimals):
+        """
+        This method rounds the given numeric columns and replaces infinite values with missing values.
+
+        Args:
+            df: The dataframe.
+            columns: The list of columns to be rounded.
+            decimals: The number of decimals to keep.
+
+        Returns:
+            df: The dataframe with rounded columns.
+        """
+        df = df.copy()
+        for column in columns:
+            df[column] = df[column].astype(float).round(decimals).replace([np.inf, -np.inf], np.NaN)
+        return df
+
+    def parse_dates(self, df, columns):
+        """
+        This method converts the given string columns into datetime columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of date columns.
+
+        Returns:
+            df: The dataframe with parsed date columns.
+        """
+        df = df.copy()
+        for column in columns:
+            df[column] = pd.to_datetime(df[column], infer_datetime_format=True, cache=True)
+        return df
+
+    def filter_referencing(self, df, references):
+        """
+        This method keeps the rows of the referencing dataframe whose foreign keys are either missing
+        or present in the referenced columns of the referenced dataframes.
+        The foreign keys are checked one after the other, in the given order.
+
+        Args:
+            df: The referencing dataframe.
+            references: The list of the (foreign key column, referenced dataframe, referenced column) tuples.
+
+        Returns:
+            - df            - the filtered referencing dataframe
+            - removed_rows  - the list of the numbers of rows removed by each foreign key
+        """
+        removed_rows = []
+        for fk, referenced_df, rc in references:
+            n_rows = df.shape[0]
+            df = df[(df[fk].isin(referenced_df[rc])) | (df[fk].isnull())]
+            removed_rows.append(n_rows - df.shape[0])
+        return df, removed_rows
+
+    def isin(self, df, column, keys):
+        """
+        This method tells which rows of a dataframe have a value of the given column among the given keys.
+
+        Args:
+            df: The dataframe.
+            column: The column to be checked.
+            keys: The ``numpy.ndarray`` of the keys.
+
+        Returns:
+            mask: The boolean ``numpy.ndarray`` with one element for each row; missing values are never matched.
+        """
+        return df[column].isin(keys).to_numpy(dtype=bool)
+
+    def unique_values(self, df, column, mask):
+        """
+        This method returns the distinct values of a column over a subset of the rows, ignoring missing values.
+
+        Args:
+            df: The dataframe.
+            column: The column.
+            mask: The boolean ``numpy.ndarray`` selecting the rows.
+
+        Returns:
+            values: The ``numpy.ndarray`` of the distinct values.
+        """
+        return pd.unique(df[column].to_numpy()[mask & df[column].notnull().to_numpy()])
+
+    def filter_rows(self, df, mask):
+        """
+        This method keeps the rows of a dataframe selected by a boolean mask.
+
+        Args:
+            df: The dataframe.
+            mask: The boolean ``numpy.ndarray`` selecting the rows.
+
+        Returns:
+            df: The filtered dataframe.
+        """
+        return df[mask]
+
+    def collect(self, df):
+        """
+        This method executes the pending operations of a dataframe.
+        ``pandas`` operations are executed eagerly, so the dataframe is returned as it is.
+
+        Args:
+            df: The dataframe.
+
+        Returns:
+            df: The same dataframe.
+        """
+        return df
+
+    def to_pandas(self, df):
+        """
+        This method converts a dataframe of this engine into a ``pandas.DataFrame``.
+
+        Args:
+            df: The dataframe.
+
+        Returns:
+            df: The ``pandas.DataFrame``.
+        """
+        return df
+
+
+class PolarsEngine:
+    """
+    The ``PolarsEngine`` class implements the dataframe operations required by KGTorrent with ``polars``.
+
+    Tables are ``polars.LazyFrame`` objects: the operations of the basic preprocessing (dropping duplicates, rounding
+    scores and parsing dates) only extend the query plan of a table, which is executed together with the filters
+    removing the rows with unresolved foreign keys (see :func:`.PolarsEngine.filter_referencing`), or when the table
+    is collected with :func:`.PolarsEngine.collect`. Operations returning values (e.g., the number of rows) execute
+    the plan without materializing the table, so that Polars only computes the columns they need.
+    """
+
+    name = 'polars'
+
+    # Oldest version of ``polars`` providing the API used by this engine; it requires Python 3.8 or later,
+    # while the rest of KGTorrent runs on Python 3.7
+    min_version = (1, 0)
+
+    def __init__(self):
+        """
+        The constructor of this class imports the optional ``polars`` package and checks its version.
+        """
+
+        min_version = '.'.join(map(str, self.min_version))
+        try:
+            import polars
+        except ImportError as e:
+            raise ImportError(f'The `polars` engine requires the polars package (pip install "polars>={min_version}", '
+                              f'on Python 3.8 or later).') from e
+
+        version = tuple(int(part) for part in polars.__version__.split('.')[:2])
+        if version < self.min_version:
+            raise ImportError(f'The `polars` engine requires polars>={min_version} (on Python 3.8 or later), '
+                              f'but polars {polars.__version__} is installed.')
+
+        self._pl = polars
+
+    def read_csv(self, path, columns=None, dtypes=None):
+        """
+        This method reads a ``.csv`` file into a dataframe.
+
+        Args:
+            path: The path to the ``.csv`` file.
+            columns: The optional list of the columns to be read. By default all the columns are read.
+            dtypes: The optional dictionary of the types of the columns (see :func:`.schema.get_read_dtypes`).
+                By default the types are inferred.
+
+        Returns:
+            df: The ``polars.LazyFrame`` with the content of the file, which is parsed once, here.
+        """
+        pl = self._pl
+        if dtypes is None:
+            df = pl.scan_csv(path, infer_schema_length=None)
+        else:
+            # Types are not inferred: columns without a given type are read as strings
+            polars_dtypes = {FLOAT_DTYPE: pl.Float64, BOOLEAN_DTYPE: pl.Boolean, STRING_DTYPE: pl.Utf8}
+            df = pl.scan_csv(path, infer_schema_length=0,
+                             schema_overrides={column: polars_dtypes[dtype] for column, dtype in dtypes.items()})
+        if columns is not None:
+            df = df.select(columns)
+        return df.collect().lazy()
+
+    def null_counts(self, df, columns):
+        """
+        This method counts the missing values of the given columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the columns.
+
+        Returns:
+            counts: A dictionary whose keys are the columns and whose values are the numbers of missing values.
+        """
+        if len(columns) == 0:
+            return {}
+        return df.select([self._pl.col(column).null_count() for column in columns]).collect().row(0, named=True)
+
+    def non_integral_counts(self, df, columns):
+        """
+        This method counts the non-integral values of the given numeric columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the numeric columns.
+
+        Returns:
+            counts: A dictionary whose keys are the columns and whose values are the numbers of non-integral values.
+        """
+        if len(columns) == 0:
+            return {}
+        pl = self._pl
+        return df.select([(pl.col(column) % 1 != 0).sum().alias(column) for column in columns]) \
+            .collect().row(0, named=True)
+
+    def max_lengths(self, df, columns):
+        """
+        This method computes the length of the longest string of the given string columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the string columns.
+
+        Returns:
+            lengths: A dictionary whose keys are the columns and whose values are the maximum numbers of characters.
+        """
+        if len(columns) == 0:
+            return {}
+        lengths = df.select([self._pl.col(column).str.len_chars().max() for column in columns]) \
+            .collect().row(0, named=True)
+        return {column: length or 0 for column, length in lengths.items()}
+
+    def cast_integers(self, df, columns):
+        """
+        This method converts the given integral numeric columns into (nullable) integer columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the integral numeric columns.
+
+        Returns:
+            df: The dataframe with integer columns.
+        """
+        pl = self._pl
+        return df.with_columns([pl.col(column).cast(pl.Int64) for column in columns])
+
+    def n_rows(self, df):
+        """
+        This method returns the number of rows of a dataframe.
+
+        Args:
+            df: The dataframe.
+
+        Returns:
+            n_rows: The number of rows.
+        """
+        return df.select(self._pl.len()).collect().item()
+
+    def columns(self, df):
+        """
+        This method returns the column names of a dataframe.
+
+        Args:
+            df: The dataframe.
+
+        Returns:
+            columns: The list of column names.
+        """
+        return df.collect_schema().names()
+
+    def drop_duplicates(self, df, subset):
+        """
+        This method removes duplicate rows, keeping the first occurrence.
+
+        Args:
+            df: The dataframe.
+            subset: The list of columns used to identify duplicates.
+
+        Returns:
+            df: The dataframe without duplicates.
+        """
+        return df.unique(subset=subset, keep='first', maintain_order=True)
+
+    def drop_missing(self, df, columns):
+        """
+        This method removes the rows with missing values in any of the given columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of the columns.
+
+        Returns:
+            df: The dataframe without such rows.
+        """
+        return df.drop_nulls(subset=columns)
+
+    def round_scores(self, df, columns, decimals):
+        """
+        This method rounds the given numeric columns and replaces infinite values with missing values.
+
+        Args:
+            df: The dataframe.
+            columns: The list of columns to be rounded.
+            decimals: The number of decimals to keep.
+
+        Returns:
+            df: The dataframe with rounded columns.
+        """
+        pl = self._pl
+        expressions = []
+        for column in columns:
+            value = pl.col(column).cast(pl.Float64).round(decimals)
+            expressions.append(pl.when(value.is_infinite()).then(None).otherwise(value).alias(column))
+        return df.with_columns(expressions)
+
+    def parse_dates(self, df, columns):
+        """
+        This method converts the given string columns into datetime columns.
+
+        Args:
+            df: The dataframe.
+            columns: The list of date columns.
+
+        Returns:
+            df: The dataframe with parsed date columns.
+        """
+        pl = self._pl
+        schema = df.collect_schema()
+        expressions = [pl.coalesce(pl.col(column).str.to_datetime(META_KAGGLE_DATE_FORMAT, strict=False),
+                                   pl.col(column).str.to_datetime(strict=False)).alias(column)
+                       for column in columns if schema[column] == pl.Utf8]
+        return df.with_columns(expressions)
+
+    def filter_referencing(self, df, references):
+        """
+        This method keeps the rows of the referencing dataframe whose foreign keys are either missing
+        or present in the referenced columns of the referenced dataframes.
+        Since the numbers of removed rows are needed, the plan of the referencing dataframe is executed here:
+        the filters and the pending operations (e.g., the parsing of the dates) are run by a single query,
+        which also computes the filter masks used to count the removed rows.
+
+        Args:
+            df: The referencing dataframe.
+            references: The list of the (foreign key column, referenced dataframe, referenced column) tuples.
+
+        Returns:
+            - df            - the filtered referencing dataframe
+            - removed_rows  - the list of the numbers of rows removed by each foreign key, checked in the given order
+        """
+        pl = self._pl
+        schema = df.collect_schema()
+        masks = []
+        for fk, referenced_df, rc in references:
+            # The referenced keys are computed here, since the referenced tables are usually final (and collected)
+            referenced_keys = referenced_df.select(pl.col(rc).cast(schema[fk], strict=False).unique()) \
+                .collect().to_series()
+            masks.append(pl.col(fk).is_in(referenced_keys.implode()) | pl.col(fk).is_null())
+
+        mask_names = [f'_mask_{index}' for index in range(len(masks))]
+        df = df.with_columns([mask.alias(name) for mask, name in zip(masks, mask_names)]).collect()
+
+        # Number of rows left after each filter
+        n_rows = df.select([pl.len()] + [pl.all_horizontal(mask_names[:index + 1]).sum().alias(name)
+                                         for index, name in enumerate(mask_names)]).row(0)
+        removed_rows = [n_rows[index] - n_rows[index + 1] for index in range(len(masks))]
+
+        return df.filter(pl.all_horizontal(mask_names)).drop(mask_names).lazy(), removed_rows
+
+    def isin(self, df, column, keys):
+        """
+        This method tells which rows of a dataframe have a value of the given column among the given keys.
+
+        Args:
+            df: The dataframe.
+            column: The column to be checked.
+            keys: The ``numpy.ndarray`` of the keys.
+
+        Returns:
+            mask: The boolean ``numpy.ndarray`` with one element for each row; missing values are never matched.
+        """
+        pl = self._pl
+        keys = pl.Series(keys).cast(df.collect_schema()[column], strict=False).drop_nulls()
+        return df.select(pl.col(column).is_in(keys.implode()).fill_null(False)).collect().to_series().to_numpy()
+
+    def unique_values(self, df, column, mask):
+        """
+        This method returns the distinct values of a column over a subset of the rows, ignoring missing values.
+
+        Args:
+            df: The dataframe.
+            column: The column.
+            mask: The boolean ``numpy.ndarray`` selecting the rows.
+
+        Returns:
+            values: The ``numpy.ndarray`` of the distinct values.
+        """
+        return df.select(column).collect().to_series().filter(self._pl.Series(mask)).drop_nulls().unique().to_numpy()
+
+    def filter_rows(self, df, mask):
+        """
+        This method keeps the rows of a dataframe selected by a boolean mask.
+
+        Args:
+            df: The dataframe.
+            mask: The boolean ``numpy.ndarray`` selecting the rows.
+
+        Returns:
+            df: The filtered dataframe.
+        """
+        return df.collect().filter(self._pl.Series(mask)).lazy()
+
+    def collect(self, df):
+        """
+        This method executes the query plan of a dataframe.
+        Later operations on the returned dataframe start from the computed table, rather than from its plan.
+
+        Args:
+            df: The ``polars.LazyFrame``.
+
+        Returns:
+            df: The ``polars.LazyFrame`` of the computed table.
+        """
+        return df.collect().lazy()
+
+    def to_pandas(self, df):
+        """
+        This method converts a dataframe of this engine into a ``pandas.DataFrame``.
+
+        Args:
+            df: The dataframe.
+
+        Returns:
+            df: The ``pandas.DataFrame``.
+        """
+        return df.collect().to_pandas()
+
+
+# Available engines
+ENGINES = {
+    PandasEngine.name: PandasEngine,
+    PolarsEngine.name: PolarsEngine,
+}
+
+
+def get_engine(name='pandas'):
+    """
+    This function instantiates the dataframe engine with the given name.
+
+    Args:
+        name: The name of the engine (``pandas`` or ``polars``). By default it is ``pandas``.
+
+    Returns:
+        engine: The dataframe engine.
+    """
+    return ENGINES[name]()
@@ -5,34 +5,53 @@ This module defines the class that handles the communication with the database v
 import sys
 from sqlalchemy.exc import IntegrityError
 
+from KGTorrent.catalog import CATALOG_TABLE_NAME
 from KGTorrent.exceptions import DatabaseExistsError
+from KGTorrent.profiling import stage
+from KGTorrent.schema import build_db_schema
+from KGTorrent.selection import NotebookSelector, Selection
+from KGTorrent.status_writer import DOWNLOAD_STATUS_TABLE_NAME
 
 import pandas as pd
 
 # Imports to manage database
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy_utils import database_exists, \
     create_database, \
     drop_database
 
 # Imports to create table schemas
 from sqlalchemy import (MetaData, Table, Column, Integer, String, Float,
-                        DateTime, Boolean, Text, BigInteger)
-from sqlalchemy.dialects.mysql import (MEDIUMTEXT, LONGTEXT)
+                        DateTime, Boolean, Text, BigInteger, Index)
+from sqlalchemy.schema import CreateTable, CreateIndex
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 
-# Imports for testing
-import KGTorrent.config as config
-from KGTorrent.mk_preprocessor import MkPreprocessor
-from KGTorrent.data_loader import DataLoader
+
+# Supported storage backends
+BACKENDS = ('mysql', 'sqlite')
+
+# Maximum time (in seconds) a SQLite connection waits for the lock held by another writer
+SQLITE_BUSY_TIMEOUT = 3600
 
 
 class DbCommunicationHandler:
     """
     This class creates an SQLAlchemy engine and has methods for creating, populating and querying
     a database with MetaKaggle data.
+
+    Two storage backends are supported:
+
+    ``mysql``
+        a MySQL server, reached with the provided credentials;
+
+    ``sqlite``
+        an embedded SQLite database file, which requires no server; the database name is the path to the file.
+        Since SQLite cannot add foreign keys to existing tables, they are declared when the schema is built.
+        SQLite allows a single writer at a time: concurrent writers (e.g., the tables and the download status
+        written during early downloads) wait for each other for up to an hour, instead of the default 5 seconds.
     """
 
-    def __init__(self, db_username, db_password, db_host, db_port, db_name):
+    def __init__(self, db_username, db_password, db_host, db_port, db_name, backend='mysql', pool_size=None):
         """
         The constructor of this class creates the SQLAlchemy engine with provided arguments.
 
@@ -41,19 +60,33 @@ class DbCommunicationHandler:
             db_password: The password related to the username
             db_host: An IP address of a MYSQL database
             db_port: The port of the MYSQL process on the host machine
-            db_name: The name of the database to interact with
+            db_name: The name of the database to interact with (the path to the database file for ``sqlite``)
+            backend: The storage backend (``mysql`` or ``sqlite``). By default it is ``mysql``.
+            pool_size: The number of connections kept open to the MySQL server, e.g., one for each thread querying
+                the database. By default it is the SQLAlchemy default (5).
         """
 
-        self._engine = create_engine('mysql+pymysql://{}:{}@{}:{}/{}?charset=utf8mb4'.format(
-            db_username,
-            db_password,
-            db_host,
-            db_port,
-            db_name
-        ),
-            pool_recycle=3600)
-
-    def create_new_db(self, drop_if_exists=False):
+        self._backend = backend
+
+        if backend == 'sqlite':
+            self._engine = create_engine('sqlite:///{}'.format(db_name),
+                                         connect_args={'timeout': SQLITE_BUSY_TIMEOUT})
+        else:
+            pool_options = {'pool_size': pool_size} if pool_size is not None else {}
+            self._engine = create_engine('mysql+pymysql://{}:{}@{}:{}/{}?charset=utf8mb4'.format(
+                db_username,
+                db_password,
+                db_host,
+                db_port,
+                db_name
+            ),
+                pool_recycle=3600,
+                **pool_options)
+
+        # Selection of the notebooks, with its cache
+        self._selector = NotebookSelector(self)
+
+    def create_new_db(self, drop_if_exists=False, constraints_df=None):
         """
         This method creates a database with the provided name and builds schemas of MetaKaggle tables.
         It throws by default an exception when the database already exists in order to avoid an initialization
@@ -61,360 +94,30 @@ class DbCommunicationHandler:
 
         Args:
             drop_if_exists: If True the database is dropped before creation. By default it is False.
+            constraints_df: The ``pandas.DataFrame`` which contains the foreign key constraints information.
+                It is only used by the ``sqlite`` backend, which declares foreign keys in the table schemas.
         """
 
-        def build_db_schema():
-            """
-            This function builds the schema of the KGTorrent MySQL database.
-            """
-            # Create the metadata object
-            metadata = MetaData()
-
-            # ====================
-            # CREATE TABLE SCHEMAS
-            # ====================
-
-            competition_tags = Table('CompetitionTags', metadata,
-                                     Column('Id', Integer(), primary_key=True),
-                                     Column('CompetitionId', Integer(), nullable=False),
-                                     Column('TagId', Integer(), nullable=False)
-                                     )
-
-            competitions = Table('Competitions', metadata,
-                                 Column('Id', Integer(), primary_key=True),
-                                 Column('Slug', String(255), unique=True, nullable=False),
-                                 Column('Title', String(255), nullable=False),
-                                 Column('SubTitle', Text()),
-                                 Column('HostSegmentTitle', String(255), nullable=False),
-                                 Column('ForumId', Integer()),
-                                 Column('OrganizationId', Integer()),
-                                 Column('CompetitionTypeId', Integer(), nullable=False),
-                                 Column('HostName', String(255)),
-                                 Column('EnabledDate', DateTime(), nullable=False),
-                                 Column('DeadlineDate', DateTime(), nullable=False),
-                                 Column('ProhibitNewEntrantsDeadlineDate', DateTime()),
-                                 Column('TeamMergerDeadlineDate', DateTime()),
-                                 Column('TeamModelDeadlineDate', DateTime()),
-                                 Column('ModelSubmissionDeadlineDate', DateTime()),
-                                 Column('FinalLeaderboardHasBeenVerified', Boolean(), nullable=False),
-                                 Column('HasKernels', Boolean(), nullable=False),
-                                 Column('OnlyAllowKernelSubmissions', Boolean(), nullable=False),
-                                 Column('HasLeaderboard', Boolean(), nullable=False),
-                                 Column('LeaderboardPercentage', Integer(), nullable=False),
-                                 Column('LeaderboardDisplayFormat', Integer(), nullable=False),
-                                 Column('EvaluationAlgorithmAbbreviation', String(255)),
-                                 Column('EvaluationAlgorithmName', String(255)),
-                                 Column('EvaluationAlgorithmDescription', MEDIUMTEXT),
-                                 Column('EvaluationAlgorithmIsMax', Boolean()),
-                                 Column('ValidationSetName', String(255)),
-                                 Column('ValidationSetValue', String(255)),
-                                 Column('MaxDailySubmissions', Integer(), nullable=False),
-                                 Column('NumScoredSubmissions', Integer(), nullable=False),
-                                 Column('MaxTeamSize', Integer()),
-                                 Column('BanTeamMergers', Boolean(), nullable=False),
-                                 Column('EnableTeamModels', Boolean(), nullable=False),
-                                 Column('EnableSubmissionModelHashes', Boolean(), nullable=False),
-                                 Column('EnableSubmissionModelAttachments', Boolean(), nullable=False),
-                                 Column('RewardType', String(255)),
-                                 Column('RewardQuantity', Integer()),
-                                 Column('NumPrizes', Integer(), nullable=False),
-                                 Column('UserRankMultiplier', Integer(), nullable=False),
-                                 Column('CanQualifyTiers', Boolean(), nullable=False),
-                                 Column('TotalTeams', Integer(), nullable=False),
-                                 Column('TotalCompetitors', Integer(), nullable=False),
-                                 Column('TotalSubmissions', Integer(), nullable=False)
-                                 )
-
-            dataset_tags = Table('DatasetTags', metadata,
-                                 Column('Id', Integer(), primary_key=True),
-                                 Column('DatasetId', Integer(), nullable=False),
-                                 Column('TagId', Integer(), nullable=False)
-                                 )
-
-            dataset_versions = Table('DatasetVersions', metadata,
-                                     Column('Id', Integer(), primary_key=True),
-                                     Column('DatasetId', Integer(), nullable=False),
-                                     Column('DatasourceVersionId', Integer()),
-                                     Column('CreatorUserId', Integer(), nullable=False),
-                                     Column('LicenseName', String(255), nullable=False),
-                                     Column('CreationDate', DateTime(), nullable=False),
-                                     Column('VersionNumber', Integer()),
-                                     Column('Title', String(255)),
-                                     Column('Slug', String(255), nullable=False),
-                                     Column('Subtitle', String(255)),
-                                     Column('Description', MEDIUMTEXT),
-                                     Column('VersionNotes', Text()),
-                                     Column('TotalCompressedBytes', BigInteger()),
-                                     Column('TotalUncompressedBytes', BigInteger())
-                                     )
-
-            dataset_votes = Table('DatasetVotes', metadata,
-                                  Column('Id', Integer(), primary_key=True),
-                                  Column('UserId', Integer(), nullable=False),
-                                  Column('DatasetVersionId', Integer(), nullable=False),
-                                  Column('VoteDate', DateTime(), nullable=False)
-                                  )
-
-            datasets = Table('Datasets', metadata,
-                             Column('Id', Integer(), primary_key=True),
-                             Column('CreatorUserId', Integer(), nullable=False),
-                             Column('OwnerUserId', Integer()),
-                             Column('OwnerOrganizationId', Integer()),
-                             Column('CurrentDatasetVersionId', Integer()),
-                             Column('CurrentDatasourceVersionId', Integer()),
-                             Column('ForumId', Integer(), nullable=False),
-                             Column('Type', Integer(), nullable=False),
-                             Column('CreationDate', DateTime(), nullable=False),
-                             Column('ReviewDate', DateTime()),
-                             Column('FeatureDate', DateTime()),
-                             Column('LastActivityDate', DateTime(), nullable=False),
-                             Column('TotalViews', Integer(), nullable=False),
-                             Column('TotalDownloads', Integer(), nullable=False),
-                             Column('TotalVotes', Integer(), nullable=False),
-                             Column('TotalKernels', Integer(), nullable=False)
-                             )
-
-            datasources = Table('Datasources', metadata,
-                                Column('Id', Integer(), primary_key=True),
-                                Column('CreatorUserId', Integer(), nullable=False),
-                                Column('CreationDate', DateTime(), nullable=False),
-                                Column('Type', Integer(), nullable=False),
-                                Column('CurrentDatasourceVersionId', Integer(), nullable=False)
-                                )
-
-            forum_message_votes = Table('ForumMessageVotes', metadata,
-                                        Column('Id', Integer(), primary_key=True),
-                                        Column('ForumMessageId', Integer(), nullable=False),
-                                        Column('FromUserId', Integer(), nullable=False),
-                                        Column('ToUserId', Integer(), nullable=False),
-                                        Column('VoteDate', DateTime(), nullable=False)
-                                        )
-
-            forum_messages = Table('ForumMessages', metadata,
-                                   Column('Id', Integer(), primary_key=True),
-                                   Column('ForumTopicId', Integer(), nullable=False),
-                                   Column('PostUserId', Integer(), nullable=False),
-                                   Column('PostDate', DateTime(), nullable=False),
-                                   Column('ReplyToForumMessageId', Integer()),
-                                   Column('Message', LONGTEXT),
-                                   Column('Medal', Integer()),
-                                   Column('MedalAwardDate', DateTime())
-                                   )
-
-            forum_topics = Table('ForumTopics', metadata,
-                                 Column('Id', Integer(), primary_key=True),
-                                 Column('ForumId', Integer(), nullable=False),
-                                 Column('KernelId', Integer()),
-                                 Column('LastForumMessageId', Integer()),
-                                 Column('FirstForumMessageId', Integer()),
-                                 Column('CreationDate', DateTime(), nullable=False),
-                                 Column('LastCommentDate', DateTime(), nullable=False),
-                                 Column('Title', String(255)),
-                                 Column('IsSticky', Boolean(), nullable=False),
-                                 Column('TotalViews', Integer(), nullable=False),
-                                 Column('Score', Integer(), nullable=False),
-                                 Column('TotalMessages', Integer(), nullable=False),
-                                 Column('TotalReplies', Integer(), nullable=False)
-                                 )
-
-            forums = Table('Forums', metadata,
-                           Column('Id', Integer(), primary_key=True),
-                           Column('ParentForumId', Integer()),
-                           Column('Title', String(255))
-                           )
-
-            kernel_languages = Table('KernelLanguages', metadata,
-                                     Column('Id', Integer(), primary_key=True),
-                                     Column('Name', String(255), unique=True, nullable=False),
-                                     Column('DisplayName', String(255), nullable=False),
-                                     Column('IsNotebook', Boolean(), nullable=False)
-                                     )
-
-            kernel_tags = Table('KernelTags', metadata,
-                                Column('Id', Integer(), primary_key=True),
-                                Column('KernelId', Integer(), nullable=False),
-                                Column('TagId', Integer(), nullable=False)
-                                )
-
-            kernel_version_competition_sources = Table('KernelVersionCompetitionSources', metadata,
-                                                       Column('Id', Integer(), primary_key=True),
-                                                       Column('KernelVersionId', Integer(), nullable=False),
-                                                       Column('SourceCompetitionId', Integer(), nullable=False)
-                                                       )
-
-            kernel_version_dataset_sources = Table('KernelVersionDatasetSources', metadata,
-                                                   Column('Id', Integer(), primary_key=True),
-                                                   Column('KernelVersionId', Integer(), nullable=False),
-                                                   Column('SourceDatasetVersionId', Integer(), nullable=False)
-                                                   )
-
-            kernel_version_kernel_sources = Table('KernelVersionKernelSources', metadata,
-                                                  Column('Id', Integer(), primary_key=True),
-                                                  Column('KernelVersionId', Integer(), nullable=False),
-                                                  Column('SourceKernelVersionId', Integer(), nullable=False)
-                                                  )
-
-            kernel_version_output_files = Table('KernelVersionOutputFiles', metadata,
-                                                Column('Id', Integer(), primary_key=True),
-                                                Column('KernelVersionId', Integer(), nullable=False),
-                                                Column('FileName', String(255)),
-                                                Column('ContentLength', BigInteger(), nullable=False),
-                                                Column('ContentTypeExtension', String(255)),
-                                                Column('CompressionTypeExtension', String(255))
-                                                )
-
-            kernel_versions = Table('KernelVersions', metadata,
-                                    Column('Id', Integer(), primary_key=True),
-                                    Column('ScriptId', Integer(), nullable=False),
-                                    Column('ParentScriptVersionId', Integer()),
-                                    Column('ScriptLanguageId', Integer(), nullable=False),
-                                    Column('AuthorUserId', Integer(), nullable=False),
-                                    Column('CreationDate', DateTime(), nullable=False),
-                                    Column('VersionNumber', Integer()),
-                                    Column('Title', String(255)),
-                                    Column('EvaluationDate', DateTime()),
-                                    Column('IsChange', Boolean(), nullable=False),
-                                    Column('TotalLines', Integer()),
-                                    Column('LinesInsertedFromPrevious', Integer()),
-                                    Column('LinesChangedFromPrevious', Integer()),
-                                    Column('LinesUnchangedFromPrevious', Integer()),
-                                    Column('LinesInsertedFromFork', Integer()),
-                                    Column('LinesDeletedFromFork', Integer()),
-                                    Column('LinesChangedFromFork', Integer()),
-                                    Column('LinesUnchangedFromFork', Integer()),
-                                    Column('TotalVotes', Integer(), nullable=False)
-                                    )
-
-            kernel_votes = Table('KernelVotes', metadata,
-                                 Column('Id', Integer(), primary_key=True),
-                                 Column('UserId', Integer(), nullable=False),
-                                 Column('KernelVersionId', Integer(), nullable=False),
-                                 Column('VoteDate', DateTime(), nullable=False)
-                                 )
-
-            kernels = Table('Kernels', metadata,
-                            Column('Id', Integer(), primary_key=True),
-                            Column('AuthorUserId', Integer(), nullable=False),
-                            Column('CurrentKernelVersionId', Integer()),
-                            Column('ForkParentKernelVersionId', Integer()),
-                            Column('ForumTopicId', Integer()),
-                            Column('FirstKernelVersionId', Integer()),
-                            Column('CreationDate', DateTime()),
-                            Column('EvaluationDate', DateTime()),
-                            Column('MadePublicDate', DateTime()),
-                            Column('IsProjectLanguageTemplate', Boolean(), nullable=False),
-                            Column('CurrentUrlSlug', String(255)),
-                            Column('Medal', Float()),
-                            Column('MedalAwardDate', DateTime()),
-                            Column('TotalViews', Integer(), nullable=False),
-                            Column('TotalComments', Integer(), nullable=False),
-                            Column('TotalVotes', Integer(), nullable=False)
-                            )
-
-            organizations = Table('Organizations', metadata,
-                                  Column('Id', Integer(), primary_key=True),
-                                  Column('Name', String(255), nullable=False),
-                                  Column('Slug', String(255), unique=True, nullable=False),
-                                  Column('CreationDate', DateTime(), nullable=False),
-                                  Column('Description', Text())
-                                  )
-
-            submissions = Table('Submissions', metadata,
-                                Column('Id', Integer(), primary_key=True),
-                                Column('SubmittedUserId', Integer()),
-                                Column('TeamId', Integer(), nullable=False),
-                                Column('SourceKernelVersionId', Integer()),
-                                Column('SubmissionDate', DateTime(), nullable=False),
-                                Column('ScoreDate', DateTime()),
-                                Column('IsAfterDeadline', Boolean(), nullable=False),
-                                Column('PublicScoreLeaderboardDisplay', Float(52)),
-                                Column('PublicScoreFullPrecision', Float(52)),
-                                Column('PrivateScoreLeaderboardDisplay', Float(52)),
-                                Column('PrivateScoreFullPrecision', Float(52))
-                                )
-
-            tags = Table('Tags', metadata,
-                         Column('Id', Integer(), primary_key=True),
-                         Column('ParentTagId', Integer()),
-                         Column('Name', String(255), nullable=False),
-                         Column('Slug', String(255), nullable=False),
-                         Column('FullPath', String(255), nullable=False),
-                         Column('Description', Text()),
-                         Column('DatasetCount', Integer(), nullable=False),
-                         Column('CompetitionCount', Integer(), nullable=False),
-                         Column('KernelCount', Integer(), nullable=False)
-                         )
-
-            team_memberships = Table('TeamMemberships', metadata,
-                                     Column('Id', Integer(), primary_key=True),
-                                     Column('TeamId', Integer(), nullable=False),
-                                     Column('UserId', Integer(), nullable=False),
-                                     Column('RequestDate', DateTime())
-                                     )
-
-            teams = Table('Teams', metadata,
-                          Column('Id', Integer(), primary_key=True),
-                          Column('CompetitionId', Integer(), nullable=False),
-                          Column('TeamLeaderId', Integer()),
-                          Column('TeamName', String(255)),
-                          Column('ScoreFirstSubmittedDate', DateTime()),
-                          Column('LastSubmissionDate', DateTime()),
-                          Column('PublicLeaderboardSubmissionId', Integer()),
-                          Column('PrivateLeaderboardSubmissionId', Integer()),
-                          Column('IsBenchmark', Boolean(), nullable=False),
-                          Column('Medal', Integer()),
-                          Column('MedalAwardDate', DateTime()),
-                          Column('PublicLeaderboardRank', Integer()),
-                          Column('PrivateLeaderboardRank', Integer())
-                          )
-
-            user_achievements = Table('UserAchievements', metadata,
-                                      Column('Id', Integer(), primary_key=True),
-                                      Column('UserId', Integer(), nullable=False),
-                                      Column('AchievementType', String(255), nullable=False),
-                                      Column('Tier', Integer(), nullable=False),
-                                      Column('TierAchievementDate', DateTime()),
-                                      Column('Points', Integer(), nullable=False),
-                                      Column('CurrentRanking', Integer()),
-                                      Column('HighestRanking', Integer()),
-                                      Column('TotalGold', Integer(), nullable=False),
-                                      Column('TotalSilver', Integer(), nullable=False),
-                                      Column('TotalBronze', Integer(), nullable=False)
-                                      )
-
-            user_followers = Table('UserFollowers', metadata,
-                                   Column('Id', Integer(), primary_key=True),
-                                   Column('UserId', Integer(), nullable=False),
-                                   Column('FollowingUserId', Integer(), nullable=False),
-                                   Column('CreationDate', DateTime(), nullable=False)
-                                   )
-
-            user_organizations = Table('UserOrganizations', metadata,
-                                       Column('Id', Integer(), primary_key=True),
-                                       Column('UserId', Integer(), nullable=False),
-                                       Column('OrganizationId', Integer(), nullable=False),
-                                       Column('JoinDate', DateTime(), nullable=False)
-                                       )
-
-            users = Table('Users', metadata,
-                          Column('Id', Integer(), primary_key=True),
-                          Column('UserName', String(255), unique=True),
-                          Column('DisplayName', String(255)),
-                          Column('RegisterDate', DateTime(), nullable=False),
-                          Column('PerformanceTier', Integer(), nullable=False)
-                          )
-
-            # Create all tables added to the metadata object
-            metadata.create_all(self._engine)
-            # END build_db_schema
-
         if database_exists(self._engine.url):
             if drop_if_exists:
                 drop_database(self._engine.url)
             else:
                 raise DatabaseExistsError(f'Database {self._engine.url.database} already exists.')
         create_database(self._engine.url, 'utf8mb4')
-        build_db_schema()
+
+        # Foreign keys are declared in the schemas when they cannot be added once tables are populated
+        metadata = build_db_schema(constraints_df if self._backend == 'sqlite' else None)
+        metadata.create_all(self._engine)
+        self._selector.clear_cache()
+
+    def get_backend(self):
+        """
+        This method returns the storage backend of the database.
+
+        Returns:
+            backend: The name of the storage backend (``mysql`` or ``sqlite``).
+        """
+        return self._backend
 
     def db_exists(self):
         """
@@ -439,23 +142,38 @@ class DbCommunicationHandler:
             sql_name = table_name.split('.')[0].lower()
 
             print('Writing "{}" to database...'.format(table_name))
-            tables_dict[table_name].to_sql(sql_name,
-                                           self._engine,
-                                           if_exists='append',  # TODO: make a choice here
-                                           index=False,
-                                           chunksize=10000
-                                           )
+            with stage('write_tables'):
+                tables_dict[table_name].to_sql(sql_name,
+                                               self._engine,
+                                               if_exists='append',  # TODO: make a choice here
+                                               index=False,
+                                               chunksize=10000
+                                               )
 
             print('"{}" written to database.\n'.format(table_name))
 
+        # New rows may change the snapshot of Meta Kaggle identified by the cache of the selections
+        self._selector.clear_cache()
+
     def set_foreign_keys(self, constraints_df):
         """
         This method sets the foreign key constraints based on information provided by the related ``pandas.DataFrame``.
 
+        With the ``sqlite`` backend, foreign keys are already declared in the table schemas:
+        this method only checks that populated tables do not violate them.
+
         Args:
             constraints_df: The ``pandas.DataFrame`` which contains the foreign key constraints information
         """
 
+        if self._backend == 'sqlite':
+            for table_name in (constraints_df['Table'].str[:-4].str.lower()).unique():
+                violations = self._engine.execute(f'PRAGMA foreign_key_check({table_name});').fetchall()
+                print(f'Checked foreign keys of "{table_name}": {len(violations)} violations')
+                if len(violations) != 0:
+                    print("\t - INTEGRITY ERROR. Foreign keys violated in table ", table_name, file=sys.stderr)
+            return
+
         for _, fk in constraints_df.iterrows():
             table_name = fk['Table'][:-4].lower()
             foreign_key = fk['Foreign Key']
@@ -471,49 +189,423 @@ class DbCommunicationHandler:
             except IntegrityError as e:
                 print("\t - INTEGRITY ERROR. Can't update table ", table_name, file=sys.stderr)
 
-    def get_nb_identifiers(self, languages):
+    def has_table(self, table_name):
+        """
+        This method checks whether a table exists in the database.
+
+        Args:
+            table_name: The name of the table.
+
+        Returns:
+            bool: True if the table exists, False otherwise.
+        """
+
+        with self._engine.connect() as connection:
+            return self._engine.dialect.has_table(connection, table_name)
+
+    def write_catalog(self, catalog):
+        """
+        This method replaces the notebook catalog (see :class:`.CatalogBuilder`) with the given one.
+        The catalog table is indexed on the columns most often used to select notebooks.
+
+        Args:
+            catalog: The ``pandas.DataFrame`` containing the catalog.
+        """
+
+        metadata = MetaData()
+        table = Table(CATALOG_TABLE_NAME, metadata,
+                      Column('KernelId', Integer(), primary_key=True, autoincrement=False),
+                      Column('CurrentKernelVersionId', Integer(), nullable=False),
+                      # Like in the users and kernels tables, user names and slugs may be missing
+                      Column('FileName', String(511)),
+                      Column('UserName', String(255)),
+                      Column('CurrentUrlSlug', String(255)),
+                      Column('AuthorUserId', Integer(), nullable=False),
+                      Column('AuthorDisplayName', String(255)),
+                      Column('LanguageId', Integer(), nullable=False),
+                      Column('LanguageName', String(255), nullable=False),
+                      Column('Medal', Float()),
+                      Column('MedalAwardDate', DateTime()),
+                      Column('TotalVotes', Integer(), nullable=False),
+                      Column('TotalViews', Integer(), nullable=False),
+                      Column('TotalComments', Integer(), nullable=False),
+                      Column('KernelCreationDate', DateTime()),
+                      Column('MadePublicDate', DateTime()),
+                      Column('VersionCreationDate', DateTime(), nullable=False),
+                      Column('ForkParentKernelVersionId', Integer()),
+                      Column('NDatasetSources', Integer(), nullable=False),
+                      Column('NCompetitionSources', Integer(), nullable=False),
+                      Column('NKernelSources', Integer(), nullable=False),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_CurrentKernelVersionId', 'CurrentKernelVersionId'),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_FileName', 'FileName'),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_AuthorUserId', 'AuthorUserId'),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_LanguageId', 'LanguageId'),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_LanguageName', 'LanguageName'),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_Medal', 'Medal', 'TotalVotes'),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_TotalVotes', 'TotalVotes'),
+                      Index(f'ix_{CATALOG_TABLE_NAME}_VersionCreationDate', 'VersionCreationDate')
+                      )
+        table.drop(self._engine, checkfirst=True)
+        table.create(self._engine)
+
+        self.write_tables({CATALOG_TABLE_NAME: catalog})
+
+    def get_nb_identifiers(self, languages, priority=None, priority_sql=None):
         """
         This method queries the database in order to retrieve slugs and identifiers of notebooks
-        written in the provided languages.
+        written in the provided languages (see :func:`.DbCommunicationHandler.select_notebooks`).
 
         Args:
             languages: A string array of notebook languages present in Kaggle.
+            priority: The optional name of a priority in :data:`.scheduler.PRIORITIES` defining the order
+                of the notebooks.
+            priority_sql: An optional custom SQL ORDER BY expression over the ``kernels``, ``users`` and
+                ``kernelversions`` tables; it takes precedence over ``priority``.
 
         Returns:
             nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
         """
+        return self.select_notebooks(Selection(languages=languages, priority=priority, priority_sql=priority_sql))
 
-        # Prepare the query
-        query = 'SELECT ' \
-                'users.UserName, ' \
-                'kernels.CurrentUrlSlug, ' \
-                'kernels.CurrentKernelVersionId ' \
-                'FROM ' \
-                '(((kernels INNER JOIN users ON kernels.AuthorUserId = users.Id) ' \
-                'INNER JOIN kernelversions ON kernels.CurrentKernelVersionId = kernelversions.Id) ' \
-                'INNER JOIN kernellanguages ON kernelversions.ScriptLanguageId = kernellanguages.Id) ' \
-                f'WHERE '
+    def select_notebooks(self, selection):
+        """
+        This method retrieves slugs and identifiers of the notebooks described by a :class:`.Selection`.
+        When the notebook catalog exists, notebooks are selected from it; otherwise (or when a custom
+        ``priority_sql`` expression is given), they are selected by joining the Meta Kaggle tables.
+        Results are cached until this handler writes tables to the database, or until the selections are
+        invalidated (see :func:`.DbCommunicationHandler.invalidate_selections`).
 
-        # Add where clause for each language
-        for lang in languages:
+        Args:
+            selection: The :class:`.Selection`.
 
-            if lang is languages[0]:
-                query = query + f'kernellanguages.name LIKE \'{lang}\' '
+        Returns:
+            nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
+        """
+        return self._selector.select(selection)
 
-            else:
-                query = query + f'OR kernellanguages.name LIKE \'{lang}\' '
+    def invalidate_selections(self):
+        """
+        This method makes the next selections of notebooks identify again the snapshot of Meta Kaggle loaded in the
+        database, instead of returning cached results. It must be called when the database is refreshed
+        by another process (e.g., by the ``refresh`` command) while this handler is in use.
+        """
+        self._selector.invalidate()
 
-        # Close the query
-        query = query + ';'
+    def execute_query(self, query):
+        """
+        This method executes a ``SELECT`` query on the database.
 
-        # Execute the query
-        nb_identifiers = pd.read_sql(sql=query, con=self._engine)
+        Args:
+            query: The SQL query, as a string or as an SQLAlchemy ``Select``.
 
-        return nb_identifiers
+        Returns:
+            result: The ``pandas.DataFrame`` with the result of the query.
+        """
+        return pd.read_sql(sql=query, con=self._engine)
+
+    def write_lineage_tables(self, tables_dict):
+        """
+        This method replaces the kernel lineage closure tables (see :class:`.LineageBuilder`) with the given ones.
+        Tables are created with a primary key on (``AncestorKernelId``, ``DescendantKernelId``) and an index on
+        ``DescendantKernelId``, so that both the descendants and the ancestors of a kernel are found by index lookups.
+
+        Args:
+            tables_dict: The dictionary whose keys are the table names and whose values are the ``pandas.DataFrame``
+                closure tables.
+        """
+
+        metadata = MetaData()
+        for table_name in tables_dict.keys():
+            sql_name = table_name.lower()
+            table = Table(sql_name, metadata,
+                          Column('AncestorKernelId', Integer(), primary_key=True, autoincrement=False),
+                          Column('DescendantKernelId', Integer(), primary_key=True, autoincrement=False),
+                          Column('Depth', Integer(), nullable=False),
+                          Index(f'ix_{sql_name}_DescendantKernelId', 'DescendantKernelId')
+                          )
+            table.drop(self._engine, checkfirst=True)
+            table.create(self._engine)
+
+        self.write_tables({table_name.lower(): df for table_name, df in tables_dict.items()})
+
+    def _get_notebook_tables(self):
+        """
+        This method builds the schemas of the tables storing the facts extracted from the downloaded notebooks.
+        Both tables are keyed on the ``CurrentKernelVersionId`` of the notebooks.
+
+        Returns:
+            tables: A dictionary whose keys are the table names and whose values are the SQLAlchemy tables.
+        """
+
+        metadata = MetaData()
+
+        notebook_facts = Table('notebookfacts', metadata,
+                               Column('CurrentKernelVersionId', Integer(), primary_key=True, autoincrement=False),
+                               Column('LocalPath', Text(), nullable=False),
+                               Column('ByteSize', BigInteger(), nullable=False),
+                               Column('MTimeNs', BigInteger(), nullable=False),
+                               Column('NbFormat', Integer()),
+                               Column('NCells', Integer(), nullable=False),
+                               Column('NCodeCells', Integer(), nullable=False),
+                               Column('NMarkdownCells', Integer(), nullable=False),
+                               Column('NRawCells', Integer(), nullable=False),
+                               Column('HasOutputs', Boolean(), nullable=False)
+                               )
+
+        notebook_imports = Table('notebookimports', metadata,
+                                 Column('CurrentKernelVersionId', Integer(), primary_key=True, autoincrement=False),
+                                 Column('Module', String(255), primary_key=True),
+                                 Index('ix_notebookimports_Module', 'Module')
+                                 )
+
+        return {table.name: table for table in (notebook_facts, notebook_imports)}
+
+    def create_notebook_tables(self):
+        """
+        This method creates the tables storing the facts extracted from the downloaded notebooks,
+        unless they already exist.
+        """
+
+        tables = self._get_notebook_tables()
+        for table in tables.values():
+            table.create(self._engine, checkfirst=True)
+
+    def get_notebook_facts(self):
+        """
+        This method retrieves the size and modification time of the notebooks whose facts are stored in the database,
+        so that only new or changed notebooks are extracted again.
+
+        Returns:
+            notebook_facts: The ``pandas.DataFrame`` containing ``CurrentKernelVersionId``, ``ByteSize``
+            and ``MTimeNs`` of the extracted notebooks.
+        """
+
+        query = 'SELECT CurrentKernelVersionId, ByteSize, MTimeNs FROM notebookfacts;'
+        return pd.read_sql(sql=query, con=self._engine)
+
+    def replace_notebook_facts(self, stale_ids, facts_df, imports_df, chunksize=1000):
+        """
+        This method deletes the facts of the given notebooks and bulk-loads the new ones, in a single transaction.
+
+        Args:
+            stale_ids: The list of ``CurrentKernelVersionId`` of the notebooks whose facts have to be deleted
+                (i.e., changed or no longer available notebooks).
+            facts_df: The ``pandas.DataFrame`` of the rows to be inserted in the ``notebookfacts`` table.
+            imports_df: The ``pandas.DataFrame`` of the rows to be inserted in the ``notebookimports`` table.
+            chunksize: The maximum number of identifiers in each ``DELETE`` statement. By default it is 1000.
+        """
+
+        tables = self._get_notebook_tables()
+
+        with self._engine.begin() as connection:
+            for table in tables.values():
+                for start in range(0, len(stale_ids), chunksize):
+                    chunk = [int(kernel_version_id) for kernel_version_id in stale_ids[start:start + chunksize]]
+                    connection.execute(table.delete().where(table.c.CurrentKernelVersionId.in_(chunk)))
+
+            for table_name, df in (('notebookfacts', facts_df), ('notebookimports', imports_df)):
+                if df.shape[0] != 0:
+                    df.to_sql(table_name, connection, if_exists='append', index=False, chunksize=10000)
+
+    def _get_download_status_table(self):
+        """
+        This method builds the schema of the table storing the download status of the notebooks,
+        keyed on their ``CurrentKernelVersionId``.
+
+        Returns:
+            table: The SQLAlchemy table.
+        """
+
+        return Table(DOWNLOAD_STATUS_TABLE_NAME, MetaData(),
+                     Column('CurrentKernelVersionId', Integer(), primary_key=True, autoincrement=False),
+                     Column('LocalPath', Text()),
+                     Column('Status', String(16), nullable=False),
+                     Column('Bytes', BigInteger(), nullable=False),
+                     Column('HttpStatus', Integer()),
+                     Column('Reason', Text()),
+                     Column('FetchedAt', DateTime(), nullable=False),
+                     Index(f'ix_{DOWNLOAD_STATUS_TABLE_NAME}_Status', 'Status')
+                     )
+
+    def create_download_status_table(self):
+        """
+        This method creates the table storing the download status of the notebooks, unless it already exists.
+        """
+        self._get_download_status_table().create(self._engine, checkfirst=True)
+
+    def upsert_download_status(self, rows, chunksize=100):
+        """
+        This method inserts or replaces the download status of the given notebooks with multi-row statements,
+        in a single transaction
+        (``INSERT ... ON DUPLICATE KEY UPDATE`` with MySQL, ``INSERT OR REPLACE`` with SQLite).
+
+        Args:
+            rows: The list of dictionaries whose keys are the columns of the ``downloadstatus`` table.
+            chunksize: The maximum number of rows in each statement. By default it is 100,
+                which keeps the statements within the limit of bound parameters of SQLite.
+        """
+
+        table = self._get_download_status_table()
+
+        with self._engine.begin() as connection:
+            for start in range(0, len(rows), chunksize):
+                chunk = rows[start:start + chunksize]
+                if self._backend == 'mysql':
+                    statement = mysql_insert(table).values(chunk)
+                    statement = statement.on_duplicate_key_update({column.name: statement.inserted[column.name]
+                                                                   for column in table.columns
+                                                                   if not column.primary_key})
+                else:
+                    statement = table.insert().prefix_with('OR REPLACE').values(chunk)
+                connection.execute(statement)
+
+    def get_table_schemas(self):
+        """
+        This method reflects the schemas of all the tables in the database.
+
+        Returns:
+            tables: A dictionary whose keys are the table names, in alphabetical order,
+            and whose values are the reflected SQLAlchemy tables.
+        """
+
+        metadata = MetaData()
+        metadata.reflect(bind=self._engine)
+        return {table_name: metadata.tables[table_name] for table_name in sorted(metadata.tables)}
+
+    def get_create_statements(self, table):
+        """
+        This method renders the statements creating a table and its indexes in the SQL dialect of the database.
+
+        Args:
+            table: The SQLAlchemy table (see :func:`.DbCommunicationHandler.get_table_schemas`).
+
+        Returns:
+            statements: The list of ``CREATE TABLE`` and ``CREATE INDEX`` statements, without the final semicolon.
+        """
+
+        statements = [str(CreateTable(table).compile(self._engine)).strip()]
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(str(CreateIndex(index).compile(self._engine)).strip())
+        return statements
+
+    def iter_table_rows(self, table, chunksize=10000):
+        """
+        This method reads all the rows of a table, ordered by primary key, without loading them all in memory.
+        It opens its own connection, so tables can be read by concurrent threads.
+
+        Args:
+            table: The SQLAlchemy table (see :func:`.DbCommunicationHandler.get_table_schemas`).
+            chunksize: The number of rows in each chunk. By default it is 10000.
+
+        Returns:
+            chunks: A generator of lists of row tuples.
+        """
+
+        with self._engine.connect() as connection:
+            result = connection.execution_options(stream_results=True) \
+                .execute(table.select().order_by(*table.primary_key.columns))
+            while True:
+                rows = result.fetchmany(chunksize)
+                if len(rows) == 0:
+                    break
+                yield [tuple(row) for row in rows]
+
+    def create_empty_db(self):
+        """
+        This method creates the database without any table, unless it already exists
+        (e.g., for the temporal storage mode, see :class:`.TemporalStore`).
+        """
+
+        if not database_exists(self._engine.url):
+            create_database(self._engine.url, 'utf8mb4')
+
+    def get_table_names(self):
+        """
+        This method lists the tables of the database (views excluded).
+
+        Returns:
+            table_names: The sorted list of the table names.
+        """
+        return sorted(inspect(self._engine).get_table_names())
+
+    def get_column_names(self, table_name):
+        """
+        This method lists the columns of a table or of a view.
+
+        Args:
+            table_name: The name of the table.
+
+        Returns:
+            column_names: The list of the column names, in the order of the table.
+        """
+        return [column['name'] for column in inspect(self._engine).get_columns(table_name)]
+
+    def create_table(self, table):
+        """
+        This method creates a table and its indexes, unless the table already exists.
+
+        Args:
+            table: The SQLAlchemy table.
+        """
+        table.create(self._engine, checkfirst=True)
+
+    def add_columns(self, table_name, columns):
+        """
+        This method adds nullable columns to an existing table.
+
+        Args:
+            table_name: The name of the table.
+            columns: The list of the SQLAlchemy columns to be added.
+        """
+
+        with self._engine.begin() as connection:
+            for column in columns:
+                column_type = column.type.compile(dialect=self._engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}'))
+
+    def apply_temporal_changes(self, table_name, expired_ids, rows_df, snapshot_id, chunksize=1000):
+        """
+        This method closes the validity of the current rows with the given identifiers and bulk-loads the new rows
+        of a history table (see :class:`.TemporalStore`), in a single transaction.
+
+        Args:
+            table_name: The name of the history table.
+            expired_ids: The list of the ``Id`` of the current rows that changed or were removed.
+            rows_df: The ``pandas.DataFrame`` of the rows to be inserted.
+            snapshot_id: The identifier of the snapshot closing the validity of the expired rows.
+            chunksize: The maximum number of identifiers in each ``UPDATE`` statement. By default it is 1000.
+        """
+
+        with self._engine.begin() as connection:
+            for start in range(0, len(expired_ids), chunksize):
+                chunk = ', '.join(str(int(row_id)) for row_id in expired_ids[start:start + chunksize])
+                connection.execute(text(f'UPDATE {table_name} SET ValidTo = {int(snapshot_id)} '
+                                        f'WHERE ValidTo IS NULL AND Id IN ({chunk})'))
+
+            if rows_df.shape[0] != 0:
+                rows_df.to_sql(table_name, connection, if_exists='append', index=False, chunksize=10000)
+
+    def replace_views(self, views):
+        """
+        This method creates or replaces views, in a single transaction.
+
+        Args:
+            views: A dictionary whose keys are the view names and whose values are the ``SELECT`` queries.
+        """
+
+        with self._engine.begin() as connection:
+            for view_name, query in views.items():
+                connection.execute(text(f'DROP VIEW IF EXISTS {view_name}'))
+                connection.execute(text(f'CREATE VIEW {view_name} AS {query}'))
 
 
 if __name__ == '__main__':
 
+    # Imports for testing
+    import KGTorrent.config as config
+    from KGTorrent.mk_preprocessor import MkPreprocessor
+    from KGTorrent.data_loader import DataLoader
+
     print("********************")
     print("*** LOADING DATA ***")
     print("********************")
@@ -557,3 +649,4 @@ if __name__ == '__main__':
         print("** QUERING KERNELS TO DOWNLOAD **")
         kernels_ids = db_engine.get_nb_identifiers(config.nb_conf['languages'])
         print(kernels_ids.head())
+
@@ -2,17 +2,24 @@
 This module defines the class that handles the actual download of Jupyter notebooks from Kaggle.
 """
 
+import hashlib
+import json
 import logging
+import os
 import time
 from pathlib import Path
 from tqdm import tqdm
 
 import requests
-from kaggle.api.kaggle_api_extended import KaggleApi
 
-# Imports for testing
-import KGTorrent.config as config
-from KGTorrent.db_communication_handler import DbCommunicationHandler
+from KGTorrent.manifest import ArchiveManifest, sha256_file
+from KGTorrent.nb_validator import NotebookValidator, validate_notebook, validate_notebook_file
+from KGTorrent.profiling import stage
+from KGTorrent.rate_controller import RateController, SUCCESS, RETRYABLE_OUTCOMES
+from KGTorrent.shards import JOURNAL_FILE_NAME
+
+# URL template of the HTTP download strategy, formatted with the CurrentKernelVersionId of the notebook
+NOTEBOOK_URL = 'https://www.kaggle.com/kernels/scriptcontent/{}/download'
 
 
 class Downloader:
@@ -29,19 +36,43 @@ class Downloader:
         to download notebooks via calls to the official Kaggle API;
         Jupyter notebooks downloaded by using this strategy always miss the output of code cells.
 
+    The pace of the requests is adapted to the responses of the server by a :class:`.RateController`:
+    error responses are never written to the download folder, and throttled or failed requests
+    are retried up to a maximum number of attempts.
+    Downloaded notebooks are validated before being written (see :mod:`.nb_validator`): invalid content
+    (e.g., an HTML page or truncated JSON) is retried as well, and eventually moved to the quarantine folder.
+
+    The outcome of each notebook request is appended to a journal (``download_journal.jsonl``, one JSON object
+    per line) in the download folder, and each downloaded or removed notebook is recorded in the manifest of the
+    download folder (see :mod:`.manifest`).
+    With a :class:`.StatusWriter`, the outcomes are also written to the ``downloadstatus`` table of the database,
+    together with the notebooks that are already present in the download folder.
+
     Notebooks that are already present in the download folder are skipped.
     During the ``refresh`` procedure all those notebooks that are already present in the download folder
-    but are no longer referenced in the KGTorrent database are deleted.
+    but are no longer referenced in the KGTorrent database are deleted, unless pruning is disabled
+    (e.g., when only a selection of the notebooks is downloaded).
     """
 
-    def __init__(self, nb_identifiers, nb_archive_path):
+    def __init__(self, nb_identifiers, nb_archive_path, max_attempts=3, notebook_url=NOTEBOOK_URL, budget=None,
+                 status_writer=None, prune=True):
         """
         The constructor of this class sets notebook identifiers and download folder provided by the arguments.
-        It also initializes the counters for successes and failures.
+        It also initializes the counters for successes and failures and the rate controller.
 
         Args:
             nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
             nb_archive_path: The path to the download folder.
+            max_attempts: The maximum number of requests sent for a single notebook. By default it is 3.
+            notebook_url: The URL template used by the ``HTTP`` strategy; it is formatted with the notebook
+                ``CurrentKernelVersionId``. By default notebooks are requested to Kaggle.
+            budget: An optional :class:`.DownloadBudget`; notebooks are downloaded in the order of
+                ``nb_identifiers`` until the budget is exhausted.
+            status_writer: An optional :class:`.StatusWriter`, started and closed by
+                :func:`.Downloader.download_notebooks`, writing the download status of the notebooks to the database.
+            prune: If True, the notebooks in the download folder that are not in ``nb_identifiers`` are deleted.
+                It must be False when ``nb_identifiers`` only holds a selection of the notebooks, so that the notebooks
+                outside the selection are kept. By default it is True.
         """
 
         # Notebook slugs and identifiers [UserName, CurrentUrlSlug, CurrentKernelVersionId]
@@ -53,6 +84,31 @@ class Downloader:
         # Counters for successes and failures
         self._n_successful_downloads = 0
         self._n_failed_downloads = 0
+        self._n_quarantined = 0
+
+        # Validation of the downloaded notebooks
+        self._validator = NotebookValidator(nb_archive_path)
+
+        # Adaptive pacing of the requests
+        self._rate_controller = RateController()
+        self._max_attempts = max_attempts
+        self._notebook_url = notebook_url
+
+        # Time and bytes limits of the download session
+        self._budget = budget
+
+        # Journal of the outcomes of the notebook requests
+        self._journal_path = Path(nb_archive_path) / JOURNAL_FILE_NAME
+        self._journal = None
+
+        # Manifest of the notebooks in the download folder
+        self._manifest = ArchiveManifest(nb_archive_path)
+
+        # Background writer of the download status
+        self._status_writer = status_writer
+
+        # Whether the notebooks that are no longer referenced are deleted
+        self._prune = prune
 
     def _check_destination_folder(self):
         """
@@ -61,7 +117,7 @@ class Downloader:
         It checks whether an identifier of the notebooks, which are present in the destination folder,
         is present in the notebook slugs and identifiers ``pandas.DataFrame``.
         If present it deletes the notebook identifiers from the notebook slugs and identifiers ``pandas.DataFrame``.
-        If not present it deletes the bondless notebook in the download folder.
+        If not present it deletes the bondless notebook in the download folder, unless pruning is disabled.
         """
 
         # Get notebook names
@@ -78,16 +134,23 @@ class Downloader:
                 if (split[0] in self._nb_identifiers['UserName'].values) & \
                         (split[1] in self._nb_identifiers['CurrentUrlSlug'].values):
                     print('Notebook ', name, ' already downloaded')
-                    self._nb_identifiers = self._nb_identifiers.loc[~(
-                            (self._nb_identifiers['UserName'] == split[0]) &
-                            (self._nb_identifiers['CurrentUrlSlug'] == split[1]))]
-                else:  # remove the notebook
+                    is_present = (self._nb_identifiers['UserName'] == split[0]) & \
+                                 (self._nb_identifiers['CurrentUrlSlug'] == split[1])
+                    if self._status_writer is not None:
+                        stat = path.stat()
+                        for kernel_version_id in self._nb_identifiers.loc[is_present, 'CurrentKernelVersionId']:
+                            self._status_writer.put(kernel_version_id, 'present', local_path=os.path.abspath(path),
+                                                    n_bytes=stat.st_size, fetched_at=stat.st_mtime)
+                    self._nb_identifiers = self._nb_identifiers.loc[~is_present]
+                elif self._prune:  # remove the notebook
                     print('Removing notebook', name, ' not found in db')
                     path.unlink()
+                    self._manifest.remove(path.name)
 
-            else:  # remove the notebook
+            elif self._prune:  # remove the notebook
                 print('Removing notebook', name, ' not valid')
                 path.unlink()
+                self._manifest.remove(path.name)
 
     def _http_download(self):
         """
@@ -95,43 +158,150 @@ class Downloader:
         """
         self._n_successful_downloads = 0
         self._n_failed_downloads = 0
+        self._n_quarantined = 0
 
         for row in tqdm(self._nb_identifiers.itertuples(), total=self._nb_identifiers.shape[0]):
 
+            if self._is_budget_exhausted():
+                break
+
             # Generate URL
-            url = 'https://www.kaggle.com/kernels/scriptcontent/{}/download'.format(row[3])
+            url = self._notebook_url.format(row[3])
 
             # Download notebook content to memory
-            # noinspection PyBroadException
-            try:
-                notebook = requests.get(url, allow_redirects=True, timeout=5)
-
-            except requests.exceptions.HTTPError:
-                logging.exception(f'HTTPError while requesting the notebook at: "{url}"')
-                self._n_failed_downloads += 1
-                continue
-
-            except Exception:
-                logging.exception(f'An error occurred while requesting the notebook at: "{url}"')
+            notebook, http_status, reason = self._request_notebook(url)
+            if reason is not None:
+                self._validator.quarantine_content(f'{row[1]}_{row[2]}.ipynb', notebook.content, reason)
+                self._n_quarantined += 1
+            if notebook is None or reason is not None:
                 self._n_failed_downloads += 1
+                self._record(row, 'failed', http_status=http_status, reason=reason)
                 continue
 
             # Write notebook in folder
             download_path = self._nb_archive_path + f'/{row[1]}_{row[2]}.ipynb'
             with open(Path(download_path), 'wb') as notebook_file:
                 notebook_file.write(notebook.content)
+            self._manifest.add(Path(download_path).name, row[3], len(notebook.content),
+                               hashlib.sha256(notebook.content).hexdigest())
 
             self._n_successful_downloads += 1
+            self._record(row, 'downloaded', http_status=http_status, n_bytes=len(notebook.content))
+            if self._budget is not None:
+                self._budget.consume(len(notebook.content))
             logging.info(f'Downloaded {row[1]}/{row[2]} (ID: {row[3]})')
 
-            # Wait a bit to avoid a potential IP banning
-            time.sleep(1)
+    def _request_notebook(self, url):
+        """
+        This method requests a notebook at the given URL, waiting for the rate controller before each attempt.
+        Throttled requests, server errors, network errors and successful responses whose content is not a valid
+        notebook are retried until the maximum number of attempts is reached;
+        client errors (e.g., ``404 Not Found``) are not retried.
+
+        Args:
+            url: The URL of the notebook.
+
+        Returns:
+            - notebook    - the successful ``requests.Response``, or ``None`` if the notebook could not be downloaded
+            - http_status - the status code of the last response, or ``None`` if no response was received
+            - reason      - ``None`` if the notebook is valid; otherwise, the reason why the content of
+              the last successful response (returned as ``notebook``) is not a valid notebook
+        """
+
+        http_status = None
+        invalid_notebook, reason = None, None
+        for attempt in range(1, self._max_attempts + 1):
+            self._rate_controller.wait()
+
+            # noinspection PyBroadException
+            try:
+                notebook = requests.get(url, allow_redirects=True, timeout=5)
+
+            except Exception:
+                self._rate_controller.register_network_error()
+                logging.exception(f'An error occurred while requesting the notebook at: "{url}" '
+                                  f'(attempt {attempt}/{self._max_attempts})')
+                continue
+
+            http_status = notebook.status_code
+            outcome = self._rate_controller.register_response(notebook)
+            if outcome == SUCCESS:
+                reason = validate_notebook(notebook.content)
+                if reason is None:
+                    return notebook, http_status, None
+
+                invalid_notebook = notebook
+                logging.error(f'Invalid notebook ({reason}) at: "{url}" (attempt {attempt}/{self._max_attempts})')
+                continue
+
+            logging.error(f'HTTP {notebook.status_code} ({outcome}) while requesting the notebook at: "{url}" '
+                          f'(attempt {attempt}/{self._max_attempts})')
+            if outcome not in RETRYABLE_OUTCOMES:
+                break
+
+        return invalid_notebook, http_status, reason
+
+    def _is_budget_exhausted(self):
+        """
+        This method checks whether the download session has to stop because its budget is exhausted.
+
+        Returns:
+            bool: True if the budget is exhausted, False otherwise.
+        """
+
+        if self._budget is None or not self._budget.is_exhausted():
+            return False
+
+        n_left = self._nb_identifiers.shape[0] - self._n_successful_downloads - self._n_failed_downloads
+        print(f'\nDownload budget exhausted ({self._budget}): {n_left} notebooks left for the next session.')
+        logging.info(f'Download budget exhausted ({self._budget}): {n_left} notebooks left.')
+        return True
+
+    def _record(self, row, status, http_status=None, n_bytes=0, reason=None):
+        """
+        This method appends the outcome of a notebook request to the download journal
+        and enqueues it to the status writer, if any.
+
+        Args:
+            row: The notebook slugs and identifiers row (index, UserName, CurrentUrlSlug, CurrentKernelVersionId).
+            status: The outcome of the request (``downloaded`` or ``failed``).
+            http_status: The HTTP status code of the last response, if any.
+            n_bytes: The number of bytes written to the download folder.
+            reason: The reason why the downloaded notebook was quarantined, if any.
+        """
+
+        fetched_at = time.time()
+        if self._status_writer is not None:
+            local_path = None
+            if status == 'downloaded':
+                local_path = os.path.abspath(Path(self._nb_archive_path) / f'{row[1]}_{row[2]}.ipynb')
+            self._status_writer.put(row[3], status, local_path=local_path, n_bytes=n_bytes,
+                                    http_status=http_status, reason=reason, fetched_at=fetched_at)
+
+        if self._journal is None:
+            return
+
+        entry = {
+            'CurrentKernelVersionId': int(row[3]),
+            'UserName': row[1],
+            'CurrentUrlSlug': row[2],
+            'Status': status,
+            'HttpStatus': http_status,
+            'Bytes': n_bytes,
+            'Reason': reason,
+            'FetchedAt': fetched_at,
+        }
+        self._journal.write(json.dumps(entry) + '\n')
+        self._journal.flush()
 
     def _api_download(self):
         """
         This method implements the API download strategy.
         """
 
+        # The Kaggle API authenticates on import in some versions, so it is imported only when needed
+        from kaggle.api.kaggle_api_extended import KaggleApi
+
         # Initialization and authentication
         # It's need kaggle.json token in ~/.kaggle
         api = KaggleApi()
@@ -139,9 +309,15 @@ class Downloader:
 
         self._n_successful_downloads = 0
         self._n_failed_downloads = 0
+        self._n_quarantined = 0
 
         for row in tqdm(self._nb_identifiers.itertuples(), total=self._nb_identifiers.shape[0]):
 
+            if self._is_budget_exhausted():
+                break
+
+            self._rate_controller.wait()
+
             # noinspection PyBroadException
             try:
                 api.kernels_pull(f'{row[1]}/{row[2]}', path=Path(self._nb_archive_path))
@@ -150,26 +326,46 @@ class Downloader:
                 # Rename downloaded notebook to username/slug
                 nb = Path(self._nb_archive_path + f'/{row[2]}.ipynb')
                 nb.rename(self._nb_archive_path + f'/{row[1]}_{row[2]}.ipynb')
+                nb = nb.with_name(f'{row[1]}_{row[2]}.ipynb')
 
             except Exception:
+                self._rate_controller.register_network_error()
                 logging.exception(f'An error occurred while requesting the notebook {row[1]}/{row[2]}')
                 self._n_failed_downloads += 1
+                self._record(row, 'failed')
+                continue
+
+            self._rate_controller.register_success()
+
+            # Notebooks pulled by the Kaggle API are written directly to the download folder
+            reason = validate_notebook_file(nb)
+            if reason is not None:
+                self._validator.quarantine(nb, reason)
+                self._n_quarantined += 1
+                self._n_failed_downloads += 1
+                self._record(row, 'failed', reason=reason)
                 continue
 
             self._n_successful_downloads += 1
+            n_bytes = nb.stat().st_size
+            self._manifest.add(nb.name, row[3], n_bytes, sha256_file(nb))
+            self._record(row, 'downloaded', n_bytes=n_bytes)
+            if self._budget is not None:
+                self._budget.consume(n_bytes)
             logging.info(f'Downloaded {row[1]}/{row[2]} (ID: {row[3]})')
 
-            # Wait a bit to avoid a potential IP banning
-            time.sleep(1)
-
     def download_notebooks(self, strategy='HTTP'):
         """
         This method executes the download procedure using the provided strategy after checking the destination folder.
+        The status writer, if any, is started before the check and closed once all the results are written.
 
         Args:
             strategy:  The download strategy (``HTTP`` or ``API``). By default it is ``HTTP``.
         """
 
+        if self._status_writer is not None:
+            self._status_writer.start()
+
         self._check_destination_folder()
 
         # Number of notebooks to download
@@ -179,29 +375,61 @@ class Downloader:
         # Wait a bit to ensure the print before tqdm bar
         time.sleep(1)
 
-        # HTTP STRATEGY
-        if strategy is 'HTTP':
-            self._http_download()
+        if self._budget is not None:
+            self._budget.start()
+
+        with stage('download'), open(self._journal_path, 'a') as self._journal:
+
+            # HTTP STRATEGY
+            if strategy == 'HTTP':
+                self._http_download()
+
+            # API STRATEGY
+            if strategy == 'API':
+                self._api_download()
 
-        # API STRATEGY
-        if strategy is 'API':
-            self._api_download()
+        self._journal = None
+
+        if self._status_writer is not None:
+            self._status_writer.close()
 
         # Print download session summary
         # Print summary to stdout
         print("Total number of notebooks to download was:", total_rows)
         print("\tNumber of successful downloads:", self._n_successful_downloads)
         print("\tNumber of failed downloads:", self._n_failed_downloads)
+        print("\t\t- of which quarantined as invalid notebooks:", self._n_quarantined)
+
+        print("\tRate controller metrics:")
+        rate_metrics = self._rate_controller.get_metrics()
+        for metric, value in rate_metrics.items():
+            print(f"\t\t- {metric}: {value}")
 
         # Print summary to log file
         logging.info('DOWNLOAD COMPLETED.\n'
                      f'Total attempts: {total_rows}:\n'
                      f'\t- {self._n_successful_downloads} successful;\n'
-                     f'\t- {self._n_failed_downloads} failed.')
+                     f'\t- {self._n_failed_downloads} failed ({self._n_quarantined} quarantined).\n'
+                     f'Rate controller metrics: {rate_metrics}')
+
+    def get_rate_metrics(self):
+        """
+        This method returns the metrics collected by the rate controller during the last download session.
+
+        Returns:
+            metrics: A dictionary whose keys are the metric names and whose values are the metric values.
+        """
+        return self._rate_controller.get_metrics()
 
 
 if __name__ == '__main__':
 
+    # Imports for testing
+    import KGTorrent.config as config
+    from KGTorrent.db_communication_handler import DbCommunicationHandler
+
+    config.setup_logging()
+
     print(f"## Connecting to {config.db_name} db on port {config.db_port} as user {config.db_username}")
     db_engine = DbCommunicationHandler(config.db_username,
                                        config.db_password,
@@ -25,3 +25,15 @@ class DatabaseExistsError(Error):
 
     def __init__(self, message):
         self.message = message
+
+
+class SchemaValidationError(Error):
+    """Exception raised when a Meta Kaggle table does not match the schema of the KGTorrent database.
+
+    Attributes:
+        message (str): short message containing the explanation of the error.
+    """
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
@@ -0,0 +1,491 @@
+"""
+This module defines the classes that export a KGTorrent release: the dump of the database and the archive of
+the notebook dataset, packaged as ``.tar.bz2`` files, together with a manifest of their checksums.
+
+All the steps run in parallel:
+
+- each table is dumped by its own thread, which streams its rows from the database to an SQL file
+  (and, optionally, to a Parquet file);
+- archives are compressed with :class:`.ParallelBz2Writer`, which splits the stream into blocks and compresses
+  them on a pool of threads; the result is a sequence of bzip2 streams that ``bzip2``, ``tar`` and the ``bz2``
+  module decompress as a single file;
+- the checksums of the released files are computed by a pool of threads (see :func:`.manifest.hash_files`).
+
+Parquet files require the optional ``pyarrow`` package.
+"""
+
+import bz2
+import datetime
+import decimal
+import importlib.util
+import math
+import os
+import tarfile
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import types
+
+from KGTorrent.archive import list_notebooks
+from KGTorrent.manifest import ArchiveManifest, hash_files
+
+# Names of the released files; the label of a release is its Meta Kaggle version (e.g., 10-2020)
+DUMP_FILE_NAME = 'KGTorrent_dump_{label}.sql'
+DATASET_FILE_NAME = 'KGT_dataset.tar.bz2'
+PARQUET_FOLDER_NAME = 'KGTorrent_parquet_{label}'
+MANIFEST_FILE_NAME = 'MANIFEST.sha256'
+
+# Size of the blocks compressed independently by ParallelBz2Writer
+BZ2_BLOCK_SIZE = 8 * 2 ** 20
+
+# Number of rows in each INSERT statement of the SQL dump
+INSERT_BATCH_SIZE = 1000
+
+# Statements wrapping the SQL dump, so that tables can be loaded in any order
+DUMP_HEADER = {
+    'mysql': ['SET NAMES utf8mb4', 'SET FOREIGN_KEY_CHECKS=0'],
+    'sqlite': ['PRAGMA foreign_keys=OFF', 'BEGIN TRANSACTION'],
+}
+DUMP_FOOTER = {
+    'mysql': ['SET FOREIGN_KEY_CHECKS=1'],
+    'sqlite': ['COMMIT'],
+}
+
+
+def sql_literal(value, backend):
+    """
+    This function renders a value read from the database as an SQL literal.
+
+    Args:
+        value: The value.
+        backend: The storage backend whose SQL dialect is used (``mysql`` or ``sqlite``).
+
+    Returns:
+        literal: The SQL literal.
+    """
+
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return 'NULL' if math.isnan(value) or math.isinf(value) else repr(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        # Same format SQLAlchemy uses to store dates in SQLite; MySQL accepts it as well
+        return value.strftime("'%Y-%m-%d %H:%M:%S.%f'")
+    if isinstance(value, datetime.date):
+        return f"'{value.isoformat()}'"
+    if isinstance(value, bytes):
+        return f"X'{value.hex()}'"
+
+    value = str(value)
+    if backend == 'mysql':
+        # MySQL also treats backslashes as escape characters within strings
+        value = value.replace('\\', '\\\\').replace('\0', '\\0')
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _get_arrow_schema(table):
+    """
+    This function maps the columns of a database table to a Parquet schema.
+
+    Args:
+        table: The SQLAlchemy table.
+
+    Returns:
+        schema: The ``pyarrow.Schema`` of the table.
+    """
+
+    import pyarrow
+
+    fields = []
+    for column in table.columns:
+        if isinstance(column.type, types.Boolean):
+            arrow_type = pyarrow.bool_()
+        elif isinstance(column.type, types.Integer):
+            arrow_type = pyarrow.int64()
+        elif isinstance(column.type, (types.Float, types.Numeric)):
+            arrow_type = pyarrow.float64()
+        elif isinstance(column.type, types.DateTime):
+            arrow_type = pyarrow.timestamp('us')
+        elif isinstance(column.type, types.Date):
+            arrow_type = pyarrow.date32()
+        else:
+            arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(column.name, arrow_type))
+    return pyarrow.schema(fields)
+
+
+class ParallelBz2Writer:
+    """
+    The ``ParallelBz2Writer`` class is a writable file object that compresses its content with bzip2
+    on a pool of threads (the ``bz2`` module releases the GIL while compressing).
+    The content is split into blocks of ``block_size`` bytes, each compressed into its own bzip2 stream;
+    streams are written in order, and at most two blocks per thread are kept in memory.
+    """
+
+    def __init__(self, path, n_workers=None, block_size=BZ2_BLOCK_SIZE, compresslevel=9):
+        """
+        The constructor of this class opens the compressed file and starts the pool of threads.
+
+        Args:
+            path: The path to the compressed file.
+            n_workers: The number of compressing threads. By default it is the number of CPUs.
+            block_size: The size of the blocks compressed independently. By default it is ``BZ2_BLOCK_SIZE``.
+            compresslevel: The bzip2 compression level, from 1 to 9. By default it is 9, as for ``bzip2``.
+        """
+
+        self._n_workers = n_workers or os.cpu_count() or 1
+        self._block_size = block_size
+        self._compresslevel = compresslevel
+        self._file = open(path, 'wb')
+        self._pool = ThreadPoolExecutor(max_workers=self._n_workers, thread_name_prefix='Bz2Writer')
+        self._pending = deque()
+        self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _submit(self, block):
+        """
+        This method hands a block to the pool and writes the compressed blocks that are ready, in order.
+
+        Args:
+            block: The block to be compressed.
+        """
+
+        self._pending.append(self._pool.submit(bz2.compress, block, self._compresslevel))
+        while len(self._pending) > 2 * self._n_workers or (len(self._pending) != 0 and self._pending[0].done()):
+            self._file.write(self._pending.popleft().result())
+
+    def write(self, data):
+        """
+        This method writes data to the compressed file.
+
+        Args:
+            data: The bytes to be written.
+
+        Returns:
+            n_bytes: The number of bytes written.
+        """
+
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[:self._block_size])
+            del self._buffer[:self._block_size]
+            self._submit(block)
+        return len(data)
+
+    def close(self):
+        """
+        This method compresses the remaining data, waits for all the blocks to be written and closes the file.
+        """
+
+        if self._file.closed:
+            return
+        if len(self._buffer) != 0:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while len(self._pending) != 0:
+            self._file.write(self._pending.popleft().result())
+        self._pool.shutdown()
+        self._file.close()
+
+
+class _ConcatenatedReader:
+    """
+    The ``_ConcatenatedReader`` class is a readable file object returning the content of a list of files,
+    one after the other, so that they can be added to a tar archive as a single member without being copied.
+    """
+
+    def __init__(self, paths):
+        """
+        The constructor of this class sets the files to be read.
+
+        Args:
+            paths: The list of the paths to the files, in order.
+        """
+
+        self._paths = deque(paths)
+        self._file = None
+
+    def read(self, size=-1):
+        """
+        This method reads data from the files, moving to the next file when the current one is exhausted.
+
+        Args:
+            size: The maximum number of bytes to be read; if negative, all the remaining data is read.
+
+        Returns:
+            data: The bytes read; they are fewer than ``size`` only at the end of the last file.
+        """
+
+        chunks = []
+        while size != 0 and (self._file is not None or len(self._paths) != 0):
+            if self._file is None:
+                self._file = open(self._paths.popleft(), 'rb')
+            chunk = self._file.read(size)
+            if len(chunk) == 0 or (0 < size != len(chunk)):
+                self._file.close()
+                self._file = None
+            chunks.append(chunk)
+            size = size - len(chunk) if size > 0 else size
+        return b''.join(chunks)
+
+
+def _get_release_time(label):
+    """
+    This function returns the modification time of the dump in the archive of a release, so that exporting
+    the same database twice produces the same archive: it is the first day of the Meta Kaggle version of
+    the label (e.g., ``10-2020``), or the epoch when the label is not a month and a year.
+
+    Args:
+        label: The label of the release.
+
+    Returns:
+        mtime: The modification time, as a POSIX timestamp.
+    """
+
+    try:
+        release_date = datetime.datetime.strptime(label, '%m-%Y')
+    except ValueError:
+        return 0
+    return int(release_date.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def _normalize_tarinfo(tarinfo):
+    """
+    This function removes the owner of a member of a tar archive, so that archives do not depend on
+    the user that exported them.
+
+    Args:
+        tarinfo: The ``tarfile.TarInfo`` of the member.
+
+    Returns:
+        tarinfo: The normalized ``tarfile.TarInfo``.
+    """
+
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ''
+    return tarinfo
+
+
+class Exporter:
+    """
+    The ``Exporter`` class exports the KGTorrent database and notebook dataset into the files of a release.
+    """
+
+    def __init__(self, db_engine, output_path, label, n_workers=None):
+        """
+        The constructor of this class sets the database, the output folder and the parallelism of the export.
+
+        Args:
+            db_engine: The :class:`.DbCommunicationHandler` of the KGTorrent database.
+            output_path: The path to the folder where the released files are written.
+            label: The label of the release, used in the file names (e.g., ``10-2020``).
+            n_workers: The number of threads dumping tables, compressing and hashing. By default it is the number
+                of CPUs.
+        """
+
+        self._db_engine = db_engine
+        self._output_path = Path(output_path)
+        self._label = label
+        self._n_workers = n_workers or os.cpu_count() or 1
+
+        self._output_path.mkdir(parents=True, exist_ok=True)
+
+    def _dump_table(self, table, sql_path, parquet_path=None):
+        """
+        This method streams the rows of a table to an SQL file and, optionally, to a Parquet file.
+
+        Args:
+            table: The SQLAlchemy table.
+            sql_path: The path to the SQL file.
+            parquet_path: The optional path to the Parquet file.
+
+        Returns:
+            n_rows: The number of dumped rows.
+        """
+
+        backend = self._db_engine.get_backend()
+        column_names = ', '.join(column.name for column in table.columns)
+
+        parquet_writer = None
+        if parquet_path is not None:
+            import pyarrow
+            import pyarrow.parquet
+
+            schema = _get_arrow_schema(table)
+            parquet_writer = pyarrow.parquet.ParquetWriter(str(parquet_path), schema)
+
+        n_rows = 0
+        with open(sql_path, 'w', encoding='utf-8') as sql_file:
+            sql_file.write(f'\n-- Table {table.name}\n\n')
+            sql_file.write(f'DROP TABLE IF EXISTS {table.name};\n')
+            for statement in self._db_engine.get_create_statements(table):
+                sql_file.write(f'{statement};\n')
+            sql_file.write('\n')
+
+            for chunk in self._db_engine.iter_table_rows(table):
+                for start in range(0, len(chunk), INSERT_BATCH_SIZE):
+                    values = ',\n'.join('(' + ', '.join(sql_literal(value, backend) for value in row) + ')'
+                                        for row in chunk[start:start + INSERT_BATCH_SIZE])
+                    sql_file.write(f'INSERT INTO {table.name} ({column_names}) VALUES\n{values};\n')
+
+                if parquet_writer is not None:
+                    columns = list(zip(*chunk))
+                    parquet_writer.write_table(pyarrow.Table.from_arrays(
+                        [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+                        schema=schema))
+                n_rows += len(chunk)
+
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+        print(f'- {table.name}: {n_rows} rows dumped')
+        return n_rows
+
+    def export_database(self, parquet=False):
+        """
+        This method dumps the tables of the database in parallel and packages the dump
+        into the ``KGTorrent_dump_<label>.sql.tar.bz2`` file.
+
+        Args:
+            parquet: If True, each table is also written to a Parquet file in the
+                ``KGTorrent_parquet_<label>`` folder. By default it is False.
+
+        Returns:
+            paths: The list of the paths to the released files.
+        """
+
+        backend = self._db_engine.get_backend()
+        tables = self._db_engine.get_table_schemas()
+        dump_name = DUMP_FILE_NAME.format(label=self._label)
+        dump_path = self._output_path / f'{dump_name}.tar.bz2'
+        parquet_folder = self._output_path / PARQUET_FOLDER_NAME.format(label=self._label)
+        if parquet:
+            if importlib.util.find_spec('pyarrow') is None:
+                raise ImportError('The Parquet export requires the pyarrow package (pip install pyarrow).')
+            parquet_folder.mkdir(exist_ok=True)
+
+        print(f'## Dumping {len(tables)} tables with {self._n_workers} threads...')
+        with tempfile.TemporaryDirectory(dir=self._output_path) as staging_folder:
+            staging_folder = Path(staging_folder)
+
+            with ThreadPoolExecutor(max_workers=self._n_workers, thread_name_prefix='Exporter') as pool:
+                futures = [pool.submit(self._dump_table, table, staging_folder / f'{table_name}.sql',
+                                       parquet_folder / f'{table_name}.parquet' if parquet else None)
+                           for table_name, table in tables.items()]
+                n_rows = sum(future.result() for future in futures)
+
+            header_path = staging_folder / 'header.sql'
+            header_path.write_text(''.join(f'{statement};\n' for statement in DUMP_HEADER[backend]), encoding='utf-8')
+            footer_path = staging_folder / 'footer.sql'
+            footer_path.write_text(''.join(f'\n{statement};\n' for statement in DUMP_FOOTER[backend]),
+                                   encoding='utf-8')
+
+            # The table dumps are concatenated into a single SQL file, in alphabetical order
+            part_paths = [header_path] + [staging_folder / f'{table_name}.sql' for table_name in tables] + [footer_path]
+            tarinfo = _normalize_tarinfo(tarfile.TarInfo(dump_name))
+            tarinfo.size = sum(path.stat().st_size for path in part_paths)
+            tarinfo.mtime = _get_release_time(self._label)
+
+            print(f'## Compressing the dump ({tarinfo.size / 2 ** 20:.2f} MB)...')
+            with ParallelBz2Writer(dump_path, n_workers=self._n_workers) as compressed_file:
+                with tarfile.open(fileobj=compressed_file, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+                    tar.addfile(tarinfo, _ConcatenatedReader(part_paths))
+
+        print(f'## {n_rows} rows dumped to {dump_path}')
+        paths = [dump_path]
+        if parquet:
+            paths += [parquet_folder / f'{table_name}.parquet' for table_name in tables]
+        return paths
+
+    def export_dataset(self, nb_archive_path):
+        """
+        This method packages the notebooks of the notebook archive into the ``KGT_dataset.tar.bz2`` file.
+        Only the notebook files and the manifest of the archive are packaged (subfolders, such as shards
+        or quarantined notebooks, are not), so that extracted copies can be checked with the ``verify`` command.
+
+        Args:
+            nb_archive_path: The path to the notebook archive folder.
+
+        Returns:
+            paths: The list of the paths to the released files.
+        """
+
+        dataset_path = self._output_path / DATASET_FILE_NAME
+        notebook_paths = list_notebooks(nb_archive_path)
+
+        # Reading the manifest compacts it
+        manifest = ArchiveManifest(nb_archive_path)
+        manifest.read()
+
+        print(f'## Packaging {len(notebook_paths)} notebooks with {self._n_workers} threads...')
+        with ParallelBz2Writer(dataset_path, n_workers=self._n_workers) as compressed_file:
+            with tarfile.open(fileobj=compressed_file, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+                for path in notebook_paths:
+                    tar.add(path, arcname=path.name, recursive=False, filter=_normalize_tarinfo)
+                if manifest.get_path().exists():
+                    tar.add(manifest.get_path(), arcname=manifest.get_path().name, filter=_normalize_tarinfo)
+
+        print(f'## Notebooks packaged to {dataset_path}')
+        return [dataset_path]
+
+    def write_manifest(self, paths):
+        """
+        This method computes the checksums of the released files in parallel and writes them
+        to the ``MANIFEST.sha256`` file, in the format of the ``sha256sum`` command
+        (releases can be checked with ``sha256sum -c MANIFEST.sha256``).
+
+        Args:
+            paths: The list of the paths to the released files.
+
+        Returns:
+            manifest_path: The path to the manifest.
+        """
+
+        manifest_path = self._output_path / MANIFEST_FILE_NAME
+        relative_paths = sorted(Path(path).relative_to(self._output_path).as_posix() for path in paths)
+
+        print(f'## Computing the checksums of {len(relative_paths)} files...')
+        checksums = hash_files([self._output_path / path for path in relative_paths], n_workers=self._n_workers)
+
+        with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+            for checksum, path in zip(checksums, relative_paths):
+                manifest_file.write(f'{checksum}  {path}\n')
+
+        print(f'## Manifest written to {manifest_path}')
+        return manifest_path
+
+    def export(self, nb_archive_path=None, parquet=False):
+        """
+        This method exports the database and, optionally, the notebook dataset, and writes the manifest.
+
+        Args:
+            nb_archive_path: The path to the notebook archive folder; if None, the dataset is not exported.
+            parquet: If True, the tables are also exported to Parquet files. By default it is False.
+
+        Returns:
+            manifest_path: The path to the manifest.
+        """
+
+        start = time.perf_counter()
+
+        paths = self.export_database(parquet=parquet)
+        if nb_archive_path is not None:
+            paths += self.export_dataset(nb_archive_path)
+        manifest_path = self.write_manifest(paths)
+
+        print(f'## Export completed in {time.perf_counter() - start:.2f}s')
+        return manifest_path
@@ -1,59 +1,391 @@
 #!/usr/bin/env python3
 
+import time
+
+# Reference time used to measure the startup time of KGTorrent
+_start_time = time.perf_counter()
+
 import argparse
 import sys
 from pathlib import Path
 
 import KGTorrent.config as config
-from KGTorrent.data_loader import DataLoader
-from KGTorrent.db_communication_handler import DbCommunicationHandler
-from KGTorrent.downloader import Downloader
-from KGTorrent.mk_preprocessor import MkPreprocessor
 
+# Maximum time (in seconds) that lightweight commands are allowed to spend before starting their actual work
+STARTUP_TIME_BUDGET = 0.5
 
-def main():
-    """Entry-point function for KGTorrent.
-    It orchestrates function/method calls to build and populate the KGTorrent database and dataset."""
+# Maximum number of file names listed for each problem found by the `verify` command
+MAX_LISTED_FILES = 20
 
-    # Create the parser
-    my_parser = argparse.ArgumentParser(
-        prog='KGTorrent',
-        usage='%(prog)s <init|refresh> [options]',
-        description='Initialize or refresh KGTorrent'
-    )
 
-    # Add the arguments
-    my_parser.add_argument('command',
-                           type=str,
-                           choices=['init', 'refresh'],
-                           help='Use the `init` command to create KGTorrent from scratch or '
-                                'the `refresh` command to update KGTorrent '
-                                'according to the last version of Meta Kaggle.')
-
-    my_parser.add_argument('--strategy',
-                           type=str,
-                           choices=['API', 'HTTP'],
-                           default='HTTP',
-                           help="Use the `API` strategy to download Kaggle kernels via the Kaggle's official API; "
-                                "Use the `HTTP` strategy to download full kernels via HTTP requests."
-                                "N.B.: Notebooks downloaded via the Kaggle API miss code cell outputs.")
+def _check_startup_time(command):
+    """
+    This function measures the time elapsed since KGTorrent was started and warns the user
+    when it exceeds :data:`STARTUP_TIME_BUDGET`.
+    Lightweight commands do not import heavy dependencies (pandas, SQLAlchemy, the Kaggle API), so their startup
+    should stay well within the budget.
 
-    # Execute the parse_args() method
-    args = my_parser.parse_args()
+    Args:
+        command: The name of the command that is about to be executed.
+
+    Returns:
+        elapsed: The startup time in seconds.
+    """
+
+    elapsed = time.perf_counter() - _start_time
+    if elapsed > STARTUP_TIME_BUDGET:
+        print(f'Warning: startup of the `{command}` command took {elapsed:.3f}s '
+              f'(budget: {STARTUP_TIME_BUDGET}s).', file=sys.stderr)
+    return elapsed
+
+
+def _shard_argument(value):
+    """
+    This function converts the value of the ``--shard`` option into a ``(index, count)`` tuple.
+
+    Args:
+        value: The value of the option, in the ``i/N`` format.
+
+    Returns:
+        shard: A ``(index, count)`` tuple.
+    """
+
+    from KGTorrent.shards import parse_shard
+
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _duration_argument(value):
+    """
+    This function converts the value of the ``--max-duration`` option into a number of seconds.
+
+    Args:
+        value: The value of the option (e.g., ``90m`` or ``6h``).
+
+    Returns:
+        seconds: The duration in seconds.
+    """
+
+    from KGTorrent.scheduler import parse_duration
+
+    try:
+        return parse_duration(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _size_argument(value):
+    """
+    This function converts the value of the ``--max-bytes`` option into a number of bytes.
+
+    Args:
+        value: The value of the option (e.g., ``500M`` or ``20G``).
+
+    Returns:
+        n_bytes: The size in bytes.
+    """
+
+    from KGTorrent.scheduler import parse_size
+
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _fraction_argument(value):
+    """
+    This function converts the value of the ``--sample`` option into a fraction.
+
+    Args:
+        value: The value of the option (e.g., ``0.01``).
+
+    Returns:
+        fraction: The fraction, between 0 (excluded) and 1.
+    """
+
+    try:
+        fraction = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid fraction: {value}')
+    if not 0 < fraction <= 1:
+        raise argparse.ArgumentTypeError(f'the fraction must be between 0 and 1, got {value}')
+    return fraction
+
+
+def _date_argument(value):
+    """
+    This function checks the value of a date option.
+
+    Args:
+        value: The value of the option (e.g., ``2020-01-31``).
+
+    Returns:
+        date: The date, as given.
+    """
+
+    import datetime
+
+    try:
+        datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid date: {value}')
+    return value
+
+
+def _add_selection_arguments(parser):
+    """
+    This function adds the options filtering the selected notebooks to a command parser.
+
+    Args:
+        parser: The parser of the command.
+    """
+
+    parser.add_argument('--language',
+                        type=str,
+                        action='append',
+                        default=None,
+                        help='Select the notebooks written in the given language (e.g., "IPython Notebook HTML"); '
+                             'repeat the option to select several languages. By default the languages in the '
+                             'configuration are selected.')
+    parser.add_argument('--medal',
+                        type=str,
+                        action='append',
+                        choices=['gold', 'silver', 'bronze'],
+                        default=None,
+                        help='Select the notebooks awarded the given medal; repeat the option to select several '
+                             'medals.')
+    parser.add_argument('--min-votes',
+                        type=int,
+                        default=None,
+                        help='Select the notebooks with at least the given number of votes.')
+    parser.add_argument('--max-votes',
+                        type=int,
+                        default=None,
+                        help='Select the notebooks with at most the given number of votes.')
+    parser.add_argument('--since',
+                        type=_date_argument,
+                        default=None,
+                        metavar='DATE',
+                        help='Select the notebooks whose current version was created on or after the given date '
+                             '(e.g., 2020-01-31).')
+    parser.add_argument('--until',
+                        type=_date_argument,
+                        default=None,
+                        metavar='DATE',
+                        help='Select the notebooks whose current version was created before the given date.')
+    parser.add_argument('--competition',
+                        type=int,
+                        action='append',
+                        default=None,
+                        metavar='ID',
+                        help='Select the notebooks using the data of the competition with the given Id; '
+                             'repeat the option to select several competitions.')
+    parser.add_argument('--dataset',
+                        type=int,
+                        action='append',
+                        default=None,
+                        metavar='ID',
+                        help='Select the notebooks using a version of the dataset with the given Id; '
+                             'repeat the option to select several datasets.')
+
+
+def _has_selection_filters(args):
+    """
+    This function tells whether the notebooks requested on the command line are restricted by a selection option.
+
+    Args:
+        args: The parsed command line arguments.
+
+    Returns:
+        bool: True if any selection option is given, False otherwise.
+    """
+
+    filters = (args.language, args.medal, args.min_votes, args.max_votes, args.since, args.until, args.competition,
+               args.dataset, getattr(args, 'limit', None))
+    return any(value is not None for value in filters)
+
+
+def _get_selection(args):
+    """
+    This function creates the selection of notebooks requested on the command line.
+
+    Args:
+        args: The parsed command line arguments.
+
+    Returns:
+        selection: The :class:`.Selection`.
+    """
+
+    from KGTorrent.selection import Selection
+
+    return Selection(languages=args.language if args.language is not None else config.nb_conf['languages'],
+                     medals=args.medal,
+                     min_votes=args.min_votes,
+                     max_votes=args.max_votes,
+                     created_from=args.since,
+                     created_until=args.until,
+                     competition_ids=args.competition,
+                     dataset_ids=args.dataset,
+                     priority=args.priority,
+                     priority_sql=getattr(args, 'priority_sql', None),
+                     limit=getattr(args, 'limit', None))
+
+
+def _add_scheduling_arguments(parser):
+    """
+    This function adds the options controlling the order and the budget of the notebook download to a command parser.
+
+    Args:
+        parser: The parser of the command.
+    """
+
+    from KGTorrent.scheduler import PRIORITIES
+
+    parser.add_argument('--priority',
+                        type=str,
+                        choices=list(PRIORITIES),
+                        default=None,
+                        help='Download the most valuable notebooks first: '
+                             '`medal` (gold to bronze, then by votes), `votes` or `recency`.')
+    parser.add_argument('--priority-sql',
+                        type=str,
+                        default=None,
+                        metavar='EXPRESSION',
+                        help='A custom SQL ORDER BY expression over the kernels, users, kernelversions and '
+                             'kernellanguages tables (e.g., "kernels.TotalViews DESC"). '
+                             'It takes precedence over --priority.')
+    parser.add_argument('--max-duration',
+                        type=_duration_argument,
+                        default=None,
+                        metavar='DURATION',
+                        help='Stop downloading after the given time (e.g., 3600, 90m, 6h).')
+    parser.add_argument('--max-bytes',
+                        type=_size_argument,
+                        default=None,
+                        metavar='SIZE',
+                        help='Stop downloading after the given amount of data (e.g., 500M, 20G).')
+
+
+def _get_budget(args):
+    """
+    This function creates the download budget requested on the command line.
+
+    Args:
+        args: The parsed command line arguments.
+
+    Returns:
+        budget: The :class:`.DownloadBudget`, or ``None`` if no limit was requested.
+    """
+
+    from KGTorrent.scheduler import DownloadBudget
+
+    if args.max_duration is None and args.max_bytes is None:
+        return None
+    print(f'# Download budget: {args.max_duration} seconds, {args.max_bytes} bytes')
+    return DownloadBudget(max_duration=args.max_duration, max_bytes=args.max_bytes)
+
+
+def _add_status_arguments(parser):
+    """
+    This function adds the options controlling the writeback of the download status to a command parser.
+
+    Args:
+        parser: The parser of the command.
+    """
+
+    from KGTorrent.status_writer import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+
+    parser.add_argument('--status-batch-size',
+                        type=int,
+                        default=DEFAULT_BATCH_SIZE,
+                        metavar='N',
+                        help='Write the download status to the database every N notebooks. '
+                             f'By default it is {DEFAULT_BATCH_SIZE}.')
+    parser.add_argument('--status-interval',
+                        type=float,
+                        default=DEFAULT_FLUSH_INTERVAL,
+                        metavar='SECONDS',
+                        help='Write the download status to the database at least every given number of seconds. '
+                             f'By default it is {DEFAULT_FLUSH_INTERVAL:g}.')
+
+
+def _get_status_writer(args, db_engine):
+    """
+    This function creates the writer of the download status requested on the command line.
+
+    Args:
+        args: The parsed command line arguments.
+        db_engine: The :class:`.DbCommunicationHandler` of the KGTorrent database.
+
+    Returns:
+        status_writer: The :class:`.StatusWriter`.
+    """
+
+    from KGTorrent.status_writer import StatusWriter
+
+    return StatusWriter(db_engine, batch_size=args.status_batch_size, flush_interval=args.status_interval)
+
+
+def connect_db(pool_size=None):
+    """
+    This function creates the :class:`.DbCommunicationHandler` for the configured storage backend.
+
+    Args:
+        pool_size: The number of connections kept open to the MySQL server, e.g., one for each thread querying
+            the database. By default it is the SQLAlchemy default (5).
+
+    Returns:
+        db_engine: The :class:`.DbCommunicationHandler` connected to the KGTorrent database.
+    """
+
+    from KGTorrent.db_communication_handler import DbCommunicationHandler
+
+    if config.db_backend == 'sqlite':
+        print(f"## Opening the {config.db_name} SQLite database")
+        return DbCommunicationHandler(None, None, None, None, config.db_name, backend='sqlite')
+
+    print(f"## Connecting to {config.db_name} db on port {config.db_port} as user {config.db_username}")
+    return DbCommunicationHandler(config.db_username,
+                                  config.db_password,
+                                  config.db_host,
+                                  config.db_port,
+                                  config.db_name,
+                                  pool_size=pool_size)
+
+
+def build(args):
+    """
+    This function handles the ``init`` and ``refresh`` commands.
+    It orchestrates function/method calls to build and populate the KGTorrent database and dataset.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    # Heavy dependencies are only needed to build KGTorrent
+    from concurrent.futures import ThreadPoolExecutor
+
+    from KGTorrent.catalog import CatalogBuilder
+    from KGTorrent.dataframe_engine import get_engine
+    from KGTorrent.data_loader import DataLoader
+    from KGTorrent.downloader import Downloader
+    from KGTorrent.mk_preprocessor import MkPreprocessor, NB_IDENTIFIER_TABLES
+    from KGTorrent.profiling import stage
+    from KGTorrent.table_writer import TableWriter
 
     command = args.command
+    config.setup_logging()
 
     print("************************")
     print("*** KGTORRENT STARTED***")
     print("************************")
 
     # Create db engine
-    print(f"## Connecting to {config.db_name} db on port {config.db_port} as user {config.db_username}")
-    db_engine = DbCommunicationHandler(config.db_username,
-                                       config.db_password,
-                                       config.db_host,
-                                       config.db_port,
-                                       config.db_name)
+    db_engine = connect_db()
 
     print("## Connection with database established.")
 
@@ -62,12 +394,20 @@ def main():
 
     # Check db emptiness
     if db_engine.db_exists():
-        if command == 'init':
+        if args.temporal and command == 'refresh':
+            from KGTorrent.temporal import TemporalStore
+
+            # Temporal databases are not reinitialized: the new version is added as a snapshot
+            proceed = TemporalStore(db_engine).is_temporal()
+            if not proceed:
+                print(f'Database {config.db_name} is not a temporal database.', file=sys.stderr)
+                print('Please, provide the name of a temporal database or of a new database.', file=sys.stderr)
+        elif command == 'init':
             print(f'Database {config.db_name} already exists. ', file=sys.stderr)
             print(f'Please, provide a name that is not already in use for the KGTorrent database.',
                   file=sys.stderr)
             proceed = False
-        if command == 'refresh':
+        elif command == 'refresh':
             print(f'Database {config.db_name} already exists. This operation will reinitialize the current database')
             print('and populate it with the provided MetaKaggle version.')
             ans = input(f'Are you sure to re-initialize {config.db_name} database? [yes]\n')
@@ -91,56 +431,860 @@ def main():
         print("********************")
         print("*** LOADING DATA ***")
         print("********************")
-        dl = DataLoader(config.constraints_file_path, config.meta_kaggle_path)
+        print(f'# Selected dataframe engine: {args.engine}')
+        df_engine = get_engine(args.engine)
+        with stage('load'):
+            dl = DataLoader(config.constraints_file_path, config.meta_kaggle_path, engine=df_engine)
+            tables_dict = dl.get_tables_dict()
+
+        if args.sample is not None:
+            from KGTorrent.sampler import Sampler
+
+            print("** SAMPLING META KAGGLE **")
+            tables_dict = Sampler(tables_dict, dl.get_constraints_df(), engine=df_engine) \
+                .sample(args.sample, seed_table=f'{args.sample_from}.csv', random_state=args.sample_seed)
 
-        print("***********************************")
-        print("** TABLES PRE-PROCESSING STARTED **")
-        print("***********************************")
-        mk = MkPreprocessor(dl.get_tables_dict(), dl.get_constraints_df())
-        processed_dict, stats = mk.preprocess_mk()
+        print("## Initializing DB...")
+        if args.temporal:
+            db_engine.create_empty_db()
+        else:
+            db_engine.create_new_db(drop_if_exists=True, constraints_df=dl.get_constraints_df())
+
+        # Tables are written to the database as soon as they reach their final state,
+        # while the preprocessing of the remaining tables goes on
+        print("*****************************************************")
+        print("** TABLES PRE-PROCESSING AND DB POPULATION STARTED **")
+        print("*****************************************************")
+        # In the temporal mode, tables are compared with the current snapshot once they are all preprocessed
+        table_writer = None
+        if not args.temporal:
+            table_writer = TableWriter(db_engine, to_pandas=df_engine.to_pandas)
+            table_writer.start()
+        mk = MkPreprocessor(tables_dict, dl.get_constraints_df(), engine=df_engine, n_workers=args.workers)
+
+        # With early downloads, notebooks are downloaded on a background thread as soon as
+        # the tables identifying them are final, while the remaining tables are processed and written
+        # The download runs on a single worker, so that its exceptions are raised again by its future
+        final_tables = set()
+        download_executor = None
+        download_future = None
+
+        def on_table_final(table_name, table):
+            nonlocal download_executor, download_future
+            if table_writer is not None:
+                table_writer.put(table_name, table)
+            final_tables.add(table_name)
+
+            if args.early_download and download_future is None and final_tables.issuperset(NB_IDENTIFIER_TABLES):
+                print("** SELECTING KERNELS TO DOWNLOAD FROM THE PREPROCESSED TABLES **")
+                early_nb_identifiers = mk.get_nb_identifiers(config.nb_conf['languages'], priority=args.priority)
+                print("*******************************")
+                print("** NOTEBOOK DOWNLOAD STARTED **")
+                print("*******************************")
+                early_downloader = Downloader(early_nb_identifiers, config.nb_archive_path, budget=_get_budget(args),
+                                              status_writer=_get_status_writer(args, db_engine))
+                print(f'# Selected strategy. {args.strategy}')
+                download_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Downloader')
+                download_future = download_executor.submit(early_downloader.download_notebooks,
+                                                           strategy=args.strategy)
+
+        processed_dict, stats = mk.preprocess_mk(on_table_final=on_table_final)
 
         print("*************")
         print("*** STATS ***")
         print("*************\n")
         print(stats)
 
-        print("## Initializing DB...")
-        db_engine.create_new_db(drop_if_exists=True)
+        if args.temporal:
+            from KGTorrent.temporal import TemporalStore
+
+            print("** ADDING THE SNAPSHOT TO THE TEMPORAL DB **")
+            TemporalStore(db_engine).add_snapshot(processed_dict, args.snapshot_label, to_pandas=df_engine.to_pandas)
+        else:
+            print("## Waiting for the DB population to complete...")
+            table_writer.close()
 
-        print("***************************")
-        print("** DB POPULATION STARTED **")
-        print("***************************")
-        db_engine.write_tables(processed_dict)
+            print("** APPLICATION OF CONSTRAINTS **")
+            with stage('set_foreign_keys'):
+                db_engine.set_foreign_keys(dl.get_constraints_df())
 
-        print("** APPLICATION OF CONSTRAINTS **")
-        db_engine.set_foreign_keys(dl.get_constraints_df())
+        print("** BUILDING THE NOTEBOOK CATALOG **")
+        db_engine.write_catalog(CatalogBuilder(processed_dict, to_pandas=df_engine.to_pandas).build())
+
+        if args.lineage:
+            from KGTorrent.lineage import LineageBuilder
+
+            print("** COMPUTATION OF KERNEL LINEAGE **")
+            lineage = LineageBuilder(df_engine.to_pandas(processed_dict['Kernels.csv']),
+                                     df_engine.to_pandas(processed_dict['KernelVersions.csv']),
+                                     df_engine.to_pandas(processed_dict['KernelVersionKernelSources.csv']))
+            db_engine.write_lineage_tables(lineage.build())
+
+        if download_future is not None:
+            print("## Waiting for the notebook download to complete...")
+            download_executor.shutdown(wait=True)
+            # Errors of the download (e.g., raised when the status writer is closed) are raised again here
+            download_future.result()
+            print('## Download finished.')
+            return
 
         print("** QUERYING KERNELS TO DOWNLOAD **")
-        nb_identifiers = db_engine.get_nb_identifiers(config.nb_conf['languages'])
+        nb_identifiers = db_engine.get_nb_identifiers(config.nb_conf['languages'],
+                                                      priority=args.priority,
+                                                      priority_sql=args.priority_sql)
 
         # Free memory
         del dl
         del mk
-        del db_engine
 
-        # Download the notebooks and update the db with their local path
+        # Download the notebooks; their download status is stored in the db as they are downloaded,
+        # while their contents are stored by the `extract` command
         # To get a specific subset of notebooks, query the database by using
         # the db_schema object as needed.
         print("*******************************")
         print("** NOTEBOOK DOWNLOAD STARTED **")
         print("*******************************")
-        downloader = Downloader(nb_identifiers, config.nb_archive_path)
+        downloader = Downloader(nb_identifiers, config.nb_archive_path, budget=_get_budget(args),
+                                status_writer=_get_status_writer(args, db_engine))
         print(f'# Selected strategy. {args.strategy}')
         downloader.download_notebooks(strategy=args.strategy)
         print('## Download finished.')
 
+
+def download(args):
+    """
+    This function handles the ``download`` command.
+    It downloads the notebooks referenced in an existing KGTorrent database, optionally filtered by the selection
+    options; with the ``--shard i/N`` option, only the notebooks of the given shard are downloaded,
+    into the related shard folder.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.downloader import Downloader
+    from KGTorrent.shards import select_shard, drop_archived_notebooks, get_shard_path
+
+    config.setup_logging()
+    db_engine = connect_db()
+
+    print("** QUERYING KERNELS TO DOWNLOAD **")
+    nb_identifiers = db_engine.select_notebooks(_get_selection(args))
+
+    nb_archive_path = config.nb_archive_path
+    if args.shard is not None:
+        index, count = args.shard
+        nb_identifiers = select_shard(nb_identifiers, index, count)
+
+        # Notebooks already in the archive (e.g., reconciled from previous shard downloads) are not downloaded again
+        nb_identifiers = drop_archived_notebooks(nb_identifiers, nb_archive_path)
+        nb_archive_path = get_shard_path(nb_archive_path, index, count)
+        print(f'# Selected shard {index}/{count}: {nb_identifiers.shape[0]} notebooks in {nb_archive_path}')
+
+    print("*******************************")
+    print("** NOTEBOOK DOWNLOAD STARTED **")
+    print("*******************************")
+    # Notebooks outside a filtered selection are kept in the archive
+    downloader = Downloader(nb_identifiers, nb_archive_path, budget=_get_budget(args),
+                            status_writer=_get_status_writer(args, db_engine),
+                            prune=not _has_selection_filters(args))
+    print(f'# Selected strategy. {args.strategy}')
+    downloader.download_notebooks(strategy=args.strategy)
+    print('## Download finished.')
+
+
+def select(args):
+    """
+    This function handles the ``select`` command.
+    It prints the slugs and identifiers of the notebooks selected by the selection options, in the CSV format,
+    or writes them to a CSV file.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    _check_startup_time(args.command)
+
+    selection = _get_selection(args)
+    start = time.perf_counter()
+    nb_identifiers = connect_db().select_notebooks(selection)
+    elapsed = time.perf_counter() - start
+
+    if args.output is not None:
+        nb_identifiers.to_csv(args.output, index=False)
+    else:
+        nb_identifiers.to_csv(sys.stdout, index=False)
+    print(f'{nb_identifiers.shape[0]} notebooks selected in {elapsed * 1000:.1f}ms by {selection}', file=sys.stderr)
+
+
+def reconcile(args):
+    """
+    This function handles the ``reconcile`` command.
+    It merges the shard folders found in the notebook archive into a single archive and prints the report.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.shards import ShardReconciler, REPORT_FILE_NAME
+
+    _check_startup_time(args.command)
+
+    report = ShardReconciler(config.nb_archive_path).reconcile()
+
+    print(f'Merged notebooks: {report["merged_notebooks"]} ({report["replaced_notebooks"]} replaced)')
+    print(f'Quarantined notebooks: {report["quarantined_notebooks"]}')
+    for shard in report['shards']:
+        print(f'\tShard {shard["shard"]}: {shard["downloaded"]} downloaded, {shard["failed"]} failed')
+    if len(report['missing_shards']) != 0:
+        print(f'Missing shards: {", ".join(report["missing_shards"])}', file=sys.stderr)
+    print(f'Report written to {REPORT_FILE_NAME}')
+
+
+def catalog(args):
+    """
+    This function handles the ``catalog`` command.
+    It builds the notebook catalog from the tables of an existing KGTorrent database.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.catalog import CatalogBuilder, CATALOG_SOURCE_TABLES
+
+    config.setup_logging()
+    db_engine = connect_db()
+
+    print("** BUILDING THE NOTEBOOK CATALOG **")
+    tables_dict = {table_name: db_engine.execute_query(f'SELECT {", ".join(columns)} FROM {table_name[:-4].lower()};')
+                   for table_name, columns in CATALOG_SOURCE_TABLES.items()}
+    db_engine.write_catalog(CatalogBuilder(tables_dict).build())
+
+
+def lineage(args):
+    """
+    This function handles the ``lineage`` command.
+    It computes the kernel lineage closure tables from the tables of an existing KGTorrent database.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.lineage import LineageBuilder
+
+    config.setup_logging()
+    db_engine = connect_db()
+
+    print("** COMPUTATION OF KERNEL LINEAGE **")
+    builder = LineageBuilder(
+        db_engine.execute_query('SELECT Id, ForkParentKernelVersionId FROM kernels;'),
+        db_engine.execute_query('SELECT Id, ScriptId FROM kernelversions;'),
+        db_engine.execute_query('SELECT KernelVersionId, SourceKernelVersionId FROM kernelversionkernelsources;'))
+    db_engine.write_lineage_tables(builder.build())
+
+
+def extract(args):
+    """
+    This function handles the ``extract`` command.
+    It extracts facts (local path, size, cell counts, imported modules, output presence) from the notebooks
+    in the archive that are new or changed since the last extraction, and stores them in the database.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.nb_extractor import NotebookExtractor
+
+    config.setup_logging()
+    db_engine = connect_db()
+
+    print("** QUERYING KERNELS IN THE ARCHIVE **")
+    nb_identifiers = db_engine.get_nb_identifiers(config.nb_conf['languages'])
+
+    report = NotebookExtractor(db_engine, config.nb_archive_path, n_workers=args.workers).extract(nb_identifiers)
+
+    print(f'Extracted notebooks: {report["extracted"]} in {report["seconds"]:.2f}s '
+          f'({report["imports"]} imported modules)')
+    print(f'\tDeleted (no longer in the archive): {report["deleted"]}')
+    print(f'\tUnparsable: {report["unparsable"]}')
+    print(f'\tNot referenced in the database: {report["unknown"]}')
+
+
+def export_cells(args):
+    """
+    This function handles the ``export-cells`` command.
+    It exports the cells of the notebooks in the archive that are new or changed since the last export to a
+    partitioned Parquet dataset, and removes the cells of the notebooks that are no longer in the archive.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.cell_export import CellExporter, CELLS_FOLDER_NAME
+
+    config.setup_logging()
+    db_engine = connect_db()
+
+    print("** QUERYING KERNELS IN THE ARCHIVE **")
+    nb_identifiers = db_engine.get_nb_identifiers(config.nb_conf['languages'])
+
+    dataset_path = args.output if args.output is not None else str(Path(config.nb_archive_path) / CELLS_FOLDER_NAME)
+    report = CellExporter(dataset_path).update(nb_identifiers, config.nb_archive_path, n_workers=args.workers,
+                                               notebooks_per_part=args.notebooks_per_part)
+
+    print(f'Exported notebooks: {report["exported"]} in {report["seconds"]:.2f}s ({report["cells"]} cells)')
+    print(f'\tRemoved (no longer in the archive): {report["removed"]}')
+    print(f'\tUnparsable: {report["unparsable"]}')
+    print(f'\tNot referenced in the database: {report["unknown"]}')
+    print(f'Dataset {dataset_path}: {report["parts"]} parts')
+
+
+def _get_index_path(args):
+    """
+    This function returns the folder of the code index.
+
+    Args:
+        args: The parsed command line arguments.
+
+    Returns:
+        index_path: The path given with the ``--index`` option or, by default, the ``code_index`` subfolder
+        of the notebook archive.
+    """
+
+    from KGTorrent.code_index import INDEX_FOLDER_NAME
+
+    if args.index is not None:
+        return args.index
+    return str(Path(config.nb_archive_path) / INDEX_FOLDER_NAME)
+
+
+def index(args):
+    """
+    This function handles the ``index`` command.
+    It adds the notebooks that are new or changed since the last update to the code index,
+    and removes the notebooks that are no longer in the archive.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.code_index import CodeIndex
+
+    _check_startup_time(args.command)
+
+    index_path = _get_index_path(args)
+    report = CodeIndex(index_path).update(config.nb_archive_path, n_workers=args.workers, merge=args.merge)
+
+    print(f'Indexed notebooks: {report["indexed"]} in {report["seconds"]:.2f}s')
+    print(f'\tRemoved (no longer in the archive): {report["removed"]}')
+    print(f'\tUnparsable: {report["unparsable"]}')
+    print(f'Index {index_path}: {report["segments"]} segments')
+
+
+def search(args):
+    """
+    This function handles the ``search`` command.
+    It prints the names of the notebooks whose code uses all the given names.
+    With the ``--sql`` option, results are restricted to the notebooks selected by a query on the database.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.code_index import CodeIndex
+
+    _check_startup_time(args.command)
+
+    names = None
+    if args.sql is not None:
+        selection = connect_db().execute_query(args.sql)
+        names = selection['UserName'] + '_' + selection['CurrentUrlSlug']
+
+    start = time.perf_counter()
+    results = CodeIndex(_get_index_path(args)).search(' '.join(args.query), names=names)
+    elapsed = time.perf_counter() - start
+
+    for name in results:
+        print(name)
+    print(f'{len(results)} notebooks found in {elapsed * 1000:.1f}ms', file=sys.stderr)
+
+
+def validate(args):
+    """
+    This function handles the ``validate`` command.
+    It validates all the notebooks in the notebook archive and quarantines the invalid ones,
+    so that they are downloaded again by the next download session.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.nb_validator import NotebookValidator, QUARANTINE_FOLDER_NAME
+
+    _check_startup_time(args.command)
+    config.setup_logging()
+
+    report = NotebookValidator(config.nb_archive_path, n_workers=args.workers).validate_archive()
+
+    print(f'Checked notebooks: {report["checked"]} in {report["seconds"]:.2f}s')
+    print(f'\tValid: {report["valid"]}')
+    print(f'\tQuarantined: {report["quarantined"]}')
+    for reason, count in sorted(report['reasons'].items()):
+        print(f'\t\t- {reason}: {count}')
+    if report['quarantined'] != 0:
+        print(f'Invalid notebooks were moved to the {QUARANTINE_FOLDER_NAME} folder: '
+              f'issue the `download` command to download them again.')
+
+
+def discover_constraints(args):
+    """
+    This function handles the ``discover-constraints`` command.
+    It discovers the foreign key constraints of the Meta Kaggle tables and compares them with the constraints file.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    import pandas as pd
+
+    from KGTorrent.constraint_discovery import ConstraintDiscoverer, write_constraints
+    from KGTorrent.dataframe_engine import get_engine
+
+    config.setup_logging()
+
+    discoverer = ConstraintDiscoverer(config.meta_kaggle_path,
+                                      engine=get_engine(args.engine),
+                                      sample_size=args.sample_size,
+                                      min_coverage=args.min_coverage)
+    diff = discoverer.diff(pd.read_csv(config.constraints_file_path))
+
+    titles = {
+        'confirmed': 'Constraints confirmed',
+        'weak': f'Constraints with a coverage lower than {args.min_coverage}',
+        'stale': 'Constraints on tables or columns that are no longer in Meta Kaggle',
+        'new': 'New constraints',
+        'unresolved': 'Key columns without any candidate constraint',
+    }
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        for key, title in titles.items():
+            print(f'\n{title}: {diff[key].shape[0]}')
+            if diff[key].shape[0] != 0:
+                print(diff[key].to_string(index=False))
+
+    if args.output is not None:
+        write_constraints(diff, args.output)
+        print(f'\nConfirmed and new constraints written to {args.output}')
+
+
+def verify(args):
+    """
+    This function handles the ``verify`` command.
+    It checks the notebooks in a copy of the notebook archive against its manifest.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    from KGTorrent.manifest import ArchiveManifest, ArchiveVerifier
+
+    nb_archive_path = args.path if args.path is not None else config.nb_archive_path
+
+    if args.rebuild:
+        db_engine = connect_db()
+        print("** REBUILDING THE MANIFEST **")
+        nb_identifiers = db_engine.get_nb_identifiers(config.nb_conf['languages'])
+        entries = ArchiveManifest(nb_archive_path).rebuild(nb_identifiers, n_workers=args.workers)
+        print(f'Manifest rebuilt with {len(entries)} notebooks')
+        return
+
+    _check_startup_time(args.command)
+    report = ArchiveVerifier(nb_archive_path, n_workers=args.workers).verify(full=args.full)
+
+    print(f'Checked notebooks: {report["checked"]} in {report["seconds"]:.2f}s ({report["hashed"]} hashed)')
+    for problem in ('missing', 'extra', 'corrupt'):
+        file_names = report[problem]
+        print(f'\t{problem.capitalize()}: {len(file_names)}')
+        for file_name in file_names[:MAX_LISTED_FILES]:
+            print(f'\t\t- {file_name}')
+        if len(file_names) > MAX_LISTED_FILES:
+            print(f'\t\t- ... and {len(file_names) - MAX_LISTED_FILES} more')
+
+
+def export(args):
+    """
+    This function handles the ``export`` command.
+    It exports the KGTorrent database and notebook dataset into the files of a release, with their checksums.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    import os
+
+    from KGTorrent.exporter import Exporter
+
+    config.setup_logging()
+
+    # Each thread dumping a table holds a connection of the pool while it streams the rows
+    n_workers = args.workers or os.cpu_count() or 1
+    db_engine = connect_db(pool_size=n_workers)
+
+    print("** EXPORTING KGTORRENT **")
+    exporter = Exporter(db_engine, args.output, args.label, n_workers=n_workers)
+    exporter.export(nb_archive_path=None if args.no_dataset else config.nb_archive_path, parquet=args.parquet)
+
+
+def status(args):
+    """
+    This function handles the ``status`` command.
+    It prints a summary of the notebook archive without connecting to the database.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    _check_startup_time(args.command)
+
+    notebook_paths = list(Path(config.nb_archive_path).glob('*.ipynb'))
+    archive_size = sum(path.stat().st_size for path in notebook_paths)
+
+    print(f'Notebook archive: {config.nb_archive_path}')
+    print(f'\tNumber of notebooks: {len(notebook_paths)}')
+    print(f'\tTotal size: {archive_size / 2 ** 20:.2f} MB')
+
+
+def _add_profiling_arguments(parser):
+    """
+    This function adds the options of the profiling mode to a command parser.
+
+    Args:
+        parser: The parser of the command.
+    """
+
+    from KGTorrent.profiling import DEFAULT_INTERVAL
+
+    parser.add_argument('--profile',
+                        type=str,
+                        default=None,
+                        metavar='FOLDER',
+                        help='Profile each stage of the pipeline and write its sampled stacks (in the folded format '
+                             'of flame graphs) and its top memory allocations to the given folder.')
+    parser.add_argument('--profile-interval',
+                        type=float,
+                        default=DEFAULT_INTERVAL,
+                        metavar='SECONDS',
+                        help='The time between two samples of the stacks when profiling. '
+                             f'By default it is {DEFAULT_INTERVAL:g}.')
+
+
+def main():
+    """Entry-point function for KGTorrent.
+    It parses the command line arguments and dispatches them to the function that handles the selected command.
+    Each command imports only the modules it needs, so that lightweight commands start quickly."""
+
+    # Create the parser
+    my_parser = argparse.ArgumentParser(
+        prog='KGTorrent',
+        usage='%(prog)s <command> [options]',
+        description='Initialize or refresh KGTorrent'
+    )
+    subparsers = my_parser.add_subparsers(dest='command', metavar='command', prog='KGTorrent')
+    subparsers.required = True
+
+    # Add the commands and their arguments
+    for command in ('init', 'refresh'):
+        if command == 'init':
+            help_message = 'Use the `init` command to create KGTorrent from scratch.'
+        else:
+            help_message = 'Use the `refresh` command to update KGTorrent ' \
+                           'according to the last version of Meta Kaggle.'
+        build_parser = subparsers.add_parser(command, help=help_message)
+        build_parser.add_argument('--strategy',
+                                  type=str,
+                                  choices=['API', 'HTTP'],
+                                  default='HTTP',
+                                  help="Use the `API` strategy to download Kaggle kernels via the Kaggle's official API; "
+                                       "Use the `HTTP` strategy to download full kernels via HTTP requests."
+                                       "N.B.: Notebooks downloaded via the Kaggle API miss code cell outputs.")
+        build_parser.add_argument('--engine',
+                                  type=str,
+                                  choices=['pandas', 'polars'],
+                                  default='pandas',
+                                  help='The dataframe engine used to load and preprocess the Meta Kaggle tables. '
+                                       'The `polars` engine is multithreaded and requires the polars package.')
+        build_parser.add_argument('--early-download',
+                                  action='store_true',
+                                  help='Start downloading notebooks as soon as the tables identifying them are '
+                                       'preprocessed, while the database is still being populated.')
+        build_parser.add_argument('--lineage',
+                                  action='store_true',
+                                  help='Compute the kernel lineage closure tables (kernelforkclosure and '
+                                       'kernelsourceclosure) once the database is populated.')
+        build_parser.add_argument('--sample',
+                                  type=_fraction_argument,
+                                  default=None,
+                                  metavar='FRACTION',
+                                  help='Build KGTorrent from a referentially closed sample of Meta Kaggle, grown from '
+                                       'the given fraction of the rows of the seed table (e.g., 0.01). '
+                                       'Useful to test changes quickly.')
+        build_parser.add_argument('--sample-from',
+                                  type=str,
+                                  choices=['Kernels', 'Users'],
+                                  default='Kernels',
+                                  help='The seed table of the sample.')
+        build_parser.add_argument('--sample-seed',
+                                  type=int,
+                                  default=0,
+                                  help='The seed of the random generator, to reproduce a sample.')
+        build_parser.add_argument('--workers',
+                                  type=int,
+                                  default=None,
+                                  help='The number of threads cleaning independent groups of tables during the '
+                                       'preprocessing. By default it is the number of CPUs.')
+        build_parser.add_argument('--temporal',
+                                  action='store_true',
+                                  help='Store Meta Kaggle in a temporal database, which keeps every version as a '
+                                       'snapshot and only stores the rows that changed. With `refresh`, the new '
+                                       'version is added to the existing temporal database.')
+        build_parser.add_argument('--snapshot-label',
+                                  type=str,
+                                  default=time.strftime('%Y-%m-%d'),
+                                  help='The label of the snapshot in the temporal database. '
+                                       'By default it is the current date.')
+        _add_scheduling_arguments(build_parser)
+        _add_status_arguments(build_parser)
+        _add_profiling_arguments(build_parser)
+        build_parser.set_defaults(func=build)
+
+    download_parser = subparsers.add_parser('download',
+                                            help='Use the `download` command to download the notebooks referenced '
+                                                 'in an existing KGTorrent database.')
+    download_parser.add_argument('--strategy',
+                                 type=str,
+                                 choices=['API', 'HTTP'],
+                                 default='HTTP',
+                                 help="The download strategy (see the `init` command).")
+    download_parser.add_argument('--shard',
+                                 type=_shard_argument,
+                                 default=None,
+                                 metavar='i/N',
+                                 help='Download only the i-th of N disjoint shards of the notebooks (0 <= i < N), '
+                                      'into its own folder. Shards are merged with the `reconcile` command.')
+    _add_selection_arguments(download_parser)
+    _add_scheduling_arguments(download_parser)
+    _add_status_arguments(download_parser)
+    _add_profiling_arguments(download_parser)
+    download_parser.set_defaults(func=download)
+
+    select_parser = subparsers.add_parser('select',
+                                          help='Use the `select` command to list the notebooks matching the given '
+                                               'filters (languages, medals, votes, dates, competition and dataset '
+                                               'sources).')
+    _add_selection_arguments(select_parser)
+    from KGTorrent.scheduler import PRIORITIES
+    select_parser.add_argument('--priority',
+                               type=str,
+                               choices=list(PRIORITIES),
+                               default=None,
+                               help='Order the notebooks by priority (see the `download` command).')
+    select_parser.add_argument('--limit',
+                               type=int,
+                               default=None,
+                               help='Select at most the given number of notebooks.')
+    select_parser.add_argument('--output',
+                               type=str,
+                               default=None,
+                               help='Write the selected notebooks to the given CSV file instead of printing them.')
+    select_parser.set_defaults(func=select)
+
+    reconcile_parser = subparsers.add_parser('reconcile',
+                                             help='Use the `reconcile` command to merge the downloaded shards '
+                                                  'into the notebook archive.')
+    reconcile_parser.set_defaults(func=reconcile)
+
+    catalog_parser = subparsers.add_parser('catalog',
+                                           help='Use the `catalog` command to build the notebook catalog '
+                                                'of an existing KGTorrent database.')
+    catalog_parser.set_defaults(func=catalog)
+
+    lineage_parser = subparsers.add_parser('lineage',
+                                           help='Use the `lineage` command to compute the kernel lineage closure '
+                                                'tables of an existing KGTorrent database.')
+    lineage_parser.set_defaults(func=lineage)
+
+    extract_parser = subparsers.add_parser('extract',
+                                           help='Use the `extract` command to store facts about the downloaded '
+                                                'notebooks (cells, imports, sizes) in the database.')
+    extract_parser.add_argument('--workers',
+                                type=int,
+                                default=None,
+                                help='The number of processes parsing the notebooks. '
+                                     'By default it is the number of CPUs.')
+    extract_parser.set_defaults(func=extract)
+
+    export_cells_parser = subparsers.add_parser('export-cells',
+                                                help='Use the `export-cells` command to export the cells of the '
+                                                     'downloaded notebooks to a Parquet dataset.')
+    export_cells_parser.add_argument('--output',
+                                     type=str,
+                                     default=None,
+                                     help='The folder of the Parquet dataset. By default it is the cells subfolder '
+                                          'of the notebook archive.')
+    export_cells_parser.add_argument('--workers',
+                                     type=int,
+                                     default=None,
+                                     help='The number of processes parsing the notebooks. '
+                                          'By default it is the number of CPUs.')
+    export_cells_parser.add_argument('--notebooks-per-part',
+                                     type=int,
+                                     default=5000,
+                                     help='The maximum number of notebooks in each file of the dataset. '
+                                          'By default it is 5000.')
+    export_cells_parser.set_defaults(func=export_cells)
+
+    index_parser = subparsers.add_parser('index',
+                                         help='Use the `index` command to build or update the code search index '
+                                              'of the notebook archive.')
+    index_parser.add_argument('--index',
+                              type=str,
+                              default=None,
+                              help='The folder of the index. By default it is the code_index subfolder '
+                                   'of the notebook archive.')
+    index_parser.add_argument('--workers',
+                              type=int,
+                              default=None,
+                              help='The number of processes tokenizing the notebooks. '
+                                   'By default it is the number of CPUs.')
+    index_parser.add_argument('--merge',
+                              action='store_true',
+                              help='Merge all the segments of the index into one.')
+    index_parser.set_defaults(func=index)
+
+    search_parser = subparsers.add_parser('search',
+                                          help='Use the `search` command to find the notebooks whose code uses '
+                                               'the given names (e.g., xgboost.train).')
+    search_parser.add_argument('query',
+                               nargs='+',
+                               help='One or more names; notebooks must use all of them.')
+    search_parser.add_argument('--index',
+                               type=str,
+                               default=None,
+                               help='The folder of the index (see the `index` command).')
+    search_parser.add_argument('--sql',
+                               type=str,
+                               default=None,
+                               help='Restrict the results to the notebooks selected by an SQL query on the '
+                                    'KGTorrent database; the query must return the UserName and CurrentUrlSlug '
+                                    'columns.')
+    search_parser.set_defaults(func=search)
+
+    validate_parser = subparsers.add_parser('validate',
+                                            help='Use the `validate` command to check the notebooks in the archive '
+                                                 'and quarantine the invalid ones.')
+    validate_parser.add_argument('--workers',
+                                 type=int,
+                                 default=None,
+                                 help='The number of processes validating the notebooks. '
+                                      'By default it is the number of CPUs.')
+    validate_parser.set_defaults(func=validate)
+
+    discover_parser = subparsers.add_parser('discover-constraints',
+                                            help='Use the `discover-constraints` command to find the foreign key '
+                                                 'constraints of Meta Kaggle and compare them with the constraints '
+                                                 'file.')
+    discover_parser.add_argument('--engine',
+                                 type=str,
+                                 choices=['pandas', 'polars'],
+                                 default='pandas',
+                                 help='The dataframe engine used to read the Meta Kaggle tables.')
+    discover_parser.add_argument('--sample-size',
+                                 type=int,
+                                 default=10000,
+                                 help='The number of distinct values of each column used to screen the '
+                                      'candidate constraints.')
+    discover_parser.add_argument('--min-coverage',
+                                 type=float,
+                                 default=0.8,
+                                 help='The minimum fraction of the distinct values of a column that must be found '
+                                      'in the referenced table.')
+    discover_parser.add_argument('--output',
+                                 type=str,
+                                 default=None,
+                                 help='Write the confirmed and new constraints to a constraints file '
+                                      '(e.g., to review it before replacing fk_constraints_data.csv).')
+    discover_parser.set_defaults(func=discover_constraints)
+
+    verify_parser = subparsers.add_parser('verify',
+                                          help='Use the `verify` command to check the notebooks in the archive '
+                                               'against its manifest (missing, extra and corrupt notebooks).')
+    verify_parser.add_argument('--path',
+                               type=str,
+                               default=None,
+                               help='The folder to be verified (e.g., a copy of the archive). '
+                                    'By default it is the notebook archive.')
+    verify_parser.add_argument('--full',
+                               action='store_true',
+                               help='Hash all the notebooks again, including those that did not change '
+                                    'since the last verification.')
+    verify_parser.add_argument('--rebuild',
+                               action='store_true',
+                               help='Rebuild the manifest from the notebooks in the archive that are referenced '
+                                    'in the database, instead of verifying it.')
+    verify_parser.add_argument('--workers',
+                               type=int,
+                               default=None,
+                               help='The number of hashing threads. By default it is the number of CPUs.')
+    verify_parser.set_defaults(func=verify)
+
+    export_parser = subparsers.add_parser('export',
+                                          help='Use the `export` command to package the database dump and the '
+                                               'notebook dataset of a KGTorrent release.')
+    export_parser.add_argument('output',
+                               help='The folder where the released files are written.')
+    export_parser.add_argument('--label',
+                               type=str,
+                               default=time.strftime('%m-%Y'),
+                               help='The label of the release, used in the file names. '
+                                    'By default it is the current month (e.g., 10-2020).')
+    export_parser.add_argument('--parquet',
+                               action='store_true',
+                               help='Also export each table to a Parquet file (requires the pyarrow package).')
+    export_parser.add_argument('--no-dataset',
+                               action='store_true',
+                               help='Only export the database, without packaging the notebook dataset.')
+    export_parser.add_argument('--workers',
+                               type=int,
+                               default=None,
+                               help='The number of threads dumping, compressing and hashing. '
+                                    'By default it is the number of CPUs.')
+    export_parser.set_defaults(func=export)
+
+    status_parser = subparsers.add_parser('status',
+                                          help='Use the `status` command to print a summary of the notebook archive.')
+    status_parser.set_defaults(func=status)
+
+    # Execute the parse_args() method
+    args = my_parser.parse_args()
+    if getattr(args, 'early_download', False) and args.priority_sql is not None:
+        my_parser.error('--priority-sql cannot be used with --early-download, '
+                        'since early downloads do not query the database; use --priority instead.')
+
+    profiler = None
+    if getattr(args, 'profile', None) is not None:
+        from KGTorrent.profiling import Profiler
+
+        profiler = Profiler(args.profile, interval=args.profile_interval)
+        profiler.start()
+    try:
+        args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
     time.sleep(0.2)
     print('## KGTorrent end')
 
 
 if __name__ == '__main__':
-    import time
-
-    start_time = time.time()
     main()
-    print("--- %s minutes ---" % ((time.time() - start_time)/60))
+    print("--- %s minutes ---" % ((time.perf_counter() - _start_time)/60))
@@ -0,0 +1,150 @@
+"""
+This module defines the functions and the class that compute the lineage of the kernels, i.e., the transitive closure
+of the graphs linking each kernel to the kernels it derives from.
+
+Two graphs are considered, both at the kernel level:
+
+``fork``
+    a kernel is linked to the kernel it was forked from (``Kernels.ForkParentKernelVersionId``);
+
+``source``
+    a kernel is linked to the kernels whose output its versions use as a data source (``KernelVersionKernelSources``).
+
+For each graph, the closure table stores one row for each pair of kernels connected by a path, with the length of the
+shortest path; all the descendants (or ancestors) of a kernel can then be retrieved with a single indexed lookup
+instead of a recursive query.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+# Columns of the closure tables
+ANCESTOR = 'AncestorKernelId'
+DESCENDANT = 'DescendantKernelId'
+DEPTH = 'Depth'
+
+
+def _pair_keys(df):
+    """
+    This function encodes each (ancestor, descendant) pair of an edge dataframe into a single 64-bit integer.
+
+    Args:
+        df: The dataframe with the ``AncestorKernelId`` and ``DescendantKernelId`` columns.
+
+    Returns:
+        keys: The ``numpy.ndarray`` of the encoded pairs.
+    """
+    return (df[ANCESTOR].to_numpy(dtype=np.int64) << 32) | df[DESCENDANT].to_numpy(dtype=np.int64)
+
+
+def transitive_closure(edges):
+    """
+    This function computes the transitive closure of a graph by a breadth-first expansion of all the paths at once:
+    at each round, the paths found in the previous round are extended by one edge with a single join,
+    and only the pairs that were not reached before are kept. Pairs are thus found at their shortest distance,
+    and cycles are handled.
+
+    Args:
+        edges: The ``pandas.DataFrame`` of the edges, with the ``AncestorKernelId`` and ``DescendantKernelId`` columns.
+
+    Returns:
+        closure: The ``pandas.DataFrame`` with the ``AncestorKernelId``, ``DescendantKernelId`` and ``Depth`` columns.
+    """
+
+    edges = edges[[ANCESTOR, DESCENDANT]]
+    edges = edges.loc[edges[ANCESTOR] != edges[DESCENDANT]].drop_duplicates()
+
+    frontier = edges.assign(**{DEPTH: 1})
+    rounds = [frontier]
+    seen = np.sort(_pair_keys(frontier))
+
+    while frontier.shape[0] != 0:
+
+        # Extend each path of the last round with the edges leaving its ancestor
+        step = frontier.merge(edges, left_on=ANCESTOR, right_on=DESCENDANT, suffixes=('', '_next'))
+        frontier = pd.DataFrame({
+            ANCESTOR: step[f'{ANCESTOR}_next'].to_numpy(),
+            DESCENDANT: step[DESCENDANT].to_numpy(),
+            DEPTH: step[DEPTH].to_numpy() + 1,
+        })
+        frontier = frontier.loc[frontier[ANCESTOR] != frontier[DESCENDANT]].drop_duplicates(subset=[ANCESTOR, DESCENDANT])
+
+        # Keep the pairs that were not reached in previous rounds
+        keys = _pair_keys(frontier)
+        is_new = ~np.isin(keys, seen, assume_unique=True)
+        frontier = frontier.loc[is_new]
+        seen = np.union1d(seen, keys[is_new])
+
+        rounds.append(frontier)
+
+    closure = pd.concat(rounds, ignore_index=True)
+    return closure.astype({ANCESTOR: 'int64', DESCENDANT: 'int64', DEPTH: 'int32'})
+
+
+class LineageBuilder:
+    """
+    The ``LineageBuilder`` class computes the closure tables of the fork and source graphs of the kernels
+    from the preprocessed Meta Kaggle tables.
+    """
+
+    def __init__(self, kernels, kernel_versions, kernel_version_kernel_sources):
+        """
+        The constructor of this class sets the tables defining the lineage of the kernels.
+
+        Args:
+            kernels: The ``pandas.DataFrame`` of the kernels (``Id`` and ``ForkParentKernelVersionId`` columns).
+            kernel_versions: The ``pandas.DataFrame`` of the kernel versions (``Id`` and ``ScriptId`` columns).
+            kernel_version_kernel_sources: The ``pandas.DataFrame`` of the kernel sources of the kernel versions
+                (``KernelVersionId`` and ``SourceKernelVersionId`` columns).
+        """
+
+        self._kernels = kernels[['Id', 'ForkParentKernelVersionId']]
+        self._kernel_versions = kernel_versions[['Id', 'ScriptId']].dropna()
+        self._kernel_version_kernel_sources = kernel_version_kernel_sources[['KernelVersionId', 'SourceKernelVersionId']]
+
+    def get_fork_edges(self):
+        """
+        This method links each forked kernel to the kernel it was forked from.
+
+        Returns:
+            edges: The ``pandas.DataFrame`` with the ``AncestorKernelId`` and ``DescendantKernelId`` columns.
+        """
+
+        forks = self._kernels.dropna().merge(self._kernel_versions, left_on='ForkParentKernelVersionId',
+                                             right_on='Id', suffixes=('', '_version'))
+        return pd.DataFrame({ANCESTOR: forks['ScriptId'].astype('int64').to_numpy(),
+                             DESCENDANT: forks['Id'].astype('int64').to_numpy()})
+
+    def get_source_edges(self):
+        """
+        This method links each kernel to the kernels used as data sources by its versions.
+
+        Returns:
+            edges: The ``pandas.DataFrame`` with the ``AncestorKernelId`` and ``DescendantKernelId`` columns.
+        """
+
+        sources = self._kernel_version_kernel_sources.dropna() \
+            .merge(self._kernel_versions, left_on='KernelVersionId', right_on='Id') \
+            .merge(self._kernel_versions, left_on='SourceKernelVersionId', right_on='Id', suffixes=('', '_source'))
+        return pd.DataFrame({ANCESTOR: sources['ScriptId_source'].astype('int64').to_numpy(),
+                             DESCENDANT: sources['ScriptId'].astype('int64').to_numpy()})
+
+    def build(self):
+        """
+        This method computes the closure tables of the fork and source graphs.
+
+        Returns:
+            tables_dict: A dictionary whose keys are the table names (``KernelForkClosure`` and
+            ``KernelSourceClosure``) and whose values are the ``pandas.DataFrame`` closure tables.
+        """
+
+        tables_dict = {}
+        for table_name, edges in (('KernelForkClosure', self.get_fork_edges()),
+                                  ('KernelSourceClosure', self.get_source_edges())):
+            start = time.perf_counter()
+            tables_dict[table_name] = transitive_closure(edges)
+            print(f'## {table_name}: {edges.shape[0]} edges, {tables_dict[table_name].shape[0]} pairs '
+                  f'({time.perf_counter() - start:.2f}s)')
+        return tables_dict
@@ -0,0 +1,332 @@
+"""
+This module defines the functions and the classes that maintain and verify the manifest of the notebook archive,
+i.e., the list of the notebooks it should contain, with their size and SHA-256 checksum.
+
+The manifest is the ``manifest.csv`` file of the archive folder, with the ``FileName``, ``CurrentKernelVersionId``,
+``ByteSize`` and ``SHA256`` columns. It is maintained incrementally by the :class:`.Downloader`: a row is appended
+for each downloaded notebook, and a row with an empty checksum records the removal of a notebook; when a notebook
+appears in more than one row, the last one holds. Reading the manifest compacts it, unless it is only read to be checked.
+
+The :class:`.ArchiveVerifier` checks a copy of the archive against its manifest. Files are hashed in parallel by a
+pool of threads through memory-mapped reads (``hashlib`` releases the GIL while hashing), and the checksums are
+saved in ``manifest_verification.csv``, so that the following verifications only hash the files whose size or
+modification time changed.
+"""
+
+import csv
+import hashlib
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from KGTorrent.archive import list_notebooks, parse_notebook_name
+
+# Name of the manifest in the notebook archive folder
+MANIFEST_FILE_NAME = 'manifest.csv'
+MANIFEST_COLUMNS = ['FileName', 'CurrentKernelVersionId', 'ByteSize', 'SHA256']
+
+# Name of the file storing the checksums computed by the last verification
+VERIFICATION_FILE_NAME = 'manifest_verification.csv'
+VERIFICATION_COLUMNS = ['FileName', 'ByteSize', 'MTimeNs', 'SHA256']
+
+
+def sha256_file(path):
+    """
+    This function computes the SHA-256 checksum of a file, reading it through a memory map.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        checksum: The hexadecimal SHA-256 digest of the file.
+    """
+
+    with open(path, 'rb') as file:
+        # Empty files cannot be memory-mapped
+        if os.fstat(file.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            return hashlib.sha256(mapped_file).hexdigest()
+
+
+def hash_files(paths, n_workers=None):
+    """
+    This function computes the SHA-256 checksums of a list of files on a pool of threads.
+
+    Args:
+        paths: The list of the paths to the files.
+        n_workers: The number of threads. By default it is the number of CPUs.
+
+    Returns:
+        checksums: The list of the hexadecimal SHA-256 digests, in the same order as ``paths``.
+    """
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(paths) < 2:
+        return [sha256_file(path) for path in paths]
+
+    with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='Hasher') as pool:
+        return list(pool.map(sha256_file, paths))
+
+
+def _read_csv(path):
+    """
+    This function reads the rows of a ``.csv`` file with a header.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        rows: The list of the rows, as dictionaries; it is empty if the file does not exist.
+    """
+
+    if not Path(path).exists():
+        return []
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def _write_csv(path, columns, rows):
+    """
+    This function replaces a ``.csv`` file with the given rows; the file is written to a temporary file first,
+    so that it is never left half-written.
+
+    Args:
+        path: The path to the file.
+        columns: The list of the columns.
+        rows: The list of the rows, as dictionaries.
+    """
+
+    temporary_path = Path(f'{path}.tmp')
+    with open(temporary_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temporary_path, path)
+
+
+class ArchiveManifest:
+    """
+    The ``ArchiveManifest`` class reads and updates the manifest of a notebook archive.
+    """
+
+    def __init__(self, nb_archive_path):
+        """
+        The constructor of this class sets the path to the manifest of the given notebook archive.
+
+        Args:
+            nb_archive_path: The path to the notebook archive folder.
+        """
+
+        self._nb_archive_path = Path(nb_archive_path)
+        self._manifest_path = self._nb_archive_path / MANIFEST_FILE_NAME
+
+    def get_path(self):
+        """
+        This method returns the path to the manifest.
+
+        Returns:
+            manifest_path: The path to the ``manifest.csv`` file.
+        """
+        return self._manifest_path
+
+    def _append(self, row):
+        """
+        This method appends a row to the manifest, writing the header if the manifest is new.
+
+        Args:
+            row: The row, as a dictionary.
+        """
+
+        is_new = not self._manifest_path.exists()
+        with open(self._manifest_path, 'a', newline='', encoding='utf-8') as manifest_file:
+            writer = csv.DictWriter(manifest_file, fieldnames=MANIFEST_COLUMNS)
+            if is_new:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def add(self, file_name, kernel_version_id, n_bytes, checksum):
+        """
+        This method records a notebook written to the archive.
+
+        Args:
+            file_name: The name of the notebook file.
+            kernel_version_id: The ``CurrentKernelVersionId`` of the notebook.
+            n_bytes: The size of the notebook file.
+            checksum: The hexadecimal SHA-256 digest of the notebook file.
+        """
+        self._append({'FileName': file_name, 'CurrentKernelVersionId': int(kernel_version_id),
+                      'ByteSize': n_bytes, 'SHA256': checksum})
+
+    def remove(self, file_name):
+        """
+        This method records the removal of a notebook from the archive.
+
+        Args:
+            file_name: The name of the notebook file.
+        """
+        self._append({'FileName': file_name, 'CurrentKernelVersionId': '', 'ByteSize': '', 'SHA256': ''})
+
+    def merge(self, other_manifest_path):
+        """
+        This method appends the rows of another manifest (e.g., the manifest of a shard) to this manifest.
+
+        Args:
+            other_manifest_path: The path to the other manifest.
+        """
+        for row in _read_csv(other_manifest_path):
+            self._append(row)
+
+    def read(self, compact=True):
+        """
+        This method reads the manifest, keeping the last row of each notebook and dropping removed notebooks.
+        Unless ``compact`` is False, the manifest file is compacted accordingly.
+
+        Args:
+            compact: If False, the manifest file is left unchanged, e.g., when the archive is only checked.
+                By default it is True.
+
+        Returns:
+            entries: A dictionary whose keys are the notebook file names and whose values are dictionaries with
+            the ``CurrentKernelVersionId``, ``ByteSize`` and ``SHA256`` of the notebooks.
+        """
+
+        rows = _read_csv(self._manifest_path)
+
+        entries = {}
+        for row in rows:
+            if row['SHA256']:
+                entries[row['FileName']] = {'CurrentKernelVersionId': int(row['CurrentKernelVersionId']),
+                                            'ByteSize': int(row['ByteSize']),
+                                            'SHA256': row['SHA256']}
+            else:
+                entries.pop(row['FileName'], None)
+
+        if compact and len(rows) != len(entries):
+            self.write(entries)
+        return entries
+
+    def write(self, entries):
+        """
+        This method replaces the manifest with the given entries, sorted by file name.
+
+        Args:
+            entries: A dictionary whose keys are the notebook file names and whose values are dictionaries with
+                the ``CurrentKernelVersionId``, ``ByteSize`` and ``SHA256`` of the notebooks.
+        """
+        _write_csv(self._manifest_path, MANIFEST_COLUMNS,
+                   [{'FileName': file_name, **entries[file_name]} for file_name in sorted(entries)])
+
+    def rebuild(self, nb_identifiers, n_workers=None):
+        """
+        This method rebuilds the manifest from the notebooks in the archive, e.g., for archives downloaded before
+        the manifest was introduced. Notebooks that are not referenced in ``nb_identifiers`` are left out.
+
+        Args:
+            nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
+            n_workers: The number of hashing threads. By default it is the number of CPUs.
+
+        Returns:
+            entries: The entries of the new manifest (see :func:`.ArchiveManifest.read`).
+        """
+
+        ids = {(row.UserName, row.CurrentUrlSlug): int(row.CurrentKernelVersionId)
+               for row in nb_identifiers.itertuples()}
+        paths = [path for path in list_notebooks(self._nb_archive_path) if parse_notebook_name(path) in ids]
+
+        print(f'## Hashing {len(paths)} notebooks...')
+        checksums = hash_files(paths, n_workers=n_workers)
+
+        entries = {path.name: {'CurrentKernelVersionId': ids[parse_notebook_name(path)],
+                               'ByteSize': path.stat().st_size,
+                               'SHA256': checksum}
+                   for path, checksum in zip(paths, checksums)}
+        self.write(entries)
+        return entries
+
+
+class ArchiveVerifier:
+    """
+    The ``ArchiveVerifier`` class checks the notebooks in an archive folder against its manifest.
+    """
+
+    def __init__(self, nb_archive_path, n_workers=None):
+        """
+        The constructor of this class sets the notebook archive folder and the number of hashing threads.
+
+        Args:
+            nb_archive_path: The path to the notebook archive folder.
+            n_workers: The number of hashing threads. By default it is the number of CPUs.
+        """
+
+        self._nb_archive_path = Path(nb_archive_path)
+        self._n_workers = n_workers
+        self._manifest = ArchiveManifest(nb_archive_path)
+        self._verification_path = self._nb_archive_path / VERIFICATION_FILE_NAME
+
+    def _read_verification(self):
+        """
+        This method reads the checksums computed by the last verification.
+
+        Returns:
+            verified: A dictionary whose keys are the notebook file names and whose values are
+            ``(ByteSize, MTimeNs, SHA256)`` tuples.
+        """
+        return {row['FileName']: (int(row['ByteSize']), int(row['MTimeNs']), row['SHA256'])
+                for row in _read_csv(self._verification_path)}
+
+    def verify(self, full=False):
+        """
+        This method verifies the notebooks in the archive folder against the manifest.
+        Unless ``full`` is True, only the files whose size or modification time changed since the last
+        verification are hashed again.
+
+        Args:
+            full: If True, all the files are hashed again. By default it is False.
+
+        Returns:
+            report: A dictionary with the number of checked and hashed files and the sorted lists of the
+            ``missing`` (in the manifest, not in the folder), ``extra`` (in the folder, not in the manifest)
+            and ``corrupt`` (whose size or checksum differ from the manifest) notebooks.
+        """
+
+        start = time.perf_counter()
+        # Verifying an archive does not modify its manifest
+        entries = self._manifest.read(compact=False)
+        verified = {} if full else self._read_verification()
+
+        paths = list_notebooks(self._nb_archive_path)
+        stats = {path.name: path.stat() for path in paths}
+
+        # Files whose size and modification time did not change keep the checksum of the last verification
+        checksums = {}
+        to_hash = []
+        for path in paths:
+            stat = stats[path.name]
+            previous = verified.get(path.name)
+            if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                checksums[path.name] = previous[2]
+            else:
+                to_hash.append(path)
+
+        print(f'## Hashing {len(to_hash)} of {len(paths)} notebooks...')
+        checksums.update(zip((path.name for path in to_hash), hash_files(to_hash, n_workers=self._n_workers)))
+
+        _write_csv(self._verification_path, VERIFICATION_COLUMNS,
+                   [{'FileName': path.name, 'ByteSize': stats[path.name].st_size,
+                     'MTimeNs': stats[path.name].st_mtime_ns, 'SHA256': checksums[path.name]} for path in paths])
+
+        corrupt = [file_name for file_name, entry in entries.items()
+                   if file_name in checksums and (entry['ByteSize'] != stats[file_name].st_size or
+                                                  entry['SHA256'] != checksums[file_name])]
+
+        return {
+            'checked': len(paths),
+            'hashed': len(to_hash),
+            'missing': sorted(file_name for file_name in entries if file_name not in checksums),
+            'extra': sorted(file_name for file_name in checksums if file_name not in entries),
+            'corrupt': sorted(corrupt),
+            'seconds': time.perf_counter() - start,
+        }
@@ -3,12 +3,21 @@ This module defines the class that handles the whole preprocessing of the MetaKa
 entity integrity, referential integrity and domain integrity.
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 import pandas as pd
-import numpy as np
 
-# Imports for testing
-from KGTorrent import config
-from KGTorrent.data_loader import DataLoader
+from KGTorrent.dataframe_engine import PandasEngine
+from KGTorrent.profiling import stage
+from KGTorrent.scheduler import PRIORITIES
+
+# Tables needed to identify the notebooks to be downloaded
+NB_IDENTIFIER_TABLES = ('Kernels.csv', 'Users.csv', 'KernelVersions.csv', 'KernelLanguages.csv')
+
+# Columns describing a foreign key constraint
+CONSTRAINT_COLUMNS = ['Table', 'Foreign Key', 'Referenced Table', 'Referenced Column']
+
 
 class MkPreprocessor:
     """
@@ -17,24 +26,33 @@ class MkPreprocessor:
     Foreign key constraints in Meta Kaggle cannot always be resolved as there are many missing rows in the dataset
     (maybe because the related data are not publicly available on the Kaggle platform).
     To overcome this issue and enforce a sound relational structure in the KGTorrent database we preprocess them
-    by using a recursive procedure. This removes rows with unresolvable references before importing Meta Kaggle tables.
+    by removing rows with unresolvable references before importing Meta Kaggle tables.
+
+    Tables are grouped into the strongly connected components of the constraints graph (i.e., groups of tables
+    referencing each other, such as ``Kernels`` and ``KernelVersions``). Each component is cleaned as soon as the
+    components it references are final, so independent components (e.g., the dataset, forum and competition
+    tables) are cleaned concurrently by a pool of threads, which share the final referenced tables without copying them.
     """
 
-    def __init__(self, tables_dict, constraints_df):
+    def __init__(self, tables_dict, constraints_df, engine=None, n_workers=None):
         """
         By providing a dictionary of tables that need to be preprocessed and
         the foreign key constraints information for the purpose, the constructor of this class:
-         - adds a boolean field ``IsSolved`` to the constraints dataframe in order both to keep track of changes in
-           referenced tables and to skip solved constraints in the process.
-         - initializes the list of the visited tables used to avoid cycles while preprocessing.
+         - adds a boolean field ``IsSolved`` to the constraints dataframe in order to keep track of the constraints
+           of the tables that reached their final state.
          - initializes the summary stats ``pandas.DataFrame``
 
         Args:
             tables_dict: The dictionary whose keys are the table names and whose values are the ``pandas.DataFrame`` tables.
             constraints_df: The ``pandas.DataFrame`` which contains the foreign key constraints information
+            engine: The dataframe engine of the tables (see :mod:`.dataframe_engine`). By default it is the ``pandas`` engine.
+            n_workers: The number of threads cleaning independent components. By default it is the number of CPUs.
         """
-        # Keep track tables that have been already visited during the current recursive call
-        self._already_visited = []
+        # Dataframe engine used to process the tables
+        self._engine = engine if engine is not None else PandasEngine()
+
+        # Number of threads cleaning independent components
+        self._n_workers = n_workers or os.cpu_count() or 1
 
         # Dictionary of dataframes that need to be processed
         self._tables_dict = tables_dict
@@ -50,6 +68,9 @@ class MkPreprocessor:
         # Dataframe containing info on row loss after referential integrity checks on referencing tables
         self._stats = pd.DataFrame(columns=['Table', 'Initial#rows', 'Final#rows', 'Ratio'])
 
+        # Tables that have already been handed to the final table callback
+        self._final_tables = set()
+
     def _basic_preprocessing(self):
         """
         This method performs basic preprocessing steps converting dates from string format into the native Python date format.
@@ -61,41 +82,30 @@ class MkPreprocessor:
             # SPECIFIC TABLES FIX
             if 'ForumMessageVotes' in table_name:
                 print(f'\t{table_name} fix indexing...')
-                self._tables_dict[table_name].drop_duplicates(subset=['Id'], inplace=True)
+                self._tables_dict[table_name] = self._engine.drop_duplicates(self._tables_dict[table_name],
+                                                                             subset=['Id'])
 
             if 'Submissions' in table_name:
                 print(f'\t{table_name} fix precision columns')
-
-                self._tables_dict[table_name]['PublicScoreLeaderboardDisplay'] = self._tables_dict[table_name][
-                    'PublicScoreLeaderboardDisplay'].map(lambda x: round(float(x), 3)).map(
-                    lambda x: x if not np.isinf(x) else np.NaN)
-
-                self._tables_dict[table_name]['PublicScoreFullPrecision'] = self._tables_dict[table_name][
-                    'PublicScoreFullPrecision'].map(lambda x: round(float(x), 3)).map(
-                    lambda x: x if not np.isinf(x) else np.NaN)
-
-                self._tables_dict[table_name]['PrivateScoreLeaderboardDisplay'] = self._tables_dict[table_name][
-                    'PrivateScoreLeaderboardDisplay'].map(lambda x: round(float(x), 3)).map(
-                    lambda x: x if not np.isinf(x) else np.NaN)
-
-                self._tables_dict[table_name]['PrivateScoreFullPrecision'] = self._tables_dict[table_name][
-                    'PrivateScoreFullPrecision'].map(lambda x: round(float(x), 3)).map(
-                    lambda x: x if not np.isinf(x) else np.NaN)
+                self._tables_dict[table_name] = self._engine.round_scores(self._tables_dict[table_name],
+                                                                          ['PublicScoreLeaderboardDisplay',
+                                                                           'PublicScoreFullPrecision',
+                                                                           'PrivateScoreLeaderboardDisplay',
+                                                                           'PrivateScoreFullPrecision'],
+                                                                          decimals=3)
 
             # DATE COLUMNS FIX
-            date_columns = [column for column in self._tables_dict[table_name].columns if column.endswith('Date')]
+            date_columns = [column for column in self._engine.columns(self._tables_dict[table_name])
+                            if column.endswith('Date')]
 
             if len(date_columns) != 0:
                 print(f'\t{table_name} parsing date columns...')
-                for column in date_columns:
-                    self._tables_dict[table_name][column] = pd.to_datetime(self._tables_dict[table_name][column],
-                                                                           infer_datetime_format=True,
-                                                                           cache=True)
+                self._tables_dict[table_name] = self._engine.parse_dates(self._tables_dict[table_name], date_columns)
 
             # Set initial rows in stats df
             new_stats_row = {
                 'Table': table_name,
-                'Initial#rows': self._tables_dict[table_name].shape[0],
+                'Initial#rows': self._engine.n_rows(self._tables_dict[table_name]),
                 'Final#rows': None,
                 'Ratio': None
             }
@@ -103,131 +113,270 @@ class MkPreprocessor:
 
         print()
 
-    def _process_referencing_table(self, referencing):
+    def _get_components(self):
         """
-        This method is invoked recursively to drop rows with unsolvable foreign key constraints.
-        It uses :func:`.MKPreprocessor.clean_referencing_table` to do the actual cleaning.
-        Its purpose is to traverse the table relationships graph to take full relationship chains into account.
-        It stops when it detects cycles.
+        This method groups the tables into the strongly connected components of the constraints graph,
+        i.e., the largest groups of tables that reference each other, directly or transitively.
+
+        Returns:
+            - components   - the list of the components, as sets of table names
+            - dependencies - the list of the sets of indexes of the components referenced by each component
+        """
+
+        references = {table_name: set() for table_name in self._tables_dict.keys()}
+        for referencing, referenced in zip(self._constraints_df['Table'], self._constraints_df['Referenced Table']):
+            references[referencing].add(referenced)
+
+        # Tables reachable from each table along the foreign keys
+        reachable = {}
+        for table_name, referenced_tables in references.items():
+            reachable[table_name] = set()
+            frontier = set(referenced_tables)
+            while len(frontier) != 0:
+                reachable[table_name] |= frontier
+                frontier = set().union(*(references[referenced] for referenced in frontier)) - reachable[table_name]
+
+        components = []
+        component_index = {}
+        for table_name in references.keys():
+            if table_name in component_index:
+                continue
+            component = {table_name} | {other for other in reachable[table_name] if table_name in reachable[other]}
+            for other in component:
+                component_index[other] = len(components)
+            components.append(component)
+
+        dependencies = [{component_index[referenced] for table_name in component
+                         for referenced in references[table_name]} - {index}
+                        for index, component in enumerate(components)]
+
+        return components, dependencies
+
+    def _clean_component(self, component, constraints):
+        """
+        This method drops the rows with unsolvable foreign key constraints from the tables of a component.
+        The tables referenced outside the component must be final: the constraints pointing to them are applied once,
+        while the constraints within the component are applied until no more rows are removed,
+        since removals propagate along the cycles of the component.
+        It uses :func:`.MKPreprocessor._clean_referencing_table` to do the actual cleaning.
 
         Args:
-            referencing: the table with foreign keys to be analyzed.
+            component: The set of the names of the tables of the component.
+            constraints: The list of the foreign key constraints of the tables of the component,
+                as (``Table``, ``Foreign Key``, ``Referenced Table``, ``Referenced Column``) tuples.
+        """
+
+        if len(constraints) == 0:
+            return
+
+        print("### PREPROCESSING", ', '.join(sorted(component)))
+
+        # The stage is marked on the worker thread, so that the whole cleaning of the component is sampled
+        with stage('integrity'):
+            # The constraints pointing outside the component are applied together to each referencing table
+            external_constraints = {}
+            for constraint in constraints:
+                if constraint[2] not in component:
+                    external_constraints.setdefault(constraint[0], []).append(constraint)
+            for referencing, table_constraints in external_constraints.items():
+                self._clean_referencing_table(referencing, table_constraints)
+
+            internal_constraints = [constraint for constraint in constraints if constraint[2] in component]
+            changed = len(internal_constraints) != 0
+            while changed:
+                changed = False
+                for constraint in internal_constraints:
+                    changed |= self._clean_referencing_table(constraint[0], [constraint])
+
+    def _clean_referencing_table(self, referencing, constraints):
+        """
+        Given some foreign key constraints of a table, this method cleans the referencing table by removing all the rows
+        that point to missing tuples in the referenced tables.
+
+        Args:
+            referencing: the table to be cleaned.
+            constraints: the list of the foreign key constraints of the table,
+                as (``Table``, ``Foreign Key``, ``Referenced Table``, ``Referenced Column``) tuples.
+
+        Returns:
+            bool: True if any rows have been removed from the referencing table, False otherwise.
         """
 
-        print("### PREPROCESSING", referencing)
+        # I update the referencing table by removing rows that miss a corresponding row in the referenced tables
+        references = [(fk, self._tables_dict[referenced], rc) for _, fk, referenced, rc in constraints]
+        self._tables_dict[referencing], removed_rows = self._engine.filter_referencing(
+            self._tables_dict[referencing], references)
 
-        self._already_visited.append(referencing)
-        referenced_list = self._constraints_df.loc[
-            self._constraints_df['Table'] == referencing,
-            'Referenced Table'].values
+        for (_, fk, referenced, rc), n_removed in zip(constraints, removed_rows):
+            print(f'\tUpdated the referencing table "{referencing}" (foreign key "{fk}") '
+                  f'with the referenced table "{referenced}" (column "{rc}"): {n_removed} rows removed')
+        return sum(removed_rows) != 0
 
-        # If referenced_list is NOT empty
-        # I recursively process each referenced table and subsequently adjust the current
-        if len(referenced_list) != 0:
-            for referenced in referenced_list:
-                print(self._already_visited)
-                if referenced not in self._already_visited:
-                    self._process_referencing_table(referenced)
-                self._clean_referencing_table(referencing, referenced)
+    def _get_shrinkable_tables(self):
+        """
+        This method computes the set of tables that might still lose rows during the referential integrity preprocessing:
+        the tables with unsolved foreign key constraints and, transitively, the tables referencing them.
 
-    def _clean_referencing_table(self, referencing, referenced):
+        Returns:
+            shrinkable_tables: The set of names of the tables that are not in their final state yet.
         """
-        Given two tables - a referencing table and a referenced table - this method cleans
-        the referencing table by removing all the rows that point to missing tuples in the referenced table;
-        once the referencing table has been cleaned, this method marks the related foreign key constraint as "solved".
-        Moreover, each time the procedure actually removes rows from a referencing table, it updates
-        the constraints table accordingly: all the entries in which the current referencing table plays
-        the role of referenced table are marked as "unsolved".
+
+        shrinkable_tables = set(self._constraints_df.loc[~ self._constraints_df['IsSolved'], 'Table'])
+
+        # Propagate along the foreign keys, from referenced tables to referencing tables
+        changed = True
+        while changed:
+            referencing = set(self._constraints_df.loc[
+                                  self._constraints_df['Referenced Table'].isin(shrinkable_tables), 'Table'])
+            changed = not referencing.issubset(shrinkable_tables)
+            shrinkable_tables |= referencing
+
+        return shrinkable_tables
+
+    def _hand_final_tables(self, on_table_final):
+        """
+        This method passes the tables that reached their final state since the last call to the given callback.
+        A table is final when all the constraints it depends on, directly or transitively, are solved:
+        from then on, no other row can be removed from it.
 
         Args:
-            referencing: the table to be cleaned.
-            referenced: the table that contains rows referenced by the table that has to be cleaned.
+            on_table_final: A function accepting a table name and the related final table.
         """
 
-        # From the constraints_df, I select info on the foreign keys of the referencing table
-        # that point to the current referenced table.
-        # In most cases I have only one of such foreign keys, but they might be more
-        constraints_data = self._constraints_df.loc[
-            ((self._constraints_df['Table'] == referencing) &
-             (self._constraints_df['Referenced Table'] == referenced)),
-            ['Foreign Key', 'Referenced Column']
-        ]
-
-        # I cycle through the foreign keys of the referencing table that point to the current referenced table
-        for _, constraint in constraints_data.iterrows():
-
-            fk = constraint['Foreign Key']
-            print(f'\t\tForeign key: {fk}')
-
-            rc = constraint['Referenced Column']
-            print(f'\t\tReferenced column: {rc}')
-
-            old_df_rows = self._tables_dict[referencing].shape[0]
-
-            # For each foreign key, I update the referencing table
-            # by removing rows that miss a corresponding row in the referenced table
-            print(
-                f'\tUpdating the referencing table "{referencing}" (foreign key "{fk}") '
-                f'with the referenced table "{referenced}"')
-            self._tables_dict[referencing] = self._tables_dict[referencing][
-                (self._tables_dict[referencing][fk].isin(self._tables_dict[referenced][rc])) |
-                (self._tables_dict[referencing][fk].isnull())
-                ]
-
-            # If any rows have been removed, I mark the constraints in which
-            # this table is 'Referenced Table' as not solved
-            if self._tables_dict[referencing].shape[0] != old_df_rows:
-                self._constraints_df.loc[
-                    (self._constraints_df['Referenced Table'] == referencing), 'IsSolved'] = False
-
-            # Then I mark the constraint as solved
-            self._constraints_df.loc[((self._constraints_df['Table'] == referencing) &
-                                      (self._constraints_df['Referenced Table'] == referenced) &
-                                      (self._constraints_df['Foreign Key'] == fk)), 'IsSolved'] = True
-
-    def preprocess_mk(self):
+        if on_table_final is None:
+            return
+
+        shrinkable_tables = self._get_shrinkable_tables()
+        for table_name in self._tables_dict.keys():
+            if table_name not in shrinkable_tables and table_name not in self._final_tables:
+                self._final_tables.add(table_name)
+                self._tables_dict[table_name] = self._engine.collect(self._tables_dict[table_name])
+                on_table_final(table_name, self._tables_dict[table_name])
+
+    def preprocess_mk(self, on_table_final=None):
         """
-        This method executes the basic preprocessing method :func:`.MKPreprocessor.__basic_preprocessing` and it runs
-        the recursive preprocessing method :func:`.MKPreprocessor.__process_referencing_table` until foreign key
-        constraints are solved for all tables.
+        This method executes the basic preprocessing method :func:`.MKPreprocessor._basic_preprocessing` and it
+        cleans the components of the constraints graph with :func:`.MKPreprocessor._clean_component`
+        until foreign key constraints are solved for all tables.
         It also builds summary stats about the filtering process.
 
+        Tables can be consumed while the preprocessing is still running: each table is passed to the
+        ``on_table_final`` callback as soon as it reaches its final state.
+
+        Args:
+            on_table_final: An optional function accepting a table name and the related table;
+                it is called exactly once for each table, as soon as no more rows can be removed from it.
+
         Returns:
-            - tables_dict - dictionary of preprocessed tables
+            - tables_dict - dictionary of preprocessed tables, in the format of the dataframe engine
             - stats       - summary stats related to the filtering process
         """
 
         print('### Executing basic preprocessing...')
-        self._basic_preprocessing()
+        with stage('basic_preprocessing'):
+            self._basic_preprocessing()
 
         print('### Executing referential integrity preprocessing...')
-
-        # While all constraint fields 'IsSolved' is false
-        while not self._constraints_df['IsSolved'].all():
-
-            # Pre-process only referencing tables with constraints 'Not Solved' before writing
-            # (and write those w/o fks)
-            for value in (self._constraints_df[~ self._constraints_df['IsSolved']])['Table'].unique():
-                print("\n")
-                print("-------------")
-                print("- New cycle -")
-                print("-------------")
-
-                self._process_referencing_table(value)
-                self._already_visited = []
+        with stage('integrity'):
+            self._hand_final_tables(on_table_final)
+
+            components, dependencies = self._get_components()
+            constraints = list(self._constraints_df[CONSTRAINT_COLUMNS].itertuples(index=False, name=None))
+            print(f'### Cleaning {len(components)} components of the constraints graph '
+                  f'with {self._n_workers} threads...')
+
+            # Components are submitted as soon as the components they reference are done
+            pending = set(range(len(components)))
+            done = set()
+            running = {}
+            with ThreadPoolExecutor(max_workers=self._n_workers, thread_name_prefix='MkPreprocessor') as pool:
+                while len(pending) != 0 or len(running) != 0:
+                    for index in sorted(pending):
+                        if dependencies[index].issubset(done):
+                            pending.remove(index)
+                            component_constraints = [constraint for constraint in constraints
+                                                     if constraint[0] in components[index]]
+                            future = pool.submit(self._clean_component, components[index], component_constraints)
+                            running[future] = index
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        index = running.pop(future)
+                        future.result()
+                        done.add(index)
+                        is_solved = self._constraints_df['Table'].isin(components[index])
+                        self._constraints_df.loc[is_solved, 'IsSolved'] = True
+
+                    self._hand_final_tables(on_table_final)
+
+        # All the tables are final: their pending operations are executed once, here
+        for table_name in self._tables_dict.keys():
+            if table_name not in self._final_tables:
+                self._tables_dict[table_name] = self._engine.collect(self._tables_dict[table_name])
 
         # Final update of the stats table
         for _, row in self._stats.iterrows():
-            self._stats.loc[self._stats['Table'] == row['Table'], 'Final#rows'] = self._tables_dict[row['Table']].shape[0]
+            self._stats.loc[self._stats['Table'] == row['Table'], 'Final#rows'] = self._engine.n_rows(
+                self._tables_dict[row['Table']])
 
-        self._stats['Ratio'] = self._stats['Final#rows'] / self._stats['Initial#rows'] * 100
+        # Tables may be empty (e.g., in samples): their ratio is undefined
+        self._stats['Ratio'] = self._stats['Final#rows'].astype(float) / self._stats['Initial#rows'].astype(float) * 100
         self._stats['Ratio'] = self._stats['Ratio'].astype(float).round(decimals=2)
 
         return self._tables_dict, self._stats
 
+    def get_nb_identifiers(self, languages, priority=None):
+        """
+        This method retrieves slugs and identifiers of notebooks written in the provided languages directly from
+        the preprocessed tables, without querying the database.
+        It returns the same notebooks as :func:`.DbCommunicationHandler.get_nb_identifiers` and can be called
+        as soon as the tables in ``NB_IDENTIFIER_TABLES`` are final.
+
+        Args:
+            languages: A string array of notebook languages present in Kaggle.
+            priority: The optional name of a priority in :data:`.scheduler.PRIORITIES` defining the order of the notebooks.
+
+        Returns:
+            nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
+        """
+
+        kernels = self._engine.to_pandas(self._tables_dict['Kernels.csv'])
+        users = self._engine.to_pandas(self._tables_dict['Users.csv'])
+        kernel_versions = self._engine.to_pandas(self._tables_dict['KernelVersions.csv'])
+        kernel_languages = self._engine.to_pandas(self._tables_dict['KernelLanguages.csv'])
+
+        # Languages are matched case-insensitively, as with the LIKE operator in MySQL
+        languages = [lang.lower() for lang in languages]
+        kernel_languages = kernel_languages.loc[kernel_languages['Name'].str.lower().isin(languages), ['Id']]
+
+        kernel_versions = kernel_versions[['Id', 'ScriptLanguageId', 'CreationDate']].merge(
+            kernel_languages, left_on='ScriptLanguageId', right_on='Id', suffixes=('', '_language'))
+
+        nb_identifiers = kernels[['AuthorUserId', 'CurrentUrlSlug', 'CurrentKernelVersionId', 'Medal', 'TotalVotes']] \
+            .merge(users[['Id', 'UserName']], left_on='AuthorUserId', right_on='Id') \
+            .merge(kernel_versions[['Id', 'CreationDate']], left_on='CurrentKernelVersionId', right_on='Id')
+
+        # Order the notebooks, breaking ties by identifier as in the database query
+        if priority is not None:
+            columns, ascending = PRIORITIES[priority][2]
+            nb_identifiers = nb_identifiers.sort_values(columns + ['CurrentKernelVersionId'],
+                                                        ascending=ascending + [True],
+                                                        na_position='last',
+                                                        kind='mergesort')
+
+        nb_identifiers = nb_identifiers[['UserName', 'CurrentUrlSlug', 'CurrentKernelVersionId']] \
+            .astype({'CurrentKernelVersionId': 'int64'}) \
+            .reset_index(drop=True)
+
+        return nb_identifiers
+
 
 if __name__ == '__main__':
 
+    # Imports for testing
+    from KGTorrent import config
+    from KGTorrent.data_loader import DataLoader
+
     print("********************")
     print("*** LOADING DATA ***")
     print("********************")
@@ -0,0 +1,204 @@
+"""
+This module defines the function and the class that extract facts from the downloaded notebooks
+and store them in the KGTorrent database, next to the Meta Kaggle tables.
+
+For each notebook in the archive, the ``notebookfacts`` table stores its local path, size and modification time,
+the number of cells by type and whether code cells have outputs; the ``notebookimports`` table stores the modules
+imported by its code cells. Both tables are keyed on the ``CurrentKernelVersionId`` of the notebook.
+
+Extraction is incremental: only notebooks that are new, or whose size or modification time changed since the last
+extraction, are parsed again; facts of notebooks that are no longer in the archive are deleted.
+"""
+
+import logging
+import os
+import re
+import time
+
+import pandas as pd
+
+from KGTorrent.archive import load_notebook, get_cells, get_source, parse_notebook_name, list_notebooks, map_notebooks
+
+# Import statements of code cells: "import a.b as c, d" and "from a.b import c"
+_IMPORTED_NAME = r'[\w.]+(?:[ \t]+as[ \t]+\w+)?'
+_IMPORT_PATTERN = re.compile(rf'^[ \t]*import[ \t]+({_IMPORTED_NAME}(?:[ \t]*,[ \t]*{_IMPORTED_NAME})*)', re.MULTILINE)
+_FROM_IMPORT_PATTERN = re.compile(r'^[ \t]*from[ \t]+([\w.]+)[ \t]+import\b', re.MULTILINE)
+
+# Maximum length of the module names stored in the database
+MAX_MODULE_LENGTH = 255
+
+
+def get_imported_modules(code):
+    """
+    This function finds the modules imported by a piece of Python code.
+    Relative imports are ignored.
+
+    Args:
+        code: The source of a code cell.
+
+    Returns:
+        modules: The set of the imported module names (e.g., ``sklearn.model_selection``).
+    """
+
+    modules = set()
+    for match in _IMPORT_PATTERN.finditer(code):
+        for alias in match.group(1).split(','):
+            modules.add(alias.split()[0])
+    for match in _FROM_IMPORT_PATTERN.finditer(code):
+        modules.add(match.group(1))
+    return {module for module in modules if not module.startswith('.') and len(module) <= MAX_MODULE_LENGTH}
+
+
+def extract_notebook_facts(path):
+    """
+    This function parses a notebook file and extracts its facts.
+
+    Args:
+        path: The path to the notebook file.
+
+    Returns:
+        facts: A dictionary with the facts of the notebook (the ``Modules`` key holds the sorted list of imported
+        modules), or ``None`` if the notebook cannot be parsed.
+    """
+
+    # noinspection PyBroadException
+    try:
+        notebook = load_notebook(path)
+        cells = get_cells(notebook)
+    except Exception:
+        return None
+
+    cell_types = [cell.get('cell_type') for cell in cells]
+    code_cells = [cell for cell in cells if cell.get('cell_type') == 'code']
+
+    modules = set()
+    for cell in code_cells:
+        modules |= get_imported_modules(get_source(cell))
+
+    return {
+        'NbFormat': notebook.get('nbformat'),
+        'NCells': len(cells),
+        'NCodeCells': len(code_cells),
+        'NMarkdownCells': cell_types.count('markdown'),
+        'NRawCells': cell_types.count('raw'),
+        'HasOutputs': any(len(cell.get('outputs') or []) != 0 for cell in code_cells),
+        'Modules': sorted(modules),
+    }
+
+
+class NotebookExtractor:
+    """
+    The ``NotebookExtractor`` class extracts facts from the notebooks in the notebook archive and
+    stores them in the KGTorrent database.
+    Notebooks are parsed in parallel by a pool of processes.
+    """
+
+    def __init__(self, db_engine, nb_archive_path, n_workers=None):
+        """
+        The constructor of this class sets the database, the notebook archive folder and the size of the process pool.
+
+        Args:
+            db_engine: The :class:`.DbCommunicationHandler` of the KGTorrent database.
+            nb_archive_path: The path to the notebook archive folder.
+            n_workers: The number of worker processes. By default it is the number of CPUs.
+        """
+
+        self._db_engine = db_engine
+        self._nb_archive_path = nb_archive_path
+        self._n_workers = n_workers
+
+    def _find_changed_notebooks(self, nb_identifiers):
+        """
+        This method compares the notebooks in the archive with the facts stored in the database.
+
+        Args:
+            nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
+
+        Returns:
+            - changed     - the list of ``(CurrentKernelVersionId, path, stat)`` tuples of new or changed notebooks
+            - removed_ids - the list of ``CurrentKernelVersionId`` of notebooks no longer in the archive
+            - n_unknown   - the number of notebooks in the archive that are not referenced in the database
+              (or whose identifier is already taken by another notebook file)
+        """
+
+        ids = {(row.UserName, row.CurrentUrlSlug): int(row.CurrentKernelVersionId)
+               for row in nb_identifiers.itertuples()}
+
+        stored = self._db_engine.get_notebook_facts()
+        stored = {int(row.CurrentKernelVersionId): (int(row.ByteSize), int(row.MTimeNs))
+                  for row in stored.itertuples()}
+
+        changed = []
+        present = set()
+        n_unknown = 0
+        for path in list_notebooks(self._nb_archive_path):
+            kernel_version_id = ids.get(parse_notebook_name(path))
+            if kernel_version_id is None or kernel_version_id in present:
+                n_unknown += 1
+                continue
+
+            present.add(kernel_version_id)
+            stat = path.stat()
+            if stored.get(kernel_version_id) != (stat.st_size, stat.st_mtime_ns):
+                changed.append((kernel_version_id, path, stat))
+
+        removed_ids = [kernel_version_id for kernel_version_id in stored if kernel_version_id not in present]
+
+        return changed, removed_ids, n_unknown
+
+    def extract(self, nb_identifiers):
+        """
+        This method extracts the facts of new and changed notebooks and updates the database.
+
+        Args:
+            nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers
+                (see :func:`.DbCommunicationHandler.get_nb_identifiers`).
+
+        Returns:
+            report: A dictionary with the number of extracted, deleted, unparsable and unknown notebooks.
+        """
+
+        self._db_engine.create_notebook_tables()
+
+        changed, removed_ids, n_unknown = self._find_changed_notebooks(nb_identifiers)
+        print(f'## Extracting facts from {len(changed)} new or changed notebooks...')
+
+        start = time.perf_counter()
+        results = map_notebooks(extract_notebook_facts, [path for _, path, _ in changed], n_workers=self._n_workers)
+
+        facts_rows = []
+        imports_rows = []
+        n_unparsable = 0
+        for (kernel_version_id, path, stat), facts in zip(changed, results):
+            if facts is None:
+                n_unparsable += 1
+                logging.warning(f'Notebook {path} could not be parsed')
+                continue
+
+            for module in facts.pop('Modules'):
+                imports_rows.append({'CurrentKernelVersionId': kernel_version_id, 'Module': module})
+            facts_rows.append({
+                'CurrentKernelVersionId': kernel_version_id,
+                'LocalPath': os.path.abspath(path),
+                'ByteSize': stat.st_size,
+                'MTimeNs': stat.st_mtime_ns,
+                **facts,
+            })
+
+        facts_df = pd.DataFrame(facts_rows, columns=['CurrentKernelVersionId', 'LocalPath', 'ByteSize', 'MTimeNs',
+                                                     'NbFormat', 'NCells', 'NCodeCells', 'NMarkdownCells',
+                                                     'NRawCells', 'HasOutputs'])
+        imports_df = pd.DataFrame(imports_rows, columns=['CurrentKernelVersionId', 'Module'])
+        stale_ids = [kernel_version_id for kernel_version_id, _, _ in changed] + removed_ids
+        self._db_engine.replace_notebook_facts(stale_ids, facts_df, imports_df)
+
+        report = {
+            'extracted': facts_df.shape[0],
+            'imports': imports_df.shape[0],
+            'deleted': len(removed_ids),
+            'unparsable': n_unparsable,
+            'unknown': n_unknown,
+            'seconds': time.perf_counter() - start,
+        }
+        logging.info(f'Notebook extraction completed: {report}')
+        return report
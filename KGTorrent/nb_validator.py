@@ -0,0 +1,229 @@
+"""
+This module defines the functions and the class that check that downloaded notebooks are valid Jupyter notebooks.
+
+A notebook is valid when it is a JSON object with an integer ``nbformat`` version and a list of cells
+(``cells`` since nbformat 4, ``worksheets`` before), each cell being an object with a known ``cell_type``
+and a string or list ``source``.
+Empty files, HTML pages (e.g., login or error pages served with a ``200 OK`` status) and truncated JSON are
+rejected. Rejected notebooks are moved to the ``quarantine`` subfolder of the notebook archive, and the reason
+of each rejection is appended to ``quarantine/reasons.jsonl``.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+
+from KGTorrent.archive import loads, list_notebooks, map_notebooks
+from KGTorrent.manifest import ArchiveManifest
+
+# Name of the folder, inside the notebook archive, where invalid notebooks are moved
+QUARANTINE_FOLDER_NAME = 'quarantine'
+
+# Name of the file, inside the quarantine folder, listing the reason of each rejection
+QUARANTINE_REASONS_FILE_NAME = 'reasons.jsonl'
+
+# Cell types allowed by the nbformat specification (heading cells only exist before nbformat 4)
+CELL_TYPES = ('code', 'markdown', 'raw', 'heading')
+
+
+def validate_notebook(content):
+    """
+    This function checks the structure of a notebook.
+
+    Args:
+        content: The content of the notebook file, as ``bytes``.
+
+    Returns:
+        reason: A short description of the problem, or ``None`` if the notebook is valid.
+    """
+
+    stripped = content.strip()
+    if len(stripped) == 0:
+        return 'empty file'
+    if stripped[:1] == b'<':
+        return 'HTML page'
+
+    try:
+        notebook = loads(content)
+    except ValueError as e:
+        return f'invalid JSON: {e}'
+
+    if not isinstance(notebook, dict):
+        return 'not a JSON object'
+
+    nbformat = notebook.get('nbformat')
+    if not isinstance(nbformat, int) or isinstance(nbformat, bool):
+        return 'missing nbformat version'
+    if not isinstance(notebook.get('metadata', {}), dict):
+        return 'invalid metadata'
+
+    # Notebooks before nbformat 4 store their cells in worksheets
+    if nbformat >= 4:
+        cells = notebook.get('cells')
+    else:
+        worksheets = notebook.get('worksheets')
+        if not isinstance(worksheets, list) or not all(isinstance(ws, dict) for ws in worksheets):
+            return 'missing worksheets'
+        cells = [cell for ws in worksheets for cell in ws.get('cells', [])]
+
+    if not isinstance(cells, list):
+        return 'missing cells'
+
+    for i, cell in enumerate(cells):
+        if not isinstance(cell, dict) or cell.get('cell_type') not in CELL_TYPES:
+            return f'invalid cell type: cell {i}'
+
+        # Code cells of nbformat 3 store their source in the input field
+        source = cell.get('source', cell.get('input', ''))
+        if not isinstance(source, (str, list)):
+            return f'invalid source: cell {i}'
+
+    return None
+
+
+def validate_notebook_file(path):
+    """
+    This function checks the structure of a notebook file.
+
+    Args:
+        path: The path to the notebook file.
+
+    Returns:
+        reason: A short description of the problem, or ``None`` if the notebook is valid.
+    """
+
+    try:
+        with open(path, 'rb') as notebook_file:
+            content = notebook_file.read()
+    except OSError as e:
+        return f'unreadable file: {e}'
+
+    return validate_notebook(content)
+
+
+class NotebookValidator:
+    """
+    The ``NotebookValidator`` class validates the notebooks of a notebook archive and quarantines the invalid ones.
+    Large batches of files are validated in parallel by a pool of processes.
+
+    Quarantined notebooks are no longer in the notebook archive folder, nor in its manifest,
+    so they are requested again by the next download session.
+    """
+
+    def __init__(self, nb_archive_path, n_workers=None):
+        """
+        The constructor of this class sets the notebook archive folder and the size of the process pool.
+
+        Args:
+            nb_archive_path: The path to the notebook archive folder.
+            n_workers: The number of worker processes. By default it is the number of CPUs.
+        """
+
+        self._nb_archive_path = Path(nb_archive_path)
+        self._quarantine_path = self._nb_archive_path / QUARANTINE_FOLDER_NAME
+        self._manifest = ArchiveManifest(nb_archive_path)
+        self._n_workers = n_workers or os.cpu_count() or 1
+
+    def validate_files(self, paths):
+        """
+        This method validates a batch of notebook files.
+
+        Args:
+            paths: The list of paths to the notebook files.
+
+        Returns:
+            invalid: A dictionary whose keys are the paths to the invalid notebooks and whose values are the reasons.
+        """
+
+        reasons = map_notebooks(validate_notebook_file, paths, n_workers=self._n_workers)
+        return {path: reason for path, reason in zip(paths, reasons) if reason is not None}
+
+    def _log_quarantine(self, file_name, reason):
+        """
+        This method appends the reason of a rejection to the quarantine reasons file.
+
+        Args:
+            file_name: The name of the quarantined notebook file.
+            reason: The reason of the rejection.
+        """
+
+        entry = {'File': file_name, 'Reason': reason, 'QuarantinedAt': time.time()}
+        with open(self._quarantine_path / QUARANTINE_REASONS_FILE_NAME, 'a') as reasons_file:
+            reasons_file.write(json.dumps(entry) + '\n')
+
+        logging.warning(f'Notebook {file_name} quarantined: {reason}')
+
+    def quarantine(self, path, reason):
+        """
+        This method moves a notebook file to the quarantine folder and records its removal in the manifest.
+
+        Args:
+            path: The path to the notebook file.
+            reason: The reason of the rejection.
+
+        Returns:
+            quarantine_path: The new path of the notebook file.
+        """
+
+        path = Path(path)
+        self._quarantine_path.mkdir(exist_ok=True)
+
+        quarantine_path = self._quarantine_path / path.name
+        os.replace(path, quarantine_path)
+        self._manifest.remove(path.name)
+        self._log_quarantine(path.name, reason)
+        return quarantine_path
+
+    def quarantine_content(self, file_name, content, reason):
+        """
+        This method writes the content of a rejected notebook directly to the quarantine folder.
+        It is used for downloaded notebooks that are validated before being written to the notebook archive.
+
+        Args:
+            file_name: The name of the notebook file.
+            content: The content of the notebook, as ``bytes``.
+            reason: The reason of the rejection.
+
+        Returns:
+            quarantine_path: The path of the quarantined notebook file.
+        """
+
+        self._quarantine_path.mkdir(exist_ok=True)
+
+        quarantine_path = self._quarantine_path / file_name
+        with open(quarantine_path, 'wb') as notebook_file:
+            notebook_file.write(content)
+        self._log_quarantine(file_name, reason)
+        return quarantine_path
+
+    def validate_archive(self):
+        """
+        This method validates all the notebooks in the notebook archive folder and quarantines the invalid ones.
+
+        Returns:
+            report: A dictionary with the number of checked, valid and quarantined notebooks
+            and the number of rejections for each kind of problem.
+        """
+
+        paths = list_notebooks(self._nb_archive_path)
+        print(f'## Validating {len(paths)} notebooks with {self._n_workers} processes...')
+
+        start = time.perf_counter()
+        invalid = self.validate_files(paths)
+        elapsed = time.perf_counter() - start
+
+        for path, reason in invalid.items():
+            self.quarantine(path, reason)
+
+        report = {
+            'checked': len(paths),
+            'valid': len(paths) - len(invalid),
+            'quarantined': len(invalid),
+            'seconds': elapsed,
+            'reasons': dict(Counter(reason.split(':')[0] for reason in invalid.values())),
+        }
+        logging.info(f'Archive validation completed: {report}')
+        return report
@@ -0,0 +1,259 @@
+"""
+This module defines the profiler of the KGTorrent pipeline, enabled with the ``--profile`` option.
+
+The stages of the pipeline (e.g., the loading of Meta Kaggle, the preprocessing and the population of the database)
+are marked with the :func:`.stage` context manager, which does nothing unless a :class:`.Profiler` is running.
+While a stage is active on a thread, the stacks of the thread are sampled at a fixed interval and counted in the
+*folded* format (one ``frame;frame;...;frame count`` line per distinct stack), which can be rendered as a flame graph
+by ``flamegraph.pl`` or loaded in `speedscope <https://www.speedscope.app>`_.
+Sampling keeps the overhead low and, unlike deterministic profilers, also covers the worker threads of the pipeline.
+The memory allocated by each stage and still alive at its end is measured with ``tracemalloc``: since ``tracemalloc``
+traces the whole process, the memory of a stage also includes the allocations of the stages running concurrently
+(e.g., of the preprocessing while the tables are written to the database).
+"""
+
+import contextlib
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+# Default time (in seconds) between two samples of the stacks
+DEFAULT_INTERVAL = 0.01
+
+# Number of allocation sites listed in the memory report of each stage
+TOP_ALLOCATIONS = 25
+
+# Name of the file summarizing all the stages
+SUMMARY_FILE_NAME = 'summary.txt'
+
+# The running profiler, if any
+_profiler = None
+
+
+def stage(name):
+    """
+    This function marks a stage of the pipeline, to be used in a ``with`` statement.
+    Stages with the same name (e.g., the same stage running on several threads) are reported together.
+
+    Args:
+        name: The name of the stage.
+
+    Returns:
+        context: The context manager of the stage, which does nothing unless a :class:`.Profiler` is running.
+    """
+
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name)
+
+
+class Profiler:
+    """
+    The ``Profiler`` class samples the stacks of the threads running a stage of the pipeline on a background thread
+    and writes, for each stage, the following files to the output folder:
+
+    - ``<stage>.folded`` - the sampled stacks, in the folded format of flame graphs;
+    - ``<stage>.memory.txt`` - the sites allocating most of the memory still alive at the end of the stage.
+
+    Snapshots of the memory are taken when a stage runs for the first time and whenever it ends, and they are only
+    compared when the profiler is stopped, since comparing snapshots is much slower than taking them.
+
+    The wall time, the number of samples and the memory of each stage are summarized in ``summary.txt``.
+    """
+
+    def __init__(self, output_path, interval=DEFAULT_INTERVAL):
+        """
+        The constructor of this class sets the output folder and the sampling interval.
+
+        Args:
+            output_path: The path to the folder where the profiles are written.
+            interval: The time (in seconds) between two samples of the stacks. By default it is 0.01.
+        """
+
+        self._output_path = Path(output_path)
+        self._interval = interval
+
+        # Stack of the active stages of each thread, by thread identifier
+        self._thread_stages = {}
+
+        # Number of threads running each stage, and start time of the stages running on at least a thread
+        self._n_active = Counter()
+        self._started_at = {}
+
+        # Statistics of each stage, by name
+        self._wall_times = Counter()
+        self._samples = {}
+
+        # Memory snapshots of each stage, by name: the first taken at its first start, the second at its last end
+        self._snapshots = {}
+
+        # Memory allocated by each stage and still alive at its end, by name
+        self._memory = Counter()
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='Profiler', daemon=True)
+
+    def start(self):
+        """
+        This method starts ``tracemalloc`` and the sampling thread, and enables the :func:`.stage` context managers.
+        """
+
+        global _profiler
+
+        tracemalloc.start()
+        self._thread.start()
+        _profiler = self
+        print(f'## Profiling enabled: the profiles will be written to {self._output_path}')
+
+    def stop(self):
+        """
+        This method stops the sampling thread and ``tracemalloc``, and writes the profiles of the stages.
+        """
+
+        global _profiler
+
+        _profiler = None
+        self._stop_event.set()
+        self._thread.join()
+        tracemalloc.stop()
+
+        print('## Writing the profiles...')
+        self._output_path.mkdir(parents=True, exist_ok=True)
+        for name in sorted(self._wall_times):
+            self._write_folded(name)
+            self._write_memory(name)
+        self._write_summary()
+        print(f'## Profiles of {len(self._wall_times)} stages written to {self._output_path}')
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        This method marks a stage running on the current thread.
+        A memory snapshot is taken when the stage runs for the first time and whenever it ends on the last thread.
+
+        Args:
+            name: The name of the stage.
+        """
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._thread_stages.setdefault(thread_id, []).append(name)
+            self._n_active[name] += 1
+            if self._n_active[name] == 1:
+                self._started_at[name] = time.perf_counter()
+            is_new = name not in self._snapshots
+            if is_new:
+                self._snapshots[name] = [None, None]
+        if is_new and tracemalloc.is_tracing():
+            self._snapshots[name][0] = tracemalloc.take_snapshot()
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                stages = self._thread_stages[thread_id]
+                stages.pop()
+                if len(stages) == 0:
+                    del self._thread_stages[thread_id]
+                self._n_active[name] -= 1
+                is_last = self._n_active[name] == 0
+                if is_last:
+                    self._wall_times[name] += time.perf_counter() - self._started_at.pop(name)
+            if is_last and tracemalloc.is_tracing():
+                self._snapshots[name][1] = tracemalloc.take_snapshot()
+
+    def _run(self):
+        """
+        This method samples the stacks of the threads running a stage until the profiler is stopped.
+        """
+
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self._interval):
+            frames = sys._current_frames()
+            with self._lock:
+                active = {thread_id: stages[-1] for thread_id, stages in self._thread_stages.items()}
+
+            for thread_id, name in active.items():
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                self._samples.setdefault(name, Counter())[self._fold(frame)] += 1
+            del frames
+
+    @staticmethod
+    def _fold(frame):
+        """
+        This method formats a stack in the folded format, from its outermost to its innermost frame.
+
+        Args:
+            frame: The innermost frame of the stack.
+
+        Returns:
+            stack: The frames of the stack, as ``function (file:line)`` strings separated by semicolons.
+        """
+
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            labels.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def _write_folded(self, name):
+        """
+        This method writes the sampled stacks of a stage to ``<stage>.folded``.
+
+        Args:
+            name: The name of the stage.
+        """
+
+        samples = self._samples.get(name, Counter())
+        with open(self._output_path / f'{name}.folded', 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def _write_memory(self, name):
+        """
+        This method writes the sites allocating most of the memory still alive at the end of a stage
+        to ``<stage>.memory.txt``.
+
+        Args:
+            name: The name of the stage.
+        """
+
+        start_snapshot, end_snapshot = self._snapshots.get(name, (None, None))
+        diffs = []
+        if start_snapshot is not None and end_snapshot is not None:
+            # Allocations of the profiler itself are left out
+            ignored = (tracemalloc.__file__, __file__, linecache.__file__)
+            diffs = [diff for diff in end_snapshot.compare_to(start_snapshot, 'lineno')
+                     if diff.traceback[0].filename not in ignored]
+        self._memory[name] = sum(diff.size_diff for diff in diffs)
+
+        top = sorted(diffs, key=lambda diff: diff.size_diff, reverse=True)[:TOP_ALLOCATIONS]
+        with open(self._output_path / f'{name}.memory.txt', 'w') as f:
+            f.write(f'Top {len(top)} allocation sites of the "{name}" stage (memory still allocated at its end)\n\n')
+            for diff in top:
+                frame = diff.traceback[0]
+                f.write(f'{diff.size_diff / 1024:>12.1f} KiB {diff.count_diff:>10} blocks  '
+                        f'{frame.filename}:{frame.lineno}\n')
+                line = linecache.getline(frame.filename, frame.lineno).strip()
+                if line:
+                    f.write(f'{"":>35}{line}\n')
+
+    def _write_summary(self):
+        """
+        This method writes the wall time, the number of samples and the memory of each stage to ``summary.txt``.
+        """
+
+        with open(self._output_path / SUMMARY_FILE_NAME, 'w') as f:
+            f.write(f'{"Stage":<24}{"Wall time (s)":>15}{"Samples":>10}{"Memory (MiB)":>14}\n')
+            for name, wall_time in sorted(self._wall_times.items(), key=lambda item: item[1], reverse=True):
+                n_samples = sum(self._samples.get(name, Counter()).values())
+                f.write(f'{name:<24}{wall_time:>15.2f}{n_samples:>10}{self._memory[name] / 1024 ** 2:>14.1f}\n')
@@ -0,0 +1,230 @@
+"""
+This module defines the class that adapts the pace of notebook requests to the responses of the Kaggle server.
+"""
+
+import email.utils
+import logging
+import time
+
+# Outcomes of a single request
+SUCCESS = 'success'
+THROTTLED = 'throttled'
+SERVER_ERROR = 'server_error'
+CLIENT_ERROR = 'client_error'
+NETWORK_ERROR = 'network_error'
+
+# Outcomes that are worth another attempt
+RETRYABLE_OUTCOMES = (THROTTLED, SERVER_ERROR, NETWORK_ERROR)
+
+
+class RateController:
+    """
+    The ``RateController`` class paces the requests sent to Kaggle with an AIMD (Additive Increase,
+    Multiplicative Decrease) policy.
+
+    While the server answers successfully, the request rate is increased by a fixed step;
+    as soon as the server signals it is overloaded (``429 Too Many Requests``, ``503 Service Unavailable``,
+    other ``5xx`` codes or network errors), the rate is divided by the backoff factor.
+    When the server provides a ``Retry-After`` header, no request is sent before the given time.
+
+    Every decision is counted so that the behaviour of the controller can be inspected at the end of a session.
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=0.05, max_rate=10.0, increase_step=0.05, backoff_factor=2.0):
+        """
+        The constructor of this class sets the rate bounds and the AIMD parameters and initializes the metrics.
+
+        Args:
+            initial_rate: The number of requests per second at the beginning of the session. By default it is 1.
+            min_rate: The lowest request rate the controller can back off to.
+            max_rate: The highest request rate the controller can speed up to.
+            increase_step: The amount of requests per second added after each successful response.
+            backoff_factor: The factor the rate is divided by after each throttling signal.
+        """
+
+        self._rate = initial_rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._increase_step = increase_step
+        self._backoff_factor = backoff_factor
+
+        # Time at which the last request was sent
+        self._last_request_time = None
+
+        # Earliest time at which the next request can be sent, as asked by the server with a Retry-After header
+        self._retry_after_time = 0.0
+
+        # Counters describing the decisions of the controller
+        self._metrics = {
+            SUCCESS: 0,
+            THROTTLED: 0,
+            SERVER_ERROR: 0,
+            CLIENT_ERROR: 0,
+            NETWORK_ERROR: 0,
+            'rate_increases': 0,
+            'rate_decreases': 0,
+            'retry_after_pauses': 0,
+            'total_wait_seconds': 0.0,
+        }
+
+    @staticmethod
+    def classify(response):
+        """
+        This method classifies an HTTP response according to its status code.
+
+        Args:
+            response: The ``requests.Response`` returned by the server.
+
+        Returns:
+            outcome: One of ``success``, ``throttled``, ``server_error`` or ``client_error``.
+        """
+
+        if response.status_code in (429, 503):
+            return THROTTLED
+        if response.status_code >= 500:
+            return SERVER_ERROR
+        if response.status_code >= 400:
+            return CLIENT_ERROR
+        return SUCCESS
+
+    @staticmethod
+    def _parse_retry_after(value):
+        """
+        This method converts the value of a ``Retry-After`` header into a number of seconds.
+        The header can either contain a number of seconds or an HTTP date.
+
+        Args:
+            value: The value of the header.
+
+        Returns:
+            seconds: The number of seconds to wait, or ``None`` if the header cannot be parsed.
+        """
+
+        if value is None:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            retry_date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_date is None:
+            return None
+        return max(0.0, retry_date.timestamp() - time.time())
+
+    def wait(self):
+        """
+        This method blocks until the next request can be sent according to the current rate.
+        The delay is computed from the rate updated with the response to the last request,
+        so that a throttling signal already slows down the next request.
+        """
+
+        next_request_time = self._retry_after_time
+        if self._last_request_time is not None:
+            next_request_time = max(next_request_time, self._last_request_time + 1 / self._rate)
+
+        now = time.time()
+        if next_request_time > now:
+            delay = next_request_time - now
+            self._metrics['total_wait_seconds'] += delay
+            time.sleep(delay)
+            now = next_request_time
+
+        self._last_request_time = now
+
+    def register_response(self, response):
+        """
+        This method classifies the response and adjusts the request rate accordingly.
+
+        Args:
+            response: The ``requests.Response`` returned by the server.
+
+        Returns:
+            outcome: The classification of the response (see :func:`.RateController.classify`).
+        """
+
+        outcome = self.classify(response)
+        self._metrics[outcome] += 1
+
+        if outcome == SUCCESS:
+            self._increase()
+
+        elif outcome in (THROTTLED, SERVER_ERROR):
+            self._decrease()
+
+            retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                self._metrics['retry_after_pauses'] += 1
+                self._retry_after_time = max(self._retry_after_time, time.time() + retry_after)
+                logging.warning(f'Server asked to retry after {retry_after:.1f} seconds')
+
+        return outcome
+
+    def register_success(self):
+        """
+        This method registers a successful request whose response is not available (e.g., Kaggle API calls).
+
+        Returns:
+            outcome: Always ``success``.
+        """
+
+        self._metrics[SUCCESS] += 1
+        self._increase()
+        return SUCCESS
+
+    def register_network_error(self):
+        """
+        This method registers a request that did not get any response (timeouts, connection resets, ...).
+        These errors are treated as a congestion signal.
+
+        Returns:
+            outcome: Always ``network_error``.
+        """
+
+        self._metrics[NETWORK_ERROR] += 1
+        self._decrease()
+        return NETWORK_ERROR
+
+    def _increase(self):
+        """
+        This method additively increases the request rate, up to the maximum rate.
+        """
+
+        if self._rate < self._max_rate:
+            self._rate = min(self._max_rate, self._rate + self._increase_step)
+            self._metrics['rate_increases'] += 1
+
+    def _decrease(self):
+        """
+        This method multiplicatively decreases the request rate, down to the minimum rate.
+        """
+
+        if self._rate > self._min_rate:
+            self._rate = max(self._min_rate, self._rate / self._backoff_factor)
+            self._metrics['rate_decreases'] += 1
+            logging.info(f'Request rate lowered to {self._rate:.3f} requests/s')
+
+    def get_rate(self):
+        """
+        This method returns the current request rate.
+
+        Returns:
+            rate: The number of requests per second currently allowed.
+        """
+        return self._rate
+
+    def get_metrics(self):
+        """
+        This method returns the counters describing the decisions taken by the controller,
+        together with the current request rate.
+
+        Returns:
+            metrics: A dictionary whose keys are the metric names and whose values are the metric values.
+        """
+        metrics = dict(self._metrics)
+        metrics['current_rate'] = self._rate
+        return metrics
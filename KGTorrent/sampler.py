@@ -0,0 +1,145 @@
+"""
+This module defines the class that extracts a small, referentially closed sample of the Meta Kaggle tables,
+so that KGTorrent can be built in minutes to test changes to the preprocessing or to the database schema.
+
+The sample is grown from a random fraction of the rows of a seed table (``Kernels`` or ``Users``):
+
+1. the rows referenced by the sampled rows are added, following every foreign key constraint
+   up to a fixpoint, so that cycles (e.g., ``Kernels`` and ``KernelVersions``) and self-references
+   (e.g., ``ForumMessages``) are closed;
+2. the rows referencing the rows found so far are added (e.g., the votes, tags and data sources of the sampled
+   kernels), so that every table of the constraints graph gets rows;
+3. the rows referenced by the rows added in the previous step are added, again up to a fixpoint.
+
+A foreign key of the sample can thus only be unresolvable if it is unresolvable in the full Meta Kaggle tables,
+and the preprocessing removes the same kind of rows it removes from the full tables.
+Rows are tracked with one boolean mask per table, and keys are propagated with vectorized membership tests.
+"""
+
+import time
+
+import numpy as np
+
+from KGTorrent.dataframe_engine import PandasEngine
+
+# Tables a sample can be grown from
+SEED_TABLES = ('Kernels.csv', 'Users.csv')
+
+
+class Sampler:
+    """
+    The ``Sampler`` class extracts a referentially closed sample of the Meta Kaggle tables.
+    """
+
+    def __init__(self, tables_dict, constraints_df, engine=None):
+        """
+        The constructor of this class sets the tables to be sampled and the foreign key constraints to be preserved.
+
+        Args:
+            tables_dict: The dictionary whose keys are the table names and whose values are the dataframe tables.
+            constraints_df: The ``pandas.DataFrame`` which contains the foreign key constraints information.
+            engine: The dataframe engine of the tables (see :mod:`.dataframe_engine`). By default it is the ``pandas`` engine.
+        """
+
+        self._engine = engine if engine is not None else PandasEngine()
+        self._tables_dict = tables_dict
+        self._constraints = list(constraints_df[['Table', 'Foreign Key', 'Referenced Table', 'Referenced Column']]
+                                 .itertuples(index=False, name=None))
+
+    def _add_referenced_rows(self, masks, new_masks):
+        """
+        This method adds to the sample the rows referenced by the new rows, and then the rows referenced by those,
+        until no more rows are added. Only the rows added in the previous round are followed at each round.
+
+        Args:
+            masks: The dictionary of the boolean masks of the sampled rows of each table; it is updated in place.
+            new_masks: The dictionary of the boolean masks of the rows just added to the sample.
+        """
+
+        n_rounds = 0
+        while any(mask.any() for mask in new_masks.values()):
+            n_rounds += 1
+            next_masks = {table_name: np.zeros_like(mask) for table_name, mask in masks.items()}
+
+            for referencing, fk, referenced, rc in self._constraints:
+                if not new_masks[referencing].any():
+                    continue
+                keys = self._engine.unique_values(self._tables_dict[referencing], fk, new_masks[referencing])
+                if len(keys) == 0:
+                    continue
+                added = self._engine.isin(self._tables_dict[referenced], rc, keys) & ~masks[referenced]
+                masks[referenced] |= added
+                next_masks[referenced] |= added
+
+            new_masks = next_masks
+
+        print(f'\tReferenced rows added in {n_rounds} rounds')
+
+    def _add_referencing_rows(self, masks):
+        """
+        This method finds the rows referencing the rows of the sample, for every foreign key constraint.
+        All the constraints are evaluated against the same sample, so the result does not depend on their order.
+
+        Args:
+            masks: The dictionary of the boolean masks of the sampled rows of each table.
+
+        Returns:
+            new_masks: The dictionary of the boolean masks of the referencing rows that are not in the sample yet.
+        """
+
+        new_masks = {table_name: np.zeros_like(mask) for table_name, mask in masks.items()}
+        for referencing, fk, referenced, rc in self._constraints:
+            keys = self._engine.unique_values(self._tables_dict[referenced], rc, masks[referenced])
+            if len(keys) == 0:
+                continue
+            new_masks[referencing] |= self._engine.isin(self._tables_dict[referencing], fk, keys)
+
+        for table_name, mask in new_masks.items():
+            mask &= ~masks[table_name]
+            masks[table_name] |= mask
+        return new_masks
+
+    def sample(self, fraction, seed_table='Kernels.csv', random_state=0):
+        """
+        This method extracts the sample of the tables.
+
+        Args:
+            fraction: The fraction of the rows of the seed table the sample is grown from (between 0 and 1).
+            seed_table: The name of the seed table (one of ``SEED_TABLES``).
+            random_state: The seed of the random generator, so that samples can be reproduced.
+
+        Returns:
+            tables_dict: The dictionary of the sampled tables, in the format of the dataframe engine.
+        """
+
+        if not 0 < fraction <= 1:
+            raise ValueError(f'The sample fraction must be between 0 and 1, got {fraction}.')
+        if seed_table not in SEED_TABLES:
+            raise ValueError(f'Samples can only be grown from one of {SEED_TABLES}, got {seed_table}.')
+
+        start = time.perf_counter()
+        masks = {table_name: np.zeros(self._engine.n_rows(table), dtype=bool)
+                 for table_name, table in self._tables_dict.items()}
+
+        print(f'## Sampling {fraction:.2%} of {seed_table} (random state: {random_state})...')
+        seed_masks = {table_name: np.zeros_like(mask) for table_name, mask in masks.items()}
+        random = np.random.RandomState(random_state)
+        seed_masks[seed_table] = random.random_sample(masks[seed_table].shape[0]) < fraction
+        masks[seed_table] |= seed_masks[seed_table]
+
+        print('## Adding the rows referenced by the seed rows...')
+        self._add_referenced_rows(masks, seed_masks)
+
+        print('## Adding the rows referencing the sample...')
+        new_masks = self._add_referencing_rows(masks)
+
+        print('## Adding the rows referenced by the referencing rows...')
+        self._add_referenced_rows(masks, new_masks)
+
+        sampled_dict = {}
+        for table_name, table in self._tables_dict.items():
+            sampled_dict[table_name] = self._engine.filter_rows(table, masks[table_name])
+            print(f'- {table_name}: {masks[table_name].sum()} of {masks[table_name].shape[0]} rows')
+
+        print(f'## Sample extracted in {time.perf_counter() - start:.2f}s')
+        return sampled_dict
@@ -0,0 +1,167 @@
+"""
+This module defines the priorities used to order the notebook download and the class that limits
+a download session to a wall-clock or byte budget.
+
+Notebooks are downloaded from the most to the least valuable according to the selected priority;
+when the budget is exhausted the download stops cleanly, and the next session resumes from the most valuable
+notebooks that are still missing, since notebooks already in the download folder are skipped.
+"""
+
+import re
+import time
+
+# Available download priorities.
+# Each priority is described by the SQL ORDER BY expressions used when querying the Meta Kaggle tables and
+# the notebook catalog, and by the columns (with their sort direction) used when sorting the preprocessed
+# tables in memory.
+PRIORITIES = {
+    'medal': ('kernels.Medal IS NULL, kernels.Medal ASC, kernels.TotalVotes DESC',
+              'Medal IS NULL, Medal ASC, TotalVotes DESC',
+              (['Medal', 'TotalVotes'], [True, False])),
+    'votes': ('kernels.TotalVotes DESC',
+              'TotalVotes DESC',
+              (['TotalVotes'], [False])),
+    'recency': ('kernelversions.CreationDate DESC',
+                'VersionCreationDate DESC',
+                (['CreationDate'], [False])),
+}
+
+# Multipliers of the suffixes accepted by the budget options
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_SIZE_UNITS = {'': 1, 'k': 2 ** 10, 'm': 2 ** 20, 'g': 2 ** 30, 't': 2 ** 40}
+
+
+def get_order_by(priority=None, priority_sql=None, catalog=False):
+    """
+    This function returns the SQL ORDER BY expression of a download priority.
+    A custom SQL expression takes precedence over the named priority.
+    Ties are always broken by ``CurrentKernelVersionId``, so that the order is deterministic.
+
+    Args:
+        priority: The name of a priority in ``PRIORITIES``, or ``None``.
+        priority_sql: A custom SQL ORDER BY expression over the ``kernels``, ``users``, ``kernelversions``
+            and ``kernellanguages`` tables, or ``None``.
+        catalog: If True, the expression of the named priority refers to the columns of the notebook catalog
+            (see :mod:`.catalog`) instead of the Meta Kaggle tables. By default it is False.
+
+    Returns:
+        order_by: The SQL ORDER BY expression, or ``None`` if no priority is selected.
+    """
+
+    if priority_sql is not None:
+        return f'{priority_sql}, kernels.CurrentKernelVersionId'
+    if priority is not None and catalog:
+        return f'{PRIORITIES[priority][1]}, CurrentKernelVersionId'
+    if priority is not None:
+        return f'{PRIORITIES[priority][0]}, kernels.CurrentKernelVersionId'
+    return None
+
+
+def _parse_quantity(value, units, what):
+    """
+    This function parses a number followed by an optional unit suffix.
+
+    Args:
+        value: The string to be parsed (e.g., ``2h`` or ``500M``).
+        units: The dictionary mapping lowercase suffixes to multipliers.
+        what: The name of the quantity, used in error messages.
+
+    Returns:
+        quantity: The parsed quantity, as a float.
+    """
+
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$', value)
+    if match is None:
+        raise ValueError(f'Invalid {what} "{value}".')
+
+    # Sizes can be expressed both as 500M and 500MB
+    unit = match.group(2).lower()
+    if unit not in units and unit.endswith('b'):
+        unit = unit[:-1]
+    if unit not in units:
+        raise ValueError(f'Invalid {what} "{value}".')
+    return float(match.group(1)) * units[unit]
+
+
+def parse_duration(value):
+    """
+    This function parses a duration such as ``3600``, ``90m`` or ``6h``.
+
+    Args:
+        value: The duration, as a number of seconds optionally followed by ``s``, ``m``, ``h`` or ``d``.
+
+    Returns:
+        seconds: The duration in seconds.
+    """
+    return _parse_quantity(value, _DURATION_UNITS, 'duration')
+
+
+def parse_size(value):
+    """
+    This function parses a size such as ``1048576``, ``500M`` or ``20G``.
+
+    Args:
+        value: The size, as a number of bytes optionally followed by ``K``, ``M``, ``G`` or ``T``.
+
+    Returns:
+        n_bytes: The size in bytes.
+    """
+    return int(_parse_quantity(value, _SIZE_UNITS, 'size'))
+
+
+class DownloadBudget:
+    """
+    The ``DownloadBudget`` class keeps track of the time spent and of the bytes downloaded during a download session,
+    and tells when the session has to stop.
+    """
+
+    def __init__(self, max_duration=None, max_bytes=None):
+        """
+        The constructor of this class sets the limits of the budget.
+
+        Args:
+            max_duration: The maximum duration of the session in seconds, or ``None`` for no limit.
+            max_bytes: The maximum number of bytes to be downloaded, or ``None`` for no limit.
+        """
+
+        self._max_duration = max_duration
+        self._max_bytes = max_bytes
+
+        self._start_time = None
+        self._n_bytes = 0
+
+    def start(self):
+        """
+        This method starts the clock of the session.
+        """
+        self._start_time = time.time()
+        self._n_bytes = 0
+
+    def consume(self, n_bytes):
+        """
+        This method accounts for downloaded bytes.
+
+        Args:
+            n_bytes: The number of downloaded bytes.
+        """
+        self._n_bytes += n_bytes
+
+    def is_exhausted(self):
+        """
+        This method checks whether any limit of the budget has been reached.
+
+        Returns:
+            bool: True if the session has to stop, False otherwise.
+        """
+
+        if self._max_duration is not None and self._start_time is not None \
+                and time.time() - self._start_time >= self._max_duration:
+            return True
+        if self._max_bytes is not None and self._n_bytes >= self._max_bytes:
+            return True
+        return False
+
+    def __str__(self):
+        elapsed = 0 if self._start_time is None else time.time() - self._start_time
+        return f'{elapsed:.0f}s elapsed (limit: {self._max_duration}), ' \
+               f'{self._n_bytes} bytes downloaded (limit: {self._max_bytes})'
@@ -0,0 +1,566 @@
+"""
+This module defines the schema of the Meta Kaggle tables in the KGTorrent database.
+
+The SQLAlchemy table definitions are the single registry of the columns of each table, of their types and
+of their constraints: they are used both to create the database (see :class:`.DbCommunicationHandler`) and to read
+and validate the Meta Kaggle ``.csv`` files (see :class:`.DataLoader`). When the tables are loaded:
+
+- only the columns of the schema are parsed;
+- numeric columns are parsed as numbers and text and date columns as strings, without type inference;
+- the rows with missing values in non-nullable columns are reported and dropped, like the rows that are dropped
+  later by the referential integrity cleaning;
+- the other values are checked against the schema (non-integral values in integer columns, strings longer than the
+  length of their column), so that bad data is reported as soon as a table is read rather than when it is written
+  to the database.
+"""
+
+import csv
+from functools import lru_cache
+
+from sqlalchemy import (MetaData, Table, Column, Integer, String, Float,
+                        DateTime, Boolean, Text, BigInteger, ForeignKeyConstraint)
+from sqlalchemy.dialects.mysql import (MEDIUMTEXT, LONGTEXT)
+
+from KGTorrent.exceptions import SchemaValidationError
+
+# MySQL-specific text types, rendered as plain text by the other backends
+MEDIUM_TEXT = Text().with_variant(MEDIUMTEXT, 'mysql')
+LONG_TEXT = Text().with_variant(LONGTEXT, 'mysql')
+
+# Types used to parse the columns of the ``.csv`` files (see :func:`.get_read_dtypes`)
+FLOAT_DTYPE = 'float'
+BOOLEAN_DTYPE = 'boolean'
+STRING_DTYPE = 'string'
+
+
+def build_db_schema(constraints_df=None):
+    """
+    This function builds the schema of the KGTorrent database.
+
+    Args:
+        constraints_df: The optional ``pandas.DataFrame`` which contains the foreign key constraints information.
+            If given, foreign keys are declared in the table schemas (e.g., for backends that cannot add them
+            once tables are populated).
+
+    Returns:
+        metadata: The SQLAlchemy ``MetaData`` object containing the schemas of the Meta Kaggle tables.
+    """
+
+    # Create the metadata object
+    metadata = MetaData()
+
+    # ====================
+    # CREATE TABLE SCHEMAS
+    # ====================
+
+    competition_tags = Table('CompetitionTags', metadata,
+                             Column('Id', Integer(), primary_key=True),
+                             Column('CompetitionId', Integer(), nullable=False),
+                             Column('TagId', Integer(), nullable=False)
+                             )
+
+    competitions = Table('Competitions', metadata,
+                         Column('Id', Integer(), primary_key=True),
+                         Column('Slug', String(255), unique=True, nullable=False),
+                         Column('Title', String(255), nullable=False),
+                         Column('SubTitle', Text()),
+                         Column('HostSegmentTitle', String(255), nullable=False),
+                         Column('ForumId', Integer()),
+                         Column('OrganizationId', Integer()),
+                         Column('CompetitionTypeId', Integer(), nullable=False),
+                         Column('HostName', String(255)),
+                         Column('EnabledDate', DateTime(), nullable=False),
+                         Column('DeadlineDate', DateTime(), nullable=False),
+                         Column('ProhibitNewEntrantsDeadlineDate', DateTime()),
+                         Column('TeamMergerDeadlineDate', DateTime()),
+                         Column('TeamModelDeadlineDate', DateTime()),
+                         Column('ModelSubmissionDeadlineDate', DateTime()),
+                         Column('FinalLeaderboardHasBeenVerified', Boolean(), nullable=False),
+                         Column('HasKernels', Boolean(), nullable=False),
+                         Column('OnlyAllowKernelSubmissions', Boolean(), nullable=False),
+                         Column('HasLeaderboard', Boolean(), nullable=False),
+                         Column('LeaderboardPercentage', Integer(), nullable=False),
+                         Column('LeaderboardDisplayFormat', Integer(), nullable=False),
+                         Column('EvaluationAlgorithmAbbreviation', String(255)),
+                         Column('EvaluationAlgorithmName', String(255)),
+                         Column('EvaluationAlgorithmDescription', MEDIUM_TEXT),
+                         Column('EvaluationAlgorithmIsMax', Boolean()),
+                         Column('ValidationSetName', String(255)),
+                         Column('ValidationSetValue', String(255)),
+                         Column('MaxDailySubmissions', Integer(), nullable=False),
+                         Column('NumScoredSubmissions', Integer(), nullable=False),
+                         Column('MaxTeamSize', Integer()),
+                         Column('BanTeamMergers', Boolean(), nullable=False),
+                         Column('EnableTeamModels', Boolean(), nullable=False),
+                         Column('EnableSubmissionModelHashes', Boolean(), nullable=False),
+                         Column('EnableSubmissionModelAttachments', Boolean(), nullable=False),
+                         Column('RewardType', String(255)),
+                         Column('RewardQuantity', Integer()),
+                         Column('NumPrizes', Integer(), nullable=False),
+                         Column('UserRankMultiplier', Integer(), nullable=False),
+                         Column('CanQualifyTiers', Boolean(), nullable=False),
+                         Column('TotalTeams', Integer(), nullable=False),
+                         Column('TotalCompetitors', Integer(), nullable=False),
+                         Column('TotalSubmissions', Integer(), nullable=False)
+                         )
+
+    dataset_tags = Table('DatasetTags', metadata,
+                         Column('Id', Integer(), primary_key=True),
+                         Column('DatasetId', Integer(), nullable=False),
+                         Column('TagId', Integer(), nullable=False)
+                         )
+
+    dataset_versions = Table('DatasetVersions', metadata,
+                             Column('Id', Integer(), primary_key=True),
+                             Column('DatasetId', Integer(), nullable=False),
+                             Column('DatasourceVersionId', Integer()),
+                             Column('CreatorUserId', Integer(), nullable=False),
+                             Column('LicenseName', String(255), nullable=False),
+                             Column('CreationDate', DateTime(), nullable=False),
+                             Column('VersionNumber', Integer()),
+                             Column('Title', String(255)),
+                             Column('Slug', String(255), nullable=False),
+                             Column('Subtitle', String(255)),
+                             Column('Description', MEDIUM_TEXT),
+                             Column('VersionNotes', Text()),
+                             Column('TotalCompressedBytes', BigInteger()),
+                             Column('TotalUncompressedBytes', BigInteger())
+                             )
+
+    dataset_votes = Table('DatasetVotes', metadata,
+                          Column('Id', Integer(), primary_key=True),
+                          Column('UserId', Integer(), nullable=False),
+                          Column('DatasetVersionId', Integer(), nullable=False),
+                          Column('VoteDate', DateTime(), nullable=False)
+                          )
+
+    datasets = Table('Datasets', metadata,
+                     Column('Id', Integer(), primary_key=True),
+                     Column('CreatorUserId', Integer(), nullable=False),
+                     Column('OwnerUserId', Integer()),
+                     Column('OwnerOrganizationId', Integer()),
+                     Column('CurrentDatasetVersionId', Integer()),
+                     Column('CurrentDatasourceVersionId', Integer()),
+                     Column('ForumId', Integer(), nullable=False),
+                     Column('Type', Integer(), nullable=False),
+                     Column('CreationDate', DateTime(), nullable=False),
+                     Column('ReviewDate', DateTime()),
+                     Column('FeatureDate', DateTime()),
+                     Column('LastActivityDate', DateTime(), nullable=False),
+                     Column('TotalViews', Integer(), nullable=False),
+                     Column('TotalDownloads', Integer(), nullable=False),
+                     Column('TotalVotes', Integer(), nullable=False),
+                     Column('TotalKernels', Integer(), nullable=False)
+                     )
+
+    datasources = Table('Datasources', metadata,
+                        Column('Id', Integer(), primary_key=True),
+                        Column('CreatorUserId', Integer(), nullable=False),
+                        Column('CreationDate', DateTime(), nullable=False),
+                        Column('Type', Integer(), nullable=False),
+                        Column('CurrentDatasourceVersionId', Integer(), nullable=False)
+                        )
+
+    forum_message_votes = Table('ForumMessageVotes', metadata,
+                                Column('Id', Integer(), primary_key=True),
+                                Column('ForumMessageId', Integer(), nullable=False),
+                                Column('FromUserId', Integer(), nullable=False),
+                                Column('ToUserId', Integer(), nullable=False),
+                                Column('VoteDate', DateTime(), nullable=False)
+                                )
+
+    forum_messages = Table('ForumMessages', metadata,
+                           Column('Id', Integer(), primary_key=True),
+                           Column('ForumTopicId', Integer(), nullable=False),
+                           Column('PostUserId', Integer(), nullable=False),
+                           Column('PostDate', DateTime(), nullable=False),
+                           Column('ReplyToForumMessageId', Integer()),
+                           Column('Message', LONG_TEXT),
+                           Column('Medal', Integer()),
+                           Column('MedalAwardDate', DateTime())
+                           )
+
+    forum_topics = Table('ForumTopics', metadata,
+                         Column('Id', Integer(), primary_key=True),
+                         Column('ForumId', Integer(), nullable=False),
+                         Column('KernelId', Integer()),
+                         Column('LastForumMessageId', Integer()),
+                         Column('FirstForumMessageId', Integer()),
+                         Column('CreationDate', DateTime(), nullable=False),
+                         Column('LastCommentDate', DateTime(), nullable=False),
+                         Column('Title', String(255)),
+                         Column('IsSticky', Boolean(), nullable=False),
+                         Column('TotalViews', Integer(), nullable=False),
+                         Column('Score', Integer(), nullable=False),
+                         Column('TotalMessages', Integer(), nullable=False),
+                         Column('TotalReplies', Integer(), nullable=False)
+                         )
+
+    forums = Table('Forums', metadata,
+                   Column('Id', Integer(), primary_key=True),
+                   Column('ParentForumId', Integer()),
+                   Column('Title', String(255))
+                   )
+
+    kernel_languages = Table('KernelLanguages', metadata,
+                             Column('Id', Integer(), primary_key=True),
+                             Column('Name', String(255), unique=True, nullable=False),
+                             Column('DisplayName', String(255), nullable=False),
+                             Column('IsNotebook', Boolean(), nullable=False)
+                             )
+
+    kernel_tags = Table('KernelTags', metadata,
+                        Column('Id', Integer(), primary_key=True),
+                        Column('KernelId', Integer(), nullable=False),
+                        Column('TagId', Integer(), nullable=False)
+                        )
+
+    kernel_version_competition_sources = Table('KernelVersionCompetitionSources', metadata,
+                                               Column('Id', Integer(), primary_key=True),
+                                               Column('KernelVersionId', Integer(), nullable=False),
+                                               Column('SourceCompetitionId', Integer(), nullable=False)
+                                               )
+
+    kernel_version_dataset_sources = Table('KernelVersionDatasetSources', metadata,
+                                           Column('Id', Integer(), primary_key=True),
+                                           Column('KernelVersionId', Integer(), nullable=False),
+                                           Column('SourceDatasetVersionId', Integer(), nullable=False)
+                                           )
+
+    kernel_version_kernel_sources = Table('KernelVersionKernelSources', metadata,
+                                          Column('Id', Integer(), primary_key=True),
+                                          Column('KernelVersionId', Integer(), nullable=False),
+                                          Column('SourceKernelVersionId', Integer(), nullable=False)
+                                          )
+
+    kernel_version_output_files = Table('KernelVersionOutputFiles', metadata,
+                                        Column('Id', Integer(), primary_key=True),
+                                        Column('KernelVersionId', Integer(), nullable=False),
+                                        Column('FileName', String(255)),
+                                        Column('ContentLength', BigInteger(), nullable=False),
+                                        Column('ContentTypeExtension', String(255)),
+                                        Column('CompressionTypeExtension', String(255))
+                                        )
+
+    kernel_versions = Table('KernelVersions', metadata,
+                            Column('Id', Integer(), primary_key=True),
+                            Column('ScriptId', Integer(), nullable=False),
+                            Column('ParentScriptVersionId', Integer()),
+                            Column('ScriptLanguageId', Integer(), nullable=False),
+                            Column('AuthorUserId', Integer(), nullable=False),
+                            Column('CreationDate', DateTime(), nullable=False),
+                            Column('VersionNumber', Integer()),
+                            Column('Title', String(255)),
+                            Column('EvaluationDate', DateTime()),
+                            Column('IsChange', Boolean(), nullable=False),
+                            Column('TotalLines', Integer()),
+                            Column('LinesInsertedFromPrevious', Integer()),
+                            Column('LinesChangedFromPrevious', Integer()),
+                            Column('LinesUnchangedFromPrevious', Integer()),
+                            Column('LinesInsertedFromFork', Integer()),
+                            Column('LinesDeletedFromFork', Integer()),
+                            Column('LinesChangedFromFork', Integer()),
+                            Column('LinesUnchangedFromFork', Integer()),
+                            Column('TotalVotes', Integer(), nullable=False)
+                            )
+
+    kernel_votes = Table('KernelVotes', metadata,
+                         Column('Id', Integer(), primary_key=True),
+                         Column('UserId', Integer(), nullable=False),
+                         Column('KernelVersionId', Integer(), nullable=False),
+                         Column('VoteDate', DateTime(), nullable=False)
+                         )
+
+    kernels = Table('Kernels', metadata,
+                    Column('Id', Integer(), primary_key=True),
+                    Column('AuthorUserId', Integer(), nullable=False),
+                    Column('CurrentKernelVersionId', Integer()),
+                    Column('ForkParentKernelVersionId', Integer()),
+                    Column('ForumTopicId', Integer()),
+                    Column('FirstKernelVersionId', Integer()),
+                    Column('CreationDate', DateTime()),
+                    Column('EvaluationDate', DateTime()),
+                    Column('MadePublicDate', DateTime()),
+                    Column('IsProjectLanguageTemplate', Boolean(), nullable=False),
+                    Column('CurrentUrlSlug', String(255)),
+                    Column('Medal', Float()),
+                    Column('MedalAwardDate', DateTime()),
+                    Column('TotalViews', Integer(), nullable=False),
+                    Column('TotalComments', Integer(), nullable=False),
+                    Column('TotalVotes', Integer(), nullable=False)
+                    )
+
+    organizations = Table('Organizations', metadata,
+                          Column('Id', Integer(), primary_key=True),
+                          Column('Name', String(255), nullable=False),
+                          Column('Slug', String(255), unique=True, nullable=False),
+                          Column('CreationDate', DateTime(), nullable=False),
+                          Column('Description', Text())
+                          )
+
+    submissions = Table('Submissions', metadata,
+                        Column('Id', Integer(), primary_key=True),
+                        Column('SubmittedUserId', Integer()),
+                        Column('TeamId', Integer(), nullable=False),
+                        Column('SourceKernelVersionId', Integer()),
+                        Column('SubmissionDate', DateTime(), nullable=False),
+                        Column('ScoreDate', DateTime()),
+                        Column('IsAfterDeadline', Boolean(), nullable=False),
+                        Column('PublicScoreLeaderboardDisplay', Float(52)),
+                        Column('PublicScoreFullPrecision', Float(52)),
+                        Column('PrivateScoreLeaderboardDisplay', Float(52)),
+                        Column('PrivateScoreFullPrecision', Float(52))
+                        )
+
+    tags = Table('Tags', metadata,
+                 Column('Id', Integer(), primary_key=True),
+                 Column('ParentTagId', Integer()),
+                 Column('Name', String(255), nullable=False),
+                 Column('Slug', String(255), nullable=False),
+                 Column('FullPath', String(255), nullable=False),
+                 Column('Description', Text()),
+                 Column('DatasetCount', Integer(), nullable=False),
+                 Column('CompetitionCount', Integer(), nullable=False),
+                 Column('KernelCount', Integer(), nullable=False)
+                 )
+
+    team_memberships = Table('TeamMemberships', metadata,
+                             Column('Id', Integer(), primary_key=True),
+                             Column('TeamId', Integer(), nullable=False),
+                             Column('UserId', Integer(), nullable=False),
+                             Column('RequestDate', DateTime())
+                             )
+
+    teams = Table('Teams', metadata,
+                  Column('Id', Integer(), primary_key=True),
+                  Column('CompetitionId', Integer(), nullable=False),
+                  Column('TeamLeaderId', Integer()),
+                  Column('TeamName', String(255)),
+                  Column('ScoreFirstSubmittedDate', DateTime()),
+                  Column('LastSubmissionDate', DateTime()),
+                  Column('PublicLeaderboardSubmissionId', Integer()),
+                  Column('PrivateLeaderboardSubmissionId', Integer()),
+                  Column('IsBenchmark', Boolean(), nullable=False),
+                  Column('Medal', Integer()),
+                  Column('MedalAwardDate', DateTime()),
+                  Column('PublicLeaderboardRank', Integer()),
+                  Column('PrivateLeaderboardRank', Integer())
+                  )
+
+    user_achievements = Table('UserAchievements', metadata,
+                              Column('Id', Integer(), primary_key=True),
+                              Column('UserId', Integer(), nullable=False),
+                              Column('AchievementType', String(255), nullable=False),
+                              Column('Tier', Integer(), nullable=False),
+                              Column('TierAchievementDate', DateTime()),
+                              Column('Points', Integer(), nullable=False),
+                              Column('CurrentRanking', Integer()),
+                              Column('HighestRanking', Integer()),
+                              Column('TotalGold', Integer(), nullable=False),
+                              Column('TotalSilver', Integer(), nullable=False),
+                              Column('TotalBronze', Integer(), nullable=False)
+                              )
+
+    user_followers = Table('UserFollowers', metadata,
+                           Column('Id', Integer(), primary_key=True),
+                           Column('UserId', Integer(), nullable=False),
+                           Column('FollowingUserId', Integer(), nullable=False),
+                           Column('CreationDate', DateTime(), nullable=False)
+                           )
+
+    user_organizations = Table('UserOrganizations', metadata,
+                               Column('Id', Integer(), primary_key=True),
+                               Column('UserId', Integer(), nullable=False),
+                               Column('OrganizationId', Integer(), nullable=False),
+                               Column('JoinDate', DateTime(), nullable=False)
+                               )
+
+    users = Table('Users', metadata,
+                  Column('Id', Integer(), primary_key=True),
+                  Column('UserName', String(255), unique=True),
+                  Column('DisplayName', String(255)),
+                  Column('RegisterDate', DateTime(), nullable=False),
+                  Column('PerformanceTier', Integer(), nullable=False)
+                  )
+
+    # Declare foreign keys in the schemas
+    if constraints_df is not None:
+        for _, fk in constraints_df.iterrows():
+            metadata.tables[fk['Table'][:-4]].append_constraint(
+                ForeignKeyConstraint([fk['Foreign Key']],
+                                     [f"{fk['Referenced Table'][:-4]}.{fk['Referenced Column']}"]))
+
+    return metadata
+
+
+@lru_cache(maxsize=None)
+def _get_registry():
+    """
+    This function builds the schema of the KGTorrent database once.
+
+    Returns:
+        metadata: The SQLAlchemy ``MetaData`` object containing the schemas of the Meta Kaggle tables.
+    """
+    return build_db_schema()
+
+
+def get_table_schema(file_name):
+    """
+    This function returns the schema of a Meta Kaggle table.
+
+    Args:
+        file_name: The name of the ``.csv`` file of the table (e.g., ``Kernels.csv``).
+
+    Returns:
+        table: The SQLAlchemy table, or ``None`` if the table is not in the schema.
+    """
+    return _get_registry().tables.get(file_name[:-4])
+
+
+def read_header(path):
+    """
+    This function reads the column names of a ``.csv`` file.
+
+    Args:
+        path: The path to the ``.csv`` file.
+
+    Returns:
+        columns: The list of the column names.
+    """
+
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        return next(csv.reader(csv_file), [])
+
+
+def get_read_columns(table, header):
+    """
+    This function selects the columns of a ``.csv`` file to be parsed, i.e., the columns of the schema.
+
+    Args:
+        table: The SQLAlchemy table.
+        header: The list of the column names of the ``.csv`` file.
+
+    Returns:
+        columns: The list of the columns of the schema that are in the file, in the order of the file.
+
+    Raises:
+        SchemaValidationError: if a non-nullable column of the schema is not in the file.
+    """
+
+    missing_columns = [column.name for column in table.columns
+                       if column.name not in header and not column.nullable]
+    if len(missing_columns) != 0:
+        raise SchemaValidationError(f'Table {table.name}: missing non-nullable columns {missing_columns}.')
+    return [column_name for column_name in header if column_name in table.columns]
+
+
+def _get_base_type(column):
+    """
+    This function returns the type of a column, regardless of its backend-specific variants.
+
+    Args:
+        column: The SQLAlchemy column.
+
+    Returns:
+        column_type: The SQLAlchemy type of the column.
+    """
+    return getattr(column.type, 'impl', column.type)
+
+
+def get_read_dtypes(table, columns):
+    """
+    This function chooses the types used to parse the columns of a ``.csv`` file:
+    integer and float columns are parsed as floats (integer columns are checked and converted once parsed, since
+    they may have missing values), boolean columns as booleans and text and date columns as strings
+    (dates are parsed during the preprocessing).
+
+    Args:
+        table: The SQLAlchemy table.
+        columns: The list of the columns to be parsed.
+
+    Returns:
+        dtypes: A dictionary whose keys are column names and whose values are ``FLOAT_DTYPE``, ``BOOLEAN_DTYPE``
+        or ``STRING_DTYPE``.
+    """
+
+    dtypes = {}
+    for column_name in columns:
+        column_type = _get_base_type(table.columns[column_name])
+        if isinstance(column_type, (Integer, Float)):
+            dtypes[column_name] = FLOAT_DTYPE
+        elif isinstance(column_type, Boolean):
+            dtypes[column_name] = BOOLEAN_DTYPE
+        elif isinstance(column_type, (String, DateTime)):
+            dtypes[column_name] = STRING_DTYPE
+    return dtypes
+
+
+def get_integer_columns(table, columns):
+    """
+    This function selects the integer columns among the given ones.
+
+    Args:
+        table: The SQLAlchemy table.
+        columns: The list of the column names.
+
+    Returns:
+        integer_columns: The list of the integer columns.
+    """
+    return [column_name for column_name in columns if isinstance(_get_base_type(table.columns[column_name]), Integer)]
+
+
+def drop_missing_values(df, table, engine):
+    """
+    This function removes the rows of a table with missing values in its non-nullable columns, which cannot be
+    written to the database.
+
+    Args:
+        df: The dataframe of the table.
+        table: The SQLAlchemy table.
+        engine: The dataframe engine of the table (see :mod:`.dataframe_engine`).
+
+    Returns:
+        df: The dataframe without such rows.
+        counts: A dictionary whose keys are the non-nullable columns with missing values and whose values are
+            the numbers of missing values.
+    """
+
+    not_nullable = [column_name for column_name in engine.columns(df) if not table.columns[column_name].nullable]
+    counts = {column_name: count for column_name, count in engine.null_counts(df, not_nullable).items()
+              if count != 0}
+    if len(counts) != 0:
+        df = engine.drop_missing(df, list(counts))
+    return df, counts
+
+
+def validate_table(df, table, engine):
+    """
+    This function checks the values of a table against its schema.
+
+    Args:
+        df: The dataframe of the table, as parsed with the types of :func:`.get_read_dtypes`.
+        table: The SQLAlchemy table.
+        engine: The dataframe engine of the table (see :mod:`.dataframe_engine`).
+
+    Raises:
+        SchemaValidationError: if non-integral values are found in integer columns or strings longer than the length
+            of their column.
+    """
+
+    columns = engine.columns(df)
+    problems = []
+
+    for column_name, count in engine.non_integral_counts(df, get_integer_columns(table, columns)).items():
+        if count != 0:
+            problems.append(f'{count} non-integral values in integer column {column_name}')
+
+    lengths = {column_name: _get_base_type(table.columns[column_name]).length for column_name in columns
+               if isinstance(_get_base_type(table.columns[column_name]), String)}
+    lengths = {column_name: length for column_name, length in lengths.items() if length is not None}
+    for column_name, max_length in engine.max_lengths(df, list(lengths)).items():
+        if max_length > lengths[column_name]:
+            problems.append(f'values of column {column_name} exceed its length '
+                            f'({max_length} > {lengths[column_name]} characters)')
+
+    if len(problems) != 0:
+        raise SchemaValidationError(f'Table {table.name}: ' + '; '.join(problems) + '.')
@@ -0,0 +1,395 @@
+"""
+This module defines the class describing a selection of notebooks (e.g., the gold-medal Python notebooks using a given
+competition) and the class that selects them from the KGTorrent database.
+
+Selections are compiled into parameterized queries on the notebook catalog (see :mod:`.catalog`) or, when it does not
+exist (or when a custom SQL priority is given), on the join of the ``kernels``, ``users`` and ``kernelversions``
+tables. Languages are resolved into their identifiers once, so that the ``kernellanguages`` table is never joined
+and languages are filtered with an indexed ``IN`` condition.
+
+The results are kept in a least recently used cache, keyed on the selection and on the snapshot of Meta Kaggle loaded
+in the database, so that repeating a selection does not query the database again until the database is rebuilt.
+The snapshot is identified once for the life of the selector, and again after the database handler writes tables
+that change it. The selector does not notice the database being refreshed by another process: such callers must
+call :func:`.NotebookSelector.invalidate`, so that the snapshot is identified again at the next selection.
+The cache only lives in memory, so it only speeds up the callers selecting notebooks repeatedly in the same process
+(e.g., the Python client), not separate runs of the ``select`` command.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import and_, column, exists, func, select, table, text
+
+from KGTorrent.catalog import CATALOG_TABLE_NAME
+from KGTorrent.scheduler import PRIORITIES, get_order_by
+from KGTorrent.temporal import SNAPSHOTS_TABLE_NAME
+
+# Medals, as stored in the Medal column of the kernels
+MEDALS = {'gold': 1, 'silver': 2, 'bronze': 3}
+
+# Columns identifying the selected notebooks, in order
+NB_IDENTIFIER_COLUMNS = ['UserName', 'CurrentUrlSlug', 'CurrentKernelVersionId']
+
+# Default number of selections kept in the cache
+DEFAULT_CACHE_SIZE = 64
+
+# Tables used by the queries
+_CATALOG = table(CATALOG_TABLE_NAME, *[column(name) for name in NB_IDENTIFIER_COLUMNS],
+                 column('LanguageId'), column('Medal'), column('TotalVotes'), column('VersionCreationDate'))
+_KERNELS = table('kernels', column('AuthorUserId'), column('CurrentUrlSlug'), column('CurrentKernelVersionId'),
+                 column('Medal'), column('TotalVotes'))
+_USERS = table('users', column('Id'), column('UserName'))
+_KERNEL_VERSIONS = table('kernelversions', column('Id'), column('ScriptLanguageId'), column('CreationDate'))
+_KERNEL_LANGUAGES = table('kernellanguages', column('Id'), column('Name'))
+_COMPETITION_SOURCES = table('kernelversioncompetitionsources', column('KernelVersionId'),
+                             column('SourceCompetitionId'))
+_DATASET_SOURCES = table('kernelversiondatasetsources', column('KernelVersionId'), column('SourceDatasetVersionId'))
+_DATASET_VERSIONS = table('datasetversions', column('Id'), column('DatasetId'))
+_SNAPSHOTS = table(SNAPSHOTS_TABLE_NAME, column('SnapshotId'))
+
+
+def _normalize(values, convert):
+    """
+    This function turns the values of a filter into a sorted tuple, so that equal filters have equal keys.
+
+    Args:
+        values: The values of the filter, or ``None``.
+        convert: The function converting each value.
+
+    Returns:
+        values: The sorted tuple of the distinct converted values, or ``None``.
+    """
+
+    if values is None:
+        return None
+    return tuple(sorted({convert(value) for value in values}))
+
+
+def _to_datetime(value):
+    """
+    This function converts a date into a ``datetime.datetime``.
+
+    Args:
+        value: The date (e.g., ``2020-01-31``), or ``None``.
+
+    Returns:
+        date: The ``datetime.datetime``, or ``None``.
+    """
+    return pd.Timestamp(value).to_pydatetime() if value is not None else None
+
+
+def _to_medal(medal):
+    """
+    This function converts a medal name (e.g., ``gold``) or number into the value of the ``Medal`` column.
+
+    Args:
+        medal: The medal name or number.
+
+    Returns:
+        medal: The number of the medal (1 for gold, 2 for silver and 3 for bronze).
+    """
+
+    if isinstance(medal, str) and not medal.isdigit():
+        if medal.lower() not in MEDALS:
+            raise ValueError(f'Unknown medal "{medal}": choose among {list(MEDALS)}.')
+        return MEDALS[medal.lower()]
+    return int(medal)
+
+
+def _like_to_regex(pattern):
+    """
+    This function converts an SQL ``LIKE`` pattern into a case-insensitive regular expression.
+
+    Args:
+        pattern: The ``LIKE`` pattern (e.g., ``IPython%``).
+
+    Returns:
+        regex: The compiled regular expression.
+    """
+
+    regex = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in pattern)
+    return re.compile(regex, re.IGNORECASE | re.DOTALL)
+
+
+class Selection:
+    """
+    The ``Selection`` class describes a selection of notebooks. Filters left to ``None`` select all the notebooks.
+    Selections are immutable and hashable, so that they can be used as cache keys.
+    """
+
+    def __init__(self, languages=None, medals=None, min_votes=None, max_votes=None, created_from=None,
+                 created_until=None, competition_ids=None, dataset_ids=None, priority=None, priority_sql=None,
+                 limit=None):
+        """
+        The constructor of this class normalizes the filters of the selection.
+
+        Args:
+            languages: The names of the notebook languages (e.g., ``IPython Notebook HTML``); as in the ``LIKE``
+                operator, names are case-insensitive and may contain the ``%`` and ``_`` wildcards.
+            medals: The medals of the notebooks (``gold``, ``silver``, ``bronze`` or the numbers 1 to 3).
+            min_votes: The minimum number of votes of the notebooks.
+            max_votes: The maximum number of votes of the notebooks.
+            created_from: The earliest creation date of the current version of the notebooks (included).
+            created_until: The latest creation date of the current version of the notebooks (excluded).
+            competition_ids: The identifiers of competitions; only the notebooks using the data of at least one
+                of them are selected.
+            dataset_ids: The identifiers of datasets; only the notebooks using at least one version of one
+                of them are selected.
+            priority: The optional name of a priority in :data:`.scheduler.PRIORITIES` defining the order
+                of the notebooks.
+            priority_sql: An optional custom SQL ORDER BY expression over the ``kernels``, ``users`` and
+                ``kernelversions`` tables; it takes precedence over ``priority``.
+            limit: The maximum number of notebooks to select.
+        """
+
+        if priority is not None and priority not in PRIORITIES:
+            raise ValueError(f'Unknown priority "{priority}": choose among {list(PRIORITIES)}.')
+
+        self.languages = _normalize(languages, str)
+        self.medals = _normalize(medals, _to_medal)
+        self.min_votes = int(min_votes) if min_votes is not None else None
+        self.max_votes = int(max_votes) if max_votes is not None else None
+        self.created_from = _to_datetime(created_from)
+        self.created_until = _to_datetime(created_until)
+        self.competition_ids = _normalize(competition_ids, int)
+        self.dataset_ids = _normalize(dataset_ids, int)
+        self.priority = priority
+        self.priority_sql = priority_sql
+        self.limit = int(limit) if limit is not None else None
+
+    def _key(self):
+        """
+        This method returns the values of all the filters of the selection.
+
+        Returns:
+            key: The tuple of the values.
+        """
+        return (self.languages, self.medals, self.min_votes, self.max_votes, self.created_from, self.created_until,
+                self.competition_ids, self.dataset_ids, self.priority, self.priority_sql, self.limit)
+
+    def __eq__(self, other):
+        return isinstance(other, Selection) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        filters = ', '.join(f'{name}={value!r}' for name, value in vars(self).items() if value is not None)
+        return f'Selection({filters})'
+
+
+class NotebookSelector:
+    """
+    The ``NotebookSelector`` class selects the notebooks described by a :class:`.Selection` from the KGTorrent
+    database, and caches the results.
+    """
+
+    def __init__(self, db_engine, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        The constructor of this class sets the database and creates the cache.
+
+        Args:
+            db_engine: The :class:`.DbCommunicationHandler` of the KGTorrent database.
+            cache_size: The maximum number of selections kept in the cache. By default it is 64.
+        """
+
+        self._db_engine = db_engine
+        self._cache_size = cache_size
+
+        # Results of the selections, from the least to the most recently used
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._n_hits = 0
+        self._n_misses = 0
+
+        # Key of the snapshot loaded in the database, identified at the first selection
+        self._snapshot_key = None
+
+        # Identifiers of the languages, with the snapshot they were read from
+        self._languages = None
+
+    def get_snapshot_key(self):
+        """
+        This method identifies the snapshot of Meta Kaggle loaded in the database: the latest snapshot of a temporal
+        database (see :mod:`.temporal`) and the latest kernel version, which changes whenever the database is
+        refreshed. The key is read from the database once, and kept until the selector is invalidated
+        (see :func:`.NotebookSelector.invalidate`) or its cache is cleared (see :func:`.NotebookSelector.clear_cache`).
+
+        Returns:
+            key: The tuple identifying the snapshot.
+        """
+
+        with self._lock:
+            if self._snapshot_key is not None:
+                return self._snapshot_key
+
+        snapshot_id = None
+        if self._db_engine.has_table(SNAPSHOTS_TABLE_NAME):
+            snapshot_id = self._db_engine.execute_query(select([func.max(_SNAPSHOTS.c.SnapshotId)])).iloc[0, 0]
+        kernel_version_id = self._db_engine.execute_query(select([func.max(_KERNEL_VERSIONS.c.Id)])).iloc[0, 0]
+        use_catalog = self._db_engine.has_table(CATALOG_TABLE_NAME)
+
+        with self._lock:
+            self._snapshot_key = (snapshot_id, kernel_version_id, use_catalog)
+            return self._snapshot_key
+
+    def _resolve_languages(self, languages, snapshot_key):
+        """
+        This method resolves language names into identifiers. The ``kernellanguages`` table is read once for each
+        snapshot.
+
+        Args:
+            languages: The tuple of the language names, which may contain ``LIKE`` wildcards.
+            snapshot_key: The key of the snapshot loaded in the database.
+
+        Returns:
+            language_ids: The sorted list of the identifiers of the matching languages.
+        """
+
+        if self._languages is None or self._languages[0] != snapshot_key:
+            self._languages = (snapshot_key, self._db_engine.execute_query(select([_KERNEL_LANGUAGES.c.Id,
+                                                                                   _KERNEL_LANGUAGES.c.Name])))
+        kernel_languages = self._languages[1]
+
+        patterns = [_like_to_regex(language) for language in languages]
+        return sorted(int(language_id) for language_id, name in kernel_languages.itertuples(index=False)
+                      if any(pattern.fullmatch(name) for pattern in patterns))
+
+    def compile(self, selection, language_ids=None, use_catalog=True):
+        """
+        This method compiles a selection into a parameterized query.
+
+        Args:
+            selection: The :class:`.Selection`.
+            language_ids: The identifiers of the selected languages, if the selection filters languages.
+            use_catalog: If True, notebooks are selected from the notebook catalog; otherwise, from the Meta Kaggle
+                tables. A custom ``priority_sql`` always requires the Meta Kaggle tables. By default it is True.
+
+        Returns:
+            query: The SQLAlchemy ``Select`` returning the ``UserName``, ``CurrentUrlSlug`` and
+            ``CurrentKernelVersionId`` of the notebooks.
+        """
+
+        use_catalog = use_catalog and selection.priority_sql is None
+
+        if use_catalog:
+            query = select([_CATALOG.c[name] for name in NB_IDENTIFIER_COLUMNS])
+            kernel_version_id = _CATALOG.c.CurrentKernelVersionId
+            language_id, medal, votes, created = (_CATALOG.c.LanguageId, _CATALOG.c.Medal, _CATALOG.c.TotalVotes,
+                                                  _CATALOG.c.VersionCreationDate)
+        else:
+            query = select([_USERS.c.UserName, _KERNELS.c.CurrentUrlSlug, _KERNELS.c.CurrentKernelVersionId]) \
+                .select_from(_KERNELS
+                             .join(_USERS, _KERNELS.c.AuthorUserId == _USERS.c.Id)
+                             .join(_KERNEL_VERSIONS, _KERNELS.c.CurrentKernelVersionId == _KERNEL_VERSIONS.c.Id))
+            kernel_version_id = _KERNELS.c.CurrentKernelVersionId
+            language_id, medal, votes, created = (_KERNEL_VERSIONS.c.ScriptLanguageId, _KERNELS.c.Medal,
+                                                  _KERNELS.c.TotalVotes, _KERNEL_VERSIONS.c.CreationDate)
+
+        conditions = []
+        if language_ids is not None:
+            conditions.append(language_id.in_(language_ids))
+        if selection.medals is not None:
+            conditions.append(medal.in_(selection.medals))
+        if selection.min_votes is not None:
+            conditions.append(votes >= selection.min_votes)
+        if selection.max_votes is not None:
+            conditions.append(votes <= selection.max_votes)
+        if selection.created_from is not None:
+            conditions.append(created >= selection.created_from)
+        if selection.created_until is not None:
+            conditions.append(created < selection.created_until)
+        if selection.competition_ids is not None:
+            conditions.append(exists().where(and_(
+                _COMPETITION_SOURCES.c.KernelVersionId == kernel_version_id,
+                _COMPETITION_SOURCES.c.SourceCompetitionId.in_(selection.competition_ids))))
+        if selection.dataset_ids is not None:
+            dataset_version_ids = select([_DATASET_VERSIONS.c.Id]) \
+                .where(_DATASET_VERSIONS.c.DatasetId.in_(selection.dataset_ids))
+            conditions.append(exists().where(and_(
+                _DATASET_SOURCES.c.KernelVersionId == kernel_version_id,
+                _DATASET_SOURCES.c.SourceDatasetVersionId.in_(dataset_version_ids))))
+        if len(conditions) != 0:
+            query = query.where(and_(*conditions))
+
+        order_by = get_order_by(selection.priority, selection.priority_sql, catalog=use_catalog)
+        if order_by is not None:
+            query = query.order_by(text(order_by))
+        if selection.limit is not None:
+            query = query.limit(selection.limit)
+        return query
+
+    def select(self, selection):
+        """
+        This method selects the notebooks described by a selection. Results are served from the cache
+        as long as the same snapshot of Meta Kaggle is loaded in the database.
+
+        Args:
+            selection: The :class:`.Selection`.
+
+        Returns:
+            nb_identifiers: The ``pandas.DataFrame`` containing the ``UserName``, ``CurrentUrlSlug`` and
+            ``CurrentKernelVersionId`` of the selected notebooks.
+        """
+
+        snapshot_key = self.get_snapshot_key()
+        key = (selection, snapshot_key)
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._n_hits += 1
+                return self._cache[key].copy()
+            self._n_misses += 1
+
+        language_ids = None
+        if selection.languages is not None:
+            language_ids = self._resolve_languages(selection.languages, snapshot_key)
+
+        if language_ids is not None and len(language_ids) == 0:
+            nb_identifiers = pd.DataFrame(columns=NB_IDENTIFIER_COLUMNS)
+        else:
+            query = self.compile(selection, language_ids, use_catalog=snapshot_key[2])
+            nb_identifiers = self._db_engine.execute_query(query)
+
+        with self._lock:
+            self._cache[key] = nb_identifiers
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return nb_identifiers.copy()
+
+    def get_cache_info(self):
+        """
+        This method returns the statistics of the cache.
+
+        Returns:
+            info: A dictionary with the number of ``hits`` and ``misses`` and the current ``size`` of the cache.
+        """
+
+        with self._lock:
+            return {'hits': self._n_hits, 'misses': self._n_misses, 'size': len(self._cache)}
+
+    def invalidate(self):
+        """
+        This method forgets the snapshot loaded in the database, which is identified again at the next selection,
+        e.g., after the database is refreshed by another process. The cached results of the previous snapshot are
+        no longer returned, and they are evicted from the cache as new selections are run.
+        """
+
+        with self._lock:
+            self._snapshot_key = None
+            self._languages = None
+
+    def clear_cache(self):
+        """
+        This method empties the cache and forgets the snapshot loaded in the database (see
+        :func:`.NotebookSelector.invalidate`).
+        """
+
+        with self._lock:
+            self._cache.clear()
+            self._snapshot_key = None
+            self._languages = None
@@ -0,0 +1,288 @@
+"""
+This module defines the functions and the class that split the notebook download across multiple machines
+and merge the resulting shards into a single notebook archive.
+
+Notebooks are assigned to shards deterministically, by hashing their ``CurrentKernelVersionId``:
+every node running the ``download`` command with ``--shard i/N`` downloads a disjoint subset of the notebooks
+into its own shard folder (``shard_i_of_N``), with its own download journal.
+Once shard folders have been gathered in the notebook archive folder, the ``reconcile`` command merges them.
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+import zlib
+from pathlib import Path
+
+from KGTorrent.manifest import ArchiveManifest, MANIFEST_FILE_NAME
+from KGTorrent.nb_validator import QUARANTINE_FOLDER_NAME, QUARANTINE_REASONS_FILE_NAME
+
+# Name of the journal file written by the Downloader in each download folder
+JOURNAL_FILE_NAME = 'download_journal.jsonl'
+
+# Name of the report written by the reconciliation
+REPORT_FILE_NAME = 'reconcile_report.json'
+
+# Pattern of the shard folder names
+SHARD_FOLDER_PATTERN = re.compile(r'^shard_(\d+)_of_(\d+)$')
+
+
+def parse_shard(value):
+    """
+    This function parses a shard specification in the ``i/N`` format, where ``N`` is the number of shards and
+    ``i`` is the zero-based index of the shard.
+
+    Args:
+        value: The shard specification.
+
+    Returns:
+        shard: A ``(index, count)`` tuple.
+    """
+
+    match = re.match(r'^(\d+)/(\d+)$', value)
+    if match is None:
+        raise ValueError(f'Invalid shard "{value}": expected the "i/N" format.')
+
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or index >= count:
+        raise ValueError(f'Invalid shard "{value}": the index must be between 0 and {count - 1}.')
+    return index, count
+
+
+def shard_of(kernel_version_id, count):
+    """
+    This function returns the shard a notebook belongs to.
+    The CRC32 hash of the identifier is used, so that the assignment is the same on every machine and every run.
+
+    Args:
+        kernel_version_id: The ``CurrentKernelVersionId`` of the notebook.
+        count: The number of shards.
+
+    Returns:
+        index: The zero-based index of the shard.
+    """
+    return zlib.crc32(str(int(kernel_version_id)).encode('ascii')) % count
+
+
+def select_shard(nb_identifiers, index, count):
+    """
+    This function selects the notebooks belonging to a shard.
+
+    Args:
+        nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
+        index: The zero-based index of the shard.
+        count: The number of shards.
+
+    Returns:
+        nb_identifiers: The ``pandas.DataFrame`` containing slugs and identifiers of the notebooks in the shard.
+    """
+
+    shards = nb_identifiers['CurrentKernelVersionId'].map(lambda kernel_version_id: shard_of(kernel_version_id, count))
+    return nb_identifiers.loc[shards == index]
+
+
+def drop_archived_notebooks(nb_identifiers, nb_archive_path):
+    """
+    This function drops the notebooks whose file is already in the notebook archive folder
+    (e.g., downloaded by a previous session and reconciled), so that shards do not download them again.
+
+    Args:
+        nb_identifiers: The ``pandas.DataFrame`` containing notebook slugs and identifiers.
+        nb_archive_path: The path to the notebook archive folder.
+
+    Returns:
+        nb_identifiers: The ``pandas.DataFrame`` containing slugs and identifiers of the notebooks to be downloaded.
+    """
+
+    archived = {path.name for path in Path(nb_archive_path).glob('*.ipynb')}
+    file_names = nb_identifiers['UserName'] + '_' + nb_identifiers['CurrentUrlSlug'] + '.ipynb'
+    return nb_identifiers.loc[~file_names.isin(archived)]
+
+
+def get_shard_path(nb_archive_path, index, count):
+    """
+    This function returns the folder where a shard is downloaded, creating it if needed.
+
+    Args:
+        nb_archive_path: The path to the notebook archive folder.
+        index: The zero-based index of the shard.
+        count: The number of shards.
+
+    Returns:
+        shard_path: The path to the shard folder.
+    """
+
+    shard_path = os.path.join(nb_archive_path, f'shard_{index}_of_{count}')
+    os.makedirs(shard_path, exist_ok=True)
+    return shard_path
+
+
+class ShardReconciler:
+    """
+    The ``ShardReconciler`` class merges the shard folders found in the notebook archive folder:
+    notebooks are moved to the archive folder, quarantined notebooks to the quarantine folder of the archive,
+    shard journals, manifests and quarantine reasons are appended to those of the archive and a report summarizing the outcome of each shard is written to ``reconcile_report.json``.
+    """
+
+    def __init__(self, nb_archive_path):
+        """
+        The constructor of this class sets the notebook archive folder.
+
+        Args:
+            nb_archive_path: The path to the notebook archive folder containing the shard folders.
+        """
+        self._nb_archive_path = Path(nb_archive_path)
+
+    def _find_shards(self):
+        """
+        This method finds the shard folders in the notebook archive folder.
+
+        Returns:
+            shards: A list of ``(index, count, path)`` tuples, sorted by shard index.
+        """
+
+        shards = []
+        for path in self._nb_archive_path.iterdir():
+            match = SHARD_FOLDER_PATTERN.match(path.name)
+            if path.is_dir() and match is not None:
+                shards.append((int(match.group(1)), int(match.group(2)), path))
+        return sorted(shards)
+
+    @staticmethod
+    def _read_journal(journal_path):
+        """
+        This method reads a download journal and keeps the last outcome of each notebook.
+
+        Args:
+            journal_path: The path to the journal file.
+
+        Returns:
+            entries: A dictionary whose keys are notebook identifiers and whose values are journal entries.
+        """
+
+        entries = {}
+        if not journal_path.exists():
+            return entries
+
+        with open(journal_path) as journal:
+            for line in journal:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    entries[entry['CurrentKernelVersionId']] = entry
+        return entries
+
+    def _merge_quarantine(self, shard_path, shard):
+        """
+        This method moves the quarantined notebooks of a shard to the quarantine folder of the archive
+        and appends the reasons of their rejection to the archive quarantine reasons file.
+
+        Args:
+            shard_path: The path to the shard folder.
+            shard: The shard, in the ``i/N`` format.
+
+        Returns:
+            n_quarantined: The number of quarantined notebooks moved to the archive.
+        """
+
+        shard_quarantine_path = shard_path / QUARANTINE_FOLDER_NAME
+        if not shard_quarantine_path.is_dir():
+            return 0
+
+        archive_quarantine_path = self._nb_archive_path / QUARANTINE_FOLDER_NAME
+        archive_quarantine_path.mkdir(exist_ok=True)
+
+        n_quarantined = 0
+        for notebook_path in shard_quarantine_path.glob('*.ipynb'):
+            os.replace(notebook_path, archive_quarantine_path / notebook_path.name)
+            n_quarantined += 1
+
+        shard_reasons_path = shard_quarantine_path / QUARANTINE_REASONS_FILE_NAME
+        if shard_reasons_path.exists():
+            with open(shard_reasons_path) as shard_reasons, \
+                    open(archive_quarantine_path / QUARANTINE_REASONS_FILE_NAME, 'a') as archive_reasons:
+                for line in shard_reasons:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        entry['Shard'] = shard
+                        archive_reasons.write(json.dumps(entry) + '\n')
+        return n_quarantined
+
+    def reconcile(self):
+        """
+        This method merges all the shard folders into the notebook archive folder and writes the report.
+
+        Returns:
+            report: The dictionary written to the report file.
+        """
+
+        shards = self._find_shards()
+        report = {
+            'reconciled_at': time.time(),
+            'shards': [],
+            'missing_shards': [],
+            'merged_notebooks': 0,
+            'replaced_notebooks': 0,
+            'quarantined_notebooks': 0,
+        }
+
+        archive_journal_path = self._nb_archive_path / JOURNAL_FILE_NAME
+        archive_manifest = ArchiveManifest(self._nb_archive_path)
+        with open(archive_journal_path, 'a') as archive_journal:
+            for index, count, shard_path in shards:
+                print(f'## Merging shard {index}/{count}...')
+
+                # Journal
+                shard_journal_path = shard_path / JOURNAL_FILE_NAME
+                entries = self._read_journal(shard_journal_path)
+                for entry in entries.values():
+                    entry['Shard'] = f'{index}/{count}'
+                    archive_journal.write(json.dumps(entry) + '\n')
+
+                # Manifest
+                archive_manifest.merge(shard_path / MANIFEST_FILE_NAME)
+
+                # Notebooks
+                n_merged = 0
+                n_replaced = 0
+                for notebook_path in shard_path.glob('*.ipynb'):
+                    destination = self._nb_archive_path / notebook_path.name
+                    if destination.exists():
+                        n_replaced += 1
+                    os.replace(notebook_path, destination)
+                    n_merged += 1
+
+                # Quarantine, which would otherwise be deleted with the shard folder
+                n_quarantined = self._merge_quarantine(shard_path, f'{index}/{count}')
+
+                statuses = [entry['Status'] for entry in entries.values()]
+                report['shards'].append({
+                    'shard': f'{index}/{count}',
+                    'merged_notebooks': n_merged,
+                    'replaced_notebooks': n_replaced,
+                    'quarantined_notebooks': n_quarantined,
+                    'downloaded': statuses.count('downloaded'),
+                    'failed': statuses.count('failed'),
+                    'failed_ids': sorted(kernel_version_id for kernel_version_id, entry in entries.items()
+                                         if entry['Status'] == 'failed'),
+                })
+                report['merged_notebooks'] += n_merged
+                report['replaced_notebooks'] += n_replaced
+                report['quarantined_notebooks'] += n_quarantined
+
+                if shard_journal_path.exists():
+                    shard_journal_path.unlink()
+                shutil.rmtree(shard_path)
+
+        # Shards that were expected but not found
+        for count in sorted({count for _, count, _ in shards}):
+            found = {index for index, shard_count, _ in shards if shard_count == count}
+            report['missing_shards'] += [f'{index}/{count}' for index in range(count) if index not in found]
+
+        with open(self._nb_archive_path / REPORT_FILE_NAME, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+        return report
@@ -0,0 +1,149 @@
+"""
+This module defines the class that writes the download status of the notebooks to the database in the background,
+so that the download loop never waits for a database round trip.
+"""
+
+import datetime
+import logging
+import queue
+import threading
+import time
+
+# Name of the table storing the download status of the notebooks
+DOWNLOAD_STATUS_TABLE_NAME = 'downloadstatus'
+
+# Default number of results written by a single upsert
+DEFAULT_BATCH_SIZE = 500
+
+# Default maximum time (in seconds) a result waits before being written
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+class StatusWriter:
+    """
+    The ``StatusWriter`` class writes the download status of the notebooks to the ``downloadstatus`` table
+    on a background thread.
+    Results are enqueued with :func:`.StatusWriter.put` (e.g., by the :class:`.Downloader` after each notebook
+    request) and written in batches by :func:`.DbCommunicationHandler.upsert_download_status`:
+    a batch is written as soon as it holds ``batch_size`` results, or when its oldest result has been waiting
+    for ``flush_interval`` seconds.
+    """
+
+    def __init__(self, db_engine, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        The constructor of this class creates the queue of results to be written and the background thread.
+
+        Args:
+            db_engine: The :class:`.DbCommunicationHandler` used to write the results.
+            batch_size: The maximum number of results written by a single upsert. By default it is 500.
+            flush_interval: The maximum time (in seconds) a result waits before being written. By default it is 5.
+        """
+
+        self._db_engine = db_engine
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+
+        # Results waiting to be written; None marks the end of the stream
+        self._queue = queue.Queue()
+
+        # Number of results written so far
+        self._n_written = 0
+
+        # First exception raised by the background thread
+        self._error = None
+
+        self._thread = threading.Thread(target=self._run, name='StatusWriter', daemon=True)
+
+    def start(self):
+        """
+        This method creates the ``downloadstatus`` table, unless it already exists, and starts the background thread.
+        """
+        self._db_engine.create_download_status_table()
+        self._thread.start()
+
+    def put(self, kernel_version_id, status, local_path=None, n_bytes=0, http_status=None, reason=None,
+            fetched_at=None):
+        """
+        This method enqueues the download status of a notebook to be written to the database.
+
+        Args:
+            kernel_version_id: The ``CurrentKernelVersionId`` of the notebook.
+            status: The download status (``downloaded``, ``failed`` or ``present``).
+            local_path: The path to the notebook in the download folder, if any.
+            n_bytes: The size of the notebook in bytes.
+            http_status: The HTTP status code of the last response, if any.
+            reason: The reason why the notebook was quarantined, if any.
+            fetched_at: The UNIX time of the result. By default it is the current time.
+        """
+
+        self._queue.put({
+            'CurrentKernelVersionId': int(kernel_version_id),
+            'LocalPath': local_path,
+            'Status': status,
+            'Bytes': int(n_bytes),
+            'HttpStatus': http_status,
+            'Reason': reason,
+            'FetchedAt': datetime.datetime.fromtimestamp(fetched_at if fetched_at is not None else time.time()),
+        })
+
+    def _flush(self, batch):
+        """
+        This method upserts a batch of results.
+        After an error, the remaining results are discarded.
+
+        Args:
+            batch: The list of the results.
+        """
+
+        if len(batch) == 0 or self._error is not None:
+            return
+
+        # noinspection PyBroadException
+        try:
+            self._db_engine.upsert_download_status(batch)
+            self._n_written += len(batch)
+        except Exception as e:
+            logging.exception('An error occurred while writing the download status to the database')
+            self._error = e
+
+    def _run(self):
+        """
+        This method writes the enqueued results in batches until the end of the stream is reached.
+        """
+
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+
+            if item is None:
+                break
+
+            if item is not False:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self._flush_interval
+
+            if len(batch) >= self._batch_size or (deadline is not None and time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+        self._flush(batch)
+
+    def close(self):
+        """
+        This method waits for all the enqueued results to be written and stops the background thread.
+        The first error raised while writing, if any, is raised again here.
+        """
+
+        self._queue.put(None)
+        self._thread.join()
+        print(f'## Download status of {self._n_written} notebooks written to the "{DOWNLOAD_STATUS_TABLE_NAME}" table')
+
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,88 @@
+"""
+This module defines the class that writes tables to the database in the background,
+so that the database population can overlap with the preprocessing of the Meta Kaggle tables.
+"""
+
+import queue
+import threading
+
+
+class TableWriter:
+    """
+    The ``TableWriter`` class writes tables to the database on a background thread.
+    Tables are enqueued with :func:`.TableWriter.put` (e.g., by :func:`.MkPreprocessor.preprocess_mk`
+    as soon as they reach their final state) and written in the same order by
+    :func:`.DbCommunicationHandler.write_tables`.
+    """
+
+    def __init__(self, db_engine, to_pandas=None):
+        """
+        The constructor of this class creates the queue of tables to be written and the background thread.
+
+        Args:
+            db_engine: The :class:`.DbCommunicationHandler` used to write the tables.
+            to_pandas: An optional function converting each table into a ``pandas.DataFrame`` before writing it
+                (e.g., the ``to_pandas`` method of a dataframe engine).
+        """
+
+        self._db_engine = db_engine
+        self._to_pandas = to_pandas
+
+        # Tables waiting to be written; None marks the end of the stream
+        self._queue = queue.Queue()
+
+        # First exception raised by the background thread
+        self._error = None
+
+        self._thread = threading.Thread(target=self._run, name='TableWriter', daemon=True)
+
+    def start(self):
+        """
+        This method starts the background thread.
+        """
+        self._thread.start()
+
+    def put(self, table_name, table):
+        """
+        This method enqueues a table to be written to the database.
+
+        Args:
+            table_name: The name of the table.
+            table: The table.
+        """
+        print(f'## "{table_name}" is final: queued for writing.')
+        self._queue.put((table_name, table))
+
+    def _run(self):
+        """
+        This method writes the enqueued tables until the end of the stream is reached.
+        After an error, the remaining tables are discarded.
+        """
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+
+            table_name, table = item
+            # noinspection PyBroadException
+            try:
+                if self._to_pandas is not None:
+                    table = self._to_pandas(table)
+                self._db_engine.write_tables({table_name: table})
+            except Exception as e:
+                self._error = e
+
+    def close(self):
+        """
+        This method waits for all the enqueued tables to be written and stops the background thread.
+        The first error raised while writing, if any, is raised again here.
+        """
+
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
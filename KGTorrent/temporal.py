@@ -0,0 +1,279 @@
+"""
+This module defines the functions and the class that store successive versions (snapshots) of the preprocessed
+Meta Kaggle tables in a single temporal database, instead of one complete database per version.
+
+Each table is stored in a history table (e.g., ``kernels_history``) whose rows carry the ``ValidFrom`` and
+``ValidTo`` snapshot identifiers: a row is valid from the snapshot that inserted it until the snapshot that changed
+or removed it (``ValidTo`` is ``NULL`` while the row is current). When a new snapshot is added, rows are compared by
+``Id`` and by a hash of their content (``RowHash``), and only new and changed rows are stored.
+
+Each snapshot can be queried through views:
+
+- ``<table>`` (e.g., ``kernels``) shows the rows of the latest snapshot, so that queries written for a regular
+  KGTorrent database run unchanged;
+- ``<table>_snapshot_<n>`` (e.g., ``kernels_snapshot_3``) shows the rows as of snapshot ``n``.
+
+The snapshots are listed in the ``snapshots`` table.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, Float, DateTime, Boolean, String, Index
+
+from KGTorrent.schema import LONG_TEXT
+
+# Name of the table listing the snapshots
+SNAPSHOTS_TABLE_NAME = 'snapshots'
+
+# Names of the history tables and of the views, formatted with the name of the Meta Kaggle table
+HISTORY_TABLE_NAME = '{}_history'
+SNAPSHOT_VIEW_NAME = '{}_snapshot_{}'
+
+# Columns added to the history tables
+VALID_FROM = 'ValidFrom'
+VALID_TO = 'ValidTo'
+ROW_HASH = 'RowHash'
+TEMPORAL_COLUMNS = [VALID_FROM, VALID_TO, ROW_HASH]
+
+
+def _is_integral(values):
+    """
+    This function checks whether a numeric column only holds integral values (besides missing values).
+
+    Args:
+        values: The ``pandas.Series`` of the column.
+
+    Returns:
+        bool: True if all the values are integral, False otherwise.
+    """
+
+    values = values.dropna().to_numpy()
+    return bool(np.all(np.mod(values, 1) == 0))
+
+
+def hash_rows(df):
+    """
+    This function hashes the content of each row of a table into a 64-bit integer.
+    Integral columns are hashed as nullable integers, so that hashes do not change when a column gains or loses
+    missing values (which turns it from integer into float in ``pandas``); columns are hashed in alphabetical order.
+
+    Args:
+        df: The ``pandas.DataFrame`` of the table.
+
+    Returns:
+        hashes: The ``numpy.ndarray`` of the row hashes, as signed 64-bit integers.
+    """
+
+    normalized = {}
+    for column in sorted(df.columns):
+        values = df[column]
+        if not pd.api.types.is_bool_dtype(values) and pd.api.types.is_numeric_dtype(values) and _is_integral(values):
+            values = values.astype('Int64')
+        normalized[column] = values
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False)
+    return hashes.to_numpy().view(np.int64)
+
+
+def _get_column_type(values):
+    """
+    This function chooses the SQL type of a column of a history table.
+
+    Args:
+        values: The ``pandas.Series`` of the column.
+
+    Returns:
+        column_type: The SQLAlchemy type.
+    """
+
+    if pd.api.types.is_bool_dtype(values):
+        return Boolean()
+    if pd.api.types.is_numeric_dtype(values):
+        return BigInteger() if _is_integral(values) else Float()
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return DateTime()
+    return LONG_TEXT
+
+
+class TemporalStore:
+    """
+    The ``TemporalStore`` class adds snapshots of the preprocessed Meta Kaggle tables to a temporal database.
+    """
+
+    def __init__(self, db_engine):
+        """
+        The constructor of this class sets the temporal database.
+
+        Args:
+            db_engine: The :class:`.DbCommunicationHandler` of the temporal database.
+        """
+        self._db_engine = db_engine
+
+    def is_temporal(self):
+        """
+        This method checks whether the database is a temporal database.
+
+        Returns:
+            bool: True if the database contains the ``snapshots`` table, False otherwise.
+        """
+        return self._db_engine.has_table(SNAPSHOTS_TABLE_NAME)
+
+    def get_snapshots(self):
+        """
+        This method lists the snapshots of the database.
+
+        Returns:
+            snapshots: The ``pandas.DataFrame`` with the ``SnapshotId``, ``Label`` and ``CreatedAt`` of the snapshots.
+        """
+        return self._db_engine.execute_query(f'SELECT SnapshotId, Label, CreatedAt FROM {SNAPSHOTS_TABLE_NAME} '
+                                             f'ORDER BY SnapshotId;')
+
+    def _create_snapshot(self, label):
+        """
+        This method registers a new snapshot.
+
+        Args:
+            label: The label of the snapshot (e.g., the Meta Kaggle version).
+
+        Returns:
+            snapshot_id: The identifier of the new snapshot.
+        """
+
+        snapshots = Table(SNAPSHOTS_TABLE_NAME, MetaData(),
+                          Column('SnapshotId', Integer(), primary_key=True, autoincrement=False),
+                          Column('Label', String(255), nullable=False),
+                          Column('CreatedAt', DateTime(), nullable=False))
+        self._db_engine.create_table(snapshots)
+
+        snapshot_ids = self.get_snapshots()['SnapshotId']
+        snapshot_id = int(snapshot_ids.max()) + 1 if len(snapshot_ids) != 0 else 1
+        self._db_engine.write_tables({SNAPSHOTS_TABLE_NAME: pd.DataFrame({'SnapshotId': [snapshot_id],
+                                                                          'Label': [label],
+                                                                          'CreatedAt': [pd.Timestamp.now()]})})
+        return snapshot_id
+
+    def _prepare_history_table(self, history_table_name, df):
+        """
+        This method creates the history table of a Meta Kaggle table, or adds the columns that appeared in
+        the new snapshot to an existing one.
+
+        Args:
+            history_table_name: The name of the history table.
+            df: The ``pandas.DataFrame`` of the table in the new snapshot.
+        """
+
+        if 'Id' not in df.columns:
+            raise ValueError(f'Table {history_table_name} has no Id column: its rows cannot be tracked.')
+
+        if self._db_engine.has_table(history_table_name):
+            existing_columns = set(self._db_engine.get_column_names(history_table_name))
+            new_columns = [Column(column, _get_column_type(df[column]))
+                           for column in df.columns if column not in existing_columns]
+            if len(new_columns) != 0:
+                print(f'\tAdding columns {[column.name for column in new_columns]} to {history_table_name}')
+                self._db_engine.add_columns(history_table_name, new_columns)
+            return
+
+        columns = [Column(column, _get_column_type(df[column]), primary_key=column == 'Id', autoincrement=False)
+                   for column in df.columns]
+        history_table = Table(history_table_name, MetaData(),
+                              *columns,
+                              Column(VALID_FROM, Integer(), primary_key=True, autoincrement=False),
+                              Column(VALID_TO, Integer()),
+                              Column(ROW_HASH, BigInteger(), nullable=False),
+                              Index(f'ix_{history_table_name}_{VALID_TO}', VALID_TO, 'Id'))
+        self._db_engine.create_table(history_table)
+
+    def _store_table(self, table_name, df, snapshot_id):
+        """
+        This method stores the new and changed rows of a table and closes the validity of its changed and removed rows.
+
+        Args:
+            table_name: The name of the Meta Kaggle table in the database (e.g., ``kernels``).
+            df: The ``pandas.DataFrame`` of the table in the new snapshot.
+            snapshot_id: The identifier of the new snapshot.
+
+        Returns:
+            stats: A dictionary with the number of inserted, expired and unchanged rows.
+        """
+
+        history_table_name = HISTORY_TABLE_NAME.format(table_name)
+        self._prepare_history_table(history_table_name, df)
+
+        current = self._db_engine.execute_query(f'SELECT Id, {ROW_HASH} FROM {history_table_name} '
+                                                f'WHERE {VALID_TO} IS NULL;')
+        current_hashes = pd.Series(current[ROW_HASH].to_numpy(dtype=np.int64),
+                                   index=current['Id'].to_numpy(dtype=np.int64))
+
+        ids = df['Id'].to_numpy(dtype=np.int64)
+        hashes = hash_rows(df)
+
+        # Rows are unchanged when a current row with the same Id has the same hash
+        previous_hashes = current_hashes.reindex(ids).to_numpy()
+        is_unchanged = previous_hashes == hashes
+        is_changed_or_new = ~is_unchanged
+
+        # Current rows that changed or that are no longer in the table are expired
+        expired_ids = np.setdiff1d(current_hashes.index.to_numpy(), ids[is_unchanged], assume_unique=True)
+
+        rows = df.loc[is_changed_or_new].assign(**{VALID_FROM: snapshot_id, VALID_TO: None,
+                                                   ROW_HASH: hashes[is_changed_or_new]})
+        self._db_engine.apply_temporal_changes(history_table_name, expired_ids.tolist(), rows, snapshot_id)
+
+        return {
+            'inserted': int(is_changed_or_new.sum()),
+            'expired': len(expired_ids),
+            'unchanged': int(is_unchanged.sum()),
+        }
+
+    def _create_views(self, snapshot_id):
+        """
+        This method creates the views of a snapshot and points the current views to it.
+
+        Args:
+            snapshot_id: The identifier of the snapshot.
+        """
+
+        views = {}
+        for history_table_name in self._db_engine.get_table_names():
+            if not history_table_name.endswith(HISTORY_TABLE_NAME.format('')):
+                continue
+
+            table_name = history_table_name[:-len(HISTORY_TABLE_NAME.format(''))]
+            columns = ', '.join(column for column in self._db_engine.get_column_names(history_table_name)
+                                if column not in TEMPORAL_COLUMNS)
+            views[SNAPSHOT_VIEW_NAME.format(table_name, snapshot_id)] = \
+                f'SELECT {columns} FROM {history_table_name} ' \
+                f'WHERE {VALID_FROM} <= {snapshot_id} AND ({VALID_TO} IS NULL OR {VALID_TO} > {snapshot_id})'
+            views[table_name] = f'SELECT {columns} FROM {history_table_name} WHERE {VALID_TO} IS NULL'
+
+        self._db_engine.replace_views(views)
+
+    def add_snapshot(self, tables_dict, label, to_pandas=None):
+        """
+        This method adds a snapshot of the preprocessed Meta Kaggle tables to the temporal database.
+
+        Args:
+            tables_dict: The dictionary whose keys are the table names and whose values are the preprocessed tables.
+            label: The label of the snapshot (e.g., the Meta Kaggle version).
+            to_pandas: An optional function converting each table into a ``pandas.DataFrame``
+                (e.g., the ``to_pandas`` method of a dataframe engine).
+
+        Returns:
+            snapshot_id: The identifier of the new snapshot.
+        """
+
+        start = time.perf_counter()
+        snapshot_id = self._create_snapshot(label)
+        print(f'## Adding snapshot {snapshot_id} ({label})...')
+
+        for table_name, table in tables_dict.items():
+            df = to_pandas(table) if to_pandas is not None else table
+            stats = self._store_table(table_name.split('.')[0].lower(), df, snapshot_id)
+            print(f'- {table_name}: {stats["inserted"]} rows inserted, {stats["expired"]} expired, '
+                  f'{stats["unchanged"]} unchanged')
+
+        self._create_views(snapshot_id)
+        print(f'## Snapshot {snapshot_id} added in {time.perf_counter() - start:.2f}s')
+        return snapshot_id
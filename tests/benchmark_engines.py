@@ -0,0 +1,76 @@
+"""
+Benchmark of the dataframe engines: it times the loading and the preprocessing of Meta Kaggle with each engine.
+
+By default, a synthetic Meta Kaggle is generated (see :mod:`synthetic`); a real one can be given instead::
+
+    python tests/benchmark_engines.py --rows 200000
+    python tests/benchmark_engines.py --meta-kaggle /path/to/MetaKaggle --workers 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from KGTorrent.data_loader import DataLoader  # noqa: E402
+from KGTorrent.dataframe_engine import ENGINES, get_engine  # noqa: E402
+from KGTorrent.mk_preprocessor import MkPreprocessor  # noqa: E402
+from synthetic import CONSTRAINTS_FILE_PATH, write_meta_kaggle  # noqa: E402
+
+
+def run(engine_name, meta_kaggle_path, n_workers):
+    """
+    This function loads and preprocesses Meta Kaggle with an engine.
+
+    Args:
+        engine_name: The name of the dataframe engine.
+        meta_kaggle_path: The path to the Meta Kaggle folder.
+        n_workers: The number of threads cleaning independent components.
+
+    Returns:
+        timings: The tuple of the loading and the preprocessing times, in seconds.
+    """
+
+    engine = get_engine(engine_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        dl = DataLoader(CONSTRAINTS_FILE_PATH, meta_kaggle_path, engine=engine)
+        loaded = time.perf_counter()
+        MkPreprocessor(dl.get_tables_dict(), dl.get_constraints_df(), engine=engine, n_workers=n_workers) \
+            .preprocess_mk()
+        preprocessed = time.perf_counter()
+    return loaded - start, preprocessed - loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dataframe engines of KGTorrent')
+    parser.add_argument('--meta-kaggle', type=str, default=None,
+                        help='The Meta Kaggle folder. By default a synthetic Meta Kaggle is generated.')
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='The number of rows of each table of the synthetic Meta Kaggle.')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument('--repeat', type=int, default=3, help='The number of runs of each engine.')
+    parser.add_argument('--workers', type=int, default=None, help='The number of preprocessing threads.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_path:
+        meta_kaggle_path = args.meta_kaggle
+        if meta_kaggle_path is None:
+            print(f'Generating a synthetic Meta Kaggle with {args.rows} rows per table...')
+            meta_kaggle_path = tmp_path
+            write_meta_kaggle(meta_kaggle_path, n_rows=args.rows)
+
+        print(f'{"Engine":<10}{"Load (s)":>12}{"Preprocess (s)":>16}{"Total (s)":>12}')
+        for engine_name in args.engines:
+            # The best of the runs is reported
+            timings = min((run(engine_name, meta_kaggle_path, args.workers) for _ in range(args.repeat)), key=sum)
+            print(f'{engine_name:<10}{timings[0]:>12.2f}{timings[1]:>16.2f}{sum(timings):>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
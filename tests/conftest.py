@@ -0,0 +1,11 @@
+"""
+Shared configuration of the KGTorrent tests.
+"""
+
+import sys
+from pathlib import Path
+
+# Make the KGTorrent package importable when the tests are run from any folder
+REPO_PATH = Path(__file__).resolve().parents[1]
+if str(REPO_PATH) not in sys.path:
+    sys.path.insert(0, str(REPO_PATH))
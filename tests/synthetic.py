@@ -0,0 +1,77 @@
+"""
+Generator of a small synthetic Meta Kaggle, with the tables and columns of the schema of the KGTorrent database.
+
+Foreign keys mostly reference existing rows, but a few of them are dangling, so that the preprocessing removes rows
+from every table, cycles of the constraints graph (e.g., ``Kernels`` and ``KernelVersions``) included.
+The tables also contain the anomalies fixed by the basic preprocessing (duplicate ``ForumMessageVotes`` and infinite
+``Submissions`` scores).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Boolean, DateTime, Float, Integer
+
+from KGTorrent.schema import build_db_schema
+
+# Path to the foreign key constraints file of the repository
+CONSTRAINTS_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'data', 'fk_constraints_data.csv')
+
+# Fraction of the foreign keys that reference missing rows
+DANGLING_FRACTION = 0.03
+
+
+def write_meta_kaggle(path, n_rows=300, seed=0):
+    """
+    This function writes a synthetic Meta Kaggle to a folder.
+
+    Args:
+        path: The path to the output folder.
+        n_rows: The number of rows of each table. By default it is 300.
+        seed: The seed of the random generator. By default it is 0.
+    """
+
+    os.makedirs(path, exist_ok=True)
+    constraints_df = pd.read_csv(CONSTRAINTS_FILE_PATH)
+    foreign_keys = {(table[:-4], fk) for table, fk in zip(constraints_df['Table'], constraints_df['Foreign Key'])}
+    rng = np.random.default_rng(seed)
+    dates = pd.Series(pd.date_range('2019-01-01', periods=n_rows, freq='7h')).dt.strftime('%m/%d/%Y %H:%M:%S')
+
+    for table in build_db_schema().sorted_tables:
+        columns = {}
+        for column in table.columns:
+            if column.name == 'Id':
+                values = np.arange(1, n_rows + 1)
+            elif (table.name, column.name) in foreign_keys:
+                values = np.arange(1, n_rows + 1).astype(float)
+                dangling = rng.random(n_rows) < DANGLING_FRACTION
+                values[dangling] = rng.integers(n_rows + 1, 2 * n_rows, dangling.sum())
+                if column.nullable:
+                    values[rng.random(n_rows) < 0.2] = np.nan
+            elif isinstance(column.type, DateTime):
+                values = dates.values
+            elif isinstance(column.type, Boolean):
+                values = rng.random(n_rows) < 0.5
+            elif isinstance(column.type, Integer):
+                values = rng.integers(0, 100, n_rows)
+            elif isinstance(column.type, Float):
+                values = rng.random(n_rows) * 10
+            else:
+                values = np.array([f'{column.name.lower()}-{i}' for i in range(n_rows)], dtype=object)
+            columns[column.name] = values
+        df = pd.DataFrame(columns)
+
+        if table.name == 'KernelLanguages':
+            df.loc[0, 'Name'] = 'IPython Notebook HTML'
+        if table.name == 'KernelVersions':
+            df['ScriptLanguageId'] = rng.integers(1, 3, n_rows)
+        if table.name == 'Kernels':
+            df['Medal'] = rng.choice([np.nan, 1, 2, 3], n_rows)
+        if table.name == 'ForumMessageVotes':
+            df.loc[5, 'Id'] = 4
+        if table.name == 'Submissions':
+            df.loc[0, 'PublicScoreFullPrecision'] = np.inf
+
+        df.to_csv(os.path.join(path, f'{table.name}.csv'), index=False)
@@ -0,0 +1,41 @@
+"""
+Tests of the ``init`` command, run on a synthetic Meta Kaggle with the SQLite backend.
+"""
+
+import os
+import subprocess
+import sys
+
+from conftest import REPO_PATH
+from synthetic import write_meta_kaggle
+
+# The download fails, as it does when the status writer cannot write the last statuses
+_SCRIPT = """
+import sys
+from KGTorrent.downloader import Downloader
+
+def download_notebooks(self, strategy='HTTP'):
+    raise RuntimeError('the download failed')
+
+Downloader.download_notebooks = download_notebooks
+sys.argv = ['kgtorrent.py'] + sys.argv[1:]
+from KGTorrent.kgtorrent import main
+main()
+"""
+
+
+def test_early_download_errors_are_raised(tmp_path):
+    write_meta_kaggle(str(tmp_path / 'meta_kaggle'))
+    (tmp_path / 'notebooks').mkdir()
+    env = dict(os.environ, PYTHONPATH=str(REPO_PATH), DB_BACKEND='sqlite', DB_NAME=str(tmp_path / 'kgtorrent.db'),
+               NB_DEST_PATH=str(tmp_path / 'notebooks'), LOG_DEST_PATH=str(tmp_path),
+               METAKAGGLE_PATH=str(tmp_path / 'meta_kaggle'))
+
+    result = subprocess.run([sys.executable, '-c', _SCRIPT, 'init', '--early-download'],
+                            cwd=str(REPO_PATH / 'KGTorrent'), env=env, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    assert result.returncode != 0
+    assert 'RuntimeError: the download failed' in result.stderr
+    assert 'NOTEBOOK DOWNLOAD STARTED' in result.stdout
+    assert 'Download finished' not in result.stdout
@@ -0,0 +1,43 @@
+"""
+Tests of the notebook catalog.
+"""
+
+import pandas as pd
+
+from KGTorrent.catalog import CatalogBuilder, CATALOG_TABLE_NAME
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+
+
+def _tables_dict():
+    ids = [1, 2, 3]
+    no_sources = pd.DataFrame({'KernelVersionId': pd.Series([], dtype='int64')})
+    return {
+        'Kernels.csv': pd.DataFrame({'Id': ids, 'AuthorUserId': ids, 'CurrentKernelVersionId': ids,
+                                     'ForkParentKernelVersionId': None, 'CreationDate': pd.Timestamp('2020-10-01'),
+                                     'MadePublicDate': pd.Timestamp('2020-10-01'),
+                                     'CurrentUrlSlug': ['gold', None, 'silver'], 'Medal': 1.0,
+                                     'MedalAwardDate': None, 'TotalViews': 100, 'TotalComments': 0,
+                                     'TotalVotes': 10}),
+        'Users.csv': pd.DataFrame({'Id': ids, 'UserName': ['alice', 'bob', None],
+                                   'DisplayName': ['Alice', 'Bob', 'Carol']}),
+        'KernelVersions.csv': pd.DataFrame({'Id': ids, 'ScriptLanguageId': 1,
+                                            'CreationDate': pd.Timestamp('2020-10-01')}),
+        'KernelLanguages.csv': pd.DataFrame({'Id': [1], 'Name': ['IPython Notebook HTML']}),
+        'KernelVersionDatasetSources.csv': pd.DataFrame({'KernelVersionId': [1, 1, 3]}),
+        'KernelVersionCompetitionSources.csv': no_sources,
+        'KernelVersionKernelSources.csv': no_sources,
+    }
+
+
+def test_notebooks_without_user_name_or_slug_are_cataloged(tmp_path):
+    catalog = CatalogBuilder(_tables_dict()).build()
+
+    assert catalog['FileName'].isna().tolist() == [False, True, True]
+    assert catalog['NDatasetSources'].tolist() == [2, 0, 1]
+
+    db_engine = DbCommunicationHandler(None, None, None, None, str(tmp_path / 'kgtorrent.db'), backend='sqlite')
+    db_engine.write_catalog(catalog)
+
+    written = db_engine.execute_query(f'SELECT KernelId, FileName FROM {CATALOG_TABLE_NAME} ORDER BY KernelId')
+    assert written['KernelId'].tolist() == [1, 2, 3]
+    assert written['FileName'].tolist() == ['alice_gold.ipynb', None, None]
@@ -0,0 +1,40 @@
+"""
+Tests of the export of the notebook cells to a Parquet dataset.
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from KGTorrent.cell_export import CellExporter, extract_cells
+
+
+def _write_notebook(path, cells):
+    path.write_text(json.dumps({'nbformat': 4, 'nbformat_minor': 4, 'metadata': {}, 'cells': cells}))
+
+
+def _code_cell(source, outputs=()):
+    return {'cell_type': 'code', 'source': source, 'metadata': {}, 'execution_count': 1, 'outputs': list(outputs)}
+
+
+def test_malformed_cells_make_the_notebook_unparsable(tmp_path):
+    pytest.importorskip('pyarrow')
+
+    archive_path = tmp_path / 'notebooks'
+    archive_path.mkdir()
+    _write_notebook(archive_path / 'alice_valid.ipynb',
+                    [_code_cell(['print(1)\n', 'print(2)'], [{'output_type': 'stream', 'text': '1\n2\n'}]),
+                     {'cell_type': 'markdown', 'source': '# Title', 'metadata': {}}])
+    _write_notebook(archive_path / 'bob_list.ipynb', [_code_cell(['print(1)\n', 42])])
+    _write_notebook(archive_path / 'carol_outputs.ipynb', [_code_cell('print(1)', ['1'])])
+    nb_identifiers = pd.DataFrame({'UserName': ['alice', 'bob', 'carol'],
+                                   'CurrentUrlSlug': ['valid', 'list', 'outputs'],
+                                   'CurrentKernelVersionId': [1, 2, 3]})
+
+    assert extract_cells(archive_path / 'bob_list.ipynb') is None
+    assert extract_cells(archive_path / 'carol_outputs.ipynb') is None
+
+    report = CellExporter(tmp_path / 'cells').update(nb_identifiers, archive_path, n_workers=1)
+
+    assert (report['exported'], report['cells'], report['unparsable']) == (1, 2, 2)
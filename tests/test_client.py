@@ -0,0 +1,30 @@
+"""
+Tests of the Python client reading the notebooks of the archive.
+"""
+
+import json
+
+import pandas as pd
+
+from KGTorrent.client import KGTorrentClient
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+
+NOTEBOOK = {'nbformat': 4, 'nbformat_minor': 4, 'metadata': {},
+            'cells': [{'cell_type': 'code', 'source': 'print(1)', 'metadata': {}, 'outputs': []}]}
+
+
+def test_unreadable_notebooks_are_skipped(tmp_path):
+    (tmp_path / 'alice_valid.ipynb').write_text(json.dumps(NOTEBOOK))
+    (tmp_path / 'bob_truncated.ipynb').write_text(json.dumps(NOTEBOOK)[:20])
+    nb_identifiers = pd.DataFrame({'UserName': ['alice', 'bob', 'carol'],
+                                   'CurrentUrlSlug': ['valid', 'truncated', 'missing'],
+                                   'CurrentKernelVersionId': [1, 2, 3]})
+    db_engine = DbCommunicationHandler(None, None, None, None, str(tmp_path / 'kgtorrent.db'), backend='sqlite')
+
+    with KGTorrentClient(db_engine, tmp_path, n_workers=2, batch_size=1) as client:
+        notebooks = list(client.iter_notebooks(nb_identifiers))
+        assert [notebook.kernel_version_id for notebook in notebooks] == [1]
+        assert notebooks[0].content == NOTEBOOK
+
+        notebooks = list(client.iter_notebooks(nb_identifiers, skip_missing=False))
+        assert [notebook.content is not None for notebook in notebooks] == [True, False, False]
@@ -0,0 +1,30 @@
+"""
+Tests of the code index of the notebook archive.
+"""
+
+import json
+
+from KGTorrent.code_index import CodeIndex, tokenize_notebook_file
+
+
+def _write_notebook(path, cells):
+    path.write_text(json.dumps({'nbformat': 4, 'nbformat_minor': 4, 'metadata': {}, 'cells': cells}))
+
+
+def _code_cell(source):
+    return {'cell_type': 'code', 'source': source, 'metadata': {}, 'outputs': []}
+
+
+def test_malformed_cells_make_the_notebook_unparsable(tmp_path):
+    _write_notebook(tmp_path / 'alice_valid.ipynb', [_code_cell(['import xgboost as xgb\n', 'xgb.train(x)'])])
+    _write_notebook(tmp_path / 'bob_list.ipynb', [_code_cell(['import xgboost\n', 42])])
+    _write_notebook(tmp_path / 'carol_cell.ipynb', [_code_cell('import xgboost'), 'not a cell'])
+
+    assert tokenize_notebook_file(tmp_path / 'bob_list.ipynb') is None
+    assert tokenize_notebook_file(tmp_path / 'carol_cell.ipynb') is None
+
+    code_index = CodeIndex(tmp_path / 'index')
+    report = code_index.update(tmp_path, n_workers=1)
+
+    assert (report['indexed'], report['unparsable']) == (1, 2)
+    assert code_index.search('xgboost.train') == ['alice_valid']
@@ -0,0 +1,44 @@
+"""
+Tests of the discovery of the foreign key constraints of Meta Kaggle.
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+
+from KGTorrent.constraint_discovery import CONSTRAINT_COLUMNS, ConstraintDiscoverer, write_constraints
+
+
+def _write_meta_kaggle(path):
+    ids = list(range(1, 11))
+    pd.DataFrame({'Id': ids, 'UserName': [f'user{i}' for i in ids]}).to_csv(path / 'Users.csv', index=False)
+    pd.DataFrame({'Id': ids, 'AuthorUserId': ids, 'ForumTopicId': [100 + i for i in ids]}) \
+        .to_csv(path / 'Kernels.csv', index=False)
+    pd.DataFrame({'Id': [1, 2, 3], 'Name': ['nlp', 'gpu', 'eda']}).to_csv(path / 'Tags.csv', index=False)
+    pd.DataFrame({'Id': ids, 'KernelId': ids, 'TagId': [1, 2, 3, 1, 2, 3, 1, 2, 3, None]}) \
+        .to_csv(path / 'KernelTags.csv', index=False)
+
+
+def test_constraints_file_is_compared_with_the_discovered_constraints(tmp_path):
+    _write_meta_kaggle(tmp_path)
+    constraints_df = pd.DataFrame([['Kernels.csv', 'AuthorUserId', 'Users.csv', 'Id'],
+                                   ['KernelTags.csv', 'KernelId', 'Tags.csv', 'Id'],
+                                   ['KernelVotes.csv', 'UserId', 'Users.csv', 'Id']], columns=CONSTRAINT_COLUMNS)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        diff = ConstraintDiscoverer(tmp_path, sample_size=5).diff(constraints_df)
+
+    def constraints(name):
+        return diff[name][CONSTRAINT_COLUMNS].values.tolist()
+
+    assert constraints('confirmed') == [['Kernels.csv', 'AuthorUserId', 'Users.csv', 'Id']]
+    assert constraints('weak') == [['KernelTags.csv', 'KernelId', 'Tags.csv', 'Id']]
+    assert constraints('stale') == [['KernelVotes.csv', 'UserId', 'Users.csv', 'Id']]
+    # Users and Kernels also cover the tags, but only the name of Tags matches the column
+    assert constraints('new') == [['KernelTags.csv', 'TagId', 'Tags.csv', 'Id']]
+    assert diff['unresolved'].values.tolist() == [['Kernels.csv', 'ForumTopicId']]
+
+    write_constraints(diff, tmp_path / 'constraints' / 'fk_constraints_data.csv')
+    written = pd.read_csv(tmp_path / 'constraints' / 'fk_constraints_data.csv')
+    assert written.values.tolist() == constraints('confirmed') + constraints('new')
@@ -0,0 +1,110 @@
+"""
+Tests of the dataframe engines: the ``polars`` engine must load and preprocess Meta Kaggle as the ``pandas`` one.
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from KGTorrent.data_loader import DataLoader
+from KGTorrent.dataframe_engine import get_engine
+from KGTorrent.mk_preprocessor import MkPreprocessor
+from synthetic import CONSTRAINTS_FILE_PATH, write_meta_kaggle
+
+
+def _preprocess(engine_name, meta_kaggle_path):
+    engine = get_engine(engine_name)
+    final_tables = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        dl = DataLoader(CONSTRAINTS_FILE_PATH, str(meta_kaggle_path), engine=engine)
+        mk = MkPreprocessor(dl.get_tables_dict(), dl.get_constraints_df(), engine=engine, n_workers=4)
+        tables_dict, stats = mk.preprocess_mk(on_table_final=lambda name, table: final_tables.append(name))
+    return {name: engine.to_pandas(table) for name, table in tables_dict.items()}, stats, final_tables, mk
+
+
+@pytest.fixture(scope='module')
+def meta_kaggle_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('meta_kaggle')
+    write_meta_kaggle(str(path))
+    return path
+
+
+def test_fixture_has_cycles_and_dangling_keys(meta_kaggle_path):
+    tables_dict, stats, _, mk = _preprocess('pandas', meta_kaggle_path)
+
+    components, _ = mk._get_components()
+    cycles = [component for component in components if len(component) > 1]
+    assert any({'Kernels.csv', 'KernelVersions.csv'} <= component for component in cycles)
+
+    # Rows are removed from the tables of the cycles too
+    removed = stats.set_index('Table')['Initial#rows'] - stats.set_index('Table')['Final#rows']
+    assert removed['Kernels.csv'] > 0 and removed['KernelVersions.csv'] > 0
+
+
+def test_polars_engine_matches_pandas_engine(meta_kaggle_path):
+    pytest.importorskip('polars')
+
+    pandas_tables, pandas_stats, pandas_final, _ = _preprocess('pandas', meta_kaggle_path)
+    polars_tables, polars_stats, polars_final, _ = _preprocess('polars', meta_kaggle_path)
+
+    pd.testing.assert_frame_equal(pandas_stats, polars_stats)
+    assert sorted(pandas_final) == sorted(polars_final) == sorted(pandas_tables)
+
+    for table_name, expected in pandas_tables.items():
+        actual = polars_tables[table_name]
+        assert list(actual.columns) == list(expected.columns), table_name
+        # Nullable integer columns are floats with pandas and integers with polars
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False, obj=table_name)
+
+
+def test_polars_tables_are_lazy(meta_kaggle_path):
+    polars = pytest.importorskip('polars')
+
+    engine = get_engine('polars')
+    with contextlib.redirect_stdout(io.StringIO()):
+        dl = DataLoader(CONSTRAINTS_FILE_PATH, str(meta_kaggle_path), engine=engine)
+    tables_dict = dl.get_tables_dict()
+    votes = engine.drop_duplicates(tables_dict['ForumMessageVotes.csv'], subset=['Id'])
+    votes = engine.parse_dates(votes, ['VoteDate'])
+
+    # The basic preprocessing only extends the plan, which is executed together with the filters
+    assert isinstance(votes, polars.LazyFrame)
+    assert len(votes.explain().splitlines()) > 1
+    votes, removed_rows = engine.filter_referencing(
+        votes, [('ForumMessageId', tables_dict['ForumMessages.csv'], 'Id')])
+    assert isinstance(votes, polars.LazyFrame)
+    assert removed_rows[0] > 0
+    assert isinstance(engine.collect(votes), polars.LazyFrame)
+    assert engine.n_rows(votes) == engine.to_pandas(votes).shape[0]
+
+
+def test_polars_engine_requires_a_recent_polars(monkeypatch):
+    polars = pytest.importorskip('polars')
+    monkeypatch.setattr(polars, '__version__', '0.20.31')
+
+    with pytest.raises(ImportError, match=r'polars>=1\.0'):
+        get_engine('polars')
+
+
+@pytest.mark.parametrize('engine_name', ['pandas', 'polars'])
+def test_rows_with_missing_required_values_are_dropped(tmp_path, engine_name):
+    if engine_name == 'polars':
+        pytest.importorskip('polars')
+    write_meta_kaggle(str(tmp_path), n_rows=20)
+    competitions_path = tmp_path / 'Competitions.csv'
+    competitions = pd.read_csv(competitions_path, dtype=str)
+    competitions.loc[competitions['Id'] == '1', 'Slug'] = None
+    competitions.to_csv(competitions_path, index=False)
+
+    engine = get_engine(engine_name)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        dl = DataLoader(CONSTRAINTS_FILE_PATH, str(tmp_path), engine=engine)
+
+    competitions = engine.to_pandas(dl.get_tables_dict()['Competitions.csv'])
+    assert competitions['Id'].tolist() == list(range(2, 21))
+    assert "Competitions.csv: dropping the rows with missing values in non-nullable columns {'Slug': 1}" \
+        in output.getvalue()
@@ -0,0 +1,75 @@
+"""
+Tests of the SQLite backend of the database handler.
+"""
+
+import datetime
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import inspect
+
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+from KGTorrent.exceptions import DatabaseExistsError
+from synthetic import CONSTRAINTS_FILE_PATH
+
+# Longer than the default timeout of SQLite connections (5 seconds)
+LOCK_SECONDS = 6
+
+
+def test_sqlite_writers_wait_for_each_other(tmp_path):
+    db_path = tmp_path / 'kgtorrent.db'
+    db_engine = DbCommunicationHandler(None, None, None, None, str(db_path), backend='sqlite')
+    db_engine.create_download_status_table()
+
+    # Another writer (e.g., the TableWriter) holds the lock while it writes a large table
+    locked = threading.Event()
+
+    def write_table():
+        connection = sqlite3.connect(str(db_path))
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute('CREATE TABLE Users (Id INTEGER PRIMARY KEY)')
+        locked.set()
+        time.sleep(LOCK_SECONDS)
+        connection.commit()
+        connection.close()
+
+    writer = threading.Thread(target=write_table)
+    writer.start()
+    locked.wait()
+
+    start = time.perf_counter()
+    db_engine.upsert_download_status([{'CurrentKernelVersionId': 1, 'LocalPath': None, 'Status': 'failed', 'Bytes': 0,
+                                       'HttpStatus': 404, 'Reason': None,
+                                       'FetchedAt': datetime.datetime(2020, 10, 1)}])
+    writer.join()
+
+    assert time.perf_counter() - start >= LOCK_SECONDS - 1
+    assert db_engine.execute_query('SELECT Status FROM downloadstatus')['Status'].tolist() == ['failed']
+
+
+def test_sqlite_schema_declares_the_foreign_keys(tmp_path, capsys):
+    constraints_df = pd.read_csv(CONSTRAINTS_FILE_PATH)
+    db_engine = DbCommunicationHandler(None, None, None, None, str(tmp_path / 'kgtorrent.db'), backend='sqlite')
+    db_engine.create_new_db(constraints_df=constraints_df)
+
+    with pytest.raises(DatabaseExistsError):
+        db_engine.create_new_db(constraints_df=constraints_df)
+
+    foreign_keys = inspect(db_engine._engine).get_foreign_keys('Kernels')
+    assert {'constrained_columns': ['AuthorUserId'], 'referred_table': 'Users', 'referred_columns': ['Id']} in \
+        [{key: foreign_key[key] for key in ('constrained_columns', 'referred_table', 'referred_columns')}
+         for foreign_key in foreign_keys]
+
+    # Foreign keys cannot be added to populated SQLite tables: violations are only reported
+    db_engine.write_tables({
+        'Users.csv': pd.DataFrame({'Id': [1], 'UserName': ['alice'], 'RegisterDate': pd.Timestamp('2020-10-01'),
+                                   'PerformanceTier': 1}),
+        'Kernels.csv': pd.DataFrame({'Id': [1, 2], 'AuthorUserId': [1, 2], 'IsProjectLanguageTemplate': False,
+                                     'TotalViews': 0, 'TotalComments': 0, 'TotalVotes': 0}),
+    })
+    capsys.readouterr()
+    db_engine.set_foreign_keys(constraints_df[constraints_df['Table'] == 'Kernels.csv'])
+    assert 'Checked foreign keys of "kernels": 1 violations' in capsys.readouterr().out
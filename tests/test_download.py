@@ -0,0 +1,58 @@
+"""
+Tests of the ``download`` command, run on a small SQLite database without sending requests.
+"""
+
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from conftest import REPO_PATH
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+
+# The requests are not sent: only the notebooks already in the archive are checked
+_SCRIPT = """
+import sys
+from KGTorrent.downloader import Downloader
+
+Downloader._http_download = lambda self: None
+sys.argv = ['kgtorrent.py'] + sys.argv[1:]
+from KGTorrent.kgtorrent import main
+main()
+"""
+
+
+def _write_database(db_path):
+    ids = [1, 2, 3]
+    db_engine = DbCommunicationHandler(None, None, None, None, str(db_path), backend='sqlite')
+    db_engine.write_tables({
+        'KernelLanguages.csv': pd.DataFrame({'Id': [1], 'Name': ['IPython Notebook HTML']}),
+        'Users.csv': pd.DataFrame({'Id': ids, 'UserName': ['alice', 'bob', 'carol']}),
+        'KernelVersions.csv': pd.DataFrame({'Id': ids, 'ScriptLanguageId': 1,
+                                            'CreationDate': pd.Timestamp('2020-10-01')}),
+        'Kernels.csv': pd.DataFrame({'AuthorUserId': ids, 'CurrentUrlSlug': ['gold', 'silver', 'none'],
+                                     'CurrentKernelVersionId': ids, 'Medal': [1.0, 2.0, None],
+                                     'TotalVotes': 10}),
+    })
+
+
+def _download(tmp_path, *args):
+    env = dict(os.environ, PYTHONPATH=str(REPO_PATH), DB_BACKEND='sqlite', DB_NAME=str(tmp_path / 'kgtorrent.db'),
+               NB_DEST_PATH=str(tmp_path / 'notebooks'), LOG_DEST_PATH=str(tmp_path))
+    subprocess.run([sys.executable, '-c', _SCRIPT, 'download', *args], cwd=str(REPO_PATH / 'KGTorrent'), env=env,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return {path.name for path in (tmp_path / 'notebooks').glob('*.ipynb')}
+
+
+def test_filtered_downloads_keep_the_notebooks_outside_the_selection(tmp_path):
+    _write_database(tmp_path / 'kgtorrent.db')
+    (tmp_path / 'notebooks').mkdir()
+    archived = {'alice_gold.ipynb', 'bob_silver.ipynb', 'carol_none.ipynb', 'dave_deleted.ipynb'}
+    for file_name in archived:
+        (tmp_path / 'notebooks' / file_name).write_text('{}')
+
+    assert _download(tmp_path, '--medal', 'gold') == archived
+
+    # Without selection options, the notebooks no longer referenced in the database are deleted
+    assert _download(tmp_path) == archived - {'dave_deleted.ipynb'}
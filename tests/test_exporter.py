@@ -0,0 +1,30 @@
+"""
+Tests of the export of a KGTorrent release.
+"""
+
+import calendar
+import sqlite3
+import tarfile
+
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+from KGTorrent.exporter import Exporter
+
+
+def test_database_exports_are_reproducible(tmp_path):
+    db_path = tmp_path / 'kgtorrent.db'
+    with sqlite3.connect(str(db_path)) as connection:
+        connection.execute('CREATE TABLE Users (Id INTEGER PRIMARY KEY, UserName VARCHAR(255))')
+        connection.executemany('INSERT INTO Users VALUES (?, ?)', [(i, f'user{i}') for i in range(1, 101)])
+    db_engine = DbCommunicationHandler(None, None, None, None, str(db_path), backend='sqlite')
+
+    dumps = []
+    for name in ('first', 'second'):
+        (tmp_path / name).mkdir()
+        dump_path, = Exporter(db_engine, tmp_path / name, '10-2020', n_workers=2).export_database()
+        dumps.append(dump_path)
+
+    assert dumps[0].read_bytes() == dumps[1].read_bytes()
+    with tarfile.open(dumps[0]) as tar:
+        member, = tar.getmembers()
+    assert member.name == 'KGTorrent_dump_10-2020.sql'
+    assert member.mtime == calendar.timegm((2020, 10, 1, 0, 0, 0))
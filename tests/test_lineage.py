@@ -0,0 +1,39 @@
+"""
+Tests of the lineage closure tables of the kernels.
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+
+from KGTorrent.lineage import LineageBuilder, transitive_closure
+
+
+def _pairs(closure):
+    return {(ancestor, descendant): depth for ancestor, descendant, depth in closure.itertuples(index=False)}
+
+
+def test_closure_keeps_the_shortest_paths_and_handles_cycles():
+    edges = pd.DataFrame({'AncestorKernelId': [1, 2, 3, 1, 4, 5],
+                          'DescendantKernelId': [2, 3, 4, 3, 2, 5]})
+
+    assert _pairs(transitive_closure(edges)) == {
+        (1, 2): 1, (1, 3): 1, (1, 4): 2,
+        (2, 3): 1, (2, 4): 2,
+        (3, 4): 1, (3, 2): 2,
+        (4, 2): 1, (4, 3): 2,
+    }
+
+
+def test_fork_and_source_graphs_are_built_at_the_kernel_level():
+    kernels = pd.DataFrame({'Id': [1, 2, 3], 'ForkParentKernelVersionId': [None, 10, 20]})
+    kernel_versions = pd.DataFrame({'Id': [10, 11, 20, 30], 'ScriptId': [1, 1, 2, 3]})
+    kernel_version_kernel_sources = pd.DataFrame({'KernelVersionId': [30, 30], 'SourceKernelVersionId': [11, 99]})
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tables_dict = LineageBuilder(kernels, kernel_versions, kernel_version_kernel_sources).build()
+
+    assert _pairs(tables_dict['KernelForkClosure']) == {(1, 2): 1, (2, 3): 1, (1, 3): 2}
+    # The source version of an unknown kernel is ignored
+    assert _pairs(tables_dict['KernelSourceClosure']) == {(1, 3): 1}
@@ -0,0 +1,27 @@
+"""
+Tests of the manifest of the notebook archive.
+"""
+
+import hashlib
+
+from KGTorrent.manifest import ArchiveManifest, ArchiveVerifier
+
+
+def test_verification_does_not_compact_the_manifest(tmp_path):
+    manifest = ArchiveManifest(tmp_path)
+    for kernel_version_id, file_name in enumerate(['alice_kept.ipynb', 'bob_removed.ipynb']):
+        content = file_name.encode()
+        (tmp_path / file_name).write_bytes(content)
+        manifest.add(file_name, kernel_version_id, len(content), hashlib.sha256(content).hexdigest())
+    (tmp_path / 'bob_removed.ipynb').unlink()
+    manifest.remove('bob_removed.ipynb')
+    manifest_content = manifest.get_path().read_bytes()
+
+    report = ArchiveVerifier(tmp_path, n_workers=1).verify()
+
+    assert report['missing'] == report['extra'] == report['corrupt'] == []
+    assert manifest.get_path().read_bytes() == manifest_content
+
+    # Reading the manifest otherwise compacts it
+    assert set(manifest.read()) == {'alice_kept.ipynb'}
+    assert len(manifest.get_path().read_text().splitlines()) == 2
@@ -0,0 +1,61 @@
+"""
+Tests of the concurrent cleaning of the components of the constraints graph.
+"""
+
+import contextlib
+import io
+import threading
+
+import pandas as pd
+import pytest
+
+from KGTorrent.data_loader import DataLoader
+from KGTorrent.mk_preprocessor import MkPreprocessor
+from synthetic import CONSTRAINTS_FILE_PATH, write_meta_kaggle
+
+
+@pytest.fixture(scope='module')
+def meta_kaggle_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('meta_kaggle')
+    write_meta_kaggle(str(path))
+    return path
+
+
+def _preprocess(meta_kaggle_path, n_workers):
+    with contextlib.redirect_stdout(io.StringIO()):
+        dl = DataLoader(CONSTRAINTS_FILE_PATH, str(meta_kaggle_path))
+        mk = MkPreprocessor(dl.get_tables_dict(), dl.get_constraints_df(), n_workers=n_workers)
+        components, dependencies = mk._get_components()
+
+        # Components are recorded when their cleaning starts and ends
+        events = []
+        lock = threading.Lock()
+        clean_component = mk._clean_component
+
+        def recorded(component, constraints):
+            index = components.index(component)
+            with lock:
+                events.append(('start', index))
+            clean_component(component, constraints)
+            with lock:
+                events.append(('end', index))
+
+        mk._clean_component = recorded
+        final_tables = []
+        tables_dict, stats = mk.preprocess_mk(on_table_final=lambda name, table: final_tables.append(name))
+    return tables_dict, stats, final_tables, events, dependencies
+
+
+def test_concurrent_cleaning_matches_serial_cleaning(meta_kaggle_path):
+    serial_tables, serial_stats, _, _, _ = _preprocess(meta_kaggle_path, n_workers=1)
+    tables_dict, stats, final_tables, events, dependencies = _preprocess(meta_kaggle_path, n_workers=8)
+
+    pd.testing.assert_frame_equal(stats, serial_stats)
+    for table_name, expected in serial_tables.items():
+        pd.testing.assert_frame_equal(tables_dict[table_name], expected, obj=table_name)
+
+    # Each table is handed over once, and each component is cleaned after the components it references
+    assert sorted(final_tables) == sorted(tables_dict)
+    for index, referenced in enumerate(dependencies):
+        start = events.index(('start', index))
+        assert all(events.index(('end', dependency)) < start for dependency in referenced)
@@ -0,0 +1,53 @@
+"""
+Tests of the incremental extraction of the notebook facts.
+"""
+
+import json
+import os
+
+import pandas as pd
+
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+from KGTorrent.nb_extractor import NotebookExtractor, get_imported_modules
+
+
+def _write_notebook(path, sources):
+    cells = [{'cell_type': 'code', 'source': source, 'metadata': {}, 'execution_count': None, 'outputs': []}
+             for source in sources]
+    path.write_text(json.dumps({'nbformat': 4, 'nbformat_minor': 4, 'metadata': {}, 'cells': cells}))
+
+
+def test_imported_modules_are_found():
+    code = 'import numpy as np, os\nfrom sklearn.model_selection import KFold\nfrom . import utils\n# import re'
+    assert get_imported_modules(code) == {'numpy', 'os', 'sklearn.model_selection'}
+
+
+def test_only_new_and_changed_notebooks_are_extracted(tmp_path):
+    archive_path = tmp_path / 'notebooks'
+    archive_path.mkdir()
+    _write_notebook(archive_path / 'alice_first.ipynb', ['import pandas as pd'])
+    _write_notebook(archive_path / 'bob_second.ipynb', ['import numpy'])
+    (archive_path / 'carol_unknown.ipynb').write_text('{}')
+    nb_identifiers = pd.DataFrame({'UserName': ['alice', 'bob'], 'CurrentUrlSlug': ['first', 'second'],
+                                   'CurrentKernelVersionId': [1, 2]})
+    db_engine = DbCommunicationHandler(None, None, None, None, str(tmp_path / 'kgtorrent.db'), backend='sqlite')
+    extractor = NotebookExtractor(db_engine, archive_path, n_workers=1)
+
+    report = extractor.extract(nb_identifiers)
+    assert (report['extracted'], report['imports'], report['unknown']) == (2, 2, 1)
+
+    # Unchanged notebooks are not parsed again
+    assert extractor.extract(nb_identifiers)['extracted'] == 0
+
+    _write_notebook(archive_path / 'alice_first.ipynb', ['import pandas as pd', 'import matplotlib.pyplot as plt'])
+    stat = os.stat(archive_path / 'alice_first.ipynb')
+    os.utime(archive_path / 'alice_first.ipynb', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    (archive_path / 'bob_second.ipynb').unlink()
+
+    report = extractor.extract(nb_identifiers)
+    assert (report['extracted'], report['deleted']) == (1, 1)
+
+    imports = db_engine.execute_query('SELECT CurrentKernelVersionId, Module FROM notebookimports ORDER BY Module')
+    assert imports.values.tolist() == [[1, 'matplotlib.pyplot'], [1, 'pandas']]
+    facts = db_engine.execute_query('SELECT CurrentKernelVersionId, NCodeCells FROM notebookfacts')
+    assert facts.values.tolist() == [[1, 2]]
@@ -0,0 +1,31 @@
+"""
+Tests of the validation of the notebook archive.
+"""
+
+import hashlib
+import json
+
+from KGTorrent.manifest import ArchiveManifest, ArchiveVerifier
+from KGTorrent.nb_validator import NotebookValidator, QUARANTINE_FOLDER_NAME
+
+NOTEBOOK = json.dumps({'nbformat': 4, 'nbformat_minor': 4, 'metadata': {},
+                       'cells': [{'cell_type': 'code', 'source': 'print(1)', 'metadata': {}, 'outputs': []}]}).encode()
+
+
+def _add_notebook(nb_archive_path, file_name, kernel_version_id, content):
+    (nb_archive_path / file_name).write_bytes(content)
+    ArchiveManifest(nb_archive_path).add(file_name, kernel_version_id, len(content), hashlib.sha256(content).hexdigest())
+
+
+def test_quarantined_notebooks_are_removed_from_the_manifest(tmp_path):
+    _add_notebook(tmp_path, 'alice_valid.ipynb', 1, NOTEBOOK)
+    _add_notebook(tmp_path, 'bob_truncated.ipynb', 2, NOTEBOOK[:20])
+
+    report = NotebookValidator(tmp_path, n_workers=1).validate_archive()
+
+    assert report['quarantined'] == 1
+    assert (tmp_path / QUARANTINE_FOLDER_NAME / 'bob_truncated.ipynb').exists()
+    assert set(ArchiveManifest(tmp_path).read()) == {'alice_valid.ipynb'}
+
+    verification = ArchiveVerifier(tmp_path, n_workers=1).verify()
+    assert verification['missing'] == verification['extra'] == verification['corrupt'] == []
@@ -0,0 +1,58 @@
+"""
+Tests of the profiler of the pipeline stages.
+"""
+
+import contextlib
+import io
+import threading
+import time
+
+from KGTorrent import profiling
+from KGTorrent.profiling import Profiler, SUMMARY_FILE_NAME, stage
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _write_stage():
+    with stage('write'):
+        _busy(0.1)
+
+
+def test_stages_are_profiled_on_every_thread(tmp_path):
+    profiler = Profiler(tmp_path / 'profiles', interval=0.001)
+    kept = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        profiler.start()
+        with stage('load'):
+            kept.append(bytearray(4 * 2 ** 20))
+            _busy(0.2)
+
+        # The same stage running on several threads is reported once
+        threads = [threading.Thread(target=_write_stage) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        profiler.stop()
+
+    # Stages are no longer profiled once the profiler is stopped
+    assert profiling._profiler is None
+    assert isinstance(stage('load'), contextlib.nullcontext)
+
+    profiles_path = tmp_path / 'profiles'
+    assert sorted(path.name for path in profiles_path.iterdir()) == [
+        'load.folded', 'load.memory.txt', SUMMARY_FILE_NAME, 'write.folded', 'write.memory.txt']
+    for name in ('load', 'write'):
+        stacks = (profiles_path / f'{name}.folded').read_text().splitlines()
+        assert any('_busy (test_profiling.py:' in stack for stack in stacks)
+
+    # The memory still allocated at the end of the stage is attributed to it
+    assert 'test_profiling.py' in (profiles_path / 'load.memory.txt').read_text()
+    summary = (profiles_path / SUMMARY_FILE_NAME).read_text().splitlines()
+    assert [line.split()[0] for line in summary[1:]] == ['load', 'write']
+    assert float(summary[1].split()[-1]) >= 3.9
+
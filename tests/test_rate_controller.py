@@ -0,0 +1,87 @@
+"""
+Tests of the AIMD rate controller.
+"""
+
+import pytest
+
+from KGTorrent import rate_controller
+from KGTorrent.rate_controller import RateController, SUCCESS, THROTTLED
+
+
+class _Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _Clock:
+    """A fake clock whose time only advances when sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_controller.time, 'time', clock.time)
+    monkeypatch.setattr(rate_controller.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_first_request_is_not_delayed(clock):
+    controller = RateController(initial_rate=1.0)
+    controller.wait()
+    assert clock.sleeps == []
+
+
+def test_throttling_slows_down_the_next_request(clock):
+    controller = RateController(initial_rate=1.0, backoff_factor=2.0)
+
+    controller.wait()
+    assert controller.register_response(_Response(429)) == THROTTLED
+    controller.wait()
+
+    # The rate was halved by the 429, so the very next request waits 2 seconds instead of 1
+    assert clock.sleeps == [pytest.approx(2.0)]
+
+
+def test_success_speeds_up_the_next_request(clock):
+    controller = RateController(initial_rate=1.0, increase_step=1.0)
+
+    controller.wait()
+    assert controller.register_response(_Response(200)) == SUCCESS
+    controller.wait()
+
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_retry_after_is_honoured(clock):
+    controller = RateController(initial_rate=10.0)
+
+    controller.wait()
+    controller.register_response(_Response(503, {'Retry-After': '30'}))
+    controller.wait()
+
+    assert clock.sleeps == [pytest.approx(30.0)]
+    assert controller.get_metrics()['retry_after_pauses'] == 1
+
+
+def test_rate_is_not_lowered_below_the_minimum(clock, caplog):
+    controller = RateController(initial_rate=0.2, min_rate=0.1, backoff_factor=2.0)
+
+    with caplog.at_level('INFO'):
+        controller.register_network_error()
+        controller.register_network_error()
+
+    assert controller.get_rate() == pytest.approx(0.1)
+    assert controller.get_metrics()['rate_decreases'] == 1
+    assert [record.getMessage() for record in caplog.records] == ['Request rate lowered to 0.100 requests/s']
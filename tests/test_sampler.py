@@ -0,0 +1,40 @@
+"""
+Tests of the referentially closed sampling of Meta Kaggle.
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from KGTorrent.data_loader import DataLoader
+from KGTorrent.dataframe_engine import get_engine
+from KGTorrent.sampler import Sampler
+from synthetic import CONSTRAINTS_FILE_PATH, write_meta_kaggle
+
+
+@pytest.mark.parametrize('engine_name', ['pandas', 'polars'])
+def test_samples_are_referentially_closed(tmp_path, engine_name):
+    if engine_name == 'polars':
+        pytest.importorskip('polars')
+    write_meta_kaggle(str(tmp_path))
+    engine = get_engine(engine_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        dl = DataLoader(CONSTRAINTS_FILE_PATH, str(tmp_path), engine=engine)
+        tables_dict = dl.get_tables_dict()
+        sample = Sampler(tables_dict, dl.get_constraints_df(), engine=engine).sample(0.05)
+        same_sample = Sampler(tables_dict, dl.get_constraints_df(), engine=engine).sample(0.05)
+
+    tables_dict = {table_name: engine.to_pandas(table) for table_name, table in tables_dict.items()}
+    sample = {table_name: engine.to_pandas(table) for table_name, table in sample.items()}
+    assert 0 < sample['Kernels.csv'].shape[0] < tables_dict['Kernels.csv'].shape[0]
+    for table_name, table in sample.items():
+        pd.testing.assert_frame_equal(table, engine.to_pandas(same_sample[table_name]))
+
+    # Every key of the sample that can be resolved in the full tables is resolved in the sample
+    for referencing, fk, referenced, rc in dl.get_constraints_df()[['Table', 'Foreign Key', 'Referenced Table',
+                                                                    'Referenced Column']].itertuples(index=False):
+        keys = sample[referencing][fk].dropna()
+        resolvable = keys[keys.isin(tables_dict[referenced][rc])]
+        assert resolvable.isin(sample[referenced][rc]).all(), (referencing, fk)
@@ -0,0 +1,68 @@
+"""
+Tests of the download priorities and of the download budget.
+"""
+
+import pandas as pd
+import pytest
+
+from KGTorrent import scheduler
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+from KGTorrent.scheduler import DownloadBudget, parse_duration, parse_size
+from KGTorrent.selection import Selection
+
+
+def test_budget_options_are_parsed():
+    assert parse_duration('90m') == 5400
+    assert parse_duration('1.5h') == 5400
+    assert parse_size('500MB') == 500 * 2 ** 20
+    assert parse_size('2G') == 2 * 2 ** 30
+    with pytest.raises(ValueError):
+        parse_duration('6 weeks')
+
+
+def test_budget_is_exhausted_by_time_or_bytes(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, 'time', lambda: now[0])
+
+    budget = DownloadBudget(max_duration=60, max_bytes=1000)
+    budget.start()
+    budget.consume(999)
+    now[0] += 59
+    assert not budget.is_exhausted()
+
+    budget.consume(1)
+    assert budget.is_exhausted()
+
+    budget.start()
+    now[0] += 60
+    assert budget.is_exhausted()
+
+
+@pytest.mark.parametrize('catalog', [False, True])
+def test_notebooks_are_ordered_by_priority(tmp_path, catalog):
+    ids = [1, 2, 3, 4]
+    db_engine = DbCommunicationHandler(None, None, None, None, str(tmp_path / 'kgtorrent.db'), backend='sqlite')
+    db_engine.write_tables({
+        'KernelLanguages.csv': pd.DataFrame({'Id': [1], 'Name': ['IPython Notebook HTML']}),
+        'Users.csv': pd.DataFrame({'Id': ids, 'UserName': ['alice', 'bob', 'carol', 'dave']}),
+        'KernelVersions.csv': pd.DataFrame({'Id': ids, 'ScriptLanguageId': 1,
+                                            'CreationDate': pd.to_datetime(['2020-01-01', '2020-04-01',
+                                                                            '2020-02-01', '2020-03-01'])}),
+        'Kernels.csv': pd.DataFrame({'AuthorUserId': ids, 'CurrentUrlSlug': ['silver', 'none', 'gold', 'gold-top'],
+                                     'CurrentKernelVersionId': ids, 'Medal': [2.0, None, 1.0, 1.0],
+                                     'TotalVotes': [50, 100, 10, 20]}),
+    })
+    if catalog:
+        catalog_df = db_engine.execute_query('SELECT u.UserName, k.CurrentUrlSlug, k.CurrentKernelVersionId, '
+                                             'v.ScriptLanguageId AS LanguageId, k.Medal, k.TotalVotes, '
+                                             'v.CreationDate AS VersionCreationDate '
+                                             'FROM kernels k JOIN users u ON k.AuthorUserId = u.Id '
+                                             'JOIN kernelversions v ON k.CurrentKernelVersionId = v.Id')
+        db_engine.write_tables({'notebookcatalog': catalog_df})
+
+    def select(priority):
+        return db_engine.select_notebooks(Selection(priority=priority))['CurrentUrlSlug'].tolist()
+
+    assert select('medal') == ['gold-top', 'gold', 'silver', 'none']
+    assert select('votes') == ['none', 'silver', 'gold-top', 'gold']
+    assert select('recency') == ['none', 'gold-top', 'gold', 'silver']
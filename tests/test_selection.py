@@ -0,0 +1,72 @@
+"""
+Tests of the selection of notebooks from the KGTorrent database.
+"""
+
+import pandas as pd
+
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+from KGTorrent.selection import Selection
+
+
+class _QueryCounter:
+    """
+    Counts the queries sent to the database by a handler.
+    """
+
+    def __init__(self, db_engine, monkeypatch):
+        self.n_queries = 0
+        execute_query = db_engine.execute_query
+        has_table = db_engine.has_table
+
+        def counted(function):
+            def wrapper(*args, **kwargs):
+                self.n_queries += 1
+                return function(*args, **kwargs)
+            return wrapper
+
+        monkeypatch.setattr(db_engine, 'execute_query', counted(execute_query))
+        monkeypatch.setattr(db_engine, 'has_table', counted(has_table))
+
+
+def _write_kernels(db_engine, ids):
+    db_engine.write_tables({
+        'Users.csv': pd.DataFrame({'Id': ids, 'UserName': [f'user{i}' for i in ids]}),
+        'KernelVersions.csv': pd.DataFrame({'Id': ids, 'ScriptLanguageId': 1,
+                                            'CreationDate': pd.Timestamp('2020-10-01')}),
+        'Kernels.csv': pd.DataFrame({'AuthorUserId': ids, 'CurrentUrlSlug': [f'slug-{i}' for i in ids],
+                                     'CurrentKernelVersionId': ids, 'Medal': 1.0, 'TotalVotes': 10}),
+    })
+
+
+def test_cached_selections_do_not_query_the_database(tmp_path, monkeypatch):
+    db_engine = DbCommunicationHandler(None, None, None, None, str(tmp_path / 'kgtorrent.db'), backend='sqlite')
+    db_engine.write_tables({'KernelLanguages.csv': pd.DataFrame({'Id': [1], 'Name': ['IPython Notebook HTML']})})
+    _write_kernels(db_engine, [1, 2, 3])
+    selection = Selection(languages=['IPython Notebook HTML'])
+
+    assert db_engine.select_notebooks(selection).shape[0] == 3
+
+    counter = _QueryCounter(db_engine, monkeypatch)
+    assert db_engine.select_notebooks(selection).shape[0] == 3
+    assert counter.n_queries == 0
+
+    # Loading new rows changes the snapshot of Meta Kaggle, so the selection is run again
+    _write_kernels(db_engine, [4, 5])
+    assert db_engine.select_notebooks(selection).shape[0] == 5
+    assert counter.n_queries > 0
+
+
+def test_invalidated_selections_see_the_database_refreshed_by_another_process(tmp_path):
+    db_path = str(tmp_path / 'kgtorrent.db')
+    db_engine = DbCommunicationHandler(None, None, None, None, db_path, backend='sqlite')
+    db_engine.write_tables({'KernelLanguages.csv': pd.DataFrame({'Id': [1], 'Name': ['IPython Notebook HTML']})})
+    _write_kernels(db_engine, [1, 2, 3])
+    selection = Selection(languages=['IPython Notebook HTML'])
+    assert db_engine.select_notebooks(selection).shape[0] == 3
+
+    # Another handler stands for the process refreshing the database
+    _write_kernels(DbCommunicationHandler(None, None, None, None, db_path, backend='sqlite'), [4, 5])
+    assert db_engine.select_notebooks(selection).shape[0] == 3
+
+    db_engine.invalidate_selections()
+    assert db_engine.select_notebooks(selection).shape[0] == 5
@@ -0,0 +1,118 @@
+"""
+Tests of the sharded download: shards are downloaded by concurrent processes from a local stub server,
+then merged into the notebook archive by the :class:`.ShardReconciler`.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import REPO_PATH
+from KGTorrent.nb_validator import QUARANTINE_FOLDER_NAME, QUARANTINE_REASONS_FILE_NAME
+from KGTorrent.shards import ShardReconciler, REPORT_FILE_NAME
+
+N_NOTEBOOKS = 12
+N_SHARDS = 2
+
+# Notebooks the stub server answers with an HTML page, a missing page, and the notebook already in the archive
+HTML_ID = 5
+MISSING_ID = 8
+ARCHIVED_ID = 3
+
+NOTEBOOK = json.dumps({'nbformat': 4, 'nbformat_minor': 4, 'metadata': {},
+                       'cells': [{'cell_type': 'code', 'source': 'print(1)', 'metadata': {}, 'outputs': []}]})
+
+# Downloads a shard as the `download --shard` command does, from the stub server
+_SCRIPT = """
+import sys
+import pandas as pd
+from KGTorrent.downloader import Downloader
+from KGTorrent.rate_controller import RateController
+from KGTorrent.shards import drop_archived_notebooks, get_shard_path, select_shard
+
+nb_archive_path, port, index, count, n_notebooks = sys.argv[1], sys.argv[2], *map(int, sys.argv[3:])
+ids = range(1, n_notebooks + 1)
+nb_identifiers = pd.DataFrame({'UserName': [f'user{i}' for i in ids], 'CurrentUrlSlug': [f'slug-{i}' for i in ids],
+                               'CurrentKernelVersionId': list(ids)})
+nb_identifiers = drop_archived_notebooks(select_shard(nb_identifiers, index, count), nb_archive_path)
+downloader = Downloader(nb_identifiers, get_shard_path(nb_archive_path, index, count),
+                        notebook_url=f'http://127.0.0.1:{port}/kernels/{{}}/download')
+downloader._rate_controller = RateController(initial_rate=100, max_rate=100)
+downloader.download_notebooks()
+"""
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        kernel_version_id = int(self.path.split('/')[2])
+        self.server.requested.append(kernel_version_id)
+        if kernel_version_id == MISSING_ID:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = b'<html>Error</html>' if kernel_version_id == HTML_ID else NOTEBOOK.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.requested = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_shards_downloaded_by_concurrent_processes_are_reconciled(tmp_path, stub_server):
+    (tmp_path / f'user{ARCHIVED_ID}_slug-{ARCHIVED_ID}.ipynb').write_text(NOTEBOOK)
+
+    env = dict(os.environ, PYTHONPATH=str(REPO_PATH), LOG_DEST_PATH=str(tmp_path))
+    processes = [subprocess.Popen([sys.executable, '-c', _SCRIPT, str(tmp_path), str(stub_server.server_port),
+                                   str(index), str(N_SHARDS), str(N_NOTEBOOKS)],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                 for index in range(N_SHARDS)]
+    for process in processes:
+        _, stderr = process.communicate(timeout=120)
+        assert process.returncode == 0, stderr.decode()
+
+    # Notebooks already in the archive are not requested again
+    assert ARCHIVED_ID not in stub_server.requested
+    assert set(stub_server.requested) == set(range(1, N_NOTEBOOKS + 1)) - {ARCHIVED_ID}
+
+    report = ShardReconciler(tmp_path).reconcile()
+
+    downloaded = set(range(1, N_NOTEBOOKS + 1)) - {HTML_ID, MISSING_ID}
+    assert {path.name for path in tmp_path.glob('*.ipynb')} == {f'user{i}_slug-{i}.ipynb' for i in downloaded}
+    assert report['merged_notebooks'] == len(downloaded) - 1
+    assert report['replaced_notebooks'] == 0
+    assert report['missing_shards'] == []
+    assert not any(path.name.startswith('shard_') for path in tmp_path.iterdir())
+    assert (tmp_path / REPORT_FILE_NAME).exists()
+
+    # Quarantined notebooks and the reasons of their rejection survive the removal of the shard folders
+    quarantine_path = tmp_path / QUARANTINE_FOLDER_NAME
+    assert report['quarantined_notebooks'] == 1
+    assert (quarantine_path / f'user{HTML_ID}_slug-{HTML_ID}.ipynb').exists()
+    with open(quarantine_path / QUARANTINE_REASONS_FILE_NAME) as reasons_file:
+        reasons = [json.loads(line) for line in reasons_file]
+    assert [(entry['File'], entry['Reason']) for entry in reasons] == [(f'user{HTML_ID}_slug-{HTML_ID}.ipynb',
+                                                                        'HTML page')]
+    assert reasons[0]['Shard'] in {f'{index}/{N_SHARDS}' for index in range(N_SHARDS)}
+
+    failed_ids = sorted(i for shard in report['shards'] for i in shard['failed_ids'])
+    assert failed_ids == [HTML_ID, MISSING_ID]
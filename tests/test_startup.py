@@ -0,0 +1,37 @@
+"""
+Tests of the startup of the KGTorrent command line interface.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO_PATH
+
+# Modules that lightweight commands must not import
+HEAVY_MODULES = ('pandas', 'sqlalchemy', 'requests', 'numpy', 'kaggle')
+
+_SCRIPT = """
+import json, sys
+sys.argv = ['kgtorrent.py'] + sys.argv[1:]
+from KGTorrent.kgtorrent import main
+main()
+print(json.dumps(sorted(name for name in sys.modules if '.' not in name)))
+"""
+
+
+def _run_command(tmp_path, *args):
+    env = dict(os.environ, PYTHONPATH=str(REPO_PATH), NB_DEST_PATH=str(tmp_path))
+    result = subprocess.run([sys.executable, '-c', _SCRIPT, *args], cwd=str(REPO_PATH / 'KGTorrent'), env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    return result.stdout, set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def test_status_does_not_import_heavy_modules(tmp_path):
+    (tmp_path / 'user_notebook.ipynb').write_text('{}')
+
+    stdout, modules = _run_command(tmp_path, 'status')
+
+    assert 'Number of notebooks: 1' in stdout
+    assert modules.isdisjoint(HEAVY_MODULES), sorted(modules.intersection(HEAVY_MODULES))
@@ -0,0 +1,48 @@
+"""
+Tests of the background writer of the tables.
+"""
+
+import pytest
+
+from KGTorrent.table_writer import TableWriter
+
+
+class _DbEngine:
+    """
+    Records the tables written to the database, and fails on the given table.
+    """
+
+    def __init__(self, failing_table=None):
+        self.failing_table = failing_table
+        self.written = []
+
+    def write_tables(self, tables_dict):
+        for table_name in tables_dict:
+            if table_name == self.failing_table:
+                raise ValueError(f'cannot write {table_name}')
+            self.written.append(table_name)
+
+
+def test_tables_are_written_in_order():
+    db_engine = _DbEngine()
+    writer = TableWriter(db_engine, to_pandas=lambda table: table)
+    writer.start()
+    for table_name in ('Users.csv', 'Kernels.csv', 'KernelVersions.csv'):
+        writer.put(table_name, None)
+    writer.close()
+
+    assert db_engine.written == ['Users.csv', 'Kernels.csv', 'KernelVersions.csv']
+
+
+def test_first_error_is_raised_on_close():
+    db_engine = _DbEngine(failing_table='Kernels.csv')
+    writer = TableWriter(db_engine)
+    writer.start()
+    for table_name in ('Users.csv', 'Kernels.csv', 'KernelVersions.csv'):
+        writer.put(table_name, None)
+
+    with pytest.raises(ValueError, match='cannot write Kernels.csv'):
+        writer.close()
+
+    # The tables queued after the error are discarded
+    assert db_engine.written == ['Users.csv']
@@ -0,0 +1,46 @@
+"""
+Tests of the temporal database storing the snapshots of Meta Kaggle.
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+
+from KGTorrent.db_communication_handler import DbCommunicationHandler
+from KGTorrent.temporal import TemporalStore
+
+
+def test_rows_are_valid_until_the_snapshot_changing_them(tmp_path):
+    db_engine = DbCommunicationHandler(None, None, None, None, str(tmp_path / 'kgtorrent.db'), backend='sqlite')
+    store = TemporalStore(db_engine)
+    assert not store.is_temporal()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert store.add_snapshot({'Users.csv': pd.DataFrame({'Id': [1, 2, 3],
+                                                              'UserName': ['alice', 'bob', 'carol'],
+                                                              'PerformanceTier': [1, 2, 3]})}, '2020-10') == 1
+        # The tier of the new user is missing, which turns the column into floats in pandas
+        assert store.add_snapshot({'Users.csv': pd.DataFrame({'Id': [1, 2, 4],
+                                                              'UserName': ['alice', 'bobby', 'dave'],
+                                                              'PerformanceTier': [1, 2, None]})}, '2020-11') == 2
+
+    assert store.is_temporal()
+    assert store.get_snapshots()['Label'].tolist() == ['2020-10', '2020-11']
+
+    history = db_engine.execute_query('SELECT Id, UserName, ValidFrom, ValidTo FROM users_history '
+                                      'ORDER BY Id, ValidFrom')
+    assert history.astype(object).where(history.notnull(), None).values.tolist() == [
+        [1, 'alice', 1, None],
+        [2, 'bob', 1, 2],
+        [2, 'bobby', 2, None],
+        [3, 'carol', 1, 2],
+        [4, 'dave', 2, None],
+    ]
+
+    def user_names(view):
+        return db_engine.execute_query(f'SELECT UserName FROM {view} ORDER BY Id')['UserName'].tolist()
+
+    assert user_names('users') == ['alice', 'bobby', 'dave']
+    assert user_names('users_snapshot_1') == ['alice', 'bob', 'carol']
+    assert user_names('users_snapshot_2') == ['alice', 'bobby', 'dave']